@@ -11,7 +11,7 @@
 import asyncio
 import logging
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Optional, List, Union
+from typing import Dict, Any, Optional, List, Union, AsyncIterator
 from dataclasses import dataclass, field
 from datetime import datetime
 import time
@@ -128,6 +128,22 @@ class BaseLLM(ABC):
         """
         pass
     
+    async def stream_text(self, request: GenerationRequest) -> AsyncIterator[str]:
+        """
+        串流生成文本，逐段回傳模型輸出
+        
+        預設實作等待完整生成後一次回傳；支援串流的提供商應覆寫此方法。
+        
+        Args:
+            request: 生成請求
+            
+        Yields:
+            str: 生成的文字片段
+        """
+        response = await self.generate_text(self._prepare_request(request))
+        if response.text:
+            yield response.text
+    
     @abstractmethod
     async def get_embeddings(self, texts: List[str]) -> List[List[float]]:
         """
@@ -12,7 +12,7 @@ import asyncio
 import aiohttp
 import json
 import time
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, AsyncIterator
 from dataclasses import dataclass
 
 from .base_llm import BaseLLM, LLMConfig, GenerationRequest, GenerationResponse, ModelInfo
@@ -110,6 +110,53 @@ class QwenLLM(BaseLLM):
             self.logger.error(f"Qwen 文本生成失敗: {str(e)}")
             raise
     
+    async def stream_text(self, request: GenerationRequest) -> AsyncIterator[str]:
+        """
+        串流生成文本（OpenAI 相容 SSE 格式）
+        
+        Args:
+            request: 生成請求
+            
+        Yields:
+            str: 生成的文字片段
+        """
+        if not self.is_initialized:
+            raise RuntimeError("Qwen LLM 尚未初始化")
+        
+        payload = self._prepare_chat_payload(self._prepare_request(request))
+        payload["stream"] = True
+        
+        url = f"{self.api_base}{self.config.api_endpoint}"
+        headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.config.api_key}" if self.config.api_key else ""
+        }
+        # 串流的總時間取決於生成長度，只限制兩段輸出之間的等待時間
+        timeout = aiohttp.ClientTimeout(total=None, sock_read=self.config.timeout)
+        
+        async with self.http_session.post(url, json=payload, headers=headers, timeout=timeout) as response:
+            if response.status != 200:
+                error_text = await response.text()
+                raise RuntimeError(f"Qwen API 錯誤: {response.status} - {error_text}")
+            
+            async for raw_line in response.content:
+                line = raw_line.decode("utf-8").strip()
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                
+                try:
+                    chunk = json.loads(data)
+                    delta = chunk["choices"][0].get("delta", {}).get("content")
+                except (json.JSONDecodeError, KeyError, IndexError) as e:
+                    self.logger.warning(f"略過無法解析的 Qwen 串流片段: {str(e)}")
+                    continue
+                
+                if delta:
+                    yield delta
+    
     def _prepare_chat_payload(self, request: GenerationRequest) -> Dict[str, Any]:
         """
         準備聊天格式的請求 payload
@@ -36,7 +36,8 @@ class ModelConfig:
     text2vec_model: str = "bge-m3"
     text2vec_path: str = "BAAI/bge-m3"
     text2vec_max_length: int = 512
-    text2vec_batch_size: int = 32
+    text2vec_batch_size: int = int(os.getenv("EMBEDDING_MAX_BATCH_SIZE", "32"))
+    text2vec_max_wait_ms: float = float(os.getenv("EMBEDDING_MAX_WAIT_MS", "5"))
     text2vec_normalize_embeddings: bool = True
     text2vec_pooling_strategy: str = "mean"
     text2vec_device: str = "auto"
@@ -267,6 +268,8 @@ class PodwiseIntegratedConfig:
         self.cache_enabled = kwargs.get("cache_enabled", True)
         self.cache_ttl = kwargs.get("cache_ttl", 3600)
         self.cache_max_size = kwargs.get("cache_max_size", 1000)
+        self.semantic_cache_threshold = kwargs.get("semantic_cache_threshold", 0.95)
+        self.semantic_cache_near_hit_threshold = kwargs.get("semantic_cache_near_hit_threshold", 0.85)
         
         # 載入環境變數
         self._load_from_env()
@@ -293,6 +296,15 @@ class PodwiseIntegratedConfig:
         self.langfuse.secret_key = os.getenv("LANGFUSE_SECRET_KEY", "")
         self.langfuse.host = os.getenv("LANGFUSE_HOST", self.langfuse.host)
         
+        # 載入快取配置
+        self.cache_enabled = os.getenv("CACHE_ENABLED", str(self.cache_enabled)).lower() == "true"
+        self.cache_ttl = int(os.getenv("CACHE_TTL", self.cache_ttl))
+        self.cache_max_size = int(os.getenv("CACHE_MAX_SIZE", self.cache_max_size))
+        self.semantic_cache_threshold = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", self.semantic_cache_threshold))
+        self.semantic_cache_near_hit_threshold = float(
+            os.getenv("SEMANTIC_CACHE_NEAR_HIT_THRESHOLD", self.semantic_cache_near_hit_threshold)
+        )
+        
         # 載入安全配置
         self.secret_key = os.getenv("SECRET_KEY", "")
         self.jwt_secret_key = os.getenv("JWT_SECRET_KEY", "")
@@ -397,6 +409,7 @@ class PodwiseIntegratedConfig:
                 "model_path": self.models.text2vec_path,
                 "max_length": self.models.text2vec_max_length,
                 "batch_size": self.models.text2vec_batch_size,
+                "max_wait_ms": self.models.text2vec_max_wait_ms,
                 "normalize_embeddings": self.models.text2vec_normalize_embeddings,
                 "pooling_strategy": self.models.text2vec_pooling_strategy,
                 "device": self.models.text2vec_device
@@ -15,8 +15,8 @@ Podwise RAG Pipeline 回答生成器
 
 import logging
 import asyncio
-from typing import Dict, List, Any, Optional, Tuple
-from dataclasses import dataclass
+from typing import Dict, List, Any, Optional, Tuple, AsyncIterator
+from dataclasses import dataclass, asdict
 from datetime import datetime
 import re
 
@@ -29,6 +29,17 @@ except ImportError as e:
     logging.warning(f"摘要工具導入失敗: {e}")
     SUMMARY_TOOLS_AVAILABLE = False
 
+# 導入上下文打包器
+try:
+    try:
+        from .context_packer import ContextChunk, ContextPacker, EPISODE_KEYS, episode_key
+    except ImportError:
+        from core.context_packer import ContextChunk, ContextPacker, EPISODE_KEYS, episode_key
+    CONTEXT_PACKER_AVAILABLE = True
+except ImportError as e:
+    logging.warning(f"上下文打包器導入失敗: {e}")
+    CONTEXT_PACKER_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
 
@@ -67,7 +78,8 @@ class AnswerGenerator:
                  default_qa_processor=None,
                  web_search_tool=None,
                  prompt_templates=None,
-                 agent_roles_manager=None):
+                 agent_roles_manager=None,
+                 context_packer=None):
         """
         初始化回答生成器
         
@@ -77,12 +89,16 @@ class AnswerGenerator:
             web_search_tool: Web 搜尋工具
             prompt_templates: 提示詞模板
             agent_roles_manager: 代理角色管理器
+            context_packer: 上下文打包器，預設依 CONTEXT_MAX_TOKENS 建立
         """
         self.llm_manager = llm_manager
         self.default_qa_processor = default_qa_processor
         self.web_search_tool = web_search_tool
         self.prompt_templates = prompt_templates
         self.agent_roles_manager = agent_roles_manager
+        self.context_packer = context_packer
+        if self.context_packer is None and CONTEXT_PACKER_AVAILABLE:
+            self.context_packer = ContextPacker()
         
         logger.info("✅ 回答生成器初始化完成")
     
@@ -164,25 +180,10 @@ class AnswerGenerator:
             if not self.llm_manager or not self.prompt_templates:
                 return None
             
-            # 獲取回答生成提示詞模板
-            try:
-                from config.prompt_templates import get_prompt_template, format_prompt
-                answer_template = get_prompt_template("answer_generation")
-            except ImportError:
-                logger.warning("無法導入提示詞模板")
+            formatted_prompt, packing = self._build_answer_prompt(query, search_results, user_context)
+            if formatted_prompt is None:
                 return None
             
-            # 格式化搜尋結果
-            formatted_results = self._format_search_results_for_prompt(search_results)
-            
-            # 格式化提示詞
-            formatted_prompt = format_prompt(
-                answer_template,
-                leader_decision=formatted_results,
-                user_question=query,
-                user_context=user_context or {}
-            )
-            
             # 使用 LLM 生成回答
             if hasattr(self.llm_manager, 'generate_text'):
                 from llm.core.base_llm import GenerationRequest
@@ -203,7 +204,7 @@ class AnswerGenerator:
                     processing_time=0.0,
                     level_used="llm_prompt",
                     recommendations=recommendations,
-                    metadata={"prompt_used": "answer_generation"}
+                    metadata={"prompt_used": "answer_generation", **packing}
                 )
             
             return None
@@ -212,6 +213,185 @@ class AnswerGenerator:
             logger.error(f"LLM 提示詞生成失敗: {e}")
             return None
     
+    def _build_answer_prompt(self,
+                             query: str,
+                             search_results: List[Any],
+                             user_context: Dict[str, Any]) -> Tuple[Optional[str], Dict[str, Any]]:
+        """
+        以回答生成提示詞模板格式化提示詞
+        
+        Returns:
+            Tuple[Optional[str], Dict[str, Any]]: (提示詞，模板不可用時為 None；上下文打包統計)
+        """
+        # 獲取回答生成提示詞模板
+        try:
+            from config.prompt_templates import get_prompt_template, format_prompt
+            answer_template = get_prompt_template("answer_generation")
+        except ImportError:
+            logger.warning("無法導入提示詞模板")
+            return None, {}
+        
+        def render(results: List[Any], limit: Optional[int]) -> str:
+            return format_prompt(
+                answer_template,
+                leader_decision=self._format_search_results_for_prompt(results, limit),
+                user_question=query,
+                user_context=user_context or {}
+            )
+        
+        baseline_prompt = render(search_results, 3)
+        if not self.context_packer or not search_results:
+            return baseline_prompt, {}
+        
+        # 預算不超過原本前 3 筆結果的內容 token 數：打包讓同樣的預算容納更多不重複的資訊，而非加長提示詞
+        counter = self.context_packer.token_counter
+        baseline_contents = [
+            str(content) for content in (self._get_result_field(result, 'content') for result in search_results[:3])
+            if content is not None
+        ]
+        budget = min(self.context_packer.max_tokens, sum(counter.count_batch(baseline_contents)) or 1)
+        packed_results, stats = self._pack_search_results(query, search_results, budget)
+        prompt = render(packed_results, None)
+        tokens_before, tokens_after = counter.count_batch([baseline_prompt, prompt])
+        
+        if tokens_after > tokens_before:
+            # 打包結果的標題與編號較多時，扣除超出的部分重新打包一次
+            packed_results, stats = self._pack_search_results(
+                query, search_results, max(1, budget - (tokens_after - tokens_before)))
+            prompt = render(packed_results, None)
+            tokens_after = counter.count(prompt)
+        if tokens_after > tokens_before:
+            prompt, tokens_after = baseline_prompt, tokens_before
+        logger.info(f"提示詞 token: {tokens_before} → {tokens_after}（重複片段 {stats.duplicate_chunks}）")
+        return prompt, {
+            "context_packing": {
+                "prompt_tokens_before": tokens_before,
+                "prompt_tokens_after": tokens_after,
+                **asdict(stats)
+            }
+        }
+    
+    def _pack_search_results(self, query: str, search_results: List[Any],
+                             max_tokens: Optional[int] = None) -> Tuple[List[Dict[str, Any]], Any]:
+        """將搜尋結果打包進 token 預算（預設為打包器的設定），回傳只含 content 與 episode_title 的結果"""
+        chunks = []
+        titles = {}
+        for index, result in enumerate(search_results):
+            content = self._get_result_field(result, 'content')
+            if content is None:
+                continue
+            score = self._get_result_field(result, 'score')
+            if score is None:
+                score = self._get_result_field(result, 'confidence', 0.0)
+            chunk_id = str(index)
+            titles[chunk_id] = self._get_result_field(result, 'episode_title')
+            chunks.append(ContextChunk(
+                chunk_id=chunk_id,
+                content=str(content),
+                score=float(score or 0.0),
+                group=episode_key({key: self._get_result_field(result, key) for key in EPISODE_KEYS})
+            ))
+        
+        packed, stats = self.context_packer.pack(query, chunks, max_tokens)
+        packed_results = [
+            {"content": chunk.content, "episode_title": titles[chunk.chunk_id]}
+            for chunk in packed
+        ]
+        return packed_results, stats
+    
+    async def stream_answer(self,
+                            query: str,
+                            user_id: str,
+                            search_results: List[Any] = None,
+                            category: str = "其他",
+                            user_context: Dict[str, Any] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        串流生成回答
+        
+        依序產生事件：
+        - metadata: 檢索結果整理出的推薦節目（在 LLM 開始生成前送出）
+        - token: LLM 生成的文字片段
+        - done: 信心度、使用層級與處理時間
+        
+        LLM 不支援串流或尚未輸出任何內容就失敗時，改用 generate_answer 的分層邏輯，
+        並將完整回答作為單一 token 事件送出。
+        
+        Args:
+            query: 用戶查詢
+            user_id: 用戶 ID
+            search_results: 搜尋結果
+            category: 分類
+            user_context: 用戶上下文
+            
+        Yields:
+            Dict[str, Any]: {"event": 事件類型, "data": 事件內容}
+        """
+        start_time = datetime.now()
+        search_results = search_results or []
+        user_context = user_context or {}
+        
+        recommendations = self._extract_recommendations_from_content("", search_results)
+        yield {
+            "event": "metadata",
+            "data": {
+                "category": category,
+                "recommendations": [asdict(rec) for rec in recommendations],
+                "sources_count": len(search_results)
+            }
+        }
+        
+        formatted_prompt = None
+        packing: Dict[str, Any] = {}
+        if (self.llm_manager and self.prompt_templates and hasattr(self.llm_manager, 'stream_text')
+                and not (SUMMARY_TOOLS_AVAILABLE and self._is_summary_query(query))):
+            formatted_prompt, packing = self._build_answer_prompt(query, search_results, user_context)
+        
+        tokens_sent = 0
+        if formatted_prompt:
+            try:
+                from llm.core.base_llm import GenerationRequest
+                request = GenerationRequest(prompt=formatted_prompt, user_id=user_id)
+                async for chunk in self.llm_manager.stream_text(request):
+                    tokens_sent += 1
+                    yield {"event": "token", "data": {"text": chunk}}
+            except Exception as e:
+                logger.error(f"LLM 串流生成失敗: {e}")
+                if tokens_sent:
+                    yield {
+                        "event": "done",
+                        "data": {
+                            "confidence": 0.0,
+                            "level_used": "error",
+                            "processing_time": (datetime.now() - start_time).total_seconds(),
+                            "error": str(e)
+                        }
+                    }
+                    return
+        
+        if tokens_sent:
+            yield {
+                "event": "done",
+                "data": {
+                    "confidence": 0.8,
+                    "level_used": "llm_prompt",
+                    "processing_time": (datetime.now() - start_time).total_seconds(),
+                    **packing
+                }
+            }
+            return
+        
+        # 無法串流時以完整回答作為單一片段
+        result = await self.generate_answer(query, user_id, search_results, category, user_context)
+        yield {"event": "token", "data": {"text": result.content}}
+        yield {
+            "event": "done",
+            "data": {
+                "confidence": result.confidence,
+                "level_used": result.level_used,
+                "processing_time": (datetime.now() - start_time).total_seconds()
+            }
+        }
+    
     async def _generate_with_default_qa(self, 
                                       query: str,
                                       user_context: Dict[str, Any]) -> Optional[AnswerGenerationResult]:
@@ -327,17 +507,18 @@ class AnswerGenerator:
                 metadata={"error": str(e)}
             )
     
-    def _format_search_results_for_prompt(self, search_results: List[Any]) -> str:
-        """格式化搜尋結果用於提示詞"""
+    def _format_search_results_for_prompt(self, search_results: List[Any], limit: Optional[int] = 3) -> str:
+        """格式化搜尋結果用於提示詞（limit 為 None 時格式化全部結果）"""
         if not search_results:
             return "無相關搜尋結果"
         
         formatted_results = []
-        for i, result in enumerate(search_results[:3], 1):
-            if hasattr(result, 'content'):
-                content = result.content
-                if hasattr(result, 'episode_title') and result.episode_title:
-                    content = f"{result.episode_title}: {content}"
+        for i, result in enumerate(search_results[:limit], 1):
+            content = self._get_result_field(result, 'content')
+            if content is not None:
+                episode_title = self._get_result_field(result, 'episode_title')
+                if episode_title:
+                    content = f"{episode_title}: {content}"
                 formatted_results.append(f"{i}. {content}")
         
         return "\n".join(formatted_results)
@@ -349,23 +530,31 @@ class AnswerGenerator:
         # 從搜尋結果中提取
         if search_results:
             for result in search_results[:3]:
-                if hasattr(result, 'content'):
+                result_content = self._get_result_field(result, 'content')
+                if result_content is not None:
                     recommendation = PodcastRecommendation(
-                        title=getattr(result, 'episode_title', '未知標題'),
-                        episode=getattr(result, 'episode', ''),
-                        podcast_name=getattr(result, 'podcast_name', '未知頻道'),
-                        description=result.content[:100] + "..." if len(result.content) > 100 else result.content,
-                        confidence=getattr(result, 'confidence', 0.7),
-                        category=getattr(result, 'category', '其他'),
+                        title=self._get_result_field(result, 'episode_title', '未知標題'),
+                        episode=self._get_result_field(result, 'episode', ''),
+                        podcast_name=self._get_result_field(result, 'podcast_name', '未知頻道'),
+                        description=result_content[:100] + "..." if len(result_content) > 100 else result_content,
+                        confidence=self._get_result_field(result, 'confidence', 0.7),
+                        category=self._get_result_field(result, 'category', '其他'),
                         source="vector_search",
-                        rss_id=getattr(result, 'rss_id', None),
-                        audio_url=getattr(result, 'audio_url', None),
-                        image_url=getattr(result, 'image_url', None)
+                        rss_id=self._get_result_field(result, 'rss_id'),
+                        audio_url=self._get_result_field(result, 'audio_url'),
+                        image_url=self._get_result_field(result, 'image_url')
                     )
                     recommendations.append(recommendation)
         
         return recommendations
     
+    @staticmethod
+    def _get_result_field(result: Any, name: str, default: Any = None) -> Any:
+        """讀取搜尋結果欄位（支援物件屬性與代理人回傳的字典）"""
+        if isinstance(result, dict):
+            return result.get(name, default)
+        return getattr(result, name, default)
+    
     def _format_web_results_for_answer(self, web_results: List[Any], query: str) -> str:
         """格式化 Web 搜尋結果為回答"""
         if not web_results:
@@ -611,12 +800,14 @@ def create_answer_generator(llm_manager=None,
                            default_qa_processor=None,
                            web_search_tool=None,
                            prompt_templates=None,
-                           agent_roles_manager=None) -> AnswerGenerator:
+                           agent_roles_manager=None,
+                           context_packer=None) -> AnswerGenerator:
     """創建回答生成器實例"""
     return AnswerGenerator(
         llm_manager=llm_manager,
         default_qa_processor=default_qa_processor,
         web_search_tool=web_search_tool,
         prompt_templates=prompt_templates,
-        agent_roles_manager=agent_roles_manager
+        agent_roles_manager=agent_roles_manager,
+        context_packer=context_packer
     ) 
\ No newline at end of file
@@ -69,8 +69,24 @@ class BaseAgent(ABC):
             AgentResponse: 處理結果
         """
         pass
-    
-    async def execute_with_monitoring(self, 
+
+    def validate_input(self, input_data: Union[UserQuery, str, Any]) -> bool:
+        """
+        驗證輸入數據：需為非空字串或帶有非空 query 的 UserQuery
+
+        Args:
+            input_data: 輸入數據
+
+        Returns:
+            bool: 是否有效
+        """
+        if isinstance(input_data, UserQuery):
+            return bool(input_data.query and input_data.query.strip())
+        if isinstance(input_data, str):
+            return bool(input_data.strip())
+        return input_data is not None
+
+    async def execute_with_monitoring(self,
                                     input_data: Union[UserQuery, str, Any]) -> AgentResponse:
         """
         執行處理並監控
@@ -14,12 +14,21 @@
 """
 
 import logging
+import os
 import re
+import sys
 from typing import Dict, List, Any, Optional, Tuple
 from dataclasses import dataclass, field
 from abc import ABC, abstractmethod
 from enum import Enum
 
+# 添加後端根目錄到 Python 路徑
+backend_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if backend_root not in sys.path:
+    sys.path.insert(0, backend_root)
+
+from utils.keyword_matcher import KeywordMatcher
+
 logger = logging.getLogger(__name__)
 
 
@@ -152,6 +161,7 @@ class ContentProcessor:
         self.education_provider = EducationKeywordProvider()
         self.business_keywords = self._flatten_keywords(self.business_provider.get_keywords())
         self.education_keywords = self._flatten_keywords(self.education_provider.get_keywords())
+        self._build_keyword_matcher()
         
         logger.info("統一內容處理器初始化完成")
     
@@ -162,6 +172,25 @@ class ContentProcessor:
             flattened.extend(keywords)
         return flattened
     
+    def _build_keyword_matcher(self) -> None:
+        """將商業與教育關鍵詞編譯成單一自動機"""
+        self.keyword_matcher = KeywordMatcher(
+            [(keyword, "商業") for keyword in self.business_keywords] +
+            [(keyword, "教育") for keyword in self.education_keywords]
+        )
+    
+    def _match_keywords(self, text: str) -> Tuple[List[str], List[str]]:
+        """
+        一次掃描找出文本中的商業與教育關鍵詞
+        
+        Returns:
+            Tuple[List[str], List[str]]: (商業關鍵詞, 教育關鍵詞)，依關鍵詞清單順序
+        """
+        business_found, education_found = [], []
+        for keyword, category in self.keyword_matcher.search(text):
+            (business_found if category == "商業" else education_found).append(keyword)
+        return business_found, education_found
+    
     def analyze_content(self, title: str, content: str) -> ContentAnalysis:
         """
         分析內容
@@ -211,23 +240,15 @@ class ContentProcessor:
         Returns:
             CategoryResult: 分類結果
         """
-        text = (title + " " + content).lower()
+        business_keywords_found, education_keywords_found = self._match_keywords(title + " " + content)
         
-        # 計算商業分數
+        # 每個命中的關鍵詞加 0.1 分
         business_score = 0.0
-        business_keywords_found = []
-        for keyword in self.business_keywords:
-            if keyword in text:
-                business_score += 0.1
-                business_keywords_found.append(keyword)
-        
-        # 計算教育分數
+        for _ in business_keywords_found:
+            business_score += 0.1
         education_score = 0.0
-        education_keywords_found = []
-        for keyword in self.education_keywords:
-            if keyword in text:
-                education_score += 0.1
-                education_keywords_found.append(keyword)
+        for _ in education_keywords_found:
+            education_score += 0.1
         
         # 正規化分數
         business_score = min(business_score, 1.0)
@@ -270,21 +291,8 @@ class ContentProcessor:
         Returns:
             List[str]: 關鍵詞列表
         """
-        text_lower = text.lower()
-        keywords = []
-        
-        # 從商業關鍵詞中提取
-        for keyword in self.business_keywords:
-            if keyword in text_lower:
-                keywords.append(keyword)
-        
-        # 從教育關鍵詞中提取
-        for keyword in self.education_keywords:
-            if keyword in text_lower:
-                keywords.append(keyword)
-        
-        # 去重並限制數量
-        keywords = list(set(keywords))[:10]
+        # 依商業、教育關鍵詞順序提取，去重並限制數量
+        keywords = self.keyword_matcher.find_keywords(text)[:10]
         
         return keywords
     
@@ -323,10 +331,7 @@ class ContentProcessor:
     def _generate_business_summary(self, content: str) -> str:
         """生成商業摘要"""
         # 提取關鍵商業概念
-        business_concepts = []
-        for keyword in self.business_keywords:
-            if keyword in content.lower():
-                business_concepts.append(keyword)
+        business_concepts, _ = self._match_keywords(content)
         
         # 生成摘要
         if business_concepts:
@@ -345,10 +350,7 @@ class ContentProcessor:
     def _generate_education_summary(self, content: str) -> str:
         """生成教育摘要"""
         # 提取關鍵教育概念
-        education_concepts = []
-        for keyword in self.education_keywords:
-            if keyword in content.lower():
-                education_concepts.append(keyword)
+        _, education_concepts = self._match_keywords(content)
         
         # 生成摘要
         if education_concepts:
@@ -450,6 +452,9 @@ class ContentProcessor:
             current_keywords = self.education_provider.get_keywords()
             current_keywords.update(new_keywords)
             self.education_keywords = self._flatten_keywords(current_keywords)
+        else:
+            return
+        self._build_keyword_matcher()
 
 
 # 向後相容性別名
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Podwise RAG Pipeline - 上下文打包器
+
+在 token 預算內組裝送給 LLM 的檢索上下文：
+- 以本機 tokenizer 計算 token 數（utils/token_counter.py）
+- 同一集節目中近似重複的片段只保留分數最高的一段
+- 片段切成句子，依查詢相關度、片段分數與句子位置評分，近似重複的句子只保留一句
+- 依價值由高到低放入預算，最後按原始順序重組各片段
+- 回傳打包前後的 token 數，供追蹤提示詞縮減幅度
+
+作者: Podwise Team
+版本: 1.0.0
+"""
+
+import os
+import re
+import sys
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, List, Optional, Sequence, Tuple
+
+# 添加後端根目錄到 Python 路徑
+backend_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if backend_root not in sys.path:
+    sys.path.insert(0, backend_root)
+
+from utils.token_counter import TokenCounter, get_token_counter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_TOKENS = int(os.getenv("CONTEXT_MAX_TOKENS", "2048"))
+DEFAULT_CHUNK_DUPLICATE_THRESHOLD = float(os.getenv("CONTEXT_CHUNK_DUPLICATE_THRESHOLD", "0.85"))
+DEFAULT_SENTENCE_DUPLICATE_THRESHOLD = float(os.getenv("CONTEXT_SENTENCE_DUPLICATE_THRESHOLD", "0.8"))
+
+# 用來判斷是否屬於同一集節目的 metadata 欄位，依序取第一個有值的
+EPISODE_KEYS = ("episode_id", "episode_title", "episode", "title")
+
+_SENTENCE_SPLIT = re.compile(r"(?<=[。！？!?；;\n])|(?<=\.)\s+")
+_NORMALIZE = re.compile(r"[\s\W_]+", re.UNICODE)
+_LATIN_WORD = re.compile(r"[a-z0-9]+")
+
+
+def _shingles(text: str) -> FrozenSet[str]:
+    """字元 bigram 集合（英數字以單字為單位），用於相似度與相關度計算"""
+    lowered = text.lower()
+    words = set(_LATIN_WORD.findall(lowered))
+    normalized = _NORMALIZE.sub("", _LATIN_WORD.sub("", lowered))
+    if len(normalized) == 1:
+        words.add(normalized)
+    words.update(normalized[i:i + 2] for i in range(len(normalized) - 1))
+    return frozenset(words)
+
+
+def _jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a or not b:
+        return 1.0 if a == b else 0.0
+    return len(a & b) / len(a | b)
+
+
+def split_sentences(text: str) -> List[str]:
+    """以中英文句末標點切句，保留標點"""
+    return [sentence.strip() for sentence in _SENTENCE_SPLIT.split(text or "") if sentence and sentence.strip()]
+
+
+def episode_key(metadata: Dict[str, Any]) -> Optional[str]:
+    """取得片段所屬節目集數的鍵值"""
+    for key in EPISODE_KEYS:
+        value = (metadata or {}).get(key)
+        if value:
+            return str(value)
+    return None
+
+
+@dataclass
+class ContextChunk:
+    """待打包的檢索片段"""
+    chunk_id: str
+    content: str
+    score: float = 0.0
+    group: Optional[str] = None  # 所屬節目集數，同組內做近似重複去除
+
+
+@dataclass
+class PackingStats:
+    """打包統計"""
+    tokens_before: int = 0
+    tokens_after: int = 0
+    max_tokens: int = 0
+    chunks_before: int = 0
+    chunks_after: int = 0
+    duplicate_chunks: int = 0
+    sentences_before: int = 0
+    sentences_after: int = 0
+    duplicate_sentences: int = 0
+    tokenizer: str = ""
+
+
+@dataclass
+class _Sentence:
+    chunk_index: int
+    position: int
+    text: str
+    shingles: FrozenSet[str]
+    tokens: int = 0
+    value: float = 0.0
+
+
+class ContextPacker:
+    """上下文打包器"""
+
+    def __init__(self,
+                 max_tokens: int = DEFAULT_MAX_TOKENS,
+                 chunk_duplicate_threshold: float = DEFAULT_CHUNK_DUPLICATE_THRESHOLD,
+                 sentence_duplicate_threshold: float = DEFAULT_SENTENCE_DUPLICATE_THRESHOLD,
+                 token_counter: Optional[TokenCounter] = None):
+        """
+        初始化上下文打包器
+
+        Args:
+            max_tokens: 上下文 token 預算
+            chunk_duplicate_threshold: 同集片段的 Jaccard 相似度達此值視為重複
+            sentence_duplicate_threshold: 句子的 Jaccard 相似度達此值視為重複
+            token_counter: Token 計數器，預設使用共用實例
+        """
+        self.max_tokens = max(1, int(max_tokens))
+        self.chunk_duplicate_threshold = chunk_duplicate_threshold
+        self.sentence_duplicate_threshold = sentence_duplicate_threshold
+        self.token_counter = token_counter or get_token_counter()
+
+    def pack(self, query: str, chunks: Sequence[ContextChunk],
+             max_tokens: Optional[int] = None) -> Tuple[List[ContextChunk], PackingStats]:
+        """
+        將檢索片段打包進 token 預算
+
+        Args:
+            query: 使用者查詢，用於句子相關度評分
+            chunks: 檢索片段（順序即原始排序）
+            max_tokens: 本次的 token 預算，預設使用初始化時的設定
+
+        Returns:
+            Tuple[List[ContextChunk], PackingStats]: 打包後的片段（保持原始順序）與統計
+        """
+        budget = self.max_tokens if max_tokens is None else max(1, int(max_tokens))
+        counter = self.token_counter
+        stats = PackingStats(max_tokens=budget, chunks_before=len(chunks), tokenizer=counter.backend)
+        if not chunks:
+            return [], stats
+
+        stats.tokens_before = sum(counter.count_batch([chunk.content for chunk in chunks]))
+
+        kept_indices = self._dedupe_chunks(chunks, stats)
+
+        # 切句並評分
+        max_score = max((chunks[i].score for i in kept_indices), default=0.0)
+        query_shingles = _shingles(query or "")
+        sentences: List[_Sentence] = []
+        for index in kept_indices:
+            chunk = chunks[index]
+            chunk_weight = chunk.score / max_score if max_score > 0 else 1.0
+            for position, text in enumerate(split_sentences(chunk.content)):
+                shingles = _shingles(text)
+                relevance = len(shingles & query_shingles) / len(query_shingles) if query_shingles else 0.0
+                # 片段開頭通常是主題句，略為加權
+                position_weight = 1.1 if position == 0 else 1.0
+                sentences.append(_Sentence(
+                    chunk_index=index, position=position, text=text, shingles=shingles,
+                    value=(0.5 + relevance) * (0.5 + 0.5 * chunk_weight) * position_weight
+                ))
+        stats.sentences_before = len(sentences)
+
+        for sentence, tokens in zip(sentences, counter.count_batch([s.text for s in sentences])):
+            sentence.tokens = tokens
+
+        # 依價值貪婪放入預算；價值相同時維持原始順序
+        selected: List[_Sentence] = []
+        remaining = budget
+        for sentence in sorted(sentences, key=lambda s: -s.value):
+            if sentence.tokens > remaining:
+                continue
+            if any(_jaccard(sentence.shingles, kept.shingles) >= self.sentence_duplicate_threshold
+                   for kept in selected):
+                stats.duplicate_sentences += 1
+                continue
+            selected.append(sentence)
+            remaining -= sentence.tokens
+            if remaining <= 0:
+                break
+        stats.sentences_after = len(selected)
+
+        # 按原始順序重組
+        by_chunk: Dict[int, List[_Sentence]] = {}
+        for sentence in selected:
+            by_chunk.setdefault(sentence.chunk_index, []).append(sentence)
+
+        packed: List[ContextChunk] = []
+        for index in kept_indices:
+            picked = by_chunk.get(index)
+            if not picked:
+                continue
+            picked.sort(key=lambda s: s.position)
+            chunk = chunks[index]
+            packed.append(ContextChunk(
+                chunk_id=chunk.chunk_id,
+                content=_join_sentences([s.text for s in picked]),
+                score=chunk.score,
+                group=chunk.group
+            ))
+
+        stats.chunks_after = len(packed)
+        stats.tokens_after = sum(counter.count_batch([chunk.content for chunk in packed]))
+        return packed, stats
+
+    def _dedupe_chunks(self, chunks: Sequence[ContextChunk], stats: PackingStats) -> List[int]:
+        """同集近似重複的片段只保留分數最高者，回傳保留的索引（原始順序）"""
+        kept: Dict[Optional[str], List[FrozenSet[str]]] = {}
+        kept_indices: List[int] = []
+        for index in sorted(range(len(chunks)), key=lambda i: -chunks[i].score):
+            chunk = chunks[index]
+            shingles = _shingles(chunk.content)
+            group = kept.setdefault(chunk.group, [])
+            if any(_jaccard(shingles, other) >= self.chunk_duplicate_threshold for other in group):
+                stats.duplicate_chunks += 1
+                continue
+            group.append(shingles)
+            kept_indices.append(index)
+        return sorted(kept_indices)
+
+
+def _join_sentences(sentences: List[str]) -> str:
+    """重組句子：中文句子直接相連，英文句子以空白分隔"""
+    text = ""
+    for sentence in sentences:
+        if text and text[-1].isascii() and sentence[:1].isascii():
+            text += " "
+        text += sentence
+    return text
@@ -16,6 +16,8 @@
 
 import logging
 import asyncio
+import os
+import sys
 from typing import Dict, Any, List, Optional, Tuple, Union
 from dataclasses import dataclass, field
 from abc import ABC, abstractmethod
@@ -23,11 +25,22 @@ import time
 from datetime import datetime
 try:
     from .prompt_processor import PromptProcessor
+    from .request_memo import memoized, normalize_query, request_scope
 except ImportError:
     from core.prompt_processor import PromptProcessor
+    from core.request_memo import memoized, normalize_query, request_scope
+
+# 添加後端根目錄到 Python 路徑
+backend_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if backend_root not in sys.path:
+    sys.path.insert(0, backend_root)
+
+from utils.keyword_matcher import KeywordMatcher
 
 logger = logging.getLogger(__name__)
 
+WORD_BANK_CATEGORIES = {"business": "商業", "education": "教育", "other": "其他"}
+
 
 # 導入統一數據模型
 from .data_models import AgentResponse, UserQuery
@@ -36,6 +49,62 @@ from .data_models import AgentResponse, UserQuery
 from .base_agent import BaseAgent
 
 
+# 各類別的檢索結果（暫時使用模擬數據）
+_SIMULATED_SEARCH_RESULTS: Dict[str, List[Dict[str, Any]]] = {
+    "商業": [
+        {
+            "title": "股癌 EP123_投資新手必聽",
+            "episode": "EP123",
+            "rss_id": "stock_cancer_123",
+            "category": "商業",
+            "similarity_score": 0.85,
+            "tag_score": 0.7,
+            "hybrid_score": 0.805,
+            "updated_at": "2024-01-15",
+            "summary": "專門為投資新手設計的理財觀念分享"
+        }
+    ],
+    "教育": [
+        {
+            "title": "好葉 EP56_學習方法大公開",
+            "episode": "EP56",
+            "rss_id": "better_leaf_56",
+            "category": "教育",
+            "similarity_score": 0.8,
+            "tag_score": 0.75,
+            "hybrid_score": 0.785,
+            "updated_at": "2024-01-12",
+            "summary": "分享高效學習方法和技巧"
+        }
+    ]
+}
+
+
+async def search_podcasts(query: str, category: Optional[str] = None, top_k: int = 5) -> List[Dict[str, Any]]:
+    """
+    檢索 Podcast（各專家代理人共用）
+
+    同一請求內相同的 (正規化查詢, 類別, top_k) 只檢索一次，不論由哪個代理人發出。
+    回傳的列表由多個代理人共用，呼叫端不應修改。
+
+    Args:
+        query: 查詢文本
+        category: 類別過濾，None 表示不限
+        top_k: 返回數量
+
+    Returns:
+        List[Dict[str, Any]]: 檢索結果
+    """
+    async def run() -> List[Dict[str, Any]]:
+        if category is not None:
+            results = _SIMULATED_SEARCH_RESULTS.get(category, [])
+        else:
+            results = [item for items in _SIMULATED_SEARCH_RESULTS.values() for item in items]
+        return sorted(results, key=lambda item: item["hybrid_score"], reverse=True)[:top_k]
+
+    return await memoized(("search", normalize_query(query), category, top_k), run)
+
+
 # ==================== 第三層：功能專家層 ====================
 
 class WebSearchAgent(BaseAgent):
@@ -263,7 +332,10 @@ class RAGExpertAgent(BaseAgent):
                 )
             
             # 使用智能檢索專家處理查詢
-            retrieval_response = await self.intelligent_retrieval.process_query(input_data.query)
+            retrieval_response = await memoized(
+                ("intelligent_retrieval", normalize_query(input_data.query)),
+                lambda: self.intelligent_retrieval.process_query(input_data.query, input_data.query_vector)
+            )
             
             # 格式化回應
             if retrieval_response.status == "SUCCESS":
@@ -468,6 +540,13 @@ class TagClassificationExpertAgent(BaseAgent):
         
         # 初始化提示詞處理器
         self.prompt_processor = PromptProcessor()
+        
+        # 詞庫只載入一次並編譯成單一自動機，每個查詢只掃描一次
+        self.word_bank = self._load_excel_word_bank()
+        self.word_bank_matcher = KeywordMatcher(
+            (keyword, WORD_BANK_CATEGORIES[bank])
+            for bank, keywords in self.word_bank.items() for keyword in keywords
+        )
     
     async def process(self, input_data: UserQuery) -> AgentResponse:
         """
@@ -531,49 +610,22 @@ class TagClassificationExpertAgent(BaseAgent):
         Returns:
             Dict[str, Any]: 分類結果
         """
-        # 載入 Excel 關聯詞庫（模擬）
-        word_bank = self._load_excel_word_bank()
+        word_bank = self.word_bank
         
-        # 分析查詢中的關鍵詞
+        # 分析查詢中的關鍵詞，每個命中的關鍵詞加 0.1 分
         matched_keywords = []
-        business_score = 0.0
-        education_score = 0.0
-        other_score = 0.0
-        
-        query_lower = query.lower()
-        
-        # 商業類關鍵詞匹配
-        for keyword in word_bank["business"]:
-            if keyword in query_lower:
-                business_score += 0.1
-                matched_keywords.append({
-                    "keyword": keyword,
-                    "category": "商業",
-                    "match_type": "精確匹配",
-                    "weight": 0.8
-                })
-        
-        # 教育類關鍵詞匹配
-        for keyword in word_bank["education"]:
-            if keyword in query_lower:
-                education_score += 0.1
-                matched_keywords.append({
-                    "keyword": keyword,
-                    "category": "教育",
-                    "match_type": "精確匹配",
-                    "weight": 0.8
-                })
-        
-        # 其他類關鍵詞匹配
-        for keyword in word_bank["other"]:
-            if keyword in query_lower:
-                other_score += 0.1
-                matched_keywords.append({
-                    "keyword": keyword,
-                    "category": "其他",
-                    "match_type": "精確匹配",
-                    "weight": 0.8
-                })
+        category_scores = {category: 0.0 for category in WORD_BANK_CATEGORIES.values()}
+        for keyword, category in self.word_bank_matcher.search(query):
+            category_scores[category] += 0.1
+            matched_keywords.append({
+                "keyword": keyword,
+                "category": category,
+                "match_type": "精確匹配",
+                "weight": 0.8
+            })
+        business_score = category_scores["商業"]
+        education_score = category_scores["教育"]
+        other_score = category_scores["其他"]
         
         # 正規化分數
         business_score = min(business_score, 1.0)
@@ -919,20 +971,8 @@ class BusinessExpertAgent(BaseAgent):
             )
     
     async def _get_search_results(self, query: str) -> List[Dict[str, Any]]:
-        """獲取檢索結果（暫時使用模擬數據）"""
-        return [
-            {
-                "title": "股癌 EP123_投資新手必聽",
-                "episode": "EP123",
-                "rss_id": "stock_cancer_123",
-                "category": "商業",
-                "similarity_score": 0.85,
-                "tag_score": 0.7,
-                "hybrid_score": 0.805,
-                "updated_at": "2024-01-15",
-                "summary": "專門為投資新手設計的理財觀念分享"
-            }
-        ]
+        """獲取商業類別的檢索結果（與其他代理人共用同一請求內的檢索）"""
+        return await search_podcasts(query, category="商業")
     
     # 保留原有的方法作為備用
     def _analyze_business_relevance(self, query: str) -> float:
@@ -1031,20 +1071,8 @@ class EducationExpertAgent(BaseAgent):
             )
     
     async def _get_search_results(self, query: str) -> List[Dict[str, Any]]:
-        """獲取檢索結果（暫時使用模擬數據）"""
-        return [
-            {
-                "title": "好葉 EP56_學習方法大公開",
-                "episode": "EP56",
-                "rss_id": "better_leaf_56",
-                "category": "教育",
-                "similarity_score": 0.8,
-                "tag_score": 0.75,
-                "hybrid_score": 0.785,
-                "updated_at": "2024-01-12",
-                "summary": "分享高效學習方法和技巧"
-            }
-        ]
+        """獲取教育類別的檢索結果（與其他代理人共用同一請求內的檢索）"""
+        return await search_podcasts(query, category="教育")
     
     # 保留原有的方法作為備用
     def _analyze_education_relevance(self, query: str) -> float:
@@ -1156,96 +1184,14 @@ class LeaderAgent(BaseAgent):
             )
         
         try:
-            # 1. 用戶管理層
-            if self.user_manager:
-                user_result = await self.user_manager.process(input_data)
-            else:
-                user_result = AgentResponse(
-                    content="用戶管理服務不可用",
-                    confidence=0.5,
-                    reasoning="用戶管理專家未初始化",
-                    metadata={"user_management_available": False}
-                )
-            
-            # 2. 根據類別決定處理方式
-            if input_data.category == "商業":
-                # 商業類別：交給商業專家處理
-                if self.business_expert:
-                    category_result = await self.business_expert.process(input_data)
-                else:
-                    category_result = AgentResponse(
-                        content="商業專家服務不可用",
-                        confidence=0.3,
-                        reasoning="商業專家未初始化",
-                        metadata={"business_expert_available": False}
-                    )
-                if self.rag_expert:
-                    rag_result = await self.rag_expert.process(input_data)
-                else:
-                    rag_result = AgentResponse(
-                        content="RAG 專家服務不可用",
-                        confidence=0.3,
-                        reasoning="RAG 專家未初始化",
-                        metadata={"rag_expert_available": False}
-                    )
-            elif input_data.category == "教育":
-                # 教育類別：交給教育專家處理
-                if self.education_expert:
-                    category_result = await self.education_expert.process(input_data)
-                else:
-                    category_result = AgentResponse(
-                        content="教育專家服務不可用",
-                        confidence=0.3,
-                        reasoning="教育專家未初始化",
-                        metadata={"education_expert_available": False}
-                    )
-                if self.rag_expert:
-                    rag_result = await self.rag_expert.process(input_data)
-                else:
-                    rag_result = AgentResponse(
-                        content="RAG 專家服務不可用",
-                        confidence=0.3,
-                        reasoning="RAG 專家未初始化",
-                        metadata={"rag_expert_available": False}
-                    )
-            else:
-                # 其他類別：直接由 Leader 處理 RAG，不交給類別專家
-                category_result = AgentResponse(
-                    content="其他類別查詢",
-                    confidence=0.5,
-                    reasoning="其他類別由 Leader 直接處理",
-                    metadata={"category": "其他"}
-                )
-                if self.rag_expert:
-                    rag_result = await self.rag_expert.process(input_data)
-                else:
-                    rag_result = AgentResponse(
-                        content="RAG 專家服務不可用",
-                        confidence=0.3,
-                        reasoning="RAG 專家未初始化",
-                        metadata={"rag_expert_available": False}
-                    )
-            
-            # 3. 功能專家層（所有類別都使用）
-            if self.summary_expert and rag_result.metadata.get("results"):
-                summary_result = await self.summary_expert.process(rag_result.metadata.get("results", []))
-            else:
-                summary_result = AgentResponse(
-                    content="摘要服務不可用",
-                    confidence=0.3,
-                    reasoning="摘要專家未初始化或無結果可摘要",
-                    metadata={"summary_expert_available": False}
-                )
-            
-            # 使用 TAG 分類專家進行分類
-            if self.tag_classification_expert:
-                tag_classification_result = await self.tag_classification_expert.process(input_data)
-            else:
-                tag_classification_result = AgentResponse(
-                    content="TAG 分類服務不可用",
-                    confidence=0.3,
-                    reasoning="TAG 分類專家未初始化",
-                    metadata={"tag_classification_expert_available": False}
+            # 用戶管理、類別專家、RAG（含摘要）與 TAG 分類互不相依，並行執行；
+            # 請求範圍備忘錄讓各代理人相同的檢索與 LLM 呼叫只執行一次
+            with request_scope() as memo:
+                user_result, category_result, (rag_result, summary_result), tag_classification_result = await asyncio.gather(
+                    self._run_user_manager(input_data),
+                    self._run_category_expert(input_data),
+                    self._run_rag_with_summary(input_data),
+                    self._run_tag_classification(input_data)
                 )
             
             # 4. 最終決策
@@ -1264,7 +1210,8 @@ class LeaderAgent(BaseAgent):
                     "rag_result": rag_result.metadata,
                     "category_result": category_result.metadata,
                     "summary_result": summary_result.metadata,
-                    "tag_classification_result": tag_classification_result.metadata
+                    "tag_classification_result": tag_classification_result.metadata,
+                    "request_memo": memo.get_stats()
                 },
                 processing_time=processing_time
             )
@@ -1278,10 +1225,98 @@ class LeaderAgent(BaseAgent):
                 processing_time=time.time() - start_time
             )
     
+    async def _run_user_manager(self, input_data: UserQuery) -> AgentResponse:
+        """1. 用戶管理層"""
+        if self.user_manager:
+            return await self.user_manager.process(input_data)
+        return AgentResponse(
+            content="用戶管理服務不可用",
+            confidence=0.5,
+            reasoning="用戶管理專家未初始化",
+            processing_time=0.0,
+            metadata={"user_management_available": False}
+        )
+    
+    async def _run_category_expert(self, input_data: UserQuery) -> AgentResponse:
+        """2. 根據類別決定處理方式"""
+        if input_data.category == "商業":
+            # 商業類別：交給商業專家處理
+            if self.business_expert:
+                return await self.business_expert.process(input_data)
+            return AgentResponse(
+                content="商業專家服務不可用",
+                confidence=0.3,
+                reasoning="商業專家未初始化",
+                processing_time=0.0,
+                metadata={"business_expert_available": False}
+            )
+        
+        if input_data.category == "教育":
+            # 教育類別：交給教育專家處理
+            if self.education_expert:
+                return await self.education_expert.process(input_data)
+            return AgentResponse(
+                content="教育專家服務不可用",
+                confidence=0.3,
+                reasoning="教育專家未初始化",
+                processing_time=0.0,
+                metadata={"education_expert_available": False}
+            )
+        
+        # 其他類別：直接由 Leader 處理 RAG，不交給類別專家
+        return AgentResponse(
+            content="其他類別查詢",
+            confidence=0.5,
+            reasoning="其他類別由 Leader 直接處理",
+            processing_time=0.0,
+            metadata={"category": "其他"}
+        )
+    
+    async def _run_rag_with_summary(self, input_data: UserQuery) -> Tuple[AgentResponse, AgentResponse]:
+        """RAG 檢索（所有類別都使用），摘要依賴檢索結果因此接在其後"""
+        if self.rag_expert:
+            rag_result = await self.rag_expert.process(input_data)
+        else:
+            rag_result = AgentResponse(
+                content="RAG 專家服務不可用",
+                confidence=0.3,
+                reasoning="RAG 專家未初始化",
+                processing_time=0.0,
+                metadata={"rag_expert_available": False}
+            )
+        
+        # 3. 功能專家層
+        if self.summary_expert and rag_result.metadata.get("results"):
+            summary_result = await self.summary_expert.process(rag_result.metadata.get("results", []))
+        else:
+            summary_result = AgentResponse(
+                content="摘要服務不可用",
+                confidence=0.3,
+                reasoning="摘要專家未初始化或無結果可摘要",
+                processing_time=0.0,
+                metadata={"summary_expert_available": False}
+            )
+        
+        return rag_result, summary_result
+    
+    async def _run_tag_classification(self, input_data: UserQuery) -> AgentResponse:
+        """使用 TAG 分類專家進行分類"""
+        if self.tag_classification_expert:
+            return await self.tag_classification_expert.process(input_data)
+        return AgentResponse(
+            content="TAG 分類服務不可用",
+            confidence=0.3,
+            reasoning="TAG 分類專家未初始化",
+            processing_time=0.0,
+            metadata={"tag_classification_expert_available": False}
+        )
+    
     async def _analyze_dual_category(self, input_data: UserQuery) -> AgentResponse:
         """分析雙類別情況"""
-        business_result = await self.business_expert.process(input_data)
-        education_result = await self.education_expert.process(input_data)
+        business_result, education_result = await asyncio.gather(
+            self.business_expert.process(input_data),
+            self.education_expert.process(input_data)
+        )
         
         # 選擇信心值較高的結果
         if business_result.confidence > education_result.confidence:
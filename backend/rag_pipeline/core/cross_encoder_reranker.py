@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Podwise RAG Pipeline - Cross-Encoder 重排序器
+
+以本機 cross-encoder 對查詢與候選片段打分，取代逐筆規則評分與生成式 LLM 重排序：
+- 所有未快取的 (查詢, 片段) 配對在一次批次前向傳遞中完成
+- 分數快取以 (模型, 查詢, chunk_id) 為鍵值，重複查詢只計算新的候選
+- 候選數上限與 top-N 截斷可設定；輸入長度以 max_length 截斷，控制 CPU 延遲
+- 非同步呼叫在專用執行緒中執行；超過毫秒預算時維持原排序，已開始的前向傳遞完成後仍寫入快取，
+  排隊期間已超過預算的工作則直接略過，不佔用執行緒
+- RERANKER_MODEL=stub 使用確定性的字元重疊模型，供基準測試與無模型環境驗證流程
+
+作者: Podwise Team
+版本: 1.0.0
+"""
+
+import os
+import time
+import asyncio
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, TypeVar
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = os.getenv("RERANKER_MODEL", "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1")
+DEFAULT_DEVICE = os.getenv("RERANKER_DEVICE", "cpu")
+DEFAULT_MAX_LENGTH = int(os.getenv("RERANKER_MAX_LENGTH", "256"))
+DEFAULT_TOP_N = int(os.getenv("RERANKER_TOP_N", "10"))
+DEFAULT_MAX_CANDIDATES = int(os.getenv("RERANKER_MAX_CANDIDATES", "50"))
+DEFAULT_BUDGET_MS = float(os.getenv("RERANKER_BUDGET_MS", "300"))
+DEFAULT_CACHE_SIZE = int(os.getenv("RERANKER_CACHE_SIZE", "10000"))
+
+STUB_MODEL = "stub"
+
+T = TypeVar("T")
+
+
+def _bigrams(text: str) -> set:
+    normalized = "".join(ch for ch in text.lower() if not ch.isspace())
+    if len(normalized) < 2:
+        return {normalized} if normalized else set()
+    return {normalized[i:i + 2] for i in range(len(normalized) - 1)}
+
+
+class StubCrossEncoder:
+    """確定性的替代模型：以查詢字元 bigram 的覆蓋率打分，介面同 CrossEncoder.predict"""
+
+    def __init__(self):
+        self.forward_passes = 0
+
+    def predict(self, pairs: Sequence[Tuple[str, str]], batch_size: int = 32, **kwargs) -> List[float]:
+        self.forward_passes += 1
+        scores = []
+        for query, text in pairs:
+            query_grams = _bigrams(query)
+            overlap = len(query_grams & _bigrams(text)) / len(query_grams) if query_grams else 0.0
+            # 以內容雜湊打破同分，結果仍然確定
+            tiebreak = int(hashlib.md5(text.encode("utf-8")).hexdigest()[:4], 16) / 0xFFFF * 1e-3
+            scores.append(min(overlap + tiebreak, 1.0))
+        return scores
+
+
+def _load_model(model_name: str, max_length: int, device: str):
+    """載入 cross-encoder 模型，失敗回傳 None"""
+    if model_name == STUB_MODEL:
+        return StubCrossEncoder()
+    try:
+        from sentence_transformers import CrossEncoder
+        return CrossEncoder(model_name, max_length=max_length, device=device)
+    except Exception as e:
+        logger.error(f"Cross-encoder 模型載入失敗 {model_name}: {e}")
+        return None
+
+
+def chunk_id_for(text: str, chunk_id: Optional[Any] = None) -> str:
+    """候選片段的快取識別碼；沒有 chunk_id 時以內容雜湊代替"""
+    if chunk_id not in (None, ""):
+        return str(chunk_id)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class CrossEncoderReranker:
+    """Cross-Encoder 重排序器"""
+
+    def __init__(self,
+                 model_name: str = DEFAULT_MODEL,
+                 model: Any = None,
+                 top_n: int = DEFAULT_TOP_N,
+                 max_candidates: int = DEFAULT_MAX_CANDIDATES,
+                 max_length: int = DEFAULT_MAX_LENGTH,
+                 budget_ms: float = DEFAULT_BUDGET_MS,
+                 cache_size: int = DEFAULT_CACHE_SIZE,
+                 device: str = DEFAULT_DEVICE):
+        """
+        初始化重排序器（模型於首次使用時載入）
+
+        Args:
+            model_name: cross-encoder 模型名稱，stub 表示確定性替代模型
+            model: 已載入的模型（需提供 predict(pairs, batch_size=...)），提供時忽略 model_name
+            top_n: 預設保留的結果數
+            max_candidates: 單次重排序的候選上限，超出部分維持原排序接在後面
+            max_length: 查詢加片段的最大 token 長度
+            budget_ms: 非同步重排序的延遲預算（毫秒），0 表示不限制
+            cache_size: 分數快取的最大項目數
+            device: 推論設備
+        """
+        self.model_name = model_name
+        self.top_n = top_n
+        self.max_candidates = max(1, max_candidates)
+        self.max_length = max_length
+        self.budget_ms = budget_ms
+        self.cache_size = max(1, cache_size)
+        self.device = device
+
+        self._model = model
+        self._model_loaded = model is not None
+        self._model_lock = threading.Lock()
+        self._cache_lock = threading.Lock()
+        self._cache: "OrderedDict[Tuple[str, str, str], float]" = OrderedDict()
+        # 單一執行緒：前向傳遞本身已用滿 CPU 執行緒，序列化避免互相搶佔
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="reranker")
+
+        self._calls = 0
+        self._forward_passes = 0
+        self._pairs_scored = 0
+        self._cache_hits = 0
+        self._over_budget = 0
+        self._skipped = 0
+        self._total_forward_ms = 0.0
+
+    def _get_model(self):
+        if not self._model_loaded:
+            with self._model_lock:
+                if not self._model_loaded:
+                    start = time.perf_counter()
+                    self._model = _load_model(self.model_name, self.max_length, self.device)
+                    self._model_loaded = True
+                    if self._model is not None:
+                        logger.info(f"✅ Cross-encoder 模型載入完成: {self.model_name} "
+                                    f"({(time.perf_counter() - start):.1f}s)")
+        return self._model
+
+    @property
+    def available(self) -> bool:
+        """模型是否可用"""
+        return self._get_model() is not None
+
+    def score(self, query: str, candidates: Sequence[Tuple[str, str]],
+              deadline: Optional[float] = None) -> List[Optional[float]]:
+        """
+        對候選片段打分（同步，所有未快取的配對一次前向傳遞）
+
+        Args:
+            query: 查詢
+            candidates: (chunk_id, 片段內容) 列表
+            deadline: time.monotonic() 截止時間，開始前向傳遞時已超過則略過（只回傳快取分數）
+
+        Returns:
+            List[Optional[float]]: 與 candidates 對應的分數，模型不可用或已超過截止時間時為 None
+        """
+        self._calls += 1
+        scores: List[Optional[float]] = [None] * len(candidates)
+        missing: List[int] = []
+        with self._cache_lock:
+            for index, (chunk_id, _) in enumerate(candidates):
+                key = (self.model_name, query, chunk_id)
+                cached = self._cache.get(key)
+                if cached is None:
+                    missing.append(index)
+                else:
+                    self._cache.move_to_end(key)
+                    scores[index] = cached
+        self._cache_hits += len(candidates) - len(missing)
+        if not missing:
+            return scores
+        if deadline is not None and time.monotonic() >= deadline:
+            # 呼叫端已放棄等待（排在其他前向傳遞之後），不再計算
+            self._skipped += 1
+            return scores
+
+        model = self._get_model()
+        if model is None:
+            return scores
+
+        pairs = [(query, candidates[index][1]) for index in missing]
+        start = time.perf_counter()
+        predicted = model.predict(pairs, batch_size=len(pairs), show_progress_bar=False)
+        self._total_forward_ms += (time.perf_counter() - start) * 1000.0
+        self._forward_passes += 1
+        self._pairs_scored += len(pairs)
+
+        with self._cache_lock:
+            for index, value in zip(missing, predicted):
+                value = float(value)
+                scores[index] = value
+                self._cache[(self.model_name, query, candidates[index][0])] = value
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return scores
+
+    async def ascore(self, query: str, candidates: Sequence[Tuple[str, str]],
+                     budget_ms: Optional[float] = None) -> List[Optional[float]]:
+        """
+        非同步打分，在專用執行緒中執行
+
+        超過預算時回傳全為 None 的分數（呼叫端維持原排序）；已開始的前向傳遞
+        完成後仍會寫入快取，下次相同查詢可直接命中。尚在排隊的工作輪到時若已超過
+        預算則略過，避免突發流量下執行緒持續處理沒有人等待的請求。
+        """
+        budget = self.budget_ms if budget_ms is None else budget_ms
+        loop = asyncio.get_running_loop()
+        if not budget or budget <= 0:
+            return await loop.run_in_executor(self._executor, self.score, query, list(candidates))
+        deadline = time.monotonic() + budget / 1000.0
+        future = loop.run_in_executor(self._executor, self.score, query, list(candidates), deadline)
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout=budget / 1000.0)
+        except asyncio.TimeoutError:
+            self._over_budget += 1
+            logger.warning(f"⏱️ Cross-encoder 重排序超過 {budget:.0f}ms 預算，維持原排序")
+            return [None] * len(candidates)
+
+    async def rerank(self,
+                     query: str,
+                     items: Sequence[T],
+                     text_of: Callable[[T], str],
+                     id_of: Optional[Callable[[T], Any]] = None,
+                     top_n: Optional[int] = None,
+                     budget_ms: Optional[float] = None) -> List[Tuple[T, Optional[float]]]:
+        """
+        重排序候選並截取前 top_n 筆
+
+        Args:
+            query: 查詢
+            items: 候選（順序為第一階段檢索排序）
+            text_of: 取得候選內容的函數
+            id_of: 取得候選 chunk_id 的函數，未提供或為空時以內容雜湊代替
+            top_n: 保留筆數，預設使用初始化設定；0 或負數表示全部保留
+            budget_ms: 延遲預算（毫秒）
+
+        Returns:
+            List[Tuple[T, Optional[float]]]: (候選, 分數)；未打分的候選分數為 None，排在後面並維持原順序
+        """
+        limit = self.top_n if top_n is None else top_n
+        head = list(items[:self.max_candidates])
+        tail = list(items[self.max_candidates:])
+
+        candidates = []
+        for item in head:
+            text = text_of(item) or ""
+            candidates.append((chunk_id_for(text, id_of(item) if id_of else None), text))
+        scores = await self.ascore(query, candidates, budget_ms) if candidates else []
+
+        order = sorted(range(len(head)),
+                       key=lambda i: (scores[i] is None, -(scores[i] or 0.0), i))
+        ranked = [(head[i], scores[i]) for i in order] + [(item, None) for item in tail]
+        return ranked[:limit] if limit and limit > 0 else ranked
+
+    def clear_cache(self) -> None:
+        """清空分數快取"""
+        with self._cache_lock:
+            self._cache.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """獲取重排序統計"""
+        return {
+            "model": self.model_name,
+            "model_loaded": self._model is not None,
+            "calls": self._calls,
+            "forward_passes": self._forward_passes,
+            "pairs_scored": self._pairs_scored,
+            "cache_hits": self._cache_hits,
+            "cache_entries": len(self._cache),
+            "over_budget": self._over_budget,
+            "skipped_expired": self._skipped,
+            "avg_forward_ms": self._total_forward_ms / self._forward_passes if self._forward_passes else 0.0,
+            "budget_ms": self.budget_ms,
+            "top_n": self.top_n
+        }
+
+
+_reranker: Optional[CrossEncoderReranker] = None
+_reranker_lock = threading.Lock()
+
+
+def get_cross_encoder_reranker() -> CrossEncoderReranker:
+    """獲取共用 Cross-Encoder 重排序器（單例）"""
+    global _reranker
+    if _reranker is None:
+        with _reranker_lock:
+            if _reranker is None:
+                _reranker = CrossEncoderReranker()
+    return _reranker
@@ -64,6 +64,7 @@ class UserQuery:
     category: Optional[str] = None
     context: Optional[str] = None
     metadata: Dict[str, Any] = field(default_factory=dict)
+    query_vector: Optional[List[float]] = None  # 呼叫端已計算的查詢向量，檢索時直接使用
     
     def __post_init__(self) -> None:
         """驗證數據完整性"""
@@ -207,6 +208,7 @@ def create_user_query(
     user_id: str,
     category: Optional[str] = None,
     context: Optional[str] = None,
+    query_vector: Optional[List[float]] = None,
     **metadata
 ) -> UserQuery:
     """創建用戶查詢"""
@@ -215,7 +217,8 @@ def create_user_query(
         user_id=user_id,
         category=category,
         context=context,
-        metadata=metadata
+        metadata=metadata,
+        query_vector=query_vector
     )
 
 
@@ -7,17 +7,21 @@
 - 提供語意匹配功能
 - 支援關鍵字匹配
 - 回傳格式化的答案
+- 載入時預先分詞並建立 token → 問答 的倒排索引，查詢只對候選問答評分
+- CSV 變更時自動重新載入
 
 符合 OOP 原則和 Google Clean Code 標準
 作者: Podwise Team
-版本: 1.0.0
+版本: 1.1.0
 """
 
 import os
 import csv
+import time
 import logging
-from typing import Dict, List, Optional, Tuple, Any
-from dataclasses import dataclass
+import threading
+from typing import Dict, List, Optional, Set, Tuple, Any
+from dataclasses import dataclass, field
 import re
 # 新增 jieba 分詞支援
 try:
@@ -38,23 +42,165 @@ class DefaultQA:
     answer: str
 
 
+# 沒有任何詞彙或標籤重疊的問答，只剩模糊匹配（權重 0.1）能得分
+NON_CANDIDATE_MAX_SCORE = 0.1
+# 沒有標籤匹配的問答，最多只有關鍵字 0.2 + 語意 0.1 + 模糊 0.1
+NO_TAG_MATCH_MAX_SCORE = 0.4
+# 標籤子字串匹配的最短長度（對應 _tag_similarity 的 len > 2）
+MIN_SUBSTRING_LENGTH = 3
+
+
+@dataclass
+class QAIndex:
+    """預先分詞的問答資料與倒排索引（載入後不再修改，重新載入時整體替換）"""
+    qa_data: List[DefaultQA] = field(default_factory=list)
+    question_words: List[List[str]] = field(default_factory=list)
+    tags_words: List[List[str]] = field(default_factory=list)
+    # 問題或標籤中出現的詞彙 → 問答編號
+    token_postings: Dict[str, Set[int]] = field(default_factory=dict)
+    # 標籤詞彙 → 問答編號
+    tag_postings: Dict[str, Set[int]] = field(default_factory=dict)
+    # 標籤詞彙的同義詞 → 問答編號
+    synonym_postings: Dict[str, Set[int]] = field(default_factory=dict)
+    # 長度 > 2 的標籤詞彙 → 問答編號（用於「標籤包含於查詢詞」）
+    long_tag_postings: Dict[str, Set[int]] = field(default_factory=dict)
+    # 長度 > 2 的標籤詞彙之子字串 → 問答編號（用於「查詢詞包含於標籤」）
+    tag_substring_postings: Dict[str, Set[int]] = field(default_factory=dict)
+    # 問題包含 nvidia 的問答編號
+    nvidia_ids: Set[int] = field(default_factory=set)
+
+
 class DefaultQAProcessor:
     """預設問答處理器"""
     
-    def __init__(self, csv_path: str = "scripts/csv/default_QA.csv"):
+    def __init__(self, csv_path: str = "scripts/csv/default_QA.csv",
+                 tags_path: str = "scripts/csv/tags_info.csv",
+                 reload_check_interval: float = 5.0):
         """
         初始化預設問答處理器
         
         Args:
             csv_path: default_QA.csv 檔案路徑
+            tags_path: tags_info.csv 檔案路徑
+            reload_check_interval: 檢查 CSV 是否變更的最短間隔（秒），0 表示每次查詢都檢查
         """
         self.csv_path = csv_path
+        self.tags_path = tags_path
+        self.reload_check_interval = reload_check_interval
         self.qa_data: List[DefaultQA] = []
         self.tags_mapping: Dict[str, List[str]] = {}
+        self._index = QAIndex()
+        self._reload_lock = threading.Lock()
+        self._source_signature = self._get_source_signature()
+        self._last_reload_check = time.monotonic()
         self._load_qa_data()
         self._load_tags_mapping()
+        self._index = self._build_index()
         logger.info(f"✅ 預設問答處理器初始化完成，載入 {len(self.qa_data)} 筆資料")
     
+    def _get_source_signature(self) -> Tuple[Tuple[float, int], ...]:
+        """CSV 檔案的修改時間與大小（檔案不存在時為 (0, 0)）"""
+        signature = []
+        for path in (self.csv_path, self.tags_path):
+            try:
+                stat = os.stat(path)
+                signature.append((stat.st_mtime, stat.st_size))
+            except OSError:
+                signature.append((0.0, 0))
+        return tuple(signature)
+    
+    def reload(self) -> None:
+        """重新載入 CSV 並重建索引，完成後才替換，查詢不會看到半成品"""
+        with self._reload_lock:
+            signature = self._get_source_signature()
+            self._load_qa_data()
+            self._load_tags_mapping()
+            self._index = self._build_index()
+            self._source_signature = signature
+            logger.info(f"🔄 預設問答已重新載入，共 {len(self.qa_data)} 筆資料")
+    
+    def _reload_if_changed(self) -> None:
+        """CSV 變更時重新載入（依 reload_check_interval 節流）"""
+        now = time.monotonic()
+        if now - self._last_reload_check < self.reload_check_interval:
+            return
+        self._last_reload_check = now
+        
+        if self._get_source_signature() != self._source_signature:
+            try:
+                self.reload()
+            except Exception as e:
+                logger.error(f"重新載入預設問答失敗，沿用既有資料: {e}")
+    
+    def _build_index(self) -> QAIndex:
+        """預先分詞並建立倒排索引"""
+        index = QAIndex(qa_data=list(self.qa_data))
+        
+        for qa_id, qa in enumerate(index.qa_data):
+            question_words = self._preprocess_query(qa.question)
+            tags_words = self._preprocess_query(qa.tags) if qa.tags else []
+            index.question_words.append(question_words)
+            index.tags_words.append(tags_words)
+            
+            for word in question_words:
+                index.token_postings.setdefault(word, set()).add(qa_id)
+            for word in tags_words:
+                index.token_postings.setdefault(word, set()).add(qa_id)
+                tag = word.strip()
+                if not tag:
+                    continue
+                index.tag_postings.setdefault(tag, set()).add(qa_id)
+                if len(tag) >= MIN_SUBSTRING_LENGTH:
+                    index.long_tag_postings.setdefault(tag, set()).add(qa_id)
+                    for substring in self._substrings(tag):
+                        index.tag_substring_postings.setdefault(substring, set()).add(qa_id)
+            
+            if 'nvidia' in qa.question.lower():
+                index.nvidia_ids.add(qa_id)
+        
+        for tag, qa_ids in index.tag_postings.items():
+            for synonym in self.tags_mapping.get(tag, []):
+                index.synonym_postings.setdefault(synonym, set()).update(qa_ids)
+        
+        logger.info(f"預設問答索引建立完成: {len(index.qa_data)} 筆, {len(index.token_postings)} 個詞彙")
+        return index
+    
+    @staticmethod
+    def _substrings(word: str) -> Set[str]:
+        """長度至少 MIN_SUBSTRING_LENGTH 的所有子字串"""
+        return {
+            word[start:end]
+            for start in range(len(word))
+            for end in range(start + MIN_SUBSTRING_LENGTH, len(word) + 1)
+        }
+    
+    def _candidate_ids(self, index: QAIndex, user_words: list, confidence_threshold: float) -> Optional[Set[int]]:
+        """
+        找出分數可能達到閾值的問答，閾值過低無法篩選時回傳 None
+        
+        標籤分數需要標籤詞彙、同義詞或標籤子字串匹配，關鍵字與語意分數需要詞彙重疊；
+        沒有標籤匹配的問答最多 NO_TAG_MATCH_MAX_SCORE，完全沒有重疊的最多 NON_CANDIDATE_MAX_SCORE。
+        """
+        if confidence_threshold <= NON_CANDIDATE_MAX_SCORE:
+            return None
+        
+        candidates: Set[int] = set()
+        include_word_overlap = confidence_threshold <= NO_TAG_MATCH_MAX_SCORE
+        for word in set(user_words):
+            candidates.update(index.tag_postings.get(word, ()))
+            candidates.update(index.synonym_postings.get(word, ()))
+            if include_word_overlap:
+                candidates.update(index.token_postings.get(word, ()))
+            if len(word) >= MIN_SUBSTRING_LENGTH:
+                candidates.update(index.tag_substring_postings.get(word, ()))
+                for substring in self._substrings(word):
+                    candidates.update(index.long_tag_postings.get(substring, ()))
+        
+        user_query_text = ' '.join(user_words).lower()
+        if 'nvidia' in user_query_text:
+            candidates.update(index.nvidia_ids)
+        return candidates
+    
     def _load_qa_data(self) -> None:
         """載入預設問答資料"""
         try:
@@ -62,6 +208,7 @@ class DefaultQAProcessor:
                 logger.warning(f"預設問答檔案不存在: {self.csv_path}")
                 return
             
+            qa_data: List[DefaultQA] = []
             with open(self.csv_path, 'r', encoding='utf-8') as file:
                 # 跳過第一行空行
                 next(file, None)
@@ -82,8 +229,9 @@ class DefaultQAProcessor:
                             tags=row.get('Mapping到的tag', '').strip(),
                             answer=row.get('答案', '').strip()
                         )
-                        self.qa_data.append(qa)
+                        qa_data.append(qa)
             
+            self.qa_data = qa_data
             logger.info(f"成功載入 {len(self.qa_data)} 筆預設問答")
             
         except Exception as e:
@@ -93,11 +241,12 @@ class DefaultQAProcessor:
     def _load_tags_mapping(self) -> None:
         """載入 tags_info.csv 的關鍵字映射"""
         try:
-            tags_path = "scripts/csv/tags_info.csv"
+            tags_path = self.tags_path
             if not os.path.exists(tags_path):
                 logger.warning(f"tags_info.csv 檔案不存在: {tags_path}")
                 return
             
+            tags_mapping: Dict[str, List[str]] = {}
             with open(tags_path, 'r', encoding='utf-8') as file:
                 reader = csv.DictReader(file)
                 
@@ -113,8 +262,9 @@ class DefaultQAProcessor:
                                 synonyms.append(synonym)
                         
                         if synonyms:
-                            self.tags_mapping[tag] = synonyms
+                            tags_mapping[tag] = synonyms
             
+            self.tags_mapping = tags_mapping
             logger.info(f"成功載入 {len(self.tags_mapping)} 個 TAG 映射")
             
         except Exception as e:
@@ -132,7 +282,9 @@ class DefaultQAProcessor:
         Returns:
             Tuple[DefaultQA, float]: 匹配的問答和信心度，如果沒有匹配則返回 None
         """
-        if not self.qa_data:
+        self._reload_if_changed()
+        index = self._index
+        if not index.qa_data:
             return None
         
         best_match: Optional[DefaultQA] = None
@@ -141,8 +293,15 @@ class DefaultQAProcessor:
         # 預處理用戶查詢
         processed_query = self._preprocess_query(user_query)
         
-        for qa in self.qa_data:
-            confidence = self._calculate_similarity(processed_query, qa)
+        # 只對分數可能達到閾值的候選問答評分（依原順序，平手時結果不變）
+        candidates = self._candidate_ids(index, processed_query, confidence_threshold)
+        qa_ids = sorted(candidates) if candidates is not None else range(len(index.qa_data))
+        
+        for qa_id in qa_ids:
+            qa = index.qa_data[qa_id]
+            confidence = self._score_tokens(
+                processed_query, qa, index.question_words[qa_id], index.tags_words[qa_id]
+            )
             
             # 調試信息：檢查包含「商業」關鍵字的問答
             if '商業' in qa.question and confidence > 0:
@@ -178,7 +337,11 @@ class DefaultQAProcessor:
         # 分詞處理
         qa_question_words = self._preprocess_query(qa.question)
         qa_tags_words = self._preprocess_query(qa.tags) if qa.tags else []
-
+        return self._score_tokens(user_words, qa, qa_question_words, qa_tags_words)
+    
+    def _score_tokens(self, user_words: list, qa: DefaultQA,
+                      qa_question_words: list, qa_tags_words: list) -> float:
+        """以已分詞的問題與標籤計算相似度"""
         # 特殊處理：NVIDIA 相關查詢
         user_query_text = ' '.join(user_words).lower()
         qa_question_text = qa.question.lower()
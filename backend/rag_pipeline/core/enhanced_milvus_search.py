@@ -3,7 +3,7 @@
 增強 Milvus 搜尋模組
 
 整合 MilvusDB 功能，提供統一的向量搜尋介面
-支援 Qwen2.5-Taiwan 模型進行向量檢索
+可直接接受預先計算的查詢向量，文本查詢以共用 BGE-M3 模型編碼
 
 作者: Podwise Team
 版本: 3.0.0
@@ -20,6 +20,7 @@ from dataclasses import dataclass
 
 # 添加路徑以便導入
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
 try:
     from config.integrated_config import get_config
@@ -62,46 +63,28 @@ class EnhancedMilvusSearch:
     def __init__(self):
         """初始化增強 Milvus 搜尋服務"""
         self.config = get_config()
+        self.manager = None
         self.collection = None
         self.is_connected = False
         self._connect()
         
-        # 初始化 Qwen LLM 管理器（用於文本向量化）
-        self.qwen_llm_manager = None
-        try:
-            from .qwen_llm_manager import get_qwen3_llm_manager
-            self.qwen_llm_manager = get_qwen3_llm_manager()
-            logger.info("✅ Qwen LLM 管理器初始化成功")
-        except Exception as e:
-            logger.warning(f"Qwen LLM 管理器初始化失敗: {e}")
-        
         logger.info("✅ EnhancedMilvusSearch 初始化完成")
     
     def _connect(self):
-        """連接到 Milvus"""
+        """連接到 Milvus（連線與集合載入由共用管理器負責）"""
         try:
-            from pymilvus import connections, Collection, utility
-            
-            # 檢查是否已經連接
-            try:
-                connections.get_connection("default")
-                logger.info("✅ Milvus 已連接，使用現有連接")
-            except:
-                # 連接到 Milvus
-                connections.connect(
-                    alias="default",
-                    host=self.config.database.milvus_host,
-                    port=self.config.database.milvus_port
-                )
+            from utils.milvus_client_manager import get_milvus_manager
             
-            # 檢查集合是否存在
+            self.manager = get_milvus_manager()
             collection_name = self.config.database.milvus_collection
-            if utility.has_collection(collection_name):
-                self.collection = Collection(collection_name)
+            self.collection = self.manager.get_collection(
+                collection_name,
+                host=self.config.database.milvus_host,
+                port=self.config.database.milvus_port
+            )
+            if self.collection is not None:
                 self.is_connected = True
                 logger.info(f"✅ Milvus 集合 '{collection_name}' 連接成功")
-            else:
-                logger.warning(f"⚠️ Milvus 集合 '{collection_name}' 不存在")
                 
         except ImportError:
             logger.warning("⚠️ pymilvus 未安裝")
@@ -120,12 +103,12 @@ class EnhancedMilvusSearch:
                 return False
             
             # 檢查集合狀態
-            from pymilvus import utility
             collection_name = self.config.database.milvus_collection
-            if utility.has_collection(collection_name):
-                return True
-            else:
-                return False
+            return self.manager.has_collection(
+                collection_name,
+                host=self.config.database.milvus_host,
+                port=self.config.database.milvus_port
+            )
             
         except Exception as e:
             logger.error(f"Milvus 健康檢查失敗: {e}")
@@ -135,42 +118,59 @@ class EnhancedMilvusSearch:
         """
         執行向量搜尋
         
+        已有查詢向量的呼叫端應直接傳入向量（或呼叫 search_by_vector），
+        只有傳入文本時才會在此編碼一次。
+        
         Args:
             query: 查詢文本或向量
             top_k: 返回結果數量
             
+        Returns:
+            List[Dict[str, Any]]: 搜尋結果
+        """
+        if not isinstance(query, str):
+            return await self.search_by_vector(query, top_k)
+        
+        if not self.is_connected or self.collection is None:
+            logger.warning("Milvus 未連接，返回模擬結果")
+            return self._get_mock_results(query, top_k)
+        
+        embedding = await self._text_to_vector(query)
+        if not embedding:
+            logger.warning("文本向量化失敗，返回模擬結果")
+            return self._get_mock_results(query, top_k)
+        
+        return await self.search_by_vector(embedding, top_k)
+    
+    async def search_by_vector(self, embedding: List[float], top_k: int = 8) -> List[Dict[str, Any]]:
+        """
+        以預先計算的查詢向量執行搜尋（不再編碼）
+        
+        Args:
+            embedding: 查詢向量
+            top_k: 返回結果數量
+            
         Returns:
             List[Dict[str, Any]]: 搜尋結果
         """
         try:
             if not self.is_connected or self.collection is None:
                 logger.warning("Milvus 未連接，返回模擬結果")
-                return self._get_mock_results(query, top_k)
-            
-            # 如果輸入是文本，先向量化
-            if isinstance(query, str):
-                embedding = await self._text_to_vector(query)
-            if not embedding:
-                    logger.warning("文本向量化失敗，返回模擬結果")
-                    return self._get_mock_results(query, top_k)
-            else:
-                embedding = query
+                return self._get_mock_results(embedding, top_k)
             
-            # 載入集合
-            self.collection.load()
+            if hasattr(embedding, "tolist"):
+                embedding = embedding.tolist()
             
-            # 執行搜尋
-            search_params = {
-                "metric_type": "COSINE",
-                "params": {"nprobe": 10}
-            }
-            
-            results = self.collection.search(
-                data=[embedding],
+            # 集合已由管理器保持載入，搜尋於有界執行緒池中執行
+            results = await self.manager.asearch(
+                self.config.database.milvus_collection,
+                [embedding],
                 anns_field="embedding",
-                param=search_params,
+                param={"metric_type": "COSINE", "params": {"nprobe": 10}},
                 limit=top_k,
-                output_fields=["chunk_id", "chunk_text", "tags", "podcast_name", "episode_title", "category"]
+                output_fields=["chunk_id", "chunk_text", "tags", "podcast_name", "episode_title", "category"],
+                host=self.config.database.milvus_host,
+                port=self.config.database.milvus_port
             )
             
             # 格式化結果
@@ -208,11 +208,11 @@ class EnhancedMilvusSearch:
             
         except Exception as e:
             logger.error(f"❌ Milvus 搜尋失敗: {e}")
-            return self._get_mock_results(query, top_k)
+            return self._get_mock_results(embedding, top_k)
     
     async def _text_to_vector(self, text: str) -> Optional[List[float]]:
         """
-        文本向量化
+        文本向量化（使用程序內共用的 BGE-M3 模型）
         
         Args:
             text: 輸入文本
@@ -221,20 +221,12 @@ class EnhancedMilvusSearch:
             Optional[List[float]]: 文本向量
         """
         try:
-            if self.qwen_llm_manager:
-                # 使用 Qwen LLM 管理器進行文本向量化
-                # 這裡需要實現具體的向量化邏輯
-                # 暫時使用簡單的哈希方法
-                import hashlib
-                hash_obj = hashlib.md5(text.encode())
-                vector = [float(int(hash_obj.hexdigest()[i:i+2], 16)) / 255.0 for i in range(0, 32, 2)]
-                return vector
-            else:
-                # 使用簡單的哈希方法作為備用
-                import hashlib
-                hash_obj = hashlib.md5(text.encode())
-                vector = [float(int(hash_obj.hexdigest()[i:i+2], 16)) / 255.0 for i in range(0, 32, 2)]
-                return vector
+            from tools.bgem3_model import get_bgem3_model
+            result = await get_bgem3_model().encode(text)
+            if result.success and result.vector:
+                return result.vector
+            logger.warning(f"文本向量化失敗: {result.error_message}")
+            return None
             
         except Exception as e:
             logger.error(f"文本向量化失敗: {e}")
@@ -270,10 +262,10 @@ class EnhancedMilvusSearch:
         return mock_results
     
     async def cleanup(self):
-        """清理資源"""
+        """清理資源（集合由共用管理器持有，此處只解除引用）"""
         try:
-            if self.collection:
-                self.collection.release()
+            self.collection = None
+            self.is_connected = False
             logger.info("✅ Milvus 資源清理完成")
         except Exception as e:
             logger.error(f"❌ Milvus 資源清理失敗: {e}")
@@ -290,13 +290,17 @@ class RAGVectorSearch:
         
         logger.info("✅ RAGVectorSearch 初始化完成")
     
-    async def search(self, query: str, user_id: str = "default_user") -> List[SearchResult]:
+    async def search(self,
+                     query: str,
+                     user_id: str = "default_user",
+                     query_vector: Optional[List[float]] = None) -> List[SearchResult]:
         """
         執行智能搜尋
         
         Args:
             query: 用戶查詢
             user_id: 用戶 ID
+            query_vector: 呼叫端以原始查詢計算的向量，改寫後的查詢與原始查詢相同時才沿用
             
         Returns:
             List[SearchResult]: 搜尋結果列表
@@ -310,8 +314,9 @@ class RAGVectorSearch:
             # 步驟 2: 查詢改寫
             rewritten_query = await self._query_rewriter(query, query_keywords)
             
-            # 步驟 3: 向量化查詢
-            query_vector = await self._text2vec_model(rewritten_query)
+            # 步驟 3: 向量化查詢（每個查詢只編碼一次；改寫後文本不同時編碼改寫後的查詢）
+            if query_vector is None or rewritten_query != query:
+                query_vector = await self._text2vec_model(rewritten_query)
             
             # 步驟 4: Milvus 檢索
             raw_results = await self._milvus_db_search(query_vector)
@@ -423,9 +428,9 @@ class RAGVectorSearch:
             List[float]: 查詢向量
         """
         try:
-            # 使用真正的 text2vec 模型
-            from tools.bgem3_model import Text2VecModel
-            model = Text2VecModel()
+            # 使用程序內共用的 text2vec 模型，避免每次查詢重新載入權重
+            from tools.bgem3_model import get_bgem3_model
+            model = get_bgem3_model()
             result = await model.encode(query)
             
             if result.success and result.vector:
@@ -459,10 +464,8 @@ class RAGVectorSearch:
         """
         try:
             if self.milvus_search:
-                # 將向量轉換為字符串進行搜尋
-                query_str = " ".join([str(v) for v in query_vector[:10]])  # 取前10個維度
-                results = await self.milvus_search.search(query_str, top_k=self.config.top_k)
-                return results
+                # 直接以向量搜尋，不再重新編碼
+                return await self.milvus_search.search_by_vector(query_vector, top_k=self.config.top_k)
             else:
                 # 模擬搜尋結果
                 return [
@@ -5,13 +5,16 @@
 """
 
 import os
+import sys
 import logging
 import asyncio
 import aiohttp
 import json
+import math
 import time
-from typing import Dict, List, Any, Optional, Tuple
-from dataclasses import dataclass
+from contextvars import ContextVar
+from typing import Awaitable, Dict, List, Any, Optional, Tuple
+from dataclasses import dataclass, field, asdict, replace
 from abc import ABC, abstractmethod
 import yaml
 
@@ -22,6 +25,19 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# 添加後端根目錄到 Python 路徑
+backend_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if backend_root not in sys.path:
+    sys.path.insert(0, backend_root)
+
+try:
+    from utils.bm25_index import get_bm25_index, DEFAULT_INDEX_PATH
+    BM25_AVAILABLE = True
+except ImportError as e:
+    logger.warning(f"BM25 索引模組導入失敗: {e}")
+    BM25_AVAILABLE = False
+    DEFAULT_INDEX_PATH = "data/bm25_index"
+
 @dataclass
 class QueryContext:
     """查詢上下文"""
@@ -42,8 +58,96 @@ class SearchResult:
     source: str
     metadata: Dict[str, Any]
 
+@dataclass
+class RequestDeadline:
+    """單一請求的整體延遲預算"""
+    budget: float
+    started_at: float = field(default_factory=time.monotonic)
+    
+    def elapsed(self) -> float:
+        """已經過時間（秒）"""
+        return time.monotonic() - self.started_at
+    
+    def remaining(self) -> float:
+        """剩餘時間（秒）"""
+        return max(0.0, self.budget - self.elapsed())
+    
+    def expired(self) -> bool:
+        """是否已超過預算"""
+        return self.remaining() <= 0.0
+
+@dataclass
+class LevelTiming:
+    """層級執行紀錄"""
+    level: str
+    name: str
+    status: str  # ok / low_confidence / timeout / skipped / error
+    elapsed_ms: float
+    confidence: float
+
+# 目前請求的截止時間，各層級（含 gather 出去的子任務）皆可讀取
+_current_deadline: ContextVar[Optional[RequestDeadline]] = ContextVar("rag_request_deadline", default=None)
+
+def get_current_deadline() -> Optional[RequestDeadline]:
+    """獲取目前請求的截止時間"""
+    return _current_deadline.get()
+
+# 目前請求的原始查詢與各層級回報的統計（例如上下文打包前後的 token 數）
+_current_query: ContextVar[str] = ContextVar("rag_request_query", default="")
+_current_request_stats: ContextVar[Optional[Dict[str, Any]]] = ContextVar("rag_request_stats", default=None)
+# 呼叫端以原始查詢計算的向量（例如語意快取查詢時），密集檢索的文本與原始查詢相同時直接使用
+_current_query_vector: ContextVar[Optional[List[float]]] = ContextVar("rag_request_query_vector", default=None)
+
+def get_current_query() -> str:
+    """獲取目前請求的原始查詢"""
+    return _current_query.get()
+
+def get_current_query_vector(text: Optional[str] = None) -> Optional[List[float]]:
+    """
+    獲取目前請求的查詢向量（呼叫端未提供時為 None）
+
+    Args:
+        text: 要編碼的文本；與原始查詢不同時回傳 None（向量是原始查詢的嵌入，不能代表改寫後的查詢）
+    """
+    if text is not None and text != _current_query.get():
+        return None
+    return _current_query_vector.get()
+
+def record_request_stat(key: str, value: Any) -> None:
+    """記錄目前請求的統計，處理完成後合併到回應 metadata"""
+    stats = _current_request_stats.get()
+    if stats is not None:
+        stats[key] = value
+
+async def run_within_deadline(coro: Awaitable[Any], default: Any, label: str = "") -> Any:
+    """
+    在目前請求的剩餘預算內執行，逾時則回傳預設值（降級而非整體失敗）
+    
+    Args:
+        coro: 要執行的協程
+        default: 逾時或預算用盡時的回傳值
+        label: 日誌標籤
+    """
+    deadline = get_current_deadline()
+    if deadline is None:
+        return await coro
+    
+    remaining = deadline.remaining()
+    if remaining <= 0.0:
+        coro.close()
+        logger.warning(f"⏱️ {label} 已無剩餘預算，略過")
+        return default
+    
+    try:
+        return await asyncio.wait_for(coro, timeout=remaining)
+    except asyncio.TimeoutError:
+        logger.warning(f"⏱️ {label} 超過請求截止時間，降級處理")
+        return default
+
 # 使用統一的數據模型
 from .data_models import RAGResponse
+from .context_packer import ContextChunk, ContextPacker, PackingStats, episode_key
+from .cross_encoder_reranker import get_cross_encoder_reranker
 
 class RAGLevel(ABC):
     """RAG 層級抽象基類"""
@@ -53,6 +157,8 @@ class RAGLevel(ABC):
         self.name = config.get('name', 'Unknown')
         self.confidence_threshold = config.get('confidence_threshold', 0.7)
         self.fallback_strategy = config.get('fallback_strategy', None)
+        self.max_processing_time = config.get('max_processing_time')
+        self.min_budget = config.get('min_budget', 0.05)
     
     @abstractmethod
     async def process(self, input_data: Any) -> Tuple[Any, float]:
@@ -62,6 +168,41 @@ class RAGLevel(ABC):
     async def should_fallback(self, confidence: float) -> bool:
         """判斷是否需要降級"""
         return confidence < self.confidence_threshold
+    
+    async def run(self, level: str, input_data: Any, deadline: RequestDeadline) -> Tuple[Any, float, LevelTiming]:
+        """
+        在請求預算內執行本層級
+        
+        剩餘預算不足 min_budget 時直接略過；執行時間以 max_processing_time 與剩餘預算
+        兩者較小者為上限，逾時視為本層失敗，由呼叫端沿用上一層的輸出。
+        
+        Args:
+            level: 層級鍵值（如 level_2）
+            input_data: 輸入數據
+            deadline: 請求截止時間
+            
+        Returns:
+            Tuple[Any, float, LevelTiming]: (結果, 信心值, 執行紀錄)
+        """
+        remaining = deadline.remaining()
+        if remaining < self.min_budget:
+            logger.warning(f"⏱️ {self.name}: 剩餘預算 {remaining * 1000:.0f}ms 不足，略過")
+            return None, 0.0, LevelTiming(level, self.name, "skipped", 0.0, 0.0)
+        
+        timeout = min(remaining, self.max_processing_time) if self.max_processing_time else remaining
+        start_time = time.monotonic()
+        try:
+            result, confidence = await asyncio.wait_for(self.process(input_data), timeout=timeout)
+            status = "ok" if confidence >= self.confidence_threshold else "low_confidence"
+        except asyncio.TimeoutError:
+            logger.warning(f"⏱️ {self.name}: 超過 {timeout:.2f}s 上限，降級處理")
+            result, confidence, status = None, 0.0, "timeout"
+        except Exception as e:
+            logger.error(f"❌ {self.name}: 執行失敗 - {e}")
+            result, confidence, status = None, 0.0, "error"
+        
+        elapsed_ms = (time.monotonic() - start_time) * 1000.0
+        return result, confidence, LevelTiming(level, self.name, status, elapsed_ms, confidence)
 
 class Level1QueryProcessing(RAGLevel):
     """第一層：查詢重寫轉換拓展"""
@@ -196,6 +337,14 @@ class Level1QueryProcessing(RAGLevel):
 class Level2HybridSearch(RAGLevel):
     """第二層：混合搜尋"""
     
+    def __init__(self, config: Dict[str, Any]):
+        super().__init__(config)
+        self.top_k = config.get('top_k', 10)
+        self.rrf_k = config.get('rrf_k', 60)
+        self.sparse_index_path = config.get('sparse_index_path', DEFAULT_INDEX_PATH)
+        self.enable_sparse = config.get('enable_sparse_retrieval', True) and BM25_AVAILABLE
+        self.milvus_search = None
+    
     async def process(self, input_data: QueryContext) -> Tuple[List[SearchResult], float]:
         """執行混合搜尋"""
         logger.info(f"🔍 {self.name}: 執行混合搜尋")
@@ -203,14 +352,14 @@ class Level2HybridSearch(RAGLevel):
         start_time = time.time()
         
         try:
-            # 密集檢索
-            dense_results = await self._dense_retrieval(input_data.rewritten_query)
-            
-            # 稀疏檢索
-            sparse_results = await self._sparse_retrieval(input_data.rewritten_query)
-            
-            # 語義搜尋
-            semantic_results = await self._semantic_search(input_data.rewritten_query)
+            # 密集檢索、稀疏檢索與語義搜尋並行執行
+            # 個別檢索逾時只放棄該路結果，不影響其他路
+            query = input_data.rewritten_query
+            dense_results, sparse_results, semantic_results = await asyncio.gather(
+                run_within_deadline(self._dense_retrieval(query), [], "密集檢索"),
+                run_within_deadline(self._sparse_retrieval(query), [], "稀疏檢索"),
+                run_within_deadline(self._semantic_search(query), [], "語義搜尋")
+            )
             
             # 混合融合
             fused_results = await self._hybrid_fusion(dense_results, sparse_results, semantic_results)
@@ -228,7 +377,30 @@ class Level2HybridSearch(RAGLevel):
             return [], 0.0
     
     async def _dense_retrieval(self, query: str) -> List[SearchResult]:
-        """密集檢索"""
+        """
+        密集檢索（請求帶有查詢向量時搜尋 Milvus）
+
+        改寫後的查詢與原始查詢相同時直接使用請求的向量，否則編碼改寫後的查詢，保留查詢擴展的效果
+        """
+        query_vector = get_current_query_vector(query)
+        if query_vector is None and get_current_query_vector() is not None:
+            query_vector = await self._encode_query(query)
+        if query_vector is not None:
+            if self.milvus_search is None:
+                from .enhanced_milvus_search import EnhancedMilvusSearch
+                self.milvus_search = await asyncio.to_thread(EnhancedMilvusSearch)
+            hits = await self.milvus_search.search_by_vector(query_vector, top_k=self.top_k)
+            return [
+                SearchResult(
+                    document_id=hit.get('chunk_id') or f"dense_{rank}",
+                    content=hit.get('content', ''),
+                    score=float(hit.get('similarity_score', hit.get('confidence', 0.0))),
+                    source="dense_retrieval",
+                    metadata={'method': 'dense', **hit.get('metadata', {})}
+                )
+                for rank, hit in enumerate(hits)
+            ]
+        
         # 模擬密集檢索結果
         return [
             SearchResult(
@@ -246,18 +418,46 @@ class Level2HybridSearch(RAGLevel):
                 metadata={'method': 'dense', 'model': 'bge-large-zh'}
             )
         ]
-    
+
+    async def _encode_query(self, query: str) -> Optional[List[float]]:
+        """以程序內共用的 text2vec 模型編碼查詢，失敗時回傳 None"""
+        from tools.bgem3_model import get_bgem3_model
+        result = await get_bgem3_model().encode(query)
+        if not result.success:
+            logger.warning(f"⚠️ {self.name}: 查詢編碼失敗 - {result.error_message}")
+            return None
+        return result.vector
+
     async def _sparse_retrieval(self, query: str) -> List[SearchResult]:
-        """稀疏檢索"""
-        # 模擬稀疏檢索結果
+        """稀疏檢索（離線建置的 BM25 索引，於執行緒池中查詢）"""
+        if not self.enable_sparse:
+            return []
+        
+        index = get_bm25_index(self.sparse_index_path)
+        if index is None:
+            return []
+        
+        try:
+            loop = asyncio.get_running_loop()
+            hits = await loop.run_in_executor(None, index.search, query, self.top_k)
+        except Exception as e:
+            logger.error(f"BM25 檢索失敗: {e}")
+            return []
+        
+        if not hits:
+            return []
+        
+        # 分數以最高分正規化到 0~1，與其他檢索結果同一尺度
+        top_score = hits[0].score or 1.0
         return [
             SearchResult(
-                document_id="doc_003",
-                content="BM25 檢索到的相關文檔...",
-                score=0.72,
+                document_id=hit.chunk_id,
+                content=hit.chunk_text,
+                score=hit.score / top_score,
                 source="sparse_retrieval",
-                metadata={'method': 'sparse', 'algorithm': 'bm25'}
+                metadata={'method': 'sparse', 'algorithm': 'bm25', 'bm25_score': hit.score, **hit.metadata}
             )
+            for hit in hits
         ]
     
     async def _semantic_search(self, query: str) -> List[SearchResult]:
@@ -276,21 +476,32 @@ class Level2HybridSearch(RAGLevel):
     async def _hybrid_fusion(self, dense_results: List[SearchResult], 
                            sparse_results: List[SearchResult], 
                            semantic_results: List[SearchResult]) -> List[SearchResult]:
-        """混合融合"""
-        all_results = dense_results + sparse_results + semantic_results
-        
-        # 按分數排序
-        all_results.sort(key=lambda x: x.score, reverse=True)
-        
-        # 去重（基於 document_id）
-        seen_ids = set()
-        unique_results = []
-        for result in all_results:
-            if result.document_id not in seen_ids:
-                seen_ids.add(result.document_id)
-                unique_results.append(result)
-        
-        return unique_results[:10]  # 返回前10個結果
+        """混合融合（Reciprocal Rank Fusion）"""
+        rrf_scores: Dict[str, float] = {}
+        best: Dict[str, SearchResult] = {}
+        sources: Dict[str, List[str]] = {}
+        
+        for results in (dense_results, sparse_results, semantic_results):
+            ranked = sorted(results, key=lambda x: x.score, reverse=True)
+            for rank, result in enumerate(ranked, start=1):
+                doc_id = result.document_id
+                rrf_scores[doc_id] = rrf_scores.get(doc_id, 0.0) + 1.0 / (self.rrf_k + rank)
+                sources.setdefault(doc_id, []).append(result.source)
+                if doc_id not in best or result.score > best[doc_id].score:
+                    best[doc_id] = result
+        
+        # 依 RRF 分數排序，保留各文件最佳的原始分數供信心值計算
+        fused_ids = sorted(rrf_scores, key=rrf_scores.get, reverse=True)[:self.top_k]
+        return [
+            SearchResult(
+                document_id=doc_id,
+                content=best[doc_id].content,
+                score=best[doc_id].score,
+                source=best[doc_id].source,
+                metadata={**best[doc_id].metadata, 'rrf_score': rrf_scores[doc_id], 'fusion_sources': sources[doc_id]}
+            )
+            for doc_id in fused_ids
+        ]
     
     async def _calculate_search_confidence(self, results: List[SearchResult]) -> float:
         """計算搜尋信心值"""
@@ -314,34 +525,10 @@ class Level3RetrievalAugmentation(RAGLevel):
         start_time = time.time()
         
         try:
-            augmented_results = []
-            
-            for result in input_data:
-                # 上下文增強
-                augmented_content = await self._augment_context(result)
-                
-                # 知識圖譜整合
-                knowledge_enhanced = await self._integrate_knowledge_graph(augmented_content)
-                
-                # 外部數據融合
-                external_enhanced = await self._fuse_external_data(knowledge_enhanced)
-                
-                # 創建增強後的結果
-                augmented_result = SearchResult(
-                    document_id=result.document_id,
-                    content=external_enhanced,
-                    score=result.score * 1.1,  # 增強後分數略高
-                    source=result.source,
-                    metadata={
-                        **result.metadata,
-                        'augmented': True,
-                        'context_enhanced': True,
-                        'knowledge_integrated': True,
-                        'external_fused': True
-                    }
-                )
-                
-                augmented_results.append(augmented_result)
+            # 各結果的增強互不相依，並行處理
+            augmented_results = list(await asyncio.gather(
+                *(self._augment_result(result) for result in input_data)
+            ))
             
             processing_time = time.time() - start_time
             
@@ -355,6 +542,32 @@ class Level3RetrievalAugmentation(RAGLevel):
             logger.error(f"❌ {self.name}: 增強失敗 - {e}")
             return input_data, 0.0
     
+    async def _augment_result(self, result: SearchResult) -> SearchResult:
+        """增強單一結果"""
+        # 上下文增強
+        augmented_content = await self._augment_context(result)
+        
+        # 知識圖譜整合
+        knowledge_enhanced = await self._integrate_knowledge_graph(augmented_content)
+        
+        # 外部數據融合
+        external_enhanced = await self._fuse_external_data(knowledge_enhanced)
+        
+        # 創建增強後的結果
+        return SearchResult(
+            document_id=result.document_id,
+            content=external_enhanced,
+            score=result.score * 1.1,  # 增強後分數略高
+            source=result.source,
+            metadata={
+                **result.metadata,
+                'augmented': True,
+                'context_enhanced': True,
+                'knowledge_integrated': True,
+                'external_fused': True
+            }
+        )
+    
     async def _augment_context(self, result: SearchResult) -> str:
         """上下文增強"""
         # 模擬上下文增強
@@ -387,6 +600,13 @@ class Level3RetrievalAugmentation(RAGLevel):
 class Level4Reranking(RAGLevel):
     """第四層：重新排序"""
     
+    def __init__(self, config: Dict[str, Any]):
+        super().__init__(config)
+        self.top_k = config.get('rerank_top_k', 5)
+        self.budget_ms = config.get('rerank_budget_ms', 300)
+        # 模型權重跨請求共用，模型名稱由 RERANKER_MODEL 指定
+        self.reranker = get_cross_encoder_reranker() if config.get('enable_cross_encoder', True) else None
+    
     async def process(self, input_data: List[SearchResult]) -> Tuple[List[SearchResult], float]:
         """執行重新排序"""
         logger.info(f"🔍 {self.name}: 執行重新排序")
@@ -394,62 +614,49 @@ class Level4Reranking(RAGLevel):
         start_time = time.time()
         
         try:
-            # 多準則排序
-            multi_criteria_ranked = await self._multi_criteria_ranking(input_data)
-            
-            # 個人化排序
-            personalized_ranked = await self._personalization_ranking(multi_criteria_ranked)
+            # Cross-encoder 一次批次打分所有候選
+            reranked = await self._cross_encoder_ranking(input_data)
+            if reranked is None:
+                # 模型不可用或超過預算：維持第一階段排序，由信心值決定是否採用
+                reranked = sorted(input_data, key=lambda x: x.score, reverse=True)
+                confidence = await self._calculate_ranking_confidence(reranked)
+            else:
+                confidence = self._calculate_rerank_confidence(reranked)
             
             # 多樣性排序
-            diversity_ranked = await self._diversity_ranking(personalized_ranked)
+            diversity_ranked = await self._diversity_ranking(reranked)
             
             processing_time = time.time() - start_time
             
-            # 計算信心值
-            confidence = await self._calculate_ranking_confidence(diversity_ranked)
-            
-            logger.info(f"✅ {self.name}: 重新排序完成, 信心值 {confidence:.3f}")
+            logger.info(f"✅ {self.name}: 重新排序完成 ({processing_time * 1000:.0f}ms), 信心值 {confidence:.3f}")
             return diversity_ranked, confidence
             
         except Exception as e:
             logger.error(f"❌ {self.name}: 重新排序失敗 - {e}")
             return input_data, 0.0
     
-    async def _multi_criteria_ranking(self, results: List[SearchResult]) -> List[SearchResult]:
-        """多準則排序"""
-        # 模擬多準則排序
-        for result in results:
-            # 調整分數基於多個準則
-            relevance_score = result.score * 0.4
-            freshness_score = 0.8 * 0.2  # 假設新鮮度為0.8
-            authority_score = 0.7 * 0.2  # 假設權威性為0.7
-            diversity_score = 0.6 * 0.1  # 假設多樣性為0.6
-            novelty_score = 0.9 * 0.1    # 假設新穎性為0.9
-            
-            result.score = relevance_score + freshness_score + authority_score + diversity_score + novelty_score
-        
-        # 重新排序
-        results.sort(key=lambda x: x.score, reverse=True)
-        return results
-    
-    async def _personalization_ranking(self, results: List[SearchResult]) -> List[SearchResult]:
-        """個人化排序"""
-        # 模擬個人化排序（基於用戶偏好）
-        user_preferences = {
-            'technology': 1.2,
-            'business': 1.1,
-            'entertainment': 0.9
-        }
-        
-        for result in results:
-            # 根據內容調整分數
-            if '科技' in result.content:
-                result.score *= user_preferences.get('technology', 1.0)
-            elif '商業' in result.content:
-                result.score *= user_preferences.get('business', 1.0)
+    async def _cross_encoder_ranking(self, results: List[SearchResult]) -> Optional[List[SearchResult]]:
+        """以 cross-encoder 分數重新排序，無法打分時回傳 None"""
+        if self.reranker is None or not results:
+            return None
+        
+        ranked = await self.reranker.rerank(
+            get_current_query(), results,
+            text_of=lambda r: r.content,
+            id_of=lambda r: r.document_id,
+            top_n=0,
+            budget_ms=self.budget_ms
+        )
+        if not ranked or ranked[0][1] is None:
+            return None
         
-        results.sort(key=lambda x: x.score, reverse=True)
-        return results
+        # 超過 max_candidates 未打分的候選（分數為 None）維持原順序接在已打分的候選之後
+        return [
+            replace(result, score=score, metadata={**result.metadata, 'retrieval_score': result.score,
+                                                   'rerank_score': score})
+            if score is not None else result
+            for result, score in ranked
+        ]
     
     async def _diversity_ranking(self, results: List[SearchResult]) -> List[SearchResult]:
         """多樣性排序"""
@@ -464,7 +671,7 @@ class Level4Reranking(RAGLevel):
                 diverse_results.append(result)
                 seen_topics.add(topic)
         
-        return diverse_results[:5]  # 返回前5個多樣化結果
+        return diverse_results[:self.top_k]  # 返回前 top_k 個多樣化結果
     
     def _extract_topic(self, content: str) -> str:
         """提取主題"""
@@ -476,11 +683,26 @@ class Level4Reranking(RAGLevel):
     
     async def _calculate_ranking_confidence(self, results: List[SearchResult]) -> float:
         """計算排序信心值"""
-        if not results:
+        return self._score_confidence([r.score for r in results])
+    
+    def _calculate_rerank_confidence(self, results: List[SearchResult]) -> float:
+        """
+        以保留的前 top_k 筆 cross-encoder 分數計算信心值
+        
+        分數超出 [0, 1]（模型輸出未經 sigmoid 的 logit）時先以 sigmoid 轉換。
+        """
+        scores = [r.metadata['rerank_score'] for r in results[:self.top_k] if 'rerank_score' in r.metadata]
+        if any(score < 0.0 or score > 1.0 for score in scores):
+            scores = [0.5 * (1.0 + math.tanh(score / 2.0)) for score in scores]
+        return self._score_confidence(scores)
+    
+    @staticmethod
+    def _score_confidence(scores: List[float]) -> float:
+        """依分數高低與分布計算信心值"""
+        if not scores:
             return 0.0
         
         # 基於排序一致性和分數分布計算信心值
-        scores = [r.score for r in results]
         avg_score = sum(scores) / len(scores)
         score_variance = sum((s - avg_score) ** 2 for s in scores) / len(scores)
         
@@ -491,6 +713,14 @@ class Level4Reranking(RAGLevel):
 class Level5ContextCompression(RAGLevel):
     """第五層：上下文壓縮過濾"""
     
+    def __init__(self, config: Dict[str, Any]):
+        super().__init__(config)
+        self.packer = ContextPacker(
+            max_tokens=config.get('max_context_tokens', config.get('max_context_length', 2048)),
+            chunk_duplicate_threshold=config.get('near_duplicate_threshold', 0.85),
+            sentence_duplicate_threshold=config.get('sentence_duplicate_threshold', 0.8)
+        )
+    
     async def process(self, input_data: List[SearchResult]) -> Tuple[List[SearchResult], float]:
         """執行上下文壓縮過濾"""
         logger.info(f"🔍 {self.name}: 執行上下文壓縮過濾")
@@ -498,57 +728,85 @@ class Level5ContextCompression(RAGLevel):
         start_time = time.time()
         
         try:
-            compressed_results = []
-            
-            for result in input_data:
-                # 上下文壓縮
-                compressed_content = await self._compress_context(result.content)
-                
-                # 信息過濾
-                filtered_content = await self._filter_information(compressed_content)
-                
-                # 創建壓縮後的結果
-                compressed_result = SearchResult(
-                    document_id=result.document_id,
-                    content=filtered_content,
-                    score=result.score,
-                    source=result.source,
-                    metadata={
-                        **result.metadata,
-                        'compressed': True,
-                        'filtered': True,
-                        'compression_ratio': len(filtered_content) / len(result.content)
-                    }
-                )
-                
-                compressed_results.append(compressed_result)
+            # 各結果的清理互不相依，並行處理
+            cleaned_results = list(await asyncio.gather(
+                *(self._compress_result(result) for result in input_data)
+            ))
             
+            # 在 token 預算內打包：同集重複片段與重複句子只保留一份，依查詢相關度取句
+            compressed_results, stats = self._pack_results(input_data, cleaned_results)
+            tokens_before = sum(self.packer.token_counter.count_batch([r.content for r in input_data]))
             processing_time = time.time() - start_time
+            record_request_stat('context_packing', {
+                'prompt_tokens_before': tokens_before,
+                'prompt_tokens_after': stats.tokens_after,
+                'processing_time': processing_time,
+                **asdict(stats)
+            })
             
             # 計算信心值
             confidence = await self._calculate_compression_confidence(compressed_results)
             
-            logger.info(f"✅ {self.name}: 壓縮了 {len(compressed_results)} 個結果, 信心值 {confidence:.3f}")
+            logger.info(f"✅ {self.name}: 壓縮了 {len(compressed_results)} 個結果 ({processing_time * 1000:.0f}ms), "
+                        f"token {tokens_before} → {stats.tokens_after}, 信心值 {confidence:.3f}")
             return compressed_results, confidence
             
         except Exception as e:
             logger.error(f"❌ {self.name}: 壓縮失敗 - {e}")
             return input_data, 0.0
     
+    def _pack_results(self, original: List[SearchResult],
+                      cleaned: List[SearchResult]) -> Tuple[List[SearchResult], PackingStats]:
+        """將清理後的結果打包進 token 預算，回傳打包後的結果與統計"""
+        chunks = [
+            ContextChunk(chunk_id=str(index), content=result.content, score=result.score,
+                         group=episode_key(result.metadata))
+            for index, result in enumerate(cleaned)
+        ]
+        packed, stats = self.packer.pack(get_current_query(), chunks)
+        
+        packed_results = []
+        for chunk in packed:
+            index = int(chunk.chunk_id)
+            result = cleaned[index]
+            packed_results.append(SearchResult(
+                document_id=result.document_id,
+                content=chunk.content,
+                score=result.score,
+                source=result.source,
+                metadata={
+                    **result.metadata,
+                    'compressed': True,
+                    'compression_ratio': len(chunk.content) / max(len(original[index].content), 1)
+                }
+            ))
+        return packed_results, stats
+    
+    async def _compress_result(self, result: SearchResult) -> SearchResult:
+        """清理單一結果"""
+        # 上下文壓縮
+        compressed_content = await self._compress_context(result.content)
+        
+        # 信息過濾
+        filtered_content = await self._filter_information(compressed_content)
+        
+        return SearchResult(
+            document_id=result.document_id,
+            content=filtered_content,
+            score=result.score,
+            source=result.source,
+            metadata={**result.metadata, 'filtered': True}
+        )
+    
     async def _compress_context(self, content: str) -> str:
-        """上下文壓縮"""
-        # 模擬上下文壓縮（提取關鍵信息）
+        """上下文壓縮（長度由 token 預算控制，這裡只移除冗餘標記）"""
         import re
         
         # 移除冗餘信息
         compressed = re.sub(r'\[.*?\]', '', content)  # 移除方括號內容
-        compressed = re.sub(r'\s+', ' ', compressed)  # 合併多個空格
-        
-        # 限制長度
-        if len(compressed) > 200:
-            compressed = compressed[:200] + "..."
+        compressed = re.sub(r'[ \t]+', ' ', compressed)  # 合併多個空格，保留換行作為句界
         
-        return compressed
+        return compressed.strip()
     
     async def _filter_information(self, content: str) -> str:
         """信息過濾"""
@@ -568,30 +826,9 @@ class Level5ContextCompression(RAGLevel):
         if not results:
             return 0.0
         
-        # 基於壓縮比例和信息保留度計算信心值
-        total_compression_ratio = 0.0
-        compressed_count = 0
-        
-        for result in results:
-            if result.metadata.get('compressed', False):
-                compression_ratio = result.metadata.get('compression_ratio', 1.0)
-                total_compression_ratio += compression_ratio
-                compressed_count += 1
-        
-        if compressed_count == 0:
-            return 0.0
-        
-        avg_compression_ratio = total_compression_ratio / compressed_count
-        
-        # 理想的壓縮比例在 0.3-0.7 之間
-        if 0.3 <= avg_compression_ratio <= 0.7:
-            confidence = 0.9
-        elif avg_compression_ratio < 0.3:
-            confidence = avg_compression_ratio / 0.3 * 0.9
-        else:
-            confidence = (1.0 - avg_compression_ratio) / 0.3 * 0.9
-        
-        return min(confidence, 1.0)
+        # 打包結果保證在 token 預算內；保留的結果越多、內容越完整，信心值越高
+        kept_ratio = sum(min(r.metadata.get('compression_ratio', 1.0), 1.0) for r in results) / len(results)
+        return min(0.85 + 0.1 * kept_ratio, 1.0)
 
 class Level6HybridRAG(RAGLevel):
     """第六層：混合式RAG"""
@@ -657,14 +894,14 @@ class Level6HybridRAG(RAGLevel):
         start_time = time.time()
         
         try:
-            # 多模型生成
-            multi_model_response = await self._multi_model_generation(input_data)
-            
-            # 自適應生成
-            adaptive_response = await self._adaptive_generation(multi_model_response, input_data)
+            # 生成與 ML Pipeline 推薦互不相依，並行執行
+            adaptive_response, recommendation_text = await asyncio.gather(
+                self._generate(input_data),
+                run_within_deadline(self._fetch_ml_recommendations(input_data), "", "ML Pipeline 推薦")
+            )
             
             # 整合 ML Pipeline 推薦
-            enhanced_response = await self._integrate_ml_recommendations(adaptive_response, input_data)
+            enhanced_response = f"{adaptive_response}{recommendation_text}"
             
             # 質量控制
             quality_controlled_response = await self._quality_control(enhanced_response)
@@ -718,10 +955,18 @@ class Level6HybridRAG(RAGLevel):
         
         return adaptive_response
     
-    async def _integrate_ml_recommendations(self, base_response: str, results: List[SearchResult]) -> str:
-        """整合 ML Pipeline 推薦"""
+    async def _generate(self, results: List[SearchResult]) -> str:
+        """多模型生成後依檢索結果自適應調整"""
+        # 多模型生成
+        multi_model_response = await self._multi_model_generation(results)
+        
+        # 自適應生成
+        return await self._adaptive_generation(multi_model_response, results)
+    
+    async def _fetch_ml_recommendations(self, results: List[SearchResult]) -> str:
+        """取得 ML Pipeline 推薦文字，無推薦時回傳空字串"""
         if not self.ml_pipeline_service:
-            return base_response
+            return ""
         
         try:
             # 從檢索結果中提取相關信息
@@ -742,16 +987,15 @@ class Level6HybridRAG(RAGLevel):
                     category = rec.get('category', '未知類別')
                     recommendation_text += f"{i}. {title} ({category})\n"
                 
-                enhanced_response = f"{base_response}{recommendation_text}"
                 logger.info("ML Pipeline 推薦整合成功")
-                return enhanced_response
+                return recommendation_text
             else:
                 logger.info("ML Pipeline 未返回推薦結果")
-                return base_response
+                return ""
                 
         except Exception as e:
             logger.error(f"ML Pipeline 推薦整合失敗: {str(e)}")
-            return base_response
+            return ""
     
     def _extract_recommendation_context(self, results: List[SearchResult]) -> Dict[str, Any]:
         """從檢索結果中提取推薦上下文"""
@@ -790,6 +1034,16 @@ class Level6HybridRAG(RAGLevel):
         
         return quality_response
 
+# 層級執行順序與日誌標籤
+LEVEL_LABELS = [
+    ('level_1', '第一層'),
+    ('level_2', '第二層'),
+    ('level_3', '第三層'),
+    ('level_4', '第四層'),
+    ('level_5', '第五層'),
+    ('level_6', '第六層'),
+]
+
 class HierarchicalRAGPipeline:
     """層級化樹狀結構 RAG Pipeline"""
     
@@ -803,6 +1057,7 @@ class HierarchicalRAGPipeline:
         self.config = self._load_config(config_path)
         self.levels = self._initialize_levels()
         self.fallback_service = None  # AnythingLLM 備援服務
+        self.request_timeout = self.config.get('performance', {}).get('request_timeout', 30.0)
         
         logger.info("🌳 層級化樹狀結構 RAG Pipeline 初始化完成")
     
@@ -851,7 +1106,7 @@ class HierarchicalRAGPipeline:
         logger.info(f"✅ 初始化了 {len(levels)} 個層級")
         return levels
     
-    async def process_query(self, query: str, user_id: str = "default_user", session_id: Optional[str] = None, metadata: Optional[Dict[str, Any]] = None) -> RAGResponse:
+    async def process_query(self, query: str, user_id: str = "default_user", session_id: Optional[str] = None, metadata: Optional[Dict[str, Any]] = None, query_vector: Optional[List[float]] = None) -> RAGResponse:
         """
         處理查詢（層級化處理）
         
@@ -860,92 +1115,89 @@ class HierarchicalRAGPipeline:
             user_id: 用戶 ID
             session_id: 會話 ID
             metadata: 額外元數據
+            query_vector: 呼叫端已計算的查詢向量，密集檢索直接使用不再編碼
             
         Returns:
             RAGResponse: 最終回應
         """
         logger.info(f"🚀 開始層級化處理查詢: {query[:50]}...")
         
-        start_time = time.time()
+        # 整個請求共用一個截止時間，呼叫端可透過 metadata['latency_budget'] 指定（秒）
+        deadline = RequestDeadline(budget=float((metadata or {}).get('latency_budget', self.request_timeout)))
+        token = _current_deadline.set(deadline)
+        request_stats: Dict[str, Any] = {}
+        query_token = _current_query.set(query)
+        vector_token = _current_query_vector.set(query_vector)
+        stats_token = _current_request_stats.set(request_stats)
+        timings: List[LevelTiming] = []
         current_input = query
         level_used = "fallback"
         
         try:
-            # 第一層：查詢處理
-            level_1_result, confidence_1 = await self.levels['level_1'].process(current_input)
-            if confidence_1 >= self.levels['level_1'].confidence_threshold:
-                current_input = level_1_result
-                level_used = "level_1"
-                logger.info(f"✅ 第一層處理成功，信心值: {confidence_1:.3f}")
-            else:
-                logger.warning(f"⚠️ 第一層信心值不足 ({confidence_1:.3f})，嘗試第二層")
-            
-            # 第二層：混合搜尋
-            level_2_result, confidence_2 = await self.levels['level_2'].process(current_input)
-            if confidence_2 >= self.levels['level_2'].confidence_threshold:
-                current_input = level_2_result
-                level_used = "level_2"
-                logger.info(f"✅ 第二層處理成功，信心值: {confidence_2:.3f}")
-            else:
-                logger.warning(f"⚠️ 第二層信心值不足 ({confidence_2:.3f})，嘗試第三層")
-            
-            # 第三層：檢索增強
-            level_3_result, confidence_3 = await self.levels['level_3'].process(current_input)
-            if confidence_3 >= self.levels['level_3'].confidence_threshold:
-                current_input = level_3_result
-                level_used = "level_3"
-                logger.info(f"✅ 第三層處理成功，信心值: {confidence_3:.3f}")
-            else:
-                logger.warning(f"⚠️ 第三層信心值不足 ({confidence_3:.3f})，嘗試第四層")
-            
-            # 第四層：重新排序
-            level_4_result, confidence_4 = await self.levels['level_4'].process(current_input)
-            if confidence_4 >= self.levels['level_4'].confidence_threshold:
-                current_input = level_4_result
-                level_used = "level_4"
-                logger.info(f"✅ 第四層處理成功，信心值: {confidence_4:.3f}")
-            else:
-                logger.warning(f"⚠️ 第四層信心值不足 ({confidence_4:.3f})，嘗試第五層")
-            
-            # 第五層：上下文壓縮
-            level_5_result, confidence_5 = await self.levels['level_5'].process(current_input)
-            if confidence_5 >= self.levels['level_5'].confidence_threshold:
-                current_input = level_5_result
-                level_used = "level_5"
-                logger.info(f"✅ 第五層處理成功，信心值: {confidence_5:.3f}")
-            else:
-                logger.warning(f"⚠️ 第五層信心值不足 ({confidence_5:.3f})，嘗試第六層")
+            # 第一到五層：信心值足夠才採用本層輸出，否則沿用上一層
+            for level_key, label in LEVEL_LABELS[:-1]:
+                level = self.levels[level_key]
+                result, confidence, timing = await level.run(level_key, current_input, deadline)
+                timings.append(timing)
+                if timing.status == "ok":
+                    current_input = result
+                    level_used = level_key
+                    logger.info(f"✅ {label}處理成功，信心值: {confidence:.3f}")
+                else:
+                    logger.warning(f"⚠️ {label}未採用 ({timing.status}, 信心值 {confidence:.3f})，繼續下一層")
             
             # 第六層：混合式RAG
-            level_6_result, confidence_6 = await self.levels['level_6'].process(current_input)
-            if confidence_6 >= self.levels['level_6'].confidence_threshold:
-                level_used = "level_6"
-                logger.info(f"✅ 第六層處理成功，信心值: {confidence_6:.3f}")
+            level_key, label = LEVEL_LABELS[-1]
+            level_6_result, confidence_6, timing = await self.levels[level_key].run(level_key, current_input, deadline)
+            timings.append(timing)
+            if timing.status == "ok" and level_6_result is not None:
+                logger.info(f"✅ {label}處理成功，信心值: {confidence_6:.3f}")
                 
                 # 更新最終回應的層級信息
-                level_6_result.level_used = level_used
+                level_6_result.level_used = level_key
+                level_6_result.processing_time = deadline.elapsed()
+                level_6_result.metadata.update(self._timing_metadata(deadline, timings))
+                level_6_result.metadata.update(request_stats)
                 return level_6_result
             else:
-                logger.warning(f"⚠️ 第六層信心值不足 ({confidence_6:.3f})，使用備援服務")
+                logger.warning(f"⚠️ {label}未採用 ({timing.status}, 信心值 {confidence_6:.3f})，使用備援服務")
         
         except Exception as e:
             logger.error(f"❌ 層級化處理失敗: {e}")
+        finally:
+            _current_deadline.reset(token)
+            _current_query.reset(query_token)
+            _current_query_vector.reset(vector_token)
+            _current_request_stats.reset(stats_token)
         
         # 備援服務
         logger.info("🔄 使用備援服務 (AnythingLLM)")
         fallback_response = await self._fallback_service(query)
         
-        total_time = time.time() - start_time
-        
         return RAGResponse(
             content=fallback_response,
             confidence=0.8,  # 備援服務的預設信心值
             sources=[],
-            processing_time=total_time,
+            processing_time=deadline.elapsed(),
             level_used="fallback",
-            metadata={'fallback_used': True, 'error': 'All levels failed'}
+            metadata={
+                'fallback_used': True,
+                'error': 'All levels failed',
+                'last_successful_level': level_used,
+                **self._timing_metadata(deadline, timings),
+                **request_stats
+            }
         )
     
+    @staticmethod
+    def _timing_metadata(deadline: RequestDeadline, timings: List[LevelTiming]) -> Dict[str, Any]:
+        """各層級耗時與預算使用狀況"""
+        return {
+            'level_timings': [asdict(timing) for timing in timings],
+            'latency_budget': deadline.budget,
+            'deadline_exceeded': deadline.expired()
+        }
+    
     async def _fallback_service(self, query: str) -> str:
         """備援服務"""
         # 模擬 AnythingLLM 備援服務
@@ -975,6 +1227,8 @@ async def main():
         print(f"使用層級: {response.level_used}")
         print(f"處理時間: {response.processing_time:.3f}s")
         print(f"來源: {response.sources}")
+        for timing in response.metadata.get('level_timings', []):
+            print(f"  {timing['level']} {timing['name']}: {timing['status']} {timing['elapsed_ms']:.1f}ms")
 
 if __name__ == "__main__":
     asyncio.run(main()) 
\ No newline at end of file
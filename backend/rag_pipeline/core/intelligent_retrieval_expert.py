@@ -43,6 +43,16 @@ except ImportError as e:
 
 logger = logging.getLogger(__name__)
 
+try:
+    try:
+        from .cross_encoder_reranker import chunk_id_for, get_cross_encoder_reranker
+    except ImportError:
+        from core.cross_encoder_reranker import chunk_id_for, get_cross_encoder_reranker
+    RERANKER_AVAILABLE = True
+except ImportError as e:
+    logger.warning(f"Cross-encoder 重排序器不可用: {e}")
+    RERANKER_AVAILABLE = False
+
 
 @dataclass
 class RetrievalResult:
@@ -212,21 +222,26 @@ class Text2VecModel:
     def __init__(self):
         """初始化文本向量化模型"""
         self.config = get_config()
-        self.model = None
+        self.encoder = None
         self._load_model()
+    
+    @property
+    def model(self):
+        """共用模型實例，每次存取都向共用編碼器取得（載入失敗時於退避時間過後重試）"""
+        return self.encoder.model if self.encoder is not None else None
         
     def _load_model(self):
-        """載入模型"""
+        """載入模型（權重由共用註冊表載入，同一程序只載入一次）"""
         try:
-            from sentence_transformers import SentenceTransformer
+            from utils.embedding_registry import get_shared_encoder
             
             model_name = self.config.models.text2vec_path
-            self.model = SentenceTransformer(model_name)
-            logger.info(f"文本向量化模型載入成功: {model_name}")
+            self.encoder = get_shared_encoder(model_name)
+            if self.model is not None:
+                logger.info(f"文本向量化模型載入成功: {model_name}")
             
         except Exception as e:
             logger.error(f"文本向量化模型載入失敗: {e}")
-            self.model = None
     
     async def encode(self, text: str) -> Optional[List[float]]:
         """
@@ -243,7 +258,7 @@ class Text2VecModel:
                 logger.warning("文本向量化模型未載入")
                 return None
             
-            embedding = self.model.encode(text, normalize_embeddings=True)
+            embedding = await self.encoder.get_batcher(normalize_embeddings=True).aencode(text)
             return embedding.tolist()
             
         except Exception as e:
@@ -252,33 +267,31 @@ class Text2VecModel:
 
 
 class MilvusDB:
-    """Milvus 資料庫連接"""
+    """Milvus 資料庫連接（經由共用 Milvus 客戶端管理器）"""
+    
+    OUTPUT_FIELDS = ["chunk_id", "chunk_text", "tags", "podcast_name", "episode_title", "category"]
     
     def __init__(self):
         """初始化 Milvus 連接"""
         self.config = get_config()
+        self.collection_name = self.config.database.milvus_collection
+        self.manager = None
         self.collection = None
         self._connect()
         
     def _connect(self):
-        """連接到 Milvus"""
+        """連接到 Milvus（連線與集合載入由管理器共用）"""
         try:
-            from pymilvus import connections, Collection, utility
+            from utils.milvus_client_manager import get_milvus_manager
             
-            # 連接到 Milvus
-            connections.connect(
-                alias="default",
+            self.manager = get_milvus_manager()
+            self.collection = self.manager.get_collection(
+                self.collection_name,
                 host=self.config.database.milvus_host,
                 port=self.config.database.milvus_port
             )
-            
-            # 檢查集合是否存在
-            collection_name = self.config.database.milvus_collection
-            if utility.has_collection(collection_name):
-                self.collection = Collection(collection_name)
-                logger.info(f"Milvus 集合 '{collection_name}' 連接成功")
-            else:
-                logger.warning(f"Milvus 集合 '{collection_name}' 不存在")
+            if self.collection is not None:
+                logger.info(f"Milvus 集合 '{self.collection_name}' 連接成功")
                 
         except ImportError:
             logger.warning("pymilvus 未安裝")
@@ -301,21 +314,16 @@ class MilvusDB:
                 logger.warning("Milvus 集合未初始化")
                 return []
             
-            # 載入集合
-            self.collection.load()
-            
-            # 執行搜尋
-            search_params = {
-                "metric_type": "COSINE",
-                "params": {"nprobe": 10}
-            }
-            
-            results = self.collection.search(
-                data=[embedding],
+            # 集合已由管理器保持載入，搜尋於有界執行緒池中執行
+            results = await self.manager.asearch(
+                self.collection_name,
+                [embedding],
                 anns_field="embedding",
-                param=search_params,
+                param={"metric_type": "COSINE", "params": {"nprobe": 10}},
                 limit=top_k,
-                output_fields=["chunk_id", "chunk_text", "tags", "podcast_name", "episode_title", "category"]
+                output_fields=self.OUTPUT_FIELDS,
+                host=self.config.database.milvus_host,
+                port=self.config.database.milvus_port
             )
             
             # 格式化結果
@@ -447,8 +455,8 @@ class TagMatcher:
                 content_tags = result.get("tags", [])
                 tag_score = self.match_tags(query_keywords, content_tags)
                 
-                # 獲取語意相似度
-                semantic_score = result.get("similarity_score", 0.0)
+                # 獲取語意相似度（有 cross-encoder 分數時優先使用）
+                semantic_score = result.get("rerank_score", result.get("similarity_score", 0.0))
                 
                 # 計算混合分數
                 hybrid_score = (semantic_score * semantic_score_weight + 
@@ -498,12 +506,15 @@ class IntelligentRetrievalExpert:
         
         logger.info("智能檢索專家初始化完成")
     
-    async def process_query(self, query: str) -> IntelligentRetrievalResponse:
+    async def process_query(self, query: str,
+                            query_vector: Optional[List[float]] = None) -> IntelligentRetrievalResponse:
         """
         處理查詢 - 按照配置的五步驟流程
         
         Args:
             query: 用戶查詢
+            query_vector: 呼叫端以原始查詢計算的向量；改寫後的查詢與原始查詢相同時直接用於 Milvus 檢索，
+                否則仍編碼改寫後的查詢
             
         Returns:
             檢索結果
@@ -522,7 +533,10 @@ class IntelligentRetrievalExpert:
             
             # 步驟三：text2vec_model 向量化查詢，milvus_db 檢索 top-k=8
             logger.info("步驟三：向量搜尋")
-            query_embedding = await self.text2vec_model.encode(rewritten_query)
+            if query_vector is not None and rewritten_query == query:
+                query_embedding = list(query_vector)
+            else:
+                query_embedding = await self.text2vec_model.encode(rewritten_query)
             if not query_embedding:
                 return IntelligentRetrievalResponse(
                     query=query,
@@ -535,6 +549,18 @@ class IntelligentRetrievalExpert:
             
             search_results = await self.milvus_db.search(query_embedding, top_k=8)
             
+            # cross-encoder 一次批次打分，作為重排的語意分數
+            if RERANKER_AVAILABLE and search_results:
+                scores = await get_cross_encoder_reranker().ascore(
+                    rewritten_query,
+                    [(chunk_id_for(r.get("content") or "", r.get("chunk_id")), r.get("content") or "")
+                     for r in search_results]
+                )
+                search_results = [
+                    {**r, "rerank_score": score} if score is not None else r
+                    for r, score in zip(search_results, scores)
+                ]
+            
             # 步驟四：tag_matcher 依標籤重疊度＋相似度重排，取前 3 條
             logger.info("步驟四：標籤匹配與重排序")
             reranked_results = self.tag_matcher.rerank_results(
@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+"""
+Podwise RAG Pipeline - LLM 結果快取
+
+跨請求快取相同提示詞的 LLM 完成結果，避免查詢改寫、分類等重複提示詞反覆生成：
+- 以模型、提示詞與取樣參數的雜湊為鍵值
+- 記憶體 LRU，TTL 與容量上限；可選擇將淘汰的項目寫入磁碟（SQLite），
+  淘汰項目累積成批後在鎖外以單一交易寫入
+- 單一飛行：並行中的相同呼叫共用同一次後端呼叫
+- 非確定性呼叫（temperature > 0）預設排除，不快取也不合併；需明確設定才快取
+- 失敗或驗證未通過的結果不快取
+
+與 request_memo 的差異：request_memo 只在單一請求內去重，此快取跨請求共用。
+共用結果會被多個呼叫端讀取，呼叫端不應修改回傳的物件。
+
+作者: Podwise Team
+版本: 1.0.0
+"""
+
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = float(os.getenv("LLM_CACHE_TTL", "3600"))
+DEFAULT_MAX_SIZE = int(os.getenv("LLM_CACHE_MAX_SIZE", "2048"))
+DEFAULT_DISK_PATH = os.getenv("LLM_CACHE_DISK_PATH", "")
+DEFAULT_DISK_MAX_SIZE = int(os.getenv("LLM_CACHE_DISK_MAX_SIZE", "50000"))
+DEFAULT_SPILL_BATCH = int(os.getenv("LLM_CACHE_SPILL_BATCH", "64"))
+CACHE_NONDETERMINISTIC = os.getenv("LLM_CACHE_NONDETERMINISTIC", "false").lower() in ("1", "true", "yes")
+
+
+def make_cache_key(model: str, prompt: str, params: Optional[Dict[str, Any]] = None) -> str:
+    """
+    以模型、提示詞與取樣參數產生快取鍵值
+
+    Args:
+        model: 模型識別（模型名稱或端點）
+        prompt: 提示詞
+        params: 影響輸出的參數（temperature、top_p、max_tokens、stop 等）
+    """
+    payload = json.dumps([model, prompt, params or {}], ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def is_deterministic(params: Optional[Dict[str, Any]]) -> bool:
+    """temperature 為 0（或未指定）的呼叫視為確定性呼叫"""
+    temperature = (params or {}).get("temperature")
+    return temperature is None or float(temperature) <= 0.0
+
+
+class _DiskStore:
+    """淘汰項目的磁碟存放區（SQLite）"""
+
+    def __init__(self, path: str, max_size: int):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.max_size = max(1, max_size)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, value TEXT, created_at REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_created ON llm_cache (created_at)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        row = self._conn.execute("SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def put_many(self, items: List[Tuple[str, Any, float]], expire_before: float) -> None:
+        """以單一交易寫入多個項目，並刪除過期與超出容量的項目"""
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO llm_cache (key, value, created_at) VALUES (?, ?, ?)",
+            [(key, json.dumps(value, ensure_ascii=False), created_at) for key, value, created_at in items]
+        )
+        self._conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (expire_before,))
+        # 超出容量時刪除最舊的項目
+        self._conn.execute(
+            "DELETE FROM llm_cache WHERE key IN ("
+            "SELECT key FROM llm_cache ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_size,)
+        )
+        self._conn.commit()
+
+    def clear(self) -> None:
+        self._conn.execute("DELETE FROM llm_cache")
+        self._conn.commit()
+
+    def count(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+
+class LLMResultCache:
+    """LLM 結果快取"""
+
+    def __init__(self,
+                 ttl_seconds: float = DEFAULT_TTL,
+                 max_size: int = DEFAULT_MAX_SIZE,
+                 disk_path: Optional[str] = DEFAULT_DISK_PATH,
+                 disk_max_size: int = DEFAULT_DISK_MAX_SIZE,
+                 spill_batch: int = DEFAULT_SPILL_BATCH,
+                 cache_nondeterministic: bool = CACHE_NONDETERMINISTIC):
+        """
+        初始化 LLM 結果快取
+
+        Args:
+            ttl_seconds: 項目存活時間（秒）
+            max_size: 記憶體中最大項目數
+            disk_path: 磁碟存放區的 SQLite 檔案路徑，空值表示不寫入磁碟
+            disk_max_size: 磁碟存放區最大項目數
+            spill_batch: 淘汰項目累積多少筆後寫入磁碟
+            cache_nondeterministic: 是否快取 temperature > 0 的呼叫
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max(1, max_size)
+        self.spill_batch = max(1, spill_batch)
+        self.cache_nondeterministic = cache_nondeterministic
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        # 已淘汰、尚未寫入磁碟的項目；查詢時仍可命中
+        self._spill: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        self._spill_scheduled = False
+        self._clear_generation = 0
+        self._disk_lock = threading.Lock()
+
+        self._disk: Optional[_DiskStore] = None
+        if disk_path:
+            try:
+                self._disk = _DiskStore(disk_path, disk_max_size)
+            except Exception as e:
+                logger.warning(f"LLM 快取磁碟存放區開啟失敗，只使用記憶體: {e}")
+
+        self._hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+        self._coalesced = 0
+        self._bypassed = 0
+        self._rejected = 0
+        self._evictions = 0
+        self._expirations = 0
+
+    def _expired(self, created_at: float) -> bool:
+        return time.time() - created_at > self.ttl_seconds
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """
+        查詢快取
+
+        Returns:
+            Tuple[bool, Any]: (是否命中, 快取值)
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, created_at = entry
+                if not self._expired(created_at):
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return True, value
+                del self._entries[key]
+                self._expirations += 1
+
+            # 已淘汰但尚未寫入磁碟的項目
+            stored = self._spill.pop(key, None)
+            if stored is None and self._disk is None:
+                self._misses += 1
+                return False, None
+
+        from_disk = stored is None
+        if from_disk:
+            try:
+                with self._disk_lock:
+                    stored = self._disk.get(key)
+            except Exception as e:
+                logger.warning(f"讀取 LLM 快取磁碟存放區失敗: {e}")
+
+        with self._lock:
+            if stored is None or self._expired(stored[1]):
+                if stored is not None:
+                    self._expirations += 1
+                self._misses += 1
+                return False, None
+            # 讀回記憶體，磁碟上的副本在再次淘汰時覆寫
+            value, created_at = stored
+            self._store(key, value, created_at)
+            if from_disk:
+                self._disk_hits += 1
+            else:
+                self._hits += 1
+        self._schedule_spill()
+        return True, value
+
+    def put(self, key: str, value: Any) -> None:
+        """寫入快取"""
+        with self._lock:
+            self._store(key, value, time.time())
+        self._schedule_spill()
+
+    def _store(self, key: str, value: Any, created_at: float) -> None:
+        """寫入記憶體，超出容量的最舊項目移入待寫入磁碟的佇列（需持有鎖）"""
+        self._entries[key] = (value, created_at)
+        self._entries.move_to_end(key)
+        self._spill.pop(key, None)
+        while len(self._entries) > self.max_size:
+            old_key, old_entry = self._entries.popitem(last=False)
+            self._evictions += 1
+            if self._disk is not None and not self._expired(old_entry[1]):
+                self._spill[old_key] = old_entry
+
+    def _schedule_spill(self) -> None:
+        """淘汰項目累積滿一批時寫入磁碟；在事件迴圈中改由執行緒池寫入，不阻塞請求"""
+        with self._lock:
+            if self._spill_scheduled or len(self._spill) < self.spill_batch:
+                return
+            self._spill_scheduled = True
+        try:
+            asyncio.get_running_loop().run_in_executor(None, self.flush)
+        except RuntimeError:
+            self.flush()
+
+    def flush(self) -> int:
+        """
+        將待寫入的淘汰項目以單一交易寫入磁碟
+
+        Returns:
+            int: 寫入的項目數
+        """
+        with self._lock:
+            pending = list(self._spill.items())
+            generation = self._clear_generation
+            self._spill_scheduled = False
+        if not pending or self._disk is None:
+            return 0
+
+        written = 0
+        try:
+            with self._disk_lock:
+                # 快照後已清空快取則不寫入
+                if generation == self._clear_generation:
+                    self._disk.put_many([(key, value, created_at) for key, (value, created_at) in pending],
+                                        time.time() - self.ttl_seconds)
+                    written = len(pending)
+        except Exception as e:
+            logger.warning(f"寫入 LLM 快取磁碟存放區失敗，捨棄 {len(pending)} 筆: {e}")
+        with self._lock:
+            # 寫入期間被讀回記憶體或再次淘汰的項目不受影響
+            for key, entry in pending:
+                if self._spill.get(key) is entry:
+                    del self._spill[key]
+        return written
+
+    async def get_or_compute(self,
+                             key: str,
+                             factory: Callable[[], Awaitable[Any]],
+                             params: Optional[Dict[str, Any]] = None,
+                             validate: Optional[Callable[[Any], bool]] = None) -> Any:
+        """
+        取得快取結果，未命中時呼叫 factory；並行中的相同鍵值共用同一次呼叫
+
+        Args:
+            key: 快取鍵值（見 make_cache_key）
+            factory: 回傳 awaitable 的無參數函數
+            params: 取樣參數，用於判斷是否為非確定性呼叫
+            validate: 結果驗證函數，回傳 False 的結果不快取（例如錯誤訊息）
+
+        Returns:
+            Any: 呼叫結果
+        """
+        if not self.cache_nondeterministic and not is_deterministic(params):
+            self._bypassed += 1
+            return await factory()
+
+        future = self._in_flight.get(key)
+        if future is not None and future.get_loop() is asyncio.get_running_loop():
+            self._coalesced += 1
+        else:
+            hit, value = self.get(key)
+            if hit:
+                return value
+            future = asyncio.ensure_future(self._compute(key, factory, validate))
+            self._in_flight[key] = future
+            future.add_done_callback(lambda done: self._finish(key, done))
+
+        # shield：單一呼叫者被取消時不影響其他共用此結果的呼叫者
+        return await asyncio.shield(future)
+
+    async def _compute(self, key: str, factory: Callable[[], Awaitable[Any]],
+                       validate: Optional[Callable[[Any], bool]]) -> Any:
+        value = await factory()
+        if value is None or (validate is not None and not validate(value)):
+            self._rejected += 1
+        else:
+            self.put(key, value)
+        return value
+
+    def _finish(self, key: str, future: asyncio.Future) -> None:
+        if self._in_flight.get(key) is future:
+            del self._in_flight[key]
+
+    def clear(self) -> None:
+        """清空快取（含磁碟存放區）"""
+        with self._lock:
+            self._entries.clear()
+            self._spill.clear()
+            self._clear_generation += 1
+            if self._disk is not None:
+                with self._disk_lock:
+                    self._disk.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """獲取快取統計"""
+        with self._lock:
+            lookups = self._hits + self._disk_hits + self._misses
+            with self._disk_lock:
+                disk_entries = self._disk.count() if self._disk is not None else 0
+            return {
+                "entries": len(self._entries),
+                "disk_entries": disk_entries,
+                "pending_spill": len(self._spill),
+                "in_flight": len(self._in_flight),
+                "hits": self._hits,
+                "disk_hits": self._disk_hits,
+                "misses": self._misses,
+                "coalesced": self._coalesced,
+                "bypassed": self._bypassed,
+                "rejected": self._rejected,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "hit_rate": (self._hits + self._disk_hits) / lookups if lookups else 0.0,
+                "cache_nondeterministic": self.cache_nondeterministic
+            }
+
+
+_cache: Optional[LLMResultCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_result_cache() -> LLMResultCache:
+    """獲取共用 LLM 結果快取（單例）"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = LLMResultCache()
+    return _cache
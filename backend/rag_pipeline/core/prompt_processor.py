@@ -60,6 +60,9 @@ except ImportError as e:
             raise
 # Langfuse 整合已移除，使用 Langfuse Cloud 服務
 
+from core.request_memo import memoized
+from core.llm_result_cache import get_llm_result_cache, make_cache_key
+
 logger = logging.getLogger(__name__)
 
 
@@ -344,6 +347,40 @@ class PromptProcessor:
         Returns:
             str: LLM 回應
         """
+        # 鍵值包含模型與取樣參數：同一提示詞以不同 temperature / max_tokens 呼叫時結果不同。
+        # 同一請求內相同的呼叫只執行一次（trace_id 不影響結果，不納入鍵值），跨請求則由 LLM 結果快取共用
+        params = self._llm_params(task_type)
+        return await memoized(
+            ("llm", task_type, prompt, tuple(sorted(params.items()))),
+            lambda: get_llm_result_cache().get_or_compute(
+                make_cache_key(f"prompt_processor:{task_type}", prompt, params),
+                lambda: self._invoke_llm(prompt, task_type, trace_id),
+                params=params,
+                validate=self._is_valid_llm_result
+            )
+        )
+    
+    def _llm_params(self, task_type: str) -> Dict[str, Any]:
+        """任務使用的模型與取樣參數（商業、教育專家各自設定，其餘使用領導者設定）"""
+        crewai = self.config.crewai
+        if task_type == "business_expert":
+            model, temperature, max_tokens = (crewai.business_expert_model, crewai.business_expert_temperature,
+                                              crewai.business_expert_max_tokens)
+        elif task_type == "education_expert":
+            model, temperature, max_tokens = (crewai.education_expert_model, crewai.education_expert_temperature,
+                                              crewai.education_expert_max_tokens)
+        else:
+            model, temperature, max_tokens = crewai.leader_model, crewai.leader_temperature, crewai.leader_max_tokens
+        return {"model": model, "temperature": temperature, "max_tokens": max_tokens}
+    
+    @staticmethod
+    def _is_valid_llm_result(result: Any) -> bool:
+        """空白回應或錯誤訊息不快取"""
+        return isinstance(result, str) and bool(result.strip()) and not result.startswith("錯誤")
+    
+    async def _invoke_llm(self, prompt: str, task_type: str,
+                          trace_id: Optional[str] = None) -> str:
+        """實際調用 LLM"""
         # 這裡需要實際的 LLM 調用邏輯
         # 暫時返回模擬結果
         
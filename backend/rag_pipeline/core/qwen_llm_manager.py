@@ -5,18 +5,26 @@ Qwen3:8b LLM 管理器
 
 import os
 import json
+import time
+import asyncio
 import logging
-from typing import Dict, Any, Optional, List, Union
+from typing import Dict, Any, Optional, List, Union, AsyncIterator
+from collections import deque
 from dataclasses import dataclass
 from datetime import datetime
 
-import requests
 from langchain.llms.base import LLM
 from langchain.callbacks.manager import CallbackManagerForLLMRun
-from langchain.schema import BaseMessage, HumanMessage, AIMessage
-from langchain_openai import ChatOpenAI
+from langchain.schema import BaseMessage, AIMessage
 from pydantic import BaseModel, Field
 
+from utils.llm_http_client import get_llm_http_client
+
+try:
+    from .llm_result_cache import get_llm_result_cache, make_cache_key
+except ImportError:
+    from core.llm_result_cache import get_llm_result_cache, make_cache_key
+
 try:
     from config.integrated_config import get_config
 except ImportError:
@@ -38,6 +46,18 @@ except ImportError:
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 路由與斷路器設定
+ROUTING_WINDOW = int(os.getenv("LLM_ROUTING_WINDOW", "100"))
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("LLM_CIRCUIT_FAILURE_THRESHOLD", "3"))
+CIRCUIT_ERROR_RATE = float(os.getenv("LLM_CIRCUIT_ERROR_RATE", "0.5"))
+CIRCUIT_MIN_SAMPLES = int(os.getenv("LLM_CIRCUIT_MIN_SAMPLES", "10"))
+CIRCUIT_COOLDOWN = float(os.getenv("LLM_CIRCUIT_COOLDOWN", "30"))
+TIMEOUT_P95_FACTOR = float(os.getenv("LLM_TIMEOUT_P95_FACTOR", "3"))
+MIN_TIMEOUT = float(os.getenv("LLM_MIN_TIMEOUT", "5"))
+MAX_TIMEOUT = float(os.getenv("LLM_MAX_TIMEOUT", "120"))
+DEFAULT_EXPECTED_LATENCY = 2.0  # 尚無延遲樣本時的預估延遲（秒）
+PRIORITY_WEIGHT = 0.1  # 每降一個優先級，路由分數增加的比例
+
 
 @dataclass
 class Qwen3ModelConfig:
@@ -52,6 +72,7 @@ class Qwen3ModelConfig:
     presence_penalty: float = 0.0
     stop_sequences: Optional[List[str]] = None
     system_prompt: str = "你是一個專業的 AI 助手，能夠提供準確、有用的回答。"
+    max_concurrency: Optional[int] = None  # 同時執行的請求數上限，None 使用 LLM_MODEL_CONCURRENCY
     
     def __post_init__(self):
         if self.stop_sequences is None:
@@ -59,109 +80,128 @@ class Qwen3ModelConfig:
 
 
 class Qwen3LLM:
-    """Qwen3 LLM 實作"""
+    """Qwen3 LLM 實作（經由共用的非同步連線池呼叫）"""
     
     def __init__(self, model_config: Qwen3ModelConfig, config: Optional[Dict[str, Any]] = None):
         self.model_config = model_config
         self.config = config or {}
+        self.client = get_llm_http_client()
+        if model_config.max_concurrency:
+            self.client.set_model_concurrency(model_config.model_type, model_config.max_concurrency)
     
     @property
     def _llm_type(self) -> str:
         return f"qwen3_{self.model_config.model_type}"
     
-    def _call(
+    @property
+    def _is_openai(self) -> bool:
+        return self.model_config.model_type.startswith("openai:")
+    
+    def _build_request(self, prompt: str, stop: Optional[List[str]], stream: bool, **kwargs: Any) -> Dict[str, Any]:
+        """組合 OpenAI 相容的 chat 請求內容"""
+        request_data = {
+            "model": self.model_config.name,
+            "messages": [
+                {"role": "system", "content": self.model_config.system_prompt},
+                {"role": "user", "content": prompt}
+            ],
+            "max_tokens": self.model_config.max_tokens,
+            "temperature": self.model_config.temperature,
+            "top_p": self.model_config.top_p,
+            "frequency_penalty": self.model_config.frequency_penalty,
+            "presence_penalty": self.model_config.presence_penalty,
+        }
+        
+        # 添加停止序列（OpenAI 不認得 Qwen 的特殊停止符號）
+        if stop:
+            request_data["stop"] = stop
+        elif self.model_config.stop_sequences and not self._is_openai:
+            request_data["stop"] = self.model_config.stop_sequences
+        
+        # 添加額外配置
+        request_data.update(self.config)
+        request_data.update(kwargs)
+        request_data["stream"] = stream
+        return request_data
+    
+    def _build_headers(self) -> Dict[str, str]:
+        """請求標頭，OpenAI 模型附帶 API Key"""
+        headers = {"Content-Type": "application/json"}
+        if self._is_openai:
+            config = get_config()
+            if not config.api.openai_api_key:
+                raise RuntimeError("OpenAI API Key 未配置")
+            headers["Authorization"] = f"Bearer {config.api.openai_api_key}"
+        return headers
+    
+    async def _call(
         self,
         prompt: str,
         stop: Optional[List[str]] = None,
         run_manager: Optional[CallbackManagerForLLMRun] = None,
+        timeout: float = MAX_TIMEOUT,
         **kwargs: Any,
     ) -> str:
-        """執行 LLM 呼叫"""
-        try:
-            # 檢查是否為 OpenAI 模型
-            if self.model_config.model_type.startswith("openai:"):
-                return self._call_openai(prompt, stop, **kwargs)
-            else:
-                return self._call_qwen3(prompt, stop, **kwargs)
-                
-        except Exception as e:
-            logger.error(f"LLM 呼叫異常: {str(e)}")
-            return f"錯誤: {str(e)}"
-    
-    def _call_openai(self, prompt: str, stop: Optional[List[str]] = None, **kwargs: Any) -> str:
-        """呼叫 OpenAI API"""
+        """執行 LLM 呼叫（timeout 為整體逾時秒數，不含排隊時間）"""
         try:
-            config = get_config()
-            if not config.api.openai_api_key:
-                return "錯誤: OpenAI API Key 未配置"
-            
-            # 創建 OpenAI 客戶端
-            openai_llm = ChatOpenAI(
-                model=self.model_config.name,
-                api_key=config.api.openai_api_key,
-                temperature=self.model_config.temperature,
-                max_tokens=self.model_config.max_tokens
+            result = await self.client.post_json(
+                self.model_config.endpoint,
+                self._build_request(prompt, stop, stream=False, **kwargs),
+                model=self.model_config.model_type,
+                headers=self._build_headers(),
+                timeout=timeout
             )
             
-            # 準備消息
-            messages = [
-                HumanMessage(content=f"{self.model_config.system_prompt}\n\n{prompt}")
-            ]
-            
-            # 發送請求
-            response = openai_llm.invoke(messages)
-            return str(response.content)
+            # OpenAI 相容格式（choices）與 Ollama /api/chat 格式（message）
+            if "choices" in result:
+                return (result.get("choices") or [{}])[0].get("message", {}).get("content", "")
+            return result.get("message", {}).get("content", "")
             
         except Exception as e:
-            logger.error(f"OpenAI API 呼叫異常: {str(e)}")
-            return f"錯誤: OpenAI API 呼叫失敗 - {str(e)}"
+            logger.error(f"{self.model_config.model_type} API 呼叫異常: {str(e)}")
+            return f"錯誤: {self.model_config.model_type} API 呼叫失敗 - {str(e)}"
     
-    def _call_qwen3(self, prompt: str, stop: Optional[List[str]] = None, **kwargs: Any) -> str:
-        """呼叫 Qwen3 API"""
+    async def _stream(self, prompt: str, stop: Optional[List[str]] = None,
+                      read_timeout: float = MAX_TIMEOUT, **kwargs: Any) -> AsyncIterator[str]:
+        """
+        串流執行 LLM 呼叫，逐段回傳生成文字
+        
+        同時支援 Ollama 的逐行 JSON（message.content）與 OpenAI 相容的 SSE（choices[0].delta.content）。
+        呼叫端提前結束（aclose）時關閉串流並歸還連線。
+        """
+        lines = self.client.stream_lines(
+            self.model_config.endpoint,
+            self._build_request(prompt, stop, stream=True, **kwargs),
+            model=self.model_config.model_type,
+            headers=self._build_headers(),
+            read_timeout=read_timeout
+        )
         try:
-            # 準備請求參數
-            request_data = {
-                "model": self.model_config.name,
-                "messages": [
-                    {"role": "system", "content": self.model_config.system_prompt},
-                    {"role": "user", "content": prompt}
-                ],
-                "max_tokens": self.model_config.max_tokens,
-                "temperature": self.model_config.temperature,
-                "top_p": self.model_config.top_p,
-                "frequency_penalty": self.model_config.frequency_penalty,
-                "presence_penalty": self.model_config.presence_penalty,
-                "stream": False
-            }
-            
-            # 添加停止序列
-            if stop:
-                request_data["stop"] = stop
-            elif self.model_config.stop_sequences:
-                request_data["stop"] = self.model_config.stop_sequences
-            
-            # 添加額外配置
-            request_data.update(self.config)
-            request_data.update(kwargs)
-            
-            # 發送請求
-            response = requests.post(
-                self.model_config.endpoint,
-                json=request_data,
-                headers={"Content-Type": "application/json"},
-                timeout=120
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                return result.get("choices", [{}])[0].get("message", {}).get("content", "")
-            else:
-                logger.error(f"Qwen3 API 錯誤: {response.status_code} - {response.text}")
-                return f"錯誤: API 呼叫失敗 (狀態碼: {response.status_code})"
+            async for line in lines:
+                if line.startswith("data:"):
+                    line = line[len("data:"):].strip()
+                if line == "[DONE]":
+                    break
                 
-        except Exception as e:
-            logger.error(f"Qwen3 API 呼叫異常: {str(e)}")
-            return f"錯誤: Qwen3 API 呼叫失敗 - {str(e)}"
+                try:
+                    chunk = json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning(f"略過無法解析的串流片段: {line[:100]}")
+                    continue
+                
+                if chunk.get("error"):
+                    raise RuntimeError(f"{self.model_config.model_type} 串流錯誤: {chunk['error']}")
+                
+                if "message" in chunk:
+                    content = chunk["message"].get("content", "")
+                else:
+                    content = (chunk.get("choices") or [{}])[0].get("delta", {}).get("content", "")
+                if content:
+                    yield content
+                if chunk.get("done"):
+                    break
+        finally:
+            await lines.aclose()
     
     @property
     def _identifying_params(self) -> Dict[str, Any]:
@@ -175,6 +215,126 @@ class Qwen3LLM:
         }
 
 
+class ModelCircuit:
+    """
+    單一模型的路由狀態與斷路器
+    
+    - 滾動視窗記錄延遲與成功/失敗，提供 p50/p95 與錯誤率
+    - 連續失敗達門檻或視窗錯誤率過高時斷路（open），冷卻後進入半開（half_open），
+      只放行少量探測請求；探測成功即恢復（closed），失敗則重新斷路
+    - 呼叫逾時依 p95 延遲動態調整，慢速端點在數倍 p95 內即判定失敗，不必等完整逾時
+    """
+    
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+    
+    def __init__(self, window: int = ROUTING_WINDOW):
+        self.latencies: deque = deque(maxlen=window)
+        self.outcomes: deque = deque(maxlen=window)
+        self.in_flight = 0
+        self.probes_in_flight = 0
+        self.consecutive_failures = 0
+        self.state = self.CLOSED
+        self.opened_at = 0.0
+        self.trips = 0
+    
+    def allow(self) -> bool:
+        """是否可以送出請求（open 冷卻結束後轉為 half_open）"""
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= CIRCUIT_COOLDOWN:
+            self.state = self.HALF_OPEN
+        if self.state == self.OPEN:
+            return False
+        if self.state == self.HALF_OPEN:
+            return self.probes_in_flight == 0
+        return True
+    
+    def start(self) -> bool:
+        """記錄請求開始，回傳是否為探測請求（斷路器非 closed 時送出的請求）"""
+        self.in_flight += 1
+        probe = self.state != self.CLOSED
+        if probe:
+            self.probes_in_flight += 1
+        return probe
+    
+    def finish(self, elapsed: Optional[float], success: Optional[bool], probe: bool) -> None:
+        """
+        記錄請求結束
+        
+        Args:
+            elapsed: 耗時（秒），None 表示不納入延遲統計（例如串流）
+            success: 是否成功，None 表示不計入（例如呼叫端取消）
+            probe: 是否為探測請求
+        """
+        self.in_flight -= 1
+        if probe:
+            self.probes_in_flight -= 1
+        if success is None:
+            return
+        
+        self.outcomes.append(success)
+        if success:
+            if elapsed is not None:
+                self.latencies.append(elapsed)
+            self.consecutive_failures = 0
+            if self.state != self.CLOSED:
+                # 恢復後清除斷路前的失敗紀錄，避免立即再次斷路
+                self.state = self.CLOSED
+                self.outcomes.clear()
+                self.outcomes.append(True)
+            return
+        
+        self.consecutive_failures += 1
+        if (probe
+                or self.consecutive_failures >= CIRCUIT_FAILURE_THRESHOLD
+                or (len(self.outcomes) >= CIRCUIT_MIN_SAMPLES and self.error_rate >= CIRCUIT_ERROR_RATE)):
+            if self.state != self.OPEN:
+                self.trips += 1
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+    
+    @property
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return 1.0 - sum(self.outcomes) / len(self.outcomes)
+    
+    def percentile(self, p: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+    
+    def timeout(self) -> float:
+        """本次呼叫的逾時：p95 的倍數，限制在 [MIN_TIMEOUT, MAX_TIMEOUT]"""
+        p95 = self.percentile(0.95)
+        if p95 is None or len(self.latencies) < 5:
+            return MAX_TIMEOUT
+        return min(MAX_TIMEOUT, max(MIN_TIMEOUT, p95 * TIMEOUT_P95_FACTOR))
+    
+    def score(self, priority_rank: int) -> float:
+        """路由分數（越低越好）：預估延遲 × 排隊負載 ÷ 成功率 × 優先級權重"""
+        expected = self.percentile(0.50) or DEFAULT_EXPECTED_LATENCY
+        # 半開時忽略斷路前的錯誤率，讓探測請求有機會送出
+        success_rate = 1.0 if self.state == self.HALF_OPEN else max(0.05, 1.0 - self.error_rate)
+        return expected * (1 + self.in_flight) / success_rate * (1 + PRIORITY_WEIGHT * priority_rank)
+    
+    def snapshot(self) -> Dict[str, Any]:
+        p50 = self.percentile(0.50)
+        p95 = self.percentile(0.95)
+        return {
+            "state": self.state,
+            "p50_ms": p50 * 1000.0 if p50 is not None else None,
+            "p95_ms": p95 * 1000.0 if p95 is not None else None,
+            "error_rate": self.error_rate,
+            "samples": len(self.outcomes),
+            "in_flight": self.in_flight,
+            "consecutive_failures": self.consecutive_failures,
+            "timeout_s": self.timeout(),
+            "trips": self.trips
+        }
+
+
 class Qwen3LLMManager:
     """Qwen3 LLM 管理器"""
     
@@ -184,6 +344,8 @@ class Qwen3LLMManager:
         self.current_model: Optional[str] = None
         self.model_health: Dict[str, bool] = {}
         self.model_metrics: Dict[str, Dict[str, Any]] = {}
+        self.circuits: Dict[str, ModelCircuit] = {}
+        self.result_cache = get_llm_result_cache()
         
         # 初始化模型
         self._initialize_models()
@@ -239,6 +401,7 @@ class Qwen3LLMManager:
         # 初始化健康狀態
         for model_name in self.models.keys():
             self.model_health[model_name] = True
+            self.circuits[model_name] = ModelCircuit()
             self.model_metrics[model_name] = {
                 "total_calls": 0,
                 "successful_calls": 0,
@@ -291,96 +454,199 @@ class Qwen3LLMManager:
             "temperature": model.model_config.temperature,
             "health": self.model_health[model_name],
             "metrics": metrics,
+            "routing": self.circuits[model_name].snapshot(),
             "is_current": model_name == self.current_model
         }
     
-    def test_model_health(self, model_name: Optional[str] = None) -> bool:
-        """測試模型健康狀態"""
+    async def test_model_health(self, model_name: Optional[str] = None) -> bool:
+        """
+        測試模型健康狀態
+        
+        結果計入路由統計；斷路中的模型檢查成功即恢復。
+        """
         if model_name is None:
             model_name = self.current_model
         
         if model_name not in self.models:
             return False
         
-        try:
-            model = self.models[model_name]
-            test_prompt = "請回答：你好"
-            
-            start_time = datetime.now()
-            response = model._call(test_prompt)
-            end_time = datetime.now()
-            
-            response_time = (end_time - start_time).total_seconds()
-            
-            # 更新指標
-            self.model_metrics[model_name]["total_calls"] += 1
-            self.model_metrics[model_name]["last_used"] = datetime.now().isoformat()
-            
-            if "錯誤" not in response:
-                self.model_health[model_name] = True
-                self.model_metrics[model_name]["successful_calls"] += 1
-                
-                # 更新平均響應時間
-                current_avg = self.model_metrics[model_name]["average_response_time"]
-                total_calls = self.model_metrics[model_name]["total_calls"]
-                self.model_metrics[model_name]["average_response_time"] = (
-                    (current_avg * (total_calls - 1) + response_time) / total_calls
-                )
-                
-                logger.info(f"模型 {model_name} 健康檢查通過，響應時間: {response_time:.2f}s")
-                return True
-            else:
-                self.model_health[model_name] = False
-                self.model_metrics[model_name]["failed_calls"] += 1
-                logger.error(f"模型 {model_name} 健康檢查失敗: {response}")
-                return False
-                
-        except Exception as e:
-            self.model_health[model_name] = False
-            self.model_metrics[model_name]["failed_calls"] += 1
-            logger.error(f"模型 {model_name} 健康檢查異常: {str(e)}")
+        response = await self._call_model(model_name, self.models[model_name], "請回答：你好")
+        if self._is_error(response):
+            logger.error(f"模型 {model_name} 健康檢查失敗: {response}")
             return False
+        
+        logger.info(f"模型 {model_name} 健康檢查通過，"
+                    f"平均響應時間: {self.model_metrics[model_name]['average_response_time']:.2f}s")
+        return True
+    
+    @staticmethod
+    def _is_error(response: str) -> bool:
+        """Qwen3LLM._call 以「錯誤:」開頭的字串回報失敗"""
+        return response.startswith("錯誤")
+    
+    def _candidate_models(self) -> List[str]:
+        """依設定排列的候選模型：目前模型、llm_priority，再來是其餘模型"""
+        ordered = [self.current_model] + list(self.config.models.llm_priority or []) + list(self.models.keys())
+        candidates: List[str] = []
+        for model_name in ordered:
+            if model_name in self.models and model_name not in candidates:
+                candidates.append(model_name)
+        return candidates
+    
+    def rank_models(self) -> List[str]:
+        """
+        依路由分數排序目前可送出請求的模型
+        
+        分數綜合滾動延遲 p50、錯誤率與執行中請求數，設定的優先級只作為權重；
+        斷路中（open）或已有探測請求的半開模型不列入。
+        """
+        scored = []
+        for rank, model_name in enumerate(self._candidate_models()):
+            circuit = self.circuits[model_name]
+            if circuit.allow():
+                scored.append((circuit.score(rank), rank, model_name))
+        return [model_name for _, _, model_name in sorted(scored)]
     
     def get_best_model(self) -> str:
-        """獲取最佳可用模型"""
-        # 檢查當前模型是否健康
-        if self.current_model and self.test_model_health(self.current_model):
-            return self.current_model
-        
-        # 按優先級檢查其他模型
-        priority_models = self.config.models.llm_priority or []
-        for model_name in priority_models:
-            if model_name in self.models and self.test_model_health(model_name):
-                self.switch_model(model_name)
-                return model_name
-        
-        # 如果所有模型都不健康，返回預設模型
-        logger.warning("所有模型都不健康，使用預設模型")
+        """獲取最佳可用模型（依路由統計選擇，不額外送出檢查請求）"""
+        ranked = self.rank_models()
+        if ranked:
+            return ranked[0]
+        
+        # 如果所有模型都在斷路中，返回預設模型
+        logger.warning("所有模型都在斷路中，使用預設模型")
         return self.current_model or "openai:gpt-3.5"
     
-    def call_with_fallback(self, prompt: str, **kwargs) -> str:
-        """帶回退機制的模型呼叫"""
-        best_model_name = self.get_best_model()
-        model = self.get_model(best_model_name)
+    async def call_with_fallback(self, prompt: str, use_cache: bool = True, **kwargs) -> str:
+        """
+        帶回退機制的模型呼叫
         
-        try:
-            response = model._call(prompt, **kwargs)
-            
-            # 更新指標
-            self.model_metrics[best_model_name]["total_calls"] += 1
-            self.model_metrics[best_model_name]["last_used"] = datetime.now().isoformat()
+        依路由分數依序嘗試模型；斷路中的模型直接略過，呼叫逾時依各模型近期 p95 延遲調整，
+        慢速或故障的端點不會拖滿完整逾時。
+        
+        相同模型、提示詞與取樣參數的結果跨請求快取，並行中的相同呼叫只送出一次；
+        錯誤回應不快取。temperature > 0 的呼叫預設不快取，需設定 LLM_CACHE_NONDETERMINISTIC=true。
+        
+        Args:
+            prompt: 提示詞
+            use_cache: 是否使用結果快取
+        """
+        ranked = self.rank_models()
+        if not ranked:
+            logger.warning("所有模型都在斷路中，略過呼叫")
+            return "錯誤: 所有模型暫時不可用"
+        
+        response = "錯誤: 所有模型暫時不可用"
+        for model_name in ranked:
+            # 前一個模型失敗期間，此模型可能已斷路
+            if not self.circuits[model_name].allow():
+                continue
             
-            if "錯誤" not in response:
-                self.model_metrics[best_model_name]["successful_calls"] += 1
+            model = self.models[model_name]
+            if use_cache:
+                request_data = model._build_request(prompt, None, stream=False, **kwargs)
+                key = make_cache_key(f"{model.model_config.model_type}@{model.model_config.endpoint}",
+                                     prompt, request_data)
+                response = await self.result_cache.get_or_compute(
+                    key,
+                    lambda: self._call_model(model_name, model, prompt, **kwargs),
+                    params=request_data,
+                    validate=lambda result: not self._is_error(result)
+                )
             else:
-                self.model_metrics[best_model_name]["failed_calls"] += 1
-            
-            return response
+                response = await self._call_model(model_name, model, prompt, **kwargs)
             
+            if not self._is_error(response):
+                return response
+            logger.warning(f"模型 {model_name} 呼叫失敗，改用下一個模型: {response[:100]}")
+        
+        return response
+    
+    async def _call_model(self, model_name: str, model: Qwen3LLM, prompt: str, **kwargs) -> str:
+        """呼叫模型並更新指標與路由統計"""
+        circuit = self.circuits[model_name]
+        metrics = self.model_metrics[model_name]
+        trips = circuit.trips
+        
+        probe = circuit.start()
+        start_time = time.perf_counter()
+        success: Optional[bool] = None
+        try:
+            response = await model._call(prompt, timeout=circuit.timeout(), **kwargs)
+            success = not self._is_error(response)
         except Exception as e:
-            self.model_metrics[best_model_name]["failed_calls"] += 1
             logger.error(f"模型呼叫異常: {str(e)}")
-            return f"錯誤: {str(e)}"
+            response = f"錯誤: {str(e)}"
+            success = False
+        finally:
+            response_time = time.perf_counter() - start_time
+            circuit.finish(response_time, success, probe)
+            self.model_health[model_name] = circuit.state != ModelCircuit.OPEN
+        
+        if circuit.trips != trips:
+            logger.warning(f"模型 {model_name} 斷路 {CIRCUIT_COOLDOWN:.0f}s "
+                           f"(連續失敗 {circuit.consecutive_failures}，錯誤率 {circuit.error_rate:.0%})")
+        
+        # 更新指標
+        metrics["total_calls"] += 1
+        metrics["last_used"] = datetime.now().isoformat()
+        if success:
+            metrics["successful_calls"] += 1
+            successful_calls = metrics["successful_calls"]
+            metrics["average_response_time"] = (
+                (metrics["average_response_time"] * (successful_calls - 1) + response_time) / successful_calls
+            )
+        else:
+            metrics["failed_calls"] += 1
+        
+        return response
+    
+    async def stream_text(self, request) -> AsyncIterator[str]:
+        """
+        串流生成文本
+        
+        經由共用連線池非同步讀取，不佔用執行緒；呼叫端提前結束時關閉串流並歸還連線。
+        模型依路由分數選擇（不做會拖慢首個 token 的檢查呼叫），成敗計入斷路器。
+        
+        Args:
+            request: 生成請求（需有 prompt 屬性，與 llm.core.base_llm.GenerationRequest 相容）
+            
+        Yields:
+            str: 生成的文字片段
+        """
+        model_name = self.get_best_model()
+        model = self.get_model(model_name)
+        metrics = self.model_metrics[model_name]
+        circuit = self.circuits[model_name]
+        
+        start_time = datetime.now()
+        metrics["total_calls"] += 1
+        metrics["last_used"] = start_time.isoformat()
+        
+        probe = circuit.start()
+        success: Optional[bool] = None
+        chunks = model._stream(request.prompt, read_timeout=circuit.timeout())
+        try:
+            async for chunk in chunks:
+                yield chunk
+        except Exception as e:
+            success = False
+            metrics["failed_calls"] += 1
+            logger.error(f"模型 {model_name} 串流呼叫異常: {str(e)}")
+            raise
+        else:
+            success = True
+            metrics["successful_calls"] += 1
+            response_time = (datetime.now() - start_time).total_seconds()
+            successful_calls = metrics["successful_calls"]
+            metrics["average_response_time"] = (
+                (metrics["average_response_time"] * (successful_calls - 1) + response_time) / successful_calls
+            )
+        finally:
+            await chunks.aclose()
+            # 串流總時間取決於回答長度，不納入延遲統計
+            circuit.finish(None, success, probe)
+            self.model_health[model_name] = circuit.state != ModelCircuit.OPEN
     
     def get_metrics_summary(self) -> Dict[str, Any]:
         """獲取指標摘要"""
@@ -388,18 +654,22 @@ class Qwen3LLMManager:
             "current_model": self.current_model,
             "total_models": len(self.models),
             "healthy_models": sum(self.model_health.values()),
+            "routing_order": self.rank_models(),
             "models": {}
         }
         
         for model_name in self.models.keys():
             summary["models"][model_name] = self.get_model_info(model_name)
         
+        summary["http_client"] = get_llm_http_client().get_stats()
+        summary["result_cache"] = self.result_cache.get_stats()
         return summary
     
     def reset_metrics(self, model_name: Optional[str] = None):
         """重置模型指標"""
         if model_name:
             if model_name in self.model_metrics:
+                self.circuits[model_name] = ModelCircuit()
                 self.model_metrics[model_name] = {
                     "total_calls": 0,
                     "successful_calls": 0,
@@ -409,6 +679,7 @@ class Qwen3LLMManager:
                 }
         else:
             for model_name in self.model_metrics.keys():
+                self.circuits[model_name] = ModelCircuit()
                 self.model_metrics[model_name] = {
                     "total_calls": 0,
                     "successful_calls": 0,
@@ -427,7 +698,7 @@ def get_qwen3_llm_manager() -> Qwen3LLMManager:
     return qwen3_llm_manager
 
 
-if __name__ == "__main__":
+async def _main():
     # 測試 LLM 管理器
     manager = get_qwen3_llm_manager()
     
@@ -441,16 +712,22 @@ if __name__ == "__main__":
     # 測試健康檢查
     print("\n🏥 模型健康檢查:")
     for model_name in manager.get_available_models():
-        is_healthy = manager.test_model_health(model_name)
+        is_healthy = await manager.test_model_health(model_name)
         print(f"  {model_name}: {'✅' if is_healthy else '❌'}")
     
     # 測試模型呼叫
     print("\n🤖 模型呼叫測試:")
     test_prompt = "請用繁體中文介紹一下你自己"
-    response = manager.call_with_fallback(test_prompt)
+    response = await manager.call_with_fallback(test_prompt)
     print(f"回應: {response}")
     
     # 顯示指標摘要
     print("\n📊 指標摘要:")
     metrics = manager.get_metrics_summary()
-    print(json.dumps(metrics, indent=2, ensure_ascii=False)) 
\ No newline at end of file
+    print(json.dumps(metrics, indent=2, ensure_ascii=False))
+    
+    await get_llm_http_client().close()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Podwise RAG Pipeline - 請求範圍備忘錄
+
+同一個查詢內，多個代理人並行執行時常會發出相同的檢索或 LLM 呼叫。
+此模組提供以 ContextVar 綁定的請求範圍備忘錄：
+- 相同鍵值的呼叫只執行一次，並行中的呼叫者共用同一個 Future
+- 失敗的呼叫不會被記住，之後的呼叫者會重新執行
+- 不在請求範圍內時直接執行，不做任何快取
+
+共用結果會被多個代理人讀取，呼叫端不應修改回傳的物件。
+
+作者: Podwise Team
+版本: 1.0.0
+"""
+
+import re
+import asyncio
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """
+    正規化查詢作為備忘錄鍵值：去除首尾空白、合併連續空白、英文轉小寫
+
+    只用於鍵值比對，實際呼叫仍使用原始查詢。
+    """
+    return _WHITESPACE.sub(" ", (query or "").strip()).casefold()
+
+
+class RequestMemo:
+    """單一請求的呼叫備忘錄"""
+
+    def __init__(self) -> None:
+        self._entries: Dict[Hashable, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def get_or_run(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        取得鍵值對應的結果，尚未執行時呼叫 factory
+
+        Args:
+            key: 呼叫的識別鍵（需可雜湊）
+            factory: 回傳 awaitable 的無參數函數
+
+        Returns:
+            Any: 呼叫結果
+        """
+        future = self._entries.get(key)
+        if future is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+            future = asyncio.ensure_future(factory())
+            self._entries[key] = future
+            future.add_done_callback(lambda done: self._forget_failed(key, done))
+
+        # shield：單一呼叫者被取消時不影響其他共用此結果的呼叫者
+        return await asyncio.shield(future)
+
+    def _forget_failed(self, key: Hashable, future: asyncio.Future) -> None:
+        """失敗或取消的呼叫不保留"""
+        if future.cancelled() or future.exception() is not None:
+            if self._entries.get(key) is future:
+                del self._entries[key]
+
+    def get_stats(self) -> Dict[str, int]:
+        """獲取命中統計"""
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+
+_current_memo: ContextVar[Optional[RequestMemo]] = ContextVar("podwise_request_memo", default=None)
+
+
+@contextmanager
+def request_scope() -> Iterator[RequestMemo]:
+    """
+    進入請求範圍；已在範圍內時沿用外層的備忘錄
+
+    以 asyncio.gather / create_task 建立的子任務會複製目前的 context，
+    因此同一請求內並行的代理人共用同一個備忘錄。
+    """
+    memo = _current_memo.get()
+    if memo is not None:
+        yield memo
+        return
+
+    memo = RequestMemo()
+    token = _current_memo.set(memo)
+    try:
+        yield memo
+    finally:
+        _current_memo.reset(token)
+
+
+def get_request_memo() -> Optional[RequestMemo]:
+    """獲取目前請求的備忘錄（不在請求範圍內時為 None）"""
+    return _current_memo.get()
+
+
+async def memoized(key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+    """
+    在目前請求範圍內去重執行 factory
+
+    Args:
+        key: 呼叫的識別鍵，由操作、正規化查詢與影響結果的參數組成，
+             例如 ("search", normalize_query(query), category, top_k)；
+             不要放入代理人名稱，否則不同代理人的相同呼叫無法共用
+        factory: 回傳 awaitable 的無參數函數
+
+    Returns:
+        Any: 呼叫結果
+    """
+    memo = _current_memo.get()
+    if memo is None:
+        return await factory()
+    return await memo.get_or_run(key, factory)
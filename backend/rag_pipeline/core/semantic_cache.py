@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Podwise RAG Pipeline - 語意回應快取
+
+以查詢向量相似度命中快取的回應，避免近似重複查詢重跑整條 RAG 流程：
+- 相似度高於閾值即命中，介於近似閾值與命中閾值之間記為近似命中
+- 依類別與用戶上下文分桶，不同桶互不命中
+- TTL 與容量上限（全域 LRU 淘汰）
+- 向量集合重新載入時整體失效
+
+作者: Podwise Team
+版本: 1.0.0
+"""
+
+import time
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+Scope = Tuple[str, str]
+
+
+@dataclass
+class CacheEntry:
+    """快取項目"""
+    query: str
+    vector: np.ndarray
+    response: Any
+    created_at: float
+    hits: int = 0
+
+
+@dataclass
+class CacheLookup:
+    """快取查詢結果"""
+    response: Any
+    similarity: float
+    cached_query: str
+
+
+class _ScopeIndex:
+    """單一分桶的向量索引"""
+
+    def __init__(self):
+        self.entries: Dict[int, CacheEntry] = {}
+        self._ids: List[int] = []
+        self._matrix: Optional[np.ndarray] = None
+
+    def add(self, entry_id: int, entry: CacheEntry) -> None:
+        self.entries[entry_id] = entry
+        self._matrix = None
+
+    def remove(self, entry_id: int) -> None:
+        if self.entries.pop(entry_id, None) is not None:
+            self._matrix = None
+
+    def best_match(self, vector: np.ndarray) -> Tuple[Optional[int], float]:
+        """回傳最相似項目的 id 與相似度"""
+        if not self.entries:
+            return None, 0.0
+        if self._matrix is None:
+            self._ids = list(self.entries.keys())
+            self._matrix = np.vstack([self.entries[i].vector for i in self._ids])
+        scores = self._matrix @ vector
+        best = int(np.argmax(scores))
+        return self._ids[best], float(scores[best])
+
+
+class SemanticResponseCache:
+    """語意回應快取"""
+
+    def __init__(self,
+                 similarity_threshold: float = 0.95,
+                 near_hit_threshold: float = 0.85,
+                 ttl_seconds: float = 3600,
+                 max_size: int = 1000):
+        """
+        初始化語意回應快取
+
+        Args:
+            similarity_threshold: 命中所需的最低餘弦相似度
+            near_hit_threshold: 記為近似命中的最低餘弦相似度
+            ttl_seconds: 項目存活時間（秒）
+            max_size: 最大項目數
+        """
+        self.similarity_threshold = similarity_threshold
+        self.near_hit_threshold = min(near_hit_threshold, similarity_threshold)
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max(1, max_size)
+
+        self._lock = threading.Lock()
+        self._scopes: Dict[Scope, _ScopeIndex] = {}
+        self._lru: "OrderedDict[int, Scope]" = OrderedDict()
+        self._next_id = 0
+        self._generation = 0
+
+        self._hits = 0
+        self._misses = 0
+        self._near_hits = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+        self._stale_puts = 0
+
+    @property
+    def generation(self) -> int:
+        """目前的失效世代；查詢前取得並於 put 時帶回，可丟棄跨越失效的寫入"""
+        return self._generation
+
+    @staticmethod
+    def _normalize(vector: Any) -> Optional[np.ndarray]:
+        """轉為單位長度的 float32 向量"""
+        array = np.asarray(vector, dtype=np.float32).reshape(-1)
+        norm = float(np.linalg.norm(array))
+        if norm == 0.0 or not np.isfinite(norm):
+            return None
+        return array / norm
+
+    def _drop(self, entry_id: int) -> None:
+        """移除項目（需持有鎖）"""
+        scope = self._lru.pop(entry_id, None)
+        if scope is None:
+            return
+        index = self._scopes.get(scope)
+        if index is not None:
+            index.remove(entry_id)
+            if not index.entries:
+                del self._scopes[scope]
+
+    def get(self, vector: Any, category: str, context_bucket: str) -> Optional[CacheLookup]:
+        """
+        以查詢向量查詢快取
+
+        Args:
+            vector: 查詢向量
+            category: 查詢類別
+            context_bucket: 用戶上下文分桶
+
+        Returns:
+            Optional[CacheLookup]: 命中時回傳快取回應，否則 None
+        """
+        query_vector = self._normalize(vector)
+        with self._lock:
+            index = self._scopes.get((category, context_bucket))
+            if query_vector is None or index is None:
+                self._misses += 1
+                return None
+
+            entry_id, similarity = index.best_match(query_vector)
+            entry = index.entries.get(entry_id) if entry_id is not None else None
+            if entry is not None and time.time() - entry.created_at > self.ttl_seconds:
+                self._drop(entry_id)
+                self._expirations += 1
+                entry = None
+
+            if entry is None or similarity < self.similarity_threshold:
+                self._misses += 1
+                if entry is not None and similarity >= self.near_hit_threshold:
+                    self._near_hits += 1
+                return None
+
+            self._hits += 1
+            entry.hits += 1
+            self._lru.move_to_end(entry_id)
+            return CacheLookup(response=entry.response, similarity=similarity, cached_query=entry.query)
+
+    def put(self, vector: Any, category: str, context_bucket: str, query: str, response: Any,
+            generation: Optional[int] = None) -> bool:
+        """
+        寫入快取
+
+        Args:
+            vector: 查詢向量
+            category: 查詢類別
+            context_bucket: 用戶上下文分桶
+            query: 原始查詢
+            response: 回應物件
+            generation: 查詢快取時取得的 generation；期間快取已失效則丟棄此筆
+
+        Returns:
+            bool: 是否寫入
+        """
+        query_vector = self._normalize(vector)
+        if query_vector is None:
+            return False
+
+        scope = (category, context_bucket)
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                # 回應是在失效前以舊集合計算的，不能寫入失效後的快取
+                self._stale_puts += 1
+                return False
+
+            entry_id = self._next_id
+            self._next_id += 1
+            self._scopes.setdefault(scope, _ScopeIndex()).add(
+                entry_id,
+                CacheEntry(query=query, vector=query_vector, response=response, created_at=time.time())
+            )
+            self._lru[entry_id] = scope
+
+            while len(self._lru) > self.max_size:
+                oldest_id = next(iter(self._lru))
+                self._drop(oldest_id)
+                self._evictions += 1
+        return True
+
+    def invalidate(self, reason: str = "") -> int:
+        """
+        清空快取（例如向量集合重新載入時）
+
+        Args:
+            reason: 失效原因
+
+        Returns:
+            int: 被清除的項目數
+        """
+        with self._lock:
+            cleared = len(self._lru)
+            self._scopes.clear()
+            self._lru.clear()
+            self._generation += 1
+            self._invalidations += 1
+        logger.info(f"語意快取已失效 ({reason or 'manual'})，清除 {cleared} 筆")
+        return cleared
+
+    def get_stats(self) -> Dict[str, Any]:
+        """獲取命中、未命中與近似命中比例"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "size": len(self._lru),
+                "max_size": self.max_size,
+                "scopes": len(self._scopes),
+                "lookups": lookups,
+                "hits": self._hits,
+                "misses": self._misses,
+                "near_hits": self._near_hits,
+                "hit_ratio": self._hits / lookups if lookups else 0.0,
+                "miss_ratio": self._misses / lookups if lookups else 0.0,
+                "near_hit_ratio": self._near_hits / lookups if lookups else 0.0,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "invalidations": self._invalidations,
+                "stale_puts": self._stale_puts,
+                "generation": self._generation,
+                "similarity_threshold": self.similarity_threshold,
+                "near_hit_threshold": self.near_hit_threshold,
+                "ttl_seconds": self.ttl_seconds
+            }
+
+
+# 全域實例
+_semantic_cache: Optional[SemanticResponseCache] = None
+_semantic_cache_lock = threading.Lock()
+
+
+def get_semantic_cache(**kwargs) -> SemanticResponseCache:
+    """獲取全域語意回應快取（參數只在首次建立時生效）"""
+    global _semantic_cache
+    if _semantic_cache is None:
+        with _semantic_cache_lock:
+            if _semantic_cache is None:
+                _semantic_cache = SemanticResponseCache(**kwargs)
+    return _semantic_cache
+
+
+def invalidate_semantic_cache(reason: str = "") -> int:
+    """向量集合重新載入時呼叫，若快取尚未建立則不做事"""
+    if _semantic_cache is None:
+        return 0
+    return _semantic_cache.invalidate(reason)
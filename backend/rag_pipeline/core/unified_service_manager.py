@@ -19,7 +19,7 @@ import sys
 import logging
 import asyncio
 from datetime import datetime
-from typing import Dict, Any, Optional, List, Union
+from typing import Dict, Any, Optional, List, Union, AsyncIterator
 from dataclasses import dataclass, field
 from pathlib import Path
 
@@ -47,6 +47,7 @@ from .crew_agents import (
     UserManagerAgent, WebSearchAgent, RAGExpertAgent,
     SummaryExpertAgent, TagClassificationExpertAgent, TTSExpertAgent
 )
+from .request_memo import request_scope
 
 # 導入核心服務
 from .hierarchical_rag_pipeline import HierarchicalRAGPipeline
@@ -55,6 +56,7 @@ from .qwen_llm_manager import Qwen3LLMManager
 from .content_categorizer import ContentCategorizer
 from .apple_podcast_ranking import ApplePodcastRankingSystem
 from .default_qa_processor import DefaultQAProcessor, create_default_qa_processor
+from .answer_generator import create_answer_generator
 
 # 導入配置和工具
 try:
@@ -235,6 +237,18 @@ class UnifiedServiceManager:
         except Exception as e:
             logger.warning(f"預設問答處理器初始化失敗: {e}")
             self.default_qa_processor = None
+        
+        try:
+            self.answer_generator = create_answer_generator(
+                llm_manager=self.llm_manager,
+                default_qa_processor=self.default_qa_processor,
+                prompt_templates=get_prompt_templates() if CONFIG_AVAILABLE else None,
+                agent_roles_manager=self.agent_roles_manager
+            )
+            logger.info("✅ 回答生成器初始化成功")
+        except Exception as e:
+            logger.warning(f"回答生成器初始化失敗: {e}")
+            self.answer_generator = None
     
     def _initialize_tools(self):
         """初始化工具"""
@@ -306,7 +320,8 @@ class UnifiedServiceManager:
                            query: str, 
                            user_id: str = "Podwise0001",
                            session_id: Optional[str] = None,
-                           metadata: Optional[Dict[str, Any]] = None) -> RAGResponse:
+                           metadata: Optional[Dict[str, Any]] = None,
+                           query_vector: Optional[List[float]] = None) -> RAGResponse:
         """
         處理用戶查詢 - 主要入口點
         
@@ -320,6 +335,7 @@ class UnifiedServiceManager:
             user_id: 用戶 ID
             session_id: 會話 ID
             metadata: 額外元數據
+            query_vector: 呼叫端已計算的查詢向量（例如語意快取查詢時），檢索時不再重新編碼
             
         Returns:
             RAGResponse: 處理結果
@@ -332,17 +348,20 @@ class UnifiedServiceManager:
             user_query = create_user_query(
                 query=query,
                 user_id=user_id,
+                query_vector=query_vector,
                 metadata=metadata or {}
             )
             
-            # 步驟 1: 語意分析和標籤萃取
-            semantic_analysis = await self._perform_semantic_analysis(user_query)
-            self.metrics.steps_completed.append("semantic_analysis")
-            
-            # 步驟 2: 根據三層架構處理
-            response = await self._process_with_three_layer_architecture(
-                user_query, session_id, semantic_analysis
-            )
+            # 整個查詢共用一個請求範圍備忘錄：功能專家層與領導者層的檢索只執行一次
+            with request_scope():
+                # 步驟 1: 語意分析和標籤萃取
+                semantic_analysis = await self._perform_semantic_analysis(user_query)
+                self.metrics.steps_completed.append("semantic_analysis")
+                
+                # 步驟 2: 根據三層架構處理
+                response = await self._process_with_three_layer_architecture(
+                    user_query, session_id, semantic_analysis
+                )
             
             # 步驟 3: 更新指標
             self.metrics.end_time = datetime.now()
@@ -364,6 +383,83 @@ class UnifiedServiceManager:
                 error=str(e)
             )
     
+    async def stream_query(self,
+                           query: str,
+                           user_id: str = "Podwise0001",
+                           session_id: Optional[str] = None,
+                           metadata: Optional[Dict[str, Any]] = None,
+                           query_vector: Optional[List[float]] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        串流處理用戶查詢
+        
+        先完成檢索並送出 metadata 事件，再逐段轉送回答生成器的 token 事件，最後送出 done 事件。
+        領導者層的回答是各專家結果的拼接，無法邊生成邊輸出，因此串流路徑直接以
+        RAG 專家的檢索結果交給回答生成器。
+        
+        Args:
+            query: 用戶查詢
+            user_id: 用戶 ID
+            session_id: 會話 ID
+            metadata: 額外元數據
+            query_vector: 呼叫端已計算的查詢向量，檢索時不再重新編碼
+            
+        Yields:
+            Dict[str, Any]: {"event": 事件類型, "data": 事件內容}
+        """
+        start_time = datetime.now()
+        self.metrics.steps_completed.append("stream_query_received")
+        metadata = metadata or {}
+        
+        if not self.answer_generator:
+            response = await self.process_query(query, user_id, session_id, metadata, query_vector)
+            yield {"event": "metadata", "data": {"category": response.metadata.get("category", "其他")}}
+            yield {"event": "token", "data": {"text": response.content}}
+            yield {
+                "event": "done",
+                "data": {
+                    "confidence": response.confidence,
+                    "level_used": response.level_used,
+                    "processing_time": response.processing_time
+                }
+            }
+            return
+        
+        user_query = create_user_query(query=query, user_id=user_id, query_vector=query_vector, metadata=metadata)
+        category = self.classify_category(query)
+        
+        # 檢索
+        search_results: List[Dict[str, Any]] = []
+        retrieval_confidence = 0.0
+        if self.rag_expert:
+            try:
+                rag_result = await self.rag_expert.process(user_query)
+                search_results = rag_result.metadata.get("results", [])
+                retrieval_confidence = rag_result.confidence
+            except Exception as e:
+                logger.warning(f"RAG 專家處理失敗: {e}")
+        retrieval_time = (datetime.now() - start_time).total_seconds()
+        self.metrics.steps_completed.append("stream_retrieval")
+        
+        # 生成
+        async for event in self.answer_generator.stream_answer(
+            query,
+            user_id,
+            search_results=search_results,
+            category=category,
+            user_context=metadata.get("user_context", {})
+        ):
+            if event["event"] == "metadata":
+                event["data"].update({
+                    "session_id": session_id,
+                    "retrieval_confidence": retrieval_confidence,
+                    "retrieval_time": retrieval_time
+                })
+            elif event["event"] == "done":
+                event["data"]["processing_time"] = (datetime.now() - start_time).total_seconds()
+                self.metrics.end_time = datetime.now()
+                self.metrics.steps_completed.append("stream_query_completed")
+            yield event
+    
     async def _perform_semantic_analysis(self, user_query: UserQuery) -> Dict[str, Any]:
         """
         執行語意分析和標籤萃取
@@ -395,6 +491,19 @@ class UnifiedServiceManager:
             logger.error(f"語意分析失敗: {e}")
             return self._fallback_semantic_analysis(user_query)
     
+    def classify_category(self, query: str) -> str:
+        """
+        以關鍵字快速判斷查詢主類別（不呼叫模型），供回應快取分桶使用
+        
+        Args:
+            query: 用戶查詢
+            
+        Returns:
+            str: 主類別（商業/教育/其他）
+        """
+        user_query = create_user_query(query=query, user_id="category_classifier")
+        return self._fallback_semantic_analysis(user_query)["primary_category"]
+    
     def _fallback_semantic_analysis(self, user_query: UserQuery) -> Dict[str, Any]:
         """備用語意分析邏輯"""
         query = user_query.query.lower()
@@ -691,7 +800,9 @@ class UnifiedServiceManager:
                 metadata={
                     "health_percentage": health_percentage,
                     "healthy_components": healthy_components,
-                    "total_components": total_components
+                    "total_components": total_components,
+                    "embedding": self._get_embedding_stats(),
+                    "milvus": self._get_milvus_stats()
                 }
             )
             
@@ -709,6 +820,24 @@ class UnifiedServiceManager:
                 metadata={"error": str(e)}
             )
     
+    def _get_embedding_stats(self) -> List[Dict[str, Any]]:
+        """獲取共用嵌入模型狀態（含微批次佇列深度與批次大小）"""
+        try:
+            from utils.embedding_registry import get_embedding_registry
+            return get_embedding_registry().get_stats()
+        except Exception as e:
+            logger.warning(f"獲取嵌入模型狀態失敗: {e}")
+            return []
+    
+    def _get_milvus_stats(self) -> Dict[str, Any]:
+        """獲取共用 Milvus 客戶端狀態（連線、已載入集合與各操作延遲）"""
+        try:
+            from utils.milvus_client_manager import get_milvus_manager
+            return get_milvus_manager().get_stats()
+        except Exception as e:
+            logger.warning(f"獲取 Milvus 狀態失敗: {e}")
+            return {}
+    
     def get_system_info(self) -> Dict[str, Any]:
         """獲取系統資訊"""
         return {
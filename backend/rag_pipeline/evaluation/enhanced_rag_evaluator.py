@@ -77,26 +77,24 @@ class MilvusOptimizedSearch:
     def __init__(self):
         """初始化優化的 Milvus 搜尋"""
         self.config = get_config()
+        self.manager = None
         self.collection = None
         self.is_connected = False
         self._connect()
         
     def _connect(self):
-        """連接到 Milvus"""
+        """連接到 Milvus（連線與集合載入由共用管理器負責）"""
         try:
-            from pymilvus import connections, Collection, utility
+            from utils.milvus_client_manager import get_milvus_manager
             
-            # 連接到 Milvus
-            connections.connect(
-                alias="default",
+            self.manager = get_milvus_manager()
+            collection_name = self.config.database.milvus_collection
+            self.collection = self.manager.get_collection(
+                collection_name,
                 host=self.config.database.milvus_host,
                 port=self.config.database.milvus_port
             )
-            
-            # 檢查集合是否存在
-            collection_name = self.config.database.milvus_collection
-            if utility.has_collection(collection_name):
-                self.collection = Collection(collection_name)
+            if self.collection is not None:
                 self.is_connected = True
                 
                 # 檢查集合統計資訊
@@ -108,9 +106,6 @@ class MilvusOptimizedSearch:
                     logger.info("📊 建議使用 IVF_FLAT 索引（向量數 < 1M）")
                 else:
                     logger.info("📊 建議使用 HNSW 或 DiskANN 索引（向量數 > 1M）")
-                    
-            else:
-                logger.warning(f"⚠️ Milvus 集合 '{collection_name}' 不存在")
                 
         except ImportError:
             logger.warning("⚠️ pymilvus 未安裝")
@@ -139,22 +134,16 @@ class MilvusOptimizedSearch:
             if not embedding:
                 return []
             
-            # 載入集合
-            self.collection.load()
-            
-            # 優化的搜尋參數
-            search_params = {
-                "metric_type": "COSINE",
-                "params": {"nprobe": nprobe}
-            }
-            
-            # 執行搜尋
-            results = self.collection.search(
-                data=[embedding],
+            # 執行搜尋（集合已由管理器保持載入）
+            results = await self.manager.asearch(
+                self.config.database.milvus_collection,
+                [embedding],
                 anns_field="embedding",
-                param=search_params,
+                param={"metric_type": "COSINE", "params": {"nprobe": nprobe}},
                 limit=top_k,
-                output_fields=["chunk_id", "chunk_text", "tags", "podcast_name", "episode_title", "category", "language"]
+                output_fields=["chunk_id", "chunk_text", "tags", "podcast_name", "episode_title", "category", "language"],
+                host=self.config.database.milvus_host,
+                port=self.config.database.milvus_port
             )
             
             # 格式化結果
@@ -11,12 +11,15 @@ Podwise RAG Pipeline 統一服務
 
 import os
 import sys
+import json
+import time
+import hmac
 import logging
 import asyncio
 from datetime import datetime
-from typing import Dict, Any, Optional, List, Union
+from typing import Dict, Any, Optional, List, Union, AsyncIterator
 from contextlib import asynccontextmanager
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, replace
 from pathlib import Path
 import httpx
 import re
@@ -66,7 +69,7 @@ except ImportError:
 
 # FastAPI 相關導入
 from fastapi import FastAPI, HTTPException, BackgroundTasks, Depends, Request
-from fastapi.responses import JSONResponse, HTMLResponse, FileResponse
+from fastapi.responses import JSONResponse, HTMLResponse, FileResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.templating import Jinja2Templates
@@ -95,6 +98,32 @@ except ImportError as e:
     UserQuery = None
     AgentResponse = None
 
+# 導入語意回應快取
+try:
+    from core.semantic_cache import get_semantic_cache, invalidate_semantic_cache
+    from config.integrated_config import get_config
+    from utils.embedding_registry import get_shared_encoder
+    SEMANTIC_CACHE_AVAILABLE = True
+except ImportError as e:
+    logger.warning(f"語意回應快取導入失敗: {e}")
+    SEMANTIC_CACHE_AVAILABLE = False
+
+# 導入 LLM 結果快取
+try:
+    from core.llm_result_cache import get_llm_result_cache
+    LLM_RESULT_CACHE_AVAILABLE = True
+except ImportError as e:
+    logger.warning(f"LLM 結果快取導入失敗: {e}")
+    LLM_RESULT_CACHE_AVAILABLE = False
+
+# 不寫入快取的處理層級
+NON_CACHEABLE_LEVELS = {"error", "fallback", "final_fallback"}
+
+# 快取失效端點的管理權杖（X-Cache-Admin-Token 標頭）；未設定時只接受本機呼叫
+CACHE_ADMIN_TOKEN = os.getenv("RAG_CACHE_ADMIN_TOKEN", "")
+CACHE_ADMIN_HEADER = "X-Cache-Admin-Token"
+LOOPBACK_HOSTS = {"127.0.0.1", "::1", "localhost"}
+
 # 創建簡單的 RAGResponse 類別作為備用
 if not RAGResponse:
     @dataclass
@@ -188,7 +217,8 @@ class PodwiseRAGPipeline:
                  enable_semantic_retrieval: bool = True,
                  enable_chat_history: bool = True,
                  enable_apple_ranking: bool = True,
-                 confidence_threshold: float = 0.7):
+                 confidence_threshold: float = 0.7,
+                 enable_semantic_cache: bool = True):
         """
         初始化 RAG Pipeline
         
@@ -198,6 +228,7 @@ class PodwiseRAGPipeline:
             enable_chat_history: 是否啟用聊天歷史記錄
             enable_apple_ranking: 是否啟用 Apple Podcast 排名系統
             confidence_threshold: 信心度閾值
+            enable_semantic_cache: 是否啟用語意回應快取
         """
         # 創建服務配置
         if SERVICE_MANAGER_AVAILABLE and ServiceConfig:
@@ -218,6 +249,63 @@ class PodwiseRAGPipeline:
         else:
             self.service_manager = None
             logger.warning("⚠️ 統一服務管理器不可用")
+        
+        # 初始化語意回應快取
+        self.semantic_cache = None
+        self.query_encoder = None
+        if enable_semantic_cache and SEMANTIC_CACHE_AVAILABLE and self.service_manager:
+            self._initialize_semantic_cache()
+    
+    def _initialize_semantic_cache(self) -> None:
+        """初始化語意回應快取與查詢編碼器"""
+        try:
+            config = get_config()
+            if not config.cache_enabled:
+                logger.info("ℹ️ 語意回應快取已停用")
+                return
+            
+            # 啟動時載入共用編碼器，避免首次查詢在事件迴圈中載入模型
+            encoder = get_shared_encoder(config.models.text2vec_path, config.models.text2vec_device)
+            if not encoder.available:
+                logger.warning("⚠️ 嵌入模型不可用，語意回應快取停用")
+                return
+            
+            self.query_encoder = encoder.get_batcher(normalize_embeddings=True)
+            self.semantic_cache = get_semantic_cache(
+                similarity_threshold=config.semantic_cache_threshold,
+                near_hit_threshold=config.semantic_cache_near_hit_threshold,
+                ttl_seconds=config.cache_ttl,
+                max_size=config.cache_max_size
+            )
+            self._register_cache_invalidation()
+            logger.info("✅ 語意回應快取初始化成功")
+        except Exception as e:
+            logger.warning(f"語意回應快取初始化失敗: {e}")
+            self.semantic_cache = None
+            self.query_encoder = None
+    
+    @staticmethod
+    def _register_cache_invalidation() -> None:
+        """向量集合重新載入時讓語意快取失效"""
+        try:
+            from utils.milvus_client_manager import get_milvus_manager
+            get_milvus_manager().add_reload_listener(invalidate_semantic_cache)
+        except ImportError as e:
+            logger.warning(f"Milvus 管理器不可用，語意快取不會隨集合重新載入失效: {e}")
+    
+    @staticmethod
+    def _get_context_bucket(user_id: str, metadata: Optional[Dict[str, Any]]) -> str:
+        """
+        取得用戶上下文分桶
+        
+        快取以桶為單位共享；呼叫端可透過 metadata 指定，否則依偏好類別分桶。
+        """
+        metadata = metadata or {}
+        if metadata.get("context_bucket"):
+            return str(metadata["context_bucket"])
+        if metadata.get("preferred_category"):
+            return f"pref:{metadata['preferred_category']}"
+        return "default"
     
     async def process_query(self, 
                            query: str, 
@@ -246,7 +334,139 @@ class PodwiseRAGPipeline:
                 metadata={"error": "Service manager not available"}
             )
         
-        return await self.service_manager.process_query(query, user_id, session_id, metadata)
+        if not self.semantic_cache or not self.query_encoder:
+            return await self.service_manager.process_query(query, user_id, session_id, metadata)
+        
+        start_time = datetime.now()
+        category = self.service_manager.classify_category(query)
+        context_bucket = self._get_context_bucket(user_id, metadata)
+        
+        try:
+            query_vector = await self.query_encoder.aencode(query)
+        except Exception as e:
+            logger.warning(f"快取查詢向量化失敗，略過快取: {e}")
+            return await self.service_manager.process_query(query, user_id, session_id, metadata)
+        
+        cache_generation = self.semantic_cache.generation
+        cached = self.semantic_cache.get(query_vector, category, context_bucket)
+        if cached:
+            logger.info(f"語意快取命中 (相似度 {cached.similarity:.3f}): {cached.cached_query}")
+            return replace(
+                cached.response,
+                processing_time=(datetime.now() - start_time).total_seconds(),
+                metadata={
+                    **cached.response.metadata,
+                    "cache_hit": True,
+                    "cache_similarity": cached.similarity,
+                    "cached_query": cached.cached_query
+                }
+            )
+        
+        # 快取未命中：沿用已計算的查詢向量，檢索時不再重新編碼
+        response = await self.service_manager.process_query(
+            query, user_id, session_id, metadata, query_vector=query_vector.tolist()
+        )
+        if response.level_used not in NON_CACHEABLE_LEVELS and response.confidence > 0:
+            self.semantic_cache.put(query_vector, category, context_bucket, query, response,
+                                    generation=cache_generation)
+        return response
+    
+    async def stream_query(self,
+                           query: str,
+                           user_id: str = "Podwise0001",
+                           session_id: Optional[str] = None,
+                           metadata: Optional[Dict[str, Any]] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        串流處理用戶查詢
+        
+        事件順序為 metadata → token（多個）→ done；done 事件附上首個 token 延遲
+        (time_to_first_token)。語意快取命中時直接重播快取的回答，完整生成後寫入快取。
+        
+        Args:
+            query: 用戶查詢
+            user_id: 用戶 ID
+            session_id: 會話 ID
+            metadata: 額外元數據
+            
+        Yields:
+            Dict[str, Any]: {"event": 事件類型, "data": 事件內容}
+        """
+        start_time = time.perf_counter()
+        
+        if not self.service_manager:
+            yield {"event": "metadata", "data": {"category": "其他"}}
+            yield {"event": "token", "data": {"text": "服務管理器不可用"}}
+            yield {"event": "done", "data": {"confidence": 0.0, "level_used": "error", "processing_time": 0.0}}
+            return
+        
+        query_vector = None
+        category = None
+        context_bucket = None
+        cache_generation = None
+        if self.semantic_cache and self.query_encoder:
+            category = self.service_manager.classify_category(query)
+            context_bucket = self._get_context_bucket(user_id, metadata)
+            try:
+                query_vector = await self.query_encoder.aencode(query)
+            except Exception as e:
+                logger.warning(f"快取查詢向量化失敗，略過快取: {e}")
+        
+        if query_vector is not None:
+            cache_generation = self.semantic_cache.generation
+            cached = self.semantic_cache.get(query_vector, category, context_bucket)
+            if cached:
+                logger.info(f"語意快取命中 (相似度 {cached.similarity:.3f}): {cached.cached_query}")
+                response = cached.response
+                yield {
+                    "event": "metadata",
+                    "data": {
+                        "category": response.metadata.get("category", category),
+                        "recommendations": response.metadata.get("recommendations", []),
+                        "cache_hit": True,
+                        "cache_similarity": cached.similarity
+                    }
+                }
+                yield {"event": "token", "data": {"text": response.content}}
+                elapsed = time.perf_counter() - start_time
+                yield {
+                    "event": "done",
+                    "data": {
+                        "confidence": response.confidence,
+                        "level_used": response.level_used,
+                        "processing_time": elapsed,
+                        "time_to_first_token": elapsed
+                    }
+                }
+                return
+        
+        content_parts: List[str] = []
+        stream_metadata: Dict[str, Any] = {}
+        time_to_first_token = None
+        async for event in self.service_manager.stream_query(
+                query, user_id, session_id, metadata,
+                query_vector=query_vector.tolist() if query_vector is not None else None):
+            if event["event"] == "metadata":
+                stream_metadata = dict(event["data"])
+            elif event["event"] == "token":
+                if time_to_first_token is None:
+                    time_to_first_token = time.perf_counter() - start_time
+                content_parts.append(event["data"]["text"])
+            elif event["event"] == "done":
+                event["data"]["time_to_first_token"] = time_to_first_token
+                logger.info(f"串流查詢完成，首個 token 延遲: {time_to_first_token or 0.0:.3f}s")
+                
+                done = event["data"]
+                if (query_vector is not None and done.get("level_used") not in NON_CACHEABLE_LEVELS
+                        and done.get("confidence", 0.0) > 0):
+                    self.semantic_cache.put(query_vector, category, context_bucket, query, RAGResponse(
+                        content="".join(content_parts),
+                        confidence=done["confidence"],
+                        sources=[],
+                        processing_time=done.get("processing_time", 0.0),
+                        level_used=done["level_used"],
+                        metadata=stream_metadata
+                    ), generation=cache_generation)
+            yield event
     
     async def synthesize_speech(self, text: str, voice: str = "podrina", speed: float = 1.0) -> Optional[Dict[str, Any]]:
         """語音合成（改為 HTTP 請求 TTS 微服務）"""
@@ -315,7 +535,8 @@ class PodwiseRAGPipeline:
                     "timestamp": health_status.timestamp.isoformat(),
                     "components": health_status.components,
                     "version": health_status.version,
-                    "metadata": health_status.metadata
+                    "metadata": health_status.metadata,
+                    "semantic_cache": self.semantic_cache.get_stats() if self.semantic_cache else None
                 }
             else:
                 # 如果服務管理器不可用，返回基本健康狀態
@@ -394,6 +615,17 @@ def get_rag_pipeline() -> PodwiseRAGPipeline:
         raise HTTPException(status_code=503, detail="RAG Pipeline 未初始化")
     return rag_pipeline
 
+def require_cache_admin(request: Request) -> None:
+    """快取失效端點的存取檢查：設定 RAG_CACHE_ADMIN_TOKEN 時比對標頭，否則僅限本機"""
+    if CACHE_ADMIN_TOKEN:
+        token = request.headers.get(CACHE_ADMIN_HEADER, "")
+        if not hmac.compare_digest(token.encode("utf-8"), CACHE_ADMIN_TOKEN.encode("utf-8")):
+            raise HTTPException(status_code=403, detail="快取管理權杖無效")
+        return
+    client_host = request.client.host if request.client else ""
+    if client_host not in LOOPBACK_HOSTS:
+        raise HTTPException(status_code=403, detail="未設定 RAG_CACHE_ADMIN_TOKEN，快取失效端點僅限本機呼叫")
+
 # ==================== API 端點 ====================
 
 @app.get("/")
@@ -512,6 +744,40 @@ async def process_query(
         logger.error(f"查詢處理失敗: {e}")
         raise HTTPException(status_code=500, detail=f"查詢處理失敗: {str(e)}")
 
+def _format_sse(event: Dict[str, Any]) -> str:
+    """將串流事件格式化為 Server-Sent Events"""
+    return f"event: {event['event']}\ndata: {json.dumps(event['data'], ensure_ascii=False)}\n\n"
+
+@app.post("/api/v1/query/stream")
+async def process_query_stream(
+    request: UserQueryRequest,
+    pipeline: PodwiseRAGPipeline = Depends(get_rag_pipeline)
+) -> StreamingResponse:
+    """
+    串流處理用戶查詢（Server-Sent Events）
+    
+    事件：metadata（分類與推薦）→ token（回答片段）→ done（信心度、處理時間、首個 token 延遲）；
+    處理失敗時送出 error 事件。串流不含 TTS，前端可在 done 後呼叫 /api/v1/tts/synthesize。
+    """
+    async def event_stream() -> AsyncIterator[str]:
+        try:
+            async for event in pipeline.stream_query(
+                query=request.query,
+                user_id=request.user_id,
+                session_id=request.session_id,
+                metadata=request.metadata
+            ):
+                yield _format_sse(event)
+        except Exception as e:
+            logger.error(f"串流查詢處理失敗: {e}")
+            yield _format_sse({"event": "error", "data": {"detail": f"查詢處理失敗: {str(e)}"}})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 async def process_tts_background(text: str, voice: str, speed: float, response: UserQueryResponse):
     """背景處理 TTS"""
     try:
@@ -595,6 +861,36 @@ async def get_available_voices(pipeline: PodwiseRAGPipeline = Depends(get_rag_pi
         logger.error(f"獲取語音列表失敗: {e}")
         raise HTTPException(status_code=500, detail=f"獲取語音列表失敗: {str(e)}")
 
+@app.get("/api/v1/cache/stats")
+async def get_cache_stats(pipeline: PodwiseRAGPipeline = Depends(get_rag_pipeline)) -> Dict[str, Any]:
+    """獲取語意回應快取統計（命中/未命中/近似命中比例）"""
+    if not pipeline.semantic_cache:
+        return {"enabled": False}
+    return {"enabled": True, **pipeline.semantic_cache.get_stats()}
+
+@app.post("/api/v1/cache/invalidate", dependencies=[Depends(require_cache_admin)])
+async def invalidate_cache(pipeline: PodwiseRAGPipeline = Depends(get_rag_pipeline)) -> Dict[str, Any]:
+    """清空語意回應快取（向量集合更新後呼叫）"""
+    if not pipeline.semantic_cache:
+        return {"enabled": False, "cleared": 0}
+    cleared = pipeline.semantic_cache.invalidate("api")
+    return {"enabled": True, "cleared": cleared, "timestamp": datetime.now().isoformat()}
+
+@app.get("/api/v1/cache/llm/stats")
+async def get_llm_cache_stats() -> Dict[str, Any]:
+    """獲取 LLM 結果快取統計（命中、合併的並行呼叫、略過的非確定性呼叫）"""
+    if not LLM_RESULT_CACHE_AVAILABLE:
+        return {"enabled": False}
+    return {"enabled": True, **get_llm_result_cache().get_stats()}
+
+@app.post("/api/v1/cache/llm/invalidate", dependencies=[Depends(require_cache_admin)])
+async def invalidate_llm_cache() -> Dict[str, Any]:
+    """清空 LLM 結果快取（更換模型或提示詞模板後呼叫）"""
+    if not LLM_RESULT_CACHE_AVAILABLE:
+        return {"enabled": False}
+    get_llm_result_cache().clear()
+    return {"enabled": True, "timestamp": datetime.now().isoformat()}
+
 @app.get("/api/v1/system-info", response_model=SystemInfoResponse)
 async def get_system_info(pipeline: PodwiseRAGPipeline = Depends(get_rag_pipeline)) -> SystemInfoResponse:
     """獲取系統資訊"""
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+BM25 稀疏索引基準測試
+
+以合成語料建置索引後量測查詢延遲（p50/p95）與開啟索引的時間。
+
+用法:
+    python scripts/benchmark_bm25.py --docs 1000000 --queries 500
+    python scripts/benchmark_bm25.py --index data/bm25_index      # 使用既有索引
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import logging
+import tempfile
+from typing import List
+
+import numpy as np
+
+# 添加後端根目錄到 Python 路徑
+backend_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if backend_root not in sys.path:
+    sys.path.insert(0, backend_root)
+
+from utils.bm25_index import BM25Index, BM25IndexBuilder
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+VOCABULARY = [
+    "投資", "理財", "股票", "基金", "創業", "職場", "溝通", "英文", "學習", "科技",
+    "人工智慧", "財報", "市場", "經濟", "通膨", "利率", "房地產", "退休", "保險", "ETF",
+    "心理", "成長", "時間", "管理", "領導", "團隊", "產品", "行銷", "品牌", "設計",
+    "健康", "運動", "睡眠", "飲食", "親子", "教育", "閱讀", "寫作", "旅行", "文化",
+]
+SAMPLE_QUERIES = ["推薦投資理財的節目", "職場溝通技巧", "ETF 長期投資", "人工智慧與科技趨勢", "親子教育與閱讀"]
+
+
+def synthetic_corpus(num_docs: int, words_per_doc: int, seed: int = 42):
+    """產生合成語料（詞頻呈長尾分佈，另加稀有詞）"""
+    rng = random.Random(seed)
+    weights = [1.0 / (rank + 1) for rank in range(len(VOCABULARY))]
+    for i in range(num_docs):
+        words = rng.choices(VOCABULARY, weights=weights, k=words_per_doc)
+        words.append(f"term{rng.randrange(50000)}")
+        yield {"chunk_id": f"chunk_{i}", "chunk_text": " ".join(words), "podcast_name": f"podcast_{i % 500}"}
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """計算百分位數（毫秒）"""
+    return float(np.percentile(values, pct) * 1000.0) if values else 0.0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="BM25 稀疏索引基準測試")
+    parser.add_argument("--index", default=None, help="既有索引目錄（不指定則以合成語料建置）")
+    parser.add_argument("--docs", type=int, default=200000)
+    parser.add_argument("--words-per-doc", type=int, default=60)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--top-k", type=int, default=10)
+    args = parser.parse_args()
+
+    index_dir = args.index
+    if index_dir is None:
+        index_dir = os.path.join(tempfile.gettempdir(), f"podwise_bm25_{args.docs}")
+        start = time.perf_counter()
+        builder = BM25IndexBuilder()
+        builder.add_all(synthetic_corpus(args.docs, args.words_per_doc))
+        builder.save(index_dir)
+        print(f"建置 {args.docs} 文件耗時 {time.perf_counter() - start:.1f}s")
+
+    start = time.perf_counter()
+    index = BM25Index(index_dir)
+    print(f"開啟索引耗時 {(time.perf_counter() - start) * 1000:.1f}ms ({index.num_docs} 文件, {index.num_terms} 詞彙)")
+
+    latencies = []
+    for i in range(args.queries):
+        query = SAMPLE_QUERIES[i % len(SAMPLE_QUERIES)] + f" term{i}"
+        start = time.perf_counter()
+        index.search(query, args.top_k)
+        latencies.append(time.perf_counter() - start)
+
+    print(f"查詢延遲 p50={percentile(latencies, 50):.2f}ms  p95={percentile(latencies, 95):.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+上下文打包基準測試
+
+以合成的檢索結果驗證 core/context_packer.py：
+- 同一集節目的重疊切塊（近似重複）只保留一段
+- 打包後的 token 數不超過預算
+- 與查詢相關的句子優先保留
+- 比較打包前後的 token 數與打包耗時
+
+用法:
+    python scripts/benchmark_context_packing.py --episodes 6 --chunks 8 --budget 512
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+from typing import List
+
+# 添加 rag_pipeline 目錄到 Python 路徑
+rag_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if rag_root not in sys.path:
+    sys.path.insert(0, rag_root)
+
+from core.context_packer import ContextChunk, ContextPacker
+
+QUERY = "推薦適合新手的投資理財 Podcast"
+# 每集一句與查詢相關、內容各不相同的句子
+RELEVANT = [
+    "主持人分享新手投資理財的第一步是先建立六個月的緊急預備金。",
+    "來賓建議投資新手從定期定額買進全市場 ETF 開始。",
+    "本集解釋理財新手常見的錯誤，例如追高殺低與過度交易。",
+    "節目比較了儲蓄險與指數投資，適合剛開始理財的上班族。",
+    "主持人推薦新手先記帳三個月，再決定每月可投資的金額。",
+    "來賓談到投資理財前應先還清高利率的信用卡債務。",
+]
+FILLER = [
+    "節目開頭先閒聊最近的天氣與生活近況。",
+    "主持人提到下週要去旅行，會暫停更新一次。",
+    "感謝贊助商支持本集節目的製作。",
+    "聽眾來信分享了自己養貓的趣事。",
+    "最後提醒大家記得訂閱並留下評論。",
+    "中間穿插了一段關於咖啡沖煮的小知識。",
+]
+
+
+def build_chunks(episodes: int, chunks_per_episode: int, seed: int) -> List[ContextChunk]:
+    """每集以滑動視窗切塊，相鄰切塊內容高度重疊"""
+    rng = random.Random(seed)
+    chunks = []
+    for episode in range(episodes):
+        sentences = [rng.choice(FILLER) for _ in range(chunks_per_episode + 6)]
+        sentences.insert(rng.randrange(len(sentences)), RELEVANT[episode % len(RELEVANT)])
+        for start in range(chunks_per_episode):
+            window = sentences[start:start + 6]
+            chunks.append(ContextChunk(
+                chunk_id=f"ep{episode}_{start}",
+                content="".join(window),
+                score=rng.uniform(0.5, 0.9),
+                group=f"episode_{episode}"
+            ))
+    # 完全相同的片段（同集重複索引）
+    chunks.extend(ContextChunk(chunk_id=f"{c.chunk_id}_dup", content=c.content, score=c.score, group=c.group)
+                  for c in chunks[::chunks_per_episode])
+    rng.shuffle(chunks)
+    return chunks
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="上下文打包基準測試")
+    parser.add_argument("--episodes", type=int, default=6)
+    parser.add_argument("--chunks", type=int, default=8, help="每集切塊數")
+    parser.add_argument("--budget", type=int, default=512, help="token 預算")
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+
+    chunks = build_chunks(args.episodes, args.chunks, seed=42)
+    packer = ContextPacker(max_tokens=args.budget)
+
+    start = time.perf_counter()
+    for _ in range(args.rounds):
+        packed, stats = packer.pack(QUERY, chunks)
+    elapsed_ms = (time.perf_counter() - start) * 1000.0 / args.rounds
+
+    print(f"tokenizer={stats.tokenizer}  預算={stats.max_tokens}")
+    print(f"片段  {stats.chunks_before:4d} → {stats.chunks_after:4d}  （重複片段 {stats.duplicate_chunks}）")
+    print(f"句子  {stats.sentences_before:4d} → {stats.sentences_after:4d}  （重複句子 {stats.duplicate_sentences}）")
+    print(f"token {stats.tokens_before:4d} → {stats.tokens_after:4d}  "
+          f"（減少 {1 - stats.tokens_after / max(stats.tokens_before, 1):.0%}），每次打包 {elapsed_ms:.2f}ms")
+
+    assert stats.tokens_after <= args.budget, "超過 token 預算"
+    assert stats.duplicate_chunks > 0, "未去除同集重複片段"
+    packed_text = "".join(chunk.content for chunk in packed)
+    expected = RELEVANT[:args.episodes]
+    kept_relevant = sum(sentence in packed_text for sentence in expected)
+    print(f"保留相關句子 {kept_relevant}/{len(expected)}")
+    assert kept_relevant == len(expected), "相關句子未優先保留"
+    print("✅ 驗證通過")
+
+
+if __name__ == "__main__":
+    main()
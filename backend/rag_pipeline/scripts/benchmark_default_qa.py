@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+預設問答匹配基準測試
+
+以合成的 default_QA.csv 比較兩種匹配方式，並確認結果完全一致：
+- 全表掃描：每筆問答每次查詢都重新分詞後評分（舊 find_best_match 行為）
+- 倒排索引：載入時預先分詞，只對候選問答評分
+
+用法:
+    python scripts/benchmark_default_qa.py --rows 10000 --queries 300
+"""
+
+import os
+import sys
+import csv
+import time
+import random
+import argparse
+import logging
+import tempfile
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+# 添加 rag_pipeline 根目錄到 Python 路徑
+rag_pipeline_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if rag_pipeline_root not in sys.path:
+    sys.path.insert(0, rag_pipeline_root)
+
+from core.default_qa_processor import DefaultQA, DefaultQAProcessor
+
+logging.basicConfig(level=logging.WARNING)
+logger = logging.getLogger(__name__)
+
+CATEGORIES = ["商業", "教育", "其他"]
+TOPICS = [
+    "投資", "理財", "股票", "基金", "創業", "職場", "溝通", "英文", "學習", "科技",
+    "人工智慧", "財報", "市場", "經濟", "通膨", "利率", "房地產", "退休", "保險", "ETF",
+    "心理", "成長", "時間管理", "領導力", "團隊", "產品", "行銷", "品牌", "設計", "健康",
+]
+TEMPLATES = ["有推薦{a}的節目嗎", "想了解{a}和{b}", "{a}新手該聽什麼", "請推薦關於{a}的 podcast", "{a}跟{b}有什麼關係"]
+SYNONYMS = {"投資": ["投資理財", "買股"], "學習": ["自學", "讀書"], "創業": ["新創", "開公司"]}
+
+
+def write_synthetic_csv(directory: str, rows: int, seed: int = 42) -> Tuple[str, str]:
+    """寫出與 default_QA.csv、tags_info.csv 相同格式的合成資料"""
+    rng = random.Random(seed)
+    qa_path = os.path.join(directory, "default_QA.csv")
+    tags_path = os.path.join(directory, "tags_info.csv")
+
+    with open(qa_path, "w", encoding="utf-8", newline="") as file:
+        file.write("\n")
+        writer = csv.writer(file)
+        for i in range(rows):
+            a, b = rng.sample(TOPICS, 2)
+            question = rng.choice(TEMPLATES).format(a=a, b=b) + f" 第{i}題"
+            writer.writerow(["測試", rng.choice(CATEGORIES), question, f"{a},{b}", f"答案 {i}", "", "", ""])
+
+    with open(tags_path, "w", encoding="utf-8", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(["TAG"] + [f"sync{i}" for i in range(1, 15)])
+        for tag, synonyms in SYNONYMS.items():
+            writer.writerow([tag] + synonyms + [""] * (14 - len(synonyms)))
+
+    return qa_path, tags_path
+
+
+def full_scan(processor: DefaultQAProcessor, query: str, threshold: float) -> Optional[Tuple[DefaultQA, float]]:
+    """舊版全表掃描"""
+    words = processor._preprocess_query(query)
+    best_match, best_confidence = None, 0.0
+    for qa in processor.qa_data:
+        confidence = processor._calculate_similarity(words, qa)
+        if confidence > best_confidence:
+            best_match, best_confidence = qa, confidence
+    if best_match is not None and best_confidence >= threshold:
+        return best_match, best_confidence
+    return None
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """計算百分位數（毫秒）"""
+    return float(np.percentile(values, pct) * 1000.0) if values else 0.0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="預設問答匹配基準測試")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--threshold", type=float, default=0.6, help="answer_generator 使用 0.6")
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    queries = [rng.choice(TEMPLATES).format(a=a, b=b) for a, b in (rng.sample(TOPICS, 2) for _ in range(args.queries))]
+    queries += ["自學英文的方法", "今天天氣如何", "NVIDIA 的財報"]
+
+    with tempfile.TemporaryDirectory() as directory:
+        qa_path, tags_path = write_synthetic_csv(directory, args.rows)
+
+        start = time.perf_counter()
+        processor = DefaultQAProcessor(qa_path, tags_path)
+        print(f"載入並建立索引 {len(processor.qa_data)} 筆耗時 {time.perf_counter() - start:.2f}s")
+
+        scan_latencies, index_latencies, mismatches = [], [], 0
+        for query in queries:
+            start = time.perf_counter()
+            expected = full_scan(processor, query, args.threshold)
+            scan_latencies.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            actual = processor.find_best_match(query, args.threshold)
+            index_latencies.append(time.perf_counter() - start)
+
+            if expected != actual:
+                mismatches += 1
+                print(f"結果不一致: {query!r} 全表={expected} 索引={actual}")
+
+    print(f"全表掃描  p50={percentile(scan_latencies, 50):9.2f}ms  p95={percentile(scan_latencies, 95):9.2f}ms")
+    print(f"倒排索引  p50={percentile(index_latencies, 50):9.2f}ms  p95={percentile(index_latencies, 95):9.2f}ms")
+    print(f"結果不一致: {mismatches} / {len(queries)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+查詢嵌入微批次基準測試
+
+比較兩種方式在 N 個並發查詢下的吞吐量與延遲：
+- 逐筆編碼：每個查詢各自執行一次模型前向計算
+- 微批次：並發查詢合併為一次模型呼叫
+
+用法:
+    python scripts/benchmark_embedding_batching.py --concurrency 32 --rounds 10
+    python scripts/benchmark_embedding_batching.py --simulate   # 無模型時以模擬編碼器測試
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List
+
+import numpy as np
+
+# 添加後端根目錄到 Python 路徑
+backend_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if backend_root not in sys.path:
+    sys.path.insert(0, backend_root)
+
+from utils.embedding_batcher import EmbeddingBatcher
+from utils.embedding_registry import get_shared_encoder
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SAMPLE_QUERIES = [
+    "推薦投資理財podcast",
+    "有沒有關於職場溝通的節目",
+    "想學習英文的podcast推薦",
+    "台積電最新財報分析",
+    "創業初期如何找資金",
+    "親子教育相關的節目",
+    "ETF 長期投資的觀念",
+    "自我成長與時間管理",
+]
+
+
+def simulated_encode(texts: List[str]) -> np.ndarray:
+    """模擬 CPU 前向計算：固定開銷 + 每筆少量成本"""
+    time.sleep(0.020 + 0.002 * len(texts))
+    return np.random.rand(len(texts), 1024).astype(np.float32)
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """計算百分位數（毫秒）"""
+    return float(np.percentile(values, pct) * 1000.0) if values else 0.0
+
+
+async def run_unbatched(encode_fn: Callable[[List[str]], np.ndarray],
+                        concurrency: int, rounds: int) -> List[float]:
+    """逐筆編碼：每個查詢一次模型呼叫"""
+    executor = ThreadPoolExecutor(max_workers=2)
+    loop = asyncio.get_running_loop()
+    latencies: List[float] = []
+
+    async def one(query: str) -> None:
+        start = time.perf_counter()
+        await loop.run_in_executor(executor, encode_fn, [query])
+        latencies.append(time.perf_counter() - start)
+
+    for _ in range(rounds):
+        await asyncio.gather(*(one(SAMPLE_QUERIES[i % len(SAMPLE_QUERIES)]) for i in range(concurrency)))
+
+    executor.shutdown()
+    return latencies
+
+
+async def run_batched(batcher: EmbeddingBatcher, concurrency: int, rounds: int) -> List[float]:
+    """微批次：並發查詢合併為一次模型呼叫"""
+    latencies: List[float] = []
+
+    async def one(query: str) -> None:
+        start = time.perf_counter()
+        await batcher.aencode(query)
+        latencies.append(time.perf_counter() - start)
+
+    for _ in range(rounds):
+        await asyncio.gather(*(one(SAMPLE_QUERIES[i % len(SAMPLE_QUERIES)]) for i in range(concurrency)))
+
+    return latencies
+
+
+def report(name: str, latencies: List[float], elapsed: float) -> None:
+    """輸出結果"""
+    print(f"{name:<10} embeddings/sec={len(latencies) / elapsed:8.1f}  "
+          f"p50={percentile(latencies, 50):7.1f}ms  p95={percentile(latencies, 95):7.1f}ms")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="查詢嵌入微批次基準測試")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--max-batch-size", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--simulate", action="store_true", help="使用模擬編碼器")
+    args = parser.parse_args()
+
+    if args.simulate:
+        encode_fn = simulated_encode
+    else:
+        encoder = get_shared_encoder()
+        if not encoder.available:
+            logger.error("BGE-M3 模型不可用，請改用 --simulate")
+            return
+        encode_fn = lambda texts: encoder.encode(texts, normalize_embeddings=True)
+        encode_fn(["預熱"])
+
+    print(f"並發數: {args.concurrency}, 回合數: {args.rounds}")
+
+    start = time.perf_counter()
+    latencies = await run_unbatched(encode_fn, args.concurrency, args.rounds)
+    report("逐筆編碼", latencies, time.perf_counter() - start)
+
+    batcher = EmbeddingBatcher(encode_fn, max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms)
+    start = time.perf_counter()
+    latencies = await run_batched(batcher, args.concurrency, args.rounds)
+    report("微批次", latencies, time.perf_counter() - start)
+
+    metrics = batcher.get_metrics()
+    print(f"平均批次大小: {metrics['avg_batch_size']:.1f}, 批次數: {metrics['batches']}")
+    batcher.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
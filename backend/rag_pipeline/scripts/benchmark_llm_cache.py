@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+LLM 結果快取基準測試
+
+以模擬延遲的假 LLM 後端驗證 core/llm_result_cache.py：
+- 單一飛行：N 個並行的相同提示詞只呼叫後端一次
+- 跨請求快取：第二輪相同提示詞全部命中，不再呼叫後端
+- 磁碟存放區：記憶體容量不足時淘汰的項目從磁碟讀回
+- 非確定性呼叫：cache_nondeterministic=False 時 temperature > 0 的呼叫不快取
+
+用法:
+    python scripts/benchmark_llm_cache.py --requests 200 --distinct 10 --delay 0.2
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+from typing import Dict
+
+# 添加 rag_pipeline 目錄到 Python 路徑
+rag_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if rag_root not in sys.path:
+    sys.path.insert(0, rag_root)
+
+from core.llm_result_cache import LLMResultCache, make_cache_key
+
+
+class FakeBackend:
+    """模擬延遲的 LLM 後端，記錄呼叫次數"""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.calls = 0
+
+    async def generate(self, prompt: str) -> str:
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return f"改寫: {prompt}"
+
+
+async def run_wave(cache: LLMResultCache, backend: FakeBackend, prompts, params: Dict) -> float:
+    """並行送出一批提示詞，回傳總時間（秒）"""
+    async def one(prompt: str) -> None:
+        key = make_cache_key("fake-qwen", prompt, params)
+        result = await cache.get_or_compute(key, lambda: backend.generate(prompt), params=params)
+        assert result == f"改寫: {prompt}"
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(prompt) for prompt in prompts))
+    return time.perf_counter() - start
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="LLM 結果快取基準測試")
+    parser.add_argument("--requests", type=int, default=200, help="每輪並行請求數")
+    parser.add_argument("--distinct", type=int, default=10, help="不同提示詞數量")
+    parser.add_argument("--delay", type=float, default=0.2, help="假後端每次呼叫延遲（秒）")
+    args = parser.parse_args()
+
+    prompts = [f"推薦投資理財的 Podcast #{i % args.distinct}" for i in range(args.requests)]
+    deterministic = {"temperature": 0.0}
+
+    # 無快取基準
+    backend = FakeBackend(args.delay)
+    start = time.perf_counter()
+    await asyncio.gather(*(backend.generate(prompt) for prompt in prompts))
+    print(f"無快取      時間={(time.perf_counter() - start) * 1000:8.1f}ms  後端呼叫={backend.calls}")
+
+    cache = LLMResultCache(ttl_seconds=600, max_size=args.distinct, disk_path="")
+    backend = FakeBackend(args.delay)
+
+    elapsed = await run_wave(cache, backend, prompts, deterministic)
+    print(f"第一輪      時間={elapsed * 1000:8.1f}ms  後端呼叫={backend.calls}")
+    assert backend.calls == args.distinct, "並行的相同提示詞未合併"
+
+    elapsed = await run_wave(cache, backend, prompts, deterministic)
+    print(f"第二輪      時間={elapsed * 1000:8.1f}ms  後端呼叫={backend.calls}")
+    assert backend.calls == args.distinct, "第二輪未命中快取"
+
+    stats = cache.get_stats()
+    print(f"快取統計: 命中={stats['hits']} 未命中={stats['misses']} 合併={stats['coalesced']}")
+
+    # 記憶體只容納一半的提示詞，其餘淘汰至磁碟
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = LLMResultCache(ttl_seconds=600, max_size=max(1, args.distinct // 2),
+                               disk_path=os.path.join(tmp, "llm_cache.db"))
+        backend = FakeBackend(0.0)
+        distinct_prompts = prompts[:args.distinct]
+        await run_wave(cache, backend, distinct_prompts, deterministic)
+        # 淘汰項目成批寫入磁碟，未滿一批的在此寫入
+        cache.flush()
+        await run_wave(cache, backend, distinct_prompts, deterministic)
+        stats = cache.get_stats()
+        print(f"磁碟存放區  後端呼叫={backend.calls}  記憶體={stats['entries']} 磁碟={stats['disk_entries']} "
+              f"磁碟命中={stats['disk_hits']}")
+        assert backend.calls == args.distinct and stats["disk_hits"] > 0, "淘汰的項目未從磁碟讀回"
+
+    cache = LLMResultCache(ttl_seconds=600, max_size=args.distinct, disk_path="", cache_nondeterministic=False)
+    backend = FakeBackend(0.0)
+    await run_wave(cache, backend, prompts, {"temperature": 0.7})
+    print(f"非確定性    後端呼叫={backend.calls}（排除快取）  略過={cache.get_stats()['bypassed']}")
+    assert backend.calls == args.requests
+
+    print("✅ 驗證通過")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
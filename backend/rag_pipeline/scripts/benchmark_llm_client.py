@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+共用 LLM HTTP 客戶端基準測試
+
+啟動本機假的 OpenAI 相容端點（/v1/chat/completions，支援 stream），比較：
+- 每次新建 session：每個請求各開一個 aiohttp.ClientSession（舊 EnhancedPodcastRecommender 行為）
+- 共用客戶端：utils/llm_http_client.py 的連線池與每模型並發上限
+
+並驗證：所有請求成功、伺服器端同時處理的請求數不超過模型並發上限、
+使用的 TCP 連線數不超過連線池上限，且第二輪請求重用既有連線。
+
+用法:
+    python scripts/benchmark_llm_client.py --requests 50 --concurrency 4 --delay 0.05
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import logging
+from typing import Any, Dict, List, Set
+
+import aiohttp
+from aiohttp import web
+
+# 添加後端根目錄到 Python 路徑
+backend_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if backend_root not in sys.path:
+    sys.path.insert(0, backend_root)
+
+from utils.llm_http_client import LLMHTTPClient
+
+logging.basicConfig(level=logging.WARNING)
+logger = logging.getLogger(__name__)
+
+MODEL = "fake-qwen"
+
+
+class FakeOpenAIServer:
+    """假的 OpenAI 相容端點，記錄並發數與連線"""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.active = 0
+        self.peak_active = 0
+        self.requests = 0
+        self.connections: Set[Any] = set()
+        self.runner = None
+        self.url = ""
+
+    async def handle(self, request: web.Request) -> web.StreamResponse:
+        payload = await request.json()
+        self.requests += 1
+        self.connections.add(request.transport.get_extra_info("peername"))
+        self.active += 1
+        self.peak_active = max(self.peak_active, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+            if not payload.get("stream"):
+                return web.json_response({
+                    "choices": [{"message": {"role": "assistant", "content": "你好"}}]
+                })
+
+            response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+            await response.prepare(request)
+            for token in ["你", "好"]:
+                chunk = {"choices": [{"delta": {"content": token}}]}
+                await response.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+            await response.write(b"data: [DONE]\n\n")
+            await response.write_eof()
+            return response
+        finally:
+            self.active -= 1
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_post("/v1/chat/completions", self.handle)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://127.0.0.1:{port}/v1/chat/completions"
+
+    def reset(self) -> None:
+        self.peak_active = 0
+        self.requests = 0
+        self.connections = set()
+
+    async def stop(self) -> None:
+        await self.runner.cleanup()
+
+
+def build_payload(stream: bool) -> Dict[str, Any]:
+    return {"model": MODEL, "messages": [{"role": "user", "content": "你好"}], "stream": stream}
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """計算百分位數（毫秒）"""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))] * 1000.0
+
+
+def report(name: str, latencies: List[float], elapsed: float, server: FakeOpenAIServer) -> None:
+    """輸出結果"""
+    print(f"{name:<12} 請求={len(latencies):4d}  總時間={elapsed * 1000:8.1f}ms  "
+          f"p50={percentile(latencies, 50):8.2f}ms  p95={percentile(latencies, 95):8.2f}ms  "
+          f"伺服器峰值並發={server.peak_active:3d}  TCP 連線數={len(server.connections):3d}")
+
+
+async def timed(coro) -> float:
+    start = time.perf_counter()
+    await coro
+    return time.perf_counter() - start
+
+
+async def per_call_session(url: str) -> None:
+    """每次請求新建 session（舊行為）"""
+    async with aiohttp.ClientSession() as session:
+        async with session.post(url, json=build_payload(False),
+                                timeout=aiohttp.ClientTimeout(total=60)) as response:
+            await response.json()
+
+
+async def shared_post(client: LLMHTTPClient, url: str) -> None:
+    result = await client.post_json(url, build_payload(False), model=MODEL)
+    assert result["choices"][0]["message"]["content"] == "你好"
+
+
+async def shared_stream(client: LLMHTTPClient, url: str) -> None:
+    tokens = []
+    lines = client.stream_lines(url, build_payload(True), model=MODEL)
+    try:
+        async for line in lines:
+            data = line[len("data:"):].strip()
+            if data == "[DONE]":
+                break
+            tokens.append(json.loads(data)["choices"][0]["delta"]["content"])
+    finally:
+        await lines.aclose()
+    assert "".join(tokens) == "你好"
+
+
+async def run_round(name: str, server: FakeOpenAIServer, requests: int, factory) -> None:
+    server.reset()
+    start = time.perf_counter()
+    latencies = await asyncio.gather(*(timed(factory()) for _ in range(requests)))
+    report(name, list(latencies), time.perf_counter() - start, server)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="共用 LLM HTTP 客戶端基準測試")
+    parser.add_argument("--requests", type=int, default=50, help="同時發出的請求數")
+    parser.add_argument("--concurrency", type=int, default=4, help="模型並發上限")
+    parser.add_argument("--max-connections", type=int, default=8, help="連線池上限")
+    parser.add_argument("--delay", type=float, default=0.05, help="假端點每個請求的處理時間（秒）")
+    args = parser.parse_args()
+
+    server = FakeOpenAIServer(args.delay)
+    await server.start()
+    print(f"假端點: {server.url}，{args.requests} 個並發請求，模型並發上限 {args.concurrency}")
+
+    try:
+        await run_round("每次新建", server, args.requests, lambda: per_call_session(server.url))
+
+        client = LLMHTTPClient(max_connections=args.max_connections,
+                               max_connections_per_host=args.max_connections,
+                               model_concurrency=args.concurrency,
+                               max_queue=args.requests)
+        await run_round("共用客戶端", server, args.requests, lambda: shared_post(client, server.url))
+        assert server.requests == args.requests
+        assert server.peak_active <= args.concurrency, "超過模型並發上限"
+        assert len(server.connections) <= min(args.concurrency, args.max_connections), "超過連線池上限"
+        first_round = set(server.connections)
+
+        await run_round("共用串流", server, args.requests, lambda: shared_stream(client, server.url))
+        assert server.peak_active <= args.concurrency, "串流超過模型並發上限"
+        assert server.connections <= first_round, "串流未重用既有連線"
+
+        stats = client.get_stats()
+        model_stats = stats["models"][MODEL]
+        print(f"客戶端統計: 請求={model_stats['count']} 失敗={model_stats['errors']} "
+              f"拒絕={model_stats['rejected']} 平均排隊={model_stats['avg_wait_ms']:.2f}ms "
+              f"閒置連線={stats['idle_connections']}")
+        assert model_stats["errors"] == 0 and model_stats["rejected"] == 0
+        await client.close()
+        print("✅ 驗證通過")
+    finally:
+        await server.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
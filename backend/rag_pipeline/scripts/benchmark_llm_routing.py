@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+LLM 路由與斷路器基準測試
+
+啟動本機假端點，三個模型依優先級排列：
+- primary：回應很慢（--slow 秒，超過逾時上限）
+- secondary：一律回傳 HTTP 500
+- tertiary：正常且快速
+
+以固定並發送出多批請求，驗證 Qwen3LLMManager：
+- 慢速與故障的模型在幾次失敗後斷路，之後的請求直接送往健康模型
+- 斷路後的請求延遲接近健康端點本身的延遲，不再等待逾時
+- 路由狀態（p50/p95、錯誤率、斷路狀態）可由 get_metrics_summary() 取得
+
+用法:
+    python scripts/benchmark_llm_routing.py --batches 20 --concurrency 10
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+from typing import List
+
+# 縮短逾時上限，讓慢速端點在測試中很快判定失敗（需在匯入管理器前設定）
+os.environ.setdefault("LLM_MAX_TIMEOUT", "1.0")
+os.environ.setdefault("LLM_MIN_TIMEOUT", "0.2")
+os.environ.setdefault("LLM_CIRCUIT_COOLDOWN", "60")
+
+from aiohttp import web
+
+# 添加 rag_pipeline 與後端根目錄到 Python 路徑
+rag_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+backend_root = os.path.dirname(rag_root)
+for path in (backend_root, rag_root):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from core.qwen_llm_manager import ModelCircuit, Qwen3LLM, Qwen3LLMManager, Qwen3ModelConfig
+
+
+class FakeEndpoints:
+    """假的 Ollama /api/chat 端點：慢速、故障與正常三種"""
+
+    def __init__(self, slow: float, fast: float):
+        self.slow = slow
+        self.fast = fast
+        self.calls = {"slow": 0, "broken": 0, "fast": 0}
+        self.runner = None
+        self.base_url = ""
+
+    async def handle_slow(self, request: web.Request) -> web.Response:
+        self.calls["slow"] += 1
+        await asyncio.sleep(self.slow)
+        return web.json_response({"message": {"content": "slow"}})
+
+    async def handle_broken(self, request: web.Request) -> web.Response:
+        self.calls["broken"] += 1
+        return web.Response(status=500, text="model crashed")
+
+    async def handle_fast(self, request: web.Request) -> web.Response:
+        self.calls["fast"] += 1
+        await asyncio.sleep(self.fast)
+        return web.json_response({"message": {"content": "fast"}})
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_post("/slow/api/chat", self.handle_slow)
+        app.router.add_post("/broken/api/chat", self.handle_broken)
+        app.router.add_post("/fast/api/chat", self.handle_fast)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.base_url = f"http://127.0.0.1:{port}"
+
+    async def stop(self) -> None:
+        await self.runner.cleanup()
+
+
+def build_manager(base_url: str) -> Qwen3LLMManager:
+    """以假端點取代預設模型"""
+    manager = Qwen3LLMManager()
+    manager.models = {}
+    for model_type, path in (("primary", "slow"), ("secondary", "broken"), ("tertiary", "fast")):
+        manager.models[model_type] = Qwen3LLM(model_config=Qwen3ModelConfig(
+            name=model_type, endpoint=f"{base_url}/{path}/api/chat", model_type=model_type,
+            max_concurrency=32
+        ))
+    manager.config.models.llm_priority = ["primary", "secondary", "tertiary"]
+    manager.current_model = "primary"
+    manager.model_health = {name: True for name in manager.models}
+    manager.model_metrics = {name: {} for name in manager.models}
+    manager.reset_metrics()
+    return manager
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """計算百分位數（毫秒）"""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))] * 1000.0
+
+
+async def timed_call(manager: Qwen3LLMManager, index: int) -> float:
+    start = time.perf_counter()
+    response = await manager.call_with_fallback(f"問題 {index}", use_cache=False)
+    assert response == "fast", response
+    return time.perf_counter() - start
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="LLM 路由與斷路器基準測試")
+    parser.add_argument("--batches", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--slow", type=float, default=5.0, help="慢速端點延遲（秒）")
+    parser.add_argument("--fast", type=float, default=0.02, help="正常端點延遲（秒）")
+    args = parser.parse_args()
+
+    endpoints = FakeEndpoints(args.slow, args.fast)
+    await endpoints.start()
+    manager = build_manager(endpoints.base_url)
+
+    try:
+        first_batch: List[float] = []
+        later: List[float] = []
+        for batch in range(args.batches):
+            latencies = await asyncio.gather(*(
+                timed_call(manager, batch * args.concurrency + i) for i in range(args.concurrency)
+            ))
+            (first_batch if batch == 0 else later).extend(latencies)
+
+        print(f"第一批   p50={percentile(first_batch, 50):8.2f}ms  p95={percentile(first_batch, 95):8.2f}ms")
+        print(f"之後     p50={percentile(later, 50):8.2f}ms  p95={percentile(later, 95):8.2f}ms")
+        print(f"端點呼叫次數: {endpoints.calls}")
+
+        summary = manager.get_metrics_summary()
+        print(f"路由順序: {summary['routing_order']}")
+        for name, info in summary["models"].items():
+            routing = info["routing"]
+            print(f"  {name:<10} 狀態={routing['state']:<9} 錯誤率={routing['error_rate']:.0%} "
+                  f"斷路次數={routing['trips']} 逾時={routing['timeout_s']:.2f}s")
+
+        assert summary["models"]["primary"]["routing"]["state"] == ModelCircuit.OPEN
+        assert summary["models"]["secondary"]["routing"]["state"] == ModelCircuit.OPEN
+        assert percentile(later, 95) < 200, "斷路後仍等待慢速端點"
+        print("✅ 驗證通過")
+    finally:
+        await endpoints.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
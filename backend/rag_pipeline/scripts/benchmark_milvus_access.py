@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Milvus 存取方式基準測試
+
+在本機 Milvus Lite 檔案上比較三種存取方式的延遲：
+- 每次連線：每次查詢 connect → load → search → release → disconnect（舊 search_service 行為）
+  此方式並發時一個查詢的 release 會卸載其他查詢正在使用的集合，因此只能循序執行
+- 每次載入：共用連線，但每次查詢都呼叫 collection.load()（舊 MilvusDB 行為）
+- 共用管理器：連線與集合只建立、載入一次，搜尋於有界執行緒池中執行
+
+用法:
+    pip install "pymilvus[milvus_lite]"
+    python scripts/benchmark_milvus_access.py --rows 20000 --queries 200 --concurrency 8
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import logging
+import tempfile
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+import numpy as np
+
+# 添加後端根目錄到 Python 路徑
+backend_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if backend_root not in sys.path:
+    sys.path.insert(0, backend_root)
+
+from pymilvus import Collection, CollectionSchema, DataType, FieldSchema, connections, utility
+
+from utils.milvus_client_manager import MilvusClientManager
+
+logging.basicConfig(level=logging.WARNING)
+logger = logging.getLogger(__name__)
+
+COLLECTION_NAME = "benchmark_chunks"
+SEARCH_PARAMS = {"metric_type": "COSINE", "params": {"nprobe": 10}}
+
+
+def build_collection(uri: str, rows: int, dim: int) -> None:
+    """建立測試集合並寫入隨機向量"""
+    connections.connect(alias="setup", uri=uri)
+    if utility.has_collection(COLLECTION_NAME, using="setup"):
+        utility.drop_collection(COLLECTION_NAME, using="setup")
+
+    schema = CollectionSchema([
+        FieldSchema("chunk_id", DataType.VARCHAR, is_primary=True, max_length=64),
+        FieldSchema("chunk_text", DataType.VARCHAR, max_length=256),
+        FieldSchema("embedding", DataType.FLOAT_VECTOR, dim=dim),
+    ])
+    collection = Collection(COLLECTION_NAME, schema, using="setup")
+
+    batch = 5000
+    for start in range(0, rows, batch):
+        count = min(batch, rows - start)
+        collection.insert([
+            [f"chunk_{i}" for i in range(start, start + count)],
+            [f"文本 {i}" for i in range(start, start + count)],
+            np.random.rand(count, dim).astype(np.float32).tolist(),
+        ])
+    collection.flush()
+    collection.create_index("embedding", {"index_type": "IVF_FLAT", "metric_type": "COSINE", "params": {"nlist": 128}})
+    collection.release()
+    connections.disconnect("setup")
+
+
+def search_per_call(uri: str, vector: List[float], top_k: int) -> None:
+    """每次查詢都重新連線、載入與釋放"""
+    alias = f"per_call_{uuid.uuid4().hex}"
+    connections.connect(alias=alias, uri=uri)
+    try:
+        collection = Collection(COLLECTION_NAME, using=alias)
+        collection.load()
+        collection.search([vector], "embedding", SEARCH_PARAMS, limit=top_k, output_fields=["chunk_text"])
+        collection.release()
+    finally:
+        connections.disconnect(alias)
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """計算百分位數（毫秒）"""
+    return float(np.percentile(values, pct) * 1000.0) if values else 0.0
+
+
+def report(name: str, latencies: List[float], elapsed: float) -> None:
+    """輸出結果"""
+    print(f"{name:<10} qps={len(latencies) / elapsed:8.1f}  "
+          f"p50={percentile(latencies, 50):8.2f}ms  p95={percentile(latencies, 95):8.2f}ms")
+
+
+async def run(fn, queries: np.ndarray, concurrency: int, executor: ThreadPoolExecutor = None) -> List[float]:
+    """以固定並發數執行查詢"""
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+
+    async def one(vector: List[float]) -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            if executor is None:
+                await fn(vector)
+            else:
+                await loop.run_in_executor(executor, fn, vector)
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one(vector.tolist()) for vector in queries))
+    return latencies
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Milvus 存取方式基準測試")
+    parser.add_argument("--uri", default=os.path.join(tempfile.gettempdir(), "podwise_benchmark.db"),
+                        help="Milvus Lite 檔案路徑")
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--top-k", type=int, default=8)
+    args = parser.parse_args()
+
+    print(f"建立測試集合: {args.rows} 筆, 維度 {args.dim}")
+    build_collection(args.uri, args.rows, args.dim)
+    queries = np.random.rand(args.queries, args.dim).astype(np.float32)
+
+    # 舊方式的同步呼叫在執行緒中阻塞執行
+    executor = ThreadPoolExecutor(max_workers=args.concurrency)
+
+    start = time.perf_counter()
+    latencies = await run(lambda v: search_per_call(args.uri, v, args.top_k), queries, 1, executor)
+    report("每次連線", latencies, time.perf_counter() - start)
+
+    connections.connect(alias="load_each", uri=args.uri)
+    collection = Collection(COLLECTION_NAME, using="load_each")
+
+    def search_load_each(vector: List[float]) -> None:
+        collection.load()
+        collection.search([vector], "embedding", SEARCH_PARAMS, limit=args.top_k, output_fields=["chunk_text"])
+
+    start = time.perf_counter()
+    latencies = await run(search_load_each, queries, args.concurrency, executor)
+    report("每次載入", latencies, time.perf_counter() - start)
+    collection.release()
+    connections.disconnect("load_each")
+    executor.shutdown()
+
+    manager = MilvusClientManager(max_workers=args.concurrency)
+    manager.get_collection(COLLECTION_NAME, uri=args.uri)
+
+    async def search_managed(vector: List[float]) -> None:
+        await manager.asearch(COLLECTION_NAME, [vector], param=SEARCH_PARAMS,
+                              limit=args.top_k, output_fields=["chunk_text"], uri=args.uri)
+
+    start = time.perf_counter()
+    latencies = await run(search_managed, queries, args.concurrency)
+    report("共用管理器", latencies, time.perf_counter() - start)
+
+    stats = manager.get_stats()["latency"]
+    print(f"管理器統計: search p50={stats['search']['p50_ms']:.2f}ms "
+          f"p95={stats['search']['p95_ms']:.2f}ms, load 次數={stats['load']['count']}")
+    manager.release_all()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
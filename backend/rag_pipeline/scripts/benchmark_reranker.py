@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Cross-Encoder 重排序基準測試
+
+驗證 core/cross_encoder_reranker.py：
+- 每個查詢的所有候選只進行一次批次前向傳遞
+- 相同 (查詢, chunk_id) 第二次直接命中分數快取，不再前向傳遞
+- top-N 截斷，且結果可重現（確定性）
+- 50 個候選的重排序延遲 p95 在毫秒預算內
+
+預設使用確定性的 stub 模型；安裝 sentence-transformers 後可用 --model 指定真實模型，
+比較逐筆打分與批次打分的 CPU 延遲。
+
+用法:
+    python scripts/benchmark_reranker.py --candidates 50 --queries 20 --budget-ms 300
+    python scripts/benchmark_reranker.py --model cross-encoder/mmarco-mMiniLMv2-L12-H384-v1
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+from typing import List
+
+# 添加 rag_pipeline 目錄到 Python 路徑
+rag_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if rag_root not in sys.path:
+    sys.path.insert(0, rag_root)
+
+from core.cross_encoder_reranker import STUB_MODEL, CrossEncoderReranker
+
+TOPICS = ["投資理財", "科技新知", "職涯發展", "語言學習", "心理健康", "創業經驗", "親子教育", "運動健身"]
+
+
+def build_candidates(count: int, seed: int) -> List[dict]:
+    """合成候選片段：每個主題輪流出現"""
+    return [
+        {
+            "chunk_id": f"chunk_{seed}_{i}",
+            "content": f"第 {i} 段：本集主持人深入討論{TOPICS[i % len(TOPICS)]}的實用建議與個人經驗分享。" * 3
+        }
+        for i in range(count)
+    ]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """計算百分位數（毫秒）"""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Cross-Encoder 重排序基準測試")
+    parser.add_argument("--model", default=STUB_MODEL)
+    parser.add_argument("--candidates", type=int, default=50)
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--top-n", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=300.0)
+    args = parser.parse_args()
+
+    reranker = CrossEncoderReranker(model_name=args.model, top_n=args.top_n,
+                                    max_candidates=args.candidates, budget_ms=0)
+    assert reranker.available, f"模型 {args.model} 無法載入"
+
+    queries = [f"推薦{TOPICS[i % len(TOPICS)]}的節目 #{i}" for i in range(args.queries)]
+    candidate_sets = [build_candidates(args.candidates, seed=i) for i in range(args.queries)]
+
+    # 逐筆打分（每個候選各一次前向傳遞）作為對照
+    model = reranker._get_model()
+    per_pair: List[float] = []
+    for query, candidates in zip(queries, candidate_sets):
+        start = time.perf_counter()
+        for candidate in candidates:
+            model.predict([(query, candidate["content"])], batch_size=1, show_progress_bar=False)
+        per_pair.append((time.perf_counter() - start) * 1000.0)
+
+    batched: List[float] = []
+    first_results = []
+    for query, candidates in zip(queries, candidate_sets):
+        passes = reranker.get_stats()["forward_passes"]
+        start = time.perf_counter()
+        ranked = await reranker.rerank(query, candidates, text_of=lambda c: c["content"],
+                                       id_of=lambda c: c["chunk_id"])
+        batched.append((time.perf_counter() - start) * 1000.0)
+        assert reranker.get_stats()["forward_passes"] == passes + 1, "候選未在單次前向傳遞中打分"
+        assert len(ranked) == args.top_n, "top-N 截斷失敗"
+        first_results.append([c["chunk_id"] for c, _ in ranked])
+
+    cached: List[float] = []
+    passes = reranker.get_stats()["forward_passes"]
+    for query, candidates, expected in zip(queries, candidate_sets, first_results):
+        start = time.perf_counter()
+        ranked = await reranker.rerank(query, candidates, text_of=lambda c: c["content"],
+                                       id_of=lambda c: c["chunk_id"])
+        cached.append((time.perf_counter() - start) * 1000.0)
+        assert [c["chunk_id"] for c, _ in ranked] == expected, "結果不可重現"
+    assert reranker.get_stats()["forward_passes"] == passes, "快取命中時仍進行前向傳遞"
+
+    print(f"模型={args.model}  候選={args.candidates}  查詢={args.queries}")
+    print(f"逐筆打分   p50={percentile(per_pair, 50):8.2f}ms  p95={percentile(per_pair, 95):8.2f}ms")
+    print(f"批次打分   p50={percentile(batched, 50):8.2f}ms  p95={percentile(batched, 95):8.2f}ms")
+    print(f"快取命中   p50={percentile(cached, 50):8.2f}ms  p95={percentile(cached, 95):8.2f}ms")
+    stats = reranker.get_stats()
+    print(f"統計: 前向傳遞={stats['forward_passes']} 打分配對={stats['pairs_scored']} "
+          f"快取命中={stats['cache_hits']} 平均前向={stats['avg_forward_ms']:.2f}ms")
+
+    assert percentile(batched, 95) < args.budget_ms, f"批次重排序超過 {args.budget_ms:.0f}ms 預算"
+    print("✅ 驗證通過")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -13,6 +13,8 @@ TAG 處理器
 """
 
 import logging
+import os
+import sys
 import pandas as pd
 import re
 import json
@@ -20,8 +22,14 @@ from typing import List, Dict, Tuple, Set, Any, Optional
 from collections import defaultdict
 from pathlib import Path
 
+# 添加後端根目錄到 Python 路徑
+backend_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if backend_root not in sys.path:
+    sys.path.insert(0, backend_root)
+
 # 導入工具
 from ..core.enhanced_vector_search import SmartTagExtractor
+from utils.keyword_matcher import KeywordMatcher
 
 # 設定日誌
 logging.basicConfig(level=logging.INFO)
@@ -45,6 +53,8 @@ class TagProcessor:
         self.keyword_to_tags = defaultdict(set)
         self.smart_tag_extractor = SmartTagExtractor(existing_tags_file=tag_csv_path)
         self.load_tag_mappings()
+        # 所有關鍵字編譯成單一自動機，每個 chunk 只掃描一次
+        self.keyword_matcher = KeywordMatcher(self.keyword_to_tags.items())
     
     def load_tag_mappings(self):
         """
@@ -131,10 +141,8 @@ class TagProcessor:
     
     def extract_tags_from_chunk(self, chunk: str) -> List[str]:
         matched_tags = set()
-        chunk_lower = chunk.lower()
-        for keyword, tags in self.keyword_to_tags.items():
-            if keyword and keyword in chunk_lower:
-                matched_tags.update(tags)
+        for tags in self.keyword_matcher.find_payloads(chunk):
+            matched_tags.update(tags)
         additional_tags = self.apply_tag_rules(chunk)
         matched_tags.update(additional_tags)
         # fallback: 若無任何標籤命中，呼叫 SmartTagExtractor
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+共用 LLM HTTP 客戶端測試
+
+以本機假的 OpenAI 相容端點（/v1/chat/completions，支援 stream）驗證 utils/llm_http_client.py：
+- 伺服器端同時處理的請求數不超過模型並發上限，超出的請求排隊而非失敗
+- 後續請求（含串流）重用既有 TCP 連線，連線數不超過每主機上限
+- 佇列已滿時拒絕請求（LLMClientBusyError）
+
+用法:
+    python -m pytest tests/test_llm_http_client.py -q
+"""
+
+import os
+import sys
+import json
+import asyncio
+from typing import Any, Dict, Set
+
+import pytest
+
+aiohttp = pytest.importorskip("aiohttp")
+from aiohttp import web
+
+BACKEND_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if BACKEND_ROOT not in sys.path:
+    sys.path.insert(0, BACKEND_ROOT)
+
+from utils.llm_http_client import LLMHTTPClient, LLMClientBusyError
+
+MODEL = "fake-qwen"
+
+
+class FakeOpenAIServer:
+    """假的 OpenAI 相容端點，記錄峰值並發與客戶端連線"""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.active = 0
+        self.peak_active = 0
+        self.requests = 0
+        self.connections: Set[Any] = set()
+        self.runner = None
+        self.url = ""
+
+    async def handle(self, request: web.Request) -> web.StreamResponse:
+        payload = await request.json()
+        self.requests += 1
+        self.connections.add(request.transport.get_extra_info("peername"))
+        self.active += 1
+        self.peak_active = max(self.peak_active, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+            if not payload.get("stream"):
+                return web.json_response({
+                    "choices": [{"message": {"role": "assistant", "content": "你好"}}]
+                })
+
+            response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+            await response.prepare(request)
+            for token in ["你", "好"]:
+                chunk = {"choices": [{"delta": {"content": token}}]}
+                await response.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+            await response.write(b"data: [DONE]\n\n")
+            await response.write_eof()
+            return response
+        finally:
+            self.active -= 1
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_post("/v1/chat/completions", self.handle)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://127.0.0.1:{port}/v1/chat/completions"
+
+    async def stop(self) -> None:
+        await self.runner.cleanup()
+
+
+def build_payload(stream: bool) -> Dict[str, Any]:
+    return {"model": MODEL, "messages": [{"role": "user", "content": "你好"}], "stream": stream}
+
+
+async def stream_text(client: LLMHTTPClient, url: str) -> str:
+    tokens = []
+    lines = client.stream_lines(url, build_payload(True), model=MODEL)
+    try:
+        async for line in lines:
+            data = line[len("data:"):].strip()
+            if data == "[DONE]":
+                break
+            tokens.append(json.loads(data)["choices"][0]["delta"]["content"])
+    finally:
+        await lines.aclose()
+    return "".join(tokens)
+
+
+def test_model_concurrency_cap():
+    async def run():
+        server = FakeOpenAIServer(delay=0.05)
+        await server.start()
+        client = LLMHTTPClient(max_connections=8, max_connections_per_host=8,
+                               model_concurrency=2, max_queue=16)
+        try:
+            results = await asyncio.gather(*(
+                client.post_json(server.url, build_payload(False), model=MODEL) for _ in range(10)
+            ))
+            assert all(r["choices"][0]["message"]["content"] == "你好" for r in results)
+            assert server.requests == 10
+            assert server.peak_active == 2
+
+            texts = await asyncio.gather(*(stream_text(client, server.url) for _ in range(6)))
+            assert texts == ["你好"] * 6
+            assert server.peak_active == 2
+
+            model_stats = client.get_stats()["models"][MODEL]
+            assert model_stats["count"] == 16
+            assert model_stats["errors"] == 0 and model_stats["rejected"] == 0
+            assert model_stats["in_flight"] == 0 and model_stats["waiting"] == 0
+        finally:
+            await client.close()
+            await server.stop()
+
+    asyncio.run(run())
+
+
+def test_connection_reuse():
+    async def run():
+        server = FakeOpenAIServer(delay=0.02)
+        await server.start()
+        client = LLMHTTPClient(max_connections=2, max_connections_per_host=2,
+                               model_concurrency=4, max_queue=16)
+        try:
+            await asyncio.gather(*(
+                client.post_json(server.url, build_payload(False), model=MODEL) for _ in range(8)
+            ))
+            first_round = set(server.connections)
+            assert 1 <= len(first_round) <= 2
+
+            await asyncio.gather(*(
+                client.post_json(server.url, build_payload(False), model=MODEL) for _ in range(8)
+            ))
+            await asyncio.gather(*(stream_text(client, server.url) for _ in range(4)))
+            assert server.connections == first_round, "後續請求未重用既有連線"
+            assert client.get_stats()["idle_connections"] >= 1
+        finally:
+            await client.close()
+            await server.stop()
+
+    asyncio.run(run())
+
+
+def test_rejects_when_queue_full():
+    async def run():
+        server = FakeOpenAIServer(delay=0.1)
+        await server.start()
+        client = LLMHTTPClient(model_concurrency=1, max_queue=1)
+        try:
+            results = await asyncio.gather(*(
+                client.post_json(server.url, build_payload(False), model=MODEL) for _ in range(3)
+            ), return_exceptions=True)
+            rejected = [r for r in results if isinstance(r, LLMClientBusyError)]
+            assert len(rejected) == 1
+            assert server.requests == 2
+            assert client.get_stats()["models"][MODEL]["rejected"] == 1
+        finally:
+            await client.close()
+            await server.stop()
+
+    asyncio.run(run())
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+查詢向量化次數測試
+
+一次完整查詢（語意快取未命中 → 服務管理器 → 功能專家層 / 領導者層檢索）中同一段文本只應編碼一次：
+main.py 為查詢語意快取計算的向量要一路傳到檢索層，不能在各代理人中重新編碼原始查詢；
+查詢改寫後文本不同時，檢索須使用改寫後查詢的向量，不能以原始查詢的向量取代。
+
+共用編碼器換成固定輸出的測試模型，記錄每次編碼的文本；
+Milvus 使用暫存的 Milvus Lite 檔案，不連線外部服務。
+
+用法:
+    python -m pytest tests/test_query_encoding.py -q
+"""
+
+import os
+import sys
+import asyncio
+import hashlib
+import tempfile
+import importlib
+
+import numpy as np
+import pytest
+
+RAG_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND_ROOT = os.path.dirname(RAG_ROOT)
+EMBEDDING_DIM = 1024
+QUERY = "推薦幾個投資理財的 podcast"
+# 不含同義詞擴展詞彙，第一層改寫後文本不變
+PLAIN_QUERY = "投資理財入門"
+
+
+class FixedModel:
+    """固定輸出的嵌入模型：同一段文字永遠得到同一個單位向量，並記錄編碼過的文本"""
+
+    def __init__(self):
+        self.texts = []
+
+    def encode(self, texts, normalize_embeddings=True, batch_size=32, show_progress_bar=False):
+        single = isinstance(texts, str)
+        vectors = []
+        for text in [texts] if single else texts:
+            self.texts.append(text)
+            seed = int(hashlib.md5(text.encode("utf-8")).hexdigest()[:8], 16)
+            vector = np.random.default_rng(seed).standard_normal(EMBEDDING_DIM).astype(np.float32)
+            vectors.append(vector / np.linalg.norm(vector))
+        return vectors[0] if single else np.vstack(vectors)
+
+
+@pytest.fixture(scope="module")
+def encoder():
+    """以測試模型取代共用編碼器，並讓 core / config / utils 指向與部署時相同的套件"""
+    os.environ.setdefault("MILVUS_URI", os.path.join(tempfile.mkdtemp(), "milvus_test.db"))
+    os.environ["CACHE_ENABLED"] = "true"
+    # utils 為後端共用模組，core / config 為 rag_pipeline 內的套件（部署時 PYTHONPATH=/app）
+    sys.path.insert(0, BACKEND_ROOT)
+    importlib.import_module("utils.embedding_registry")
+    sys.path.insert(0, RAG_ROOT)
+    for package in ("core", "config"):
+        if package in sys.modules and not sys.modules[package].__file__.startswith(RAG_ROOT):
+            del sys.modules[package]
+        importlib.import_module(package)
+
+    from config.integrated_config import get_config
+    from utils.embedding_registry import get_shared_encoder
+
+    config = get_config()
+    shared = get_shared_encoder(config.models.text2vec_path, config.models.text2vec_device)
+    shared._model = FixedModel()
+    return shared
+
+
+def test_full_query_encodes_once(encoder):
+    main = importlib.import_module("main")
+    pipeline = main.PodwiseRAGPipeline()
+    assert pipeline.service_manager is not None
+    assert pipeline.semantic_cache is not None, "語意快取未啟用，無法驗證快取向量沿用到檢索層"
+
+    before = len(encoder._model.texts)
+    response = asyncio.run(pipeline.process_query(QUERY, "Podwise0001"))
+    assert response.metadata.get("cache_hit") is not True
+    encoded = encoder._model.texts[before:]
+    assert encoded.count(QUERY) == 1
+    assert len(encoded) == len(set(encoded))
+
+
+class RecordingSearch:
+    """記錄密集檢索收到的查詢向量"""
+
+    def __init__(self):
+        self.vectors = []
+
+    async def search_by_vector(self, query_vector, top_k=10):
+        self.vectors.append(list(query_vector))
+        return [{'chunk_id': 'c1', 'content': QUERY, 'similarity_score': 0.9, 'metadata': {}}]
+
+
+def test_hierarchical_pipeline_uses_given_vector(encoder):
+    from core.hierarchical_rag_pipeline import HierarchicalRAGPipeline
+
+    pipeline = HierarchicalRAGPipeline()
+    search = RecordingSearch()
+    pipeline.levels['level_2'].milvus_search = search
+    assert asyncio.run(pipeline.levels['level_1']._rewrite_query(PLAIN_QUERY)) == PLAIN_QUERY
+
+    query_vector = FixedModel().encode(PLAIN_QUERY).tolist()
+    before = encoder.encode_calls
+    asyncio.run(pipeline.process_query(PLAIN_QUERY, query_vector=query_vector))
+    assert encoder.encode_calls == before
+    assert search.vectors == [query_vector]
+
+
+def test_hierarchical_pipeline_encodes_rewritten_query(encoder):
+    from core.hierarchical_rag_pipeline import HierarchicalRAGPipeline
+
+    pipeline = HierarchicalRAGPipeline()
+    search = RecordingSearch()
+    pipeline.levels['level_2'].milvus_search = search
+
+    # 同義詞擴展隨機選詞，以實際編碼的文本比對
+    before = len(encoder._model.texts)
+    asyncio.run(pipeline.process_query(QUERY, query_vector=FixedModel().encode(QUERY).tolist()))
+    encoded = encoder._model.texts[before:]
+    assert len(encoded) == 1 and encoded[0] != QUERY
+    assert len(search.vectors) == 1
+    assert np.allclose(search.vectors[0], FixedModel().encode(encoded[0]))
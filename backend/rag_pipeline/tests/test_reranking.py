@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+第四層重新排序測試
+
+以確定性的 stub cross-encoder（RERANKER_MODEL=stub 使用的字元重疊模型）驗證 Level4Reranking：
+- 候選依 cross-encoder 分數重新排序，保留第一階段分數
+- 信心值由保留結果的重排序分數計算：相關候選信心值高、不相關候選信心值低，不是固定值
+- 模型輸出 logit（超出 [0, 1]）時先轉換再計算信心值
+- 無模型時維持第一階段排序，信心值依第一階段分數計算
+
+用法:
+    python -m pytest tests/test_reranking.py -q
+"""
+
+import os
+import sys
+import asyncio
+import importlib
+
+import pytest
+
+RAG_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND_ROOT = os.path.dirname(RAG_ROOT)
+QUERY = "投資理財入門"
+
+
+@pytest.fixture(scope="module")
+def hierarchical():
+    """讓 core / config 指向 rag_pipeline 內的套件（部署時 PYTHONPATH=/app）"""
+    sys.path.insert(0, BACKEND_ROOT)
+    sys.path.insert(0, RAG_ROOT)
+    for package in ("core", "config"):
+        if package in sys.modules and not sys.modules[package].__file__.startswith(RAG_ROOT):
+            del sys.modules[package]
+        importlib.import_module(package)
+    return importlib.import_module("core.hierarchical_rag_pipeline")
+
+
+class LogitModel:
+    """輸出未經 sigmoid 的 logit：內容含查詢時為正，否則為負"""
+
+    def predict(self, pairs, batch_size=32, **kwargs):
+        return [6.0 if query in text else -6.0 for query, text in pairs]
+
+
+def make_level(hierarchical, model=None):
+    from core.cross_encoder_reranker import CrossEncoderReranker, StubCrossEncoder
+
+    level = hierarchical.Level4Reranking({'name': '重新排序', 'enable_cross_encoder': False, 'rerank_top_k': 3})
+    if model is not None:
+        level.reranker = CrossEncoderReranker(
+            model_name="test", model=StubCrossEncoder() if model == "stub" else model, budget_ms=0
+        )
+    return level
+
+
+def make_results(hierarchical, contents, prefix="doc"):
+    # 分數快取以 document_id 為鍵值，不同候選組使用不同前綴
+    return [
+        hierarchical.SearchResult(document_id=f"{prefix}{i}", content=content, score=0.9 - i * 0.1,
+                                  source="test", metadata={})
+        for i, content in enumerate(contents)
+    ]
+
+
+def run_level(hierarchical, level, results):
+    async def run():
+        token = hierarchical._current_query.set(QUERY)
+        try:
+            return await level.process(results)
+        finally:
+            hierarchical._current_query.reset(token)
+
+    return asyncio.run(run())
+
+
+def test_stub_model_reorders_and_derives_confidence(hierarchical):
+    level = make_level(hierarchical, "stub")
+    # 第一階段分數與相關度相反，重排序後順序應改變
+    relevant = make_results(hierarchical, ["天氣晴朗", "美食旅遊", "投資理財入門：先建立預算", "理財新手"])
+
+    ranked, confidence = run_level(hierarchical, level, relevant)
+    assert ranked[0].document_id == "doc2"
+    assert ranked[0].metadata['retrieval_score'] == pytest.approx(0.7)
+    assert ranked[0].score == ranked[0].metadata['rerank_score']
+    expected = level._score_confidence([r.metadata['rerank_score'] for r in ranked[:3]])
+    assert confidence == pytest.approx(expected)
+
+    unrelated = make_results(hierarchical, ["天氣晴朗", "美食旅遊", "運動健身", "電影評論"], prefix="other")
+    _, low_confidence = run_level(hierarchical, level, unrelated)
+    assert low_confidence < 0.1 < confidence
+
+
+def test_logit_scores_are_squashed(hierarchical):
+    level = make_level(hierarchical, LogitModel())
+    results = make_results(hierarchical, ["投資理財入門一", "投資理財入門二", "投資理財入門三", "天氣晴朗"])
+
+    ranked, confidence = run_level(hierarchical, level, results)
+    assert ranked[0].metadata['rerank_score'] == 6.0
+    assert 0.9 < confidence <= 1.0
+
+
+def test_without_model_uses_first_stage_scores(hierarchical):
+    level = make_level(hierarchical)
+    results = make_results(hierarchical, ["天氣晴朗", "投資理財入門", "美食旅遊"])
+
+    ranked, confidence = run_level(hierarchical, level, results)
+    assert [r.document_id for r in ranked] == ["doc0", "doc1", "doc2"]
+    assert confidence == pytest.approx(level._score_confidence([0.9, 0.8, 0.7]))
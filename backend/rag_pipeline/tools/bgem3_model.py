@@ -14,20 +14,29 @@ Text2Vec Model
 版本: 1.0.0
 """
 
+import os
+import sys
 import logging
 import numpy as np
 from typing import List, Optional, Dict, Any, Union
 from dataclasses import dataclass
 import asyncio
 
+# 添加後端根目錄到 Python 路徑
+backend_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if backend_root not in sys.path:
+    sys.path.insert(0, backend_root)
+
 # 嘗試導入 text2vec 相關庫
 try:
-    from sentence_transformers import SentenceTransformer
+    import sentence_transformers  # noqa: F401
     TEXT2VEC_AVAILABLE = True
 except ImportError:
     TEXT2VEC_AVAILABLE = False
     logging.warning("sentence_transformers 未安裝，將使用備援向量化方法")
 
+from utils.embedding_registry import get_shared_encoder, MAX_BATCH_SIZE, MAX_WAIT_MS
+
 logger = logging.getLogger(__name__)
 
 
@@ -49,10 +58,11 @@ class Text2VecModel:
                  model_name: str = "bge-m3",
                  model_path: str = "BAAI/bge-m3",
                  max_length: int = 512,
-                 batch_size: int = 32,
+                 batch_size: Optional[int] = None,
                  normalize_embeddings: bool = True,
                  pooling_strategy: str = "mean",
-                 device: str = "auto"):
+                 device: str = "auto",
+                 max_wait_ms: Optional[float] = None):
         """
         初始化 Text2Vec 模型
         
@@ -60,46 +70,48 @@ class Text2VecModel:
             model_name: 模型名稱
             model_path: 模型路徑
             max_length: 最大長度
-            batch_size: 批次大小
+            batch_size: 批次大小，None 時使用 EMBEDDING_MAX_BATCH_SIZE
             normalize_embeddings: 是否正規化嵌入
             pooling_strategy: 池化策略
             device: 設備
+            max_wait_ms: 微批次最大等待時間（毫秒），並發查詢在此視窗內合併為一次模型呼叫，
+                None 時使用 EMBEDDING_MAX_WAIT_MS
         """
         self.model_name = model_name
         self.model_path = model_path
         self.max_length = max_length
-        self.batch_size = batch_size
+        self.batch_size = batch_size if batch_size is not None else MAX_BATCH_SIZE
         self.normalize_embeddings = normalize_embeddings
         self.pooling_strategy = pooling_strategy
         self.device = device
-        self.model = None
+        self.max_wait_ms = max_wait_ms if max_wait_ms is not None else MAX_WAIT_MS
+        self.encoder = None
+        self.batcher = None
         
         # 初始化模型
         self._initialize_model()
     
+    @property
+    def model(self):
+        """共用模型實例，每次存取都向共用編碼器取得（載入失敗時於退避時間過後重試）"""
+        return self.encoder.model if self.encoder is not None else None
+    
     def _initialize_model(self):
-        """初始化模型"""
+        """初始化模型（權重由共用註冊表載入，同一程序只載入一次）"""
         try:
-            if TEXT2VEC_AVAILABLE:
-                # 修復設備配置問題
-                device = self.device
-                if device == "auto":
-                    import torch
-                    device = "cuda" if torch.cuda.is_available() else "cpu"
-                
-                # 使用 sentence_transformers 載入 BGE-M3 模型
-                self.model = SentenceTransformer(
-                    self.model_path,
-                    device=device
-                )
-                logger.info(f"✅ Text2Vec 模型初始化成功: {self.model_name} (設備: {device})")
-            else:
-                logger.warning("sentence_transformers 未安裝，將使用備援向量化方法")
-                self.model = None
+            if not TEXT2VEC_AVAILABLE:
+                logger.warning("sentence_transformers 未安裝，模型無法載入時使用備援向量化方法")
+            self.encoder = get_shared_encoder(self.model_path, self.device)
+            self.batcher = self.encoder.get_batcher(
+                normalize_embeddings=self.normalize_embeddings,
+                max_batch_size=self.batch_size,
+                max_wait_ms=self.max_wait_ms
+            )
+            if self.model is not None:
+                logger.info(f"✅ Text2Vec 模型初始化成功: {self.model_name} (設備: {self.encoder.device})")
                 
         except Exception as e:
             logger.error(f"Text2Vec 模型初始化失敗: {e}")
-            self.model = None
     
     async def encode(self, text: str) -> VectorizationResult:
         """
@@ -159,7 +171,7 @@ class Text2VecModel:
     
     async def encode_batch(self, texts: List[str]) -> List[VectorizationResult]:
         """
-        批量向量化
+        批量向量化（單次模型呼叫）
         
         Args:
             texts: 文字列表
@@ -167,18 +179,49 @@ class Text2VecModel:
         Returns:
             List[VectorizationResult]: 向量化結果列表
         """
-        results = []
+        import time
+        start_time = time.time()
         
-        for text in texts:
-            try:
-                result = await self.encode(text)
-                results.append(result)
-            except Exception as e:
-                logger.error(f"批量向量化失敗: {e}")
+        processed_texts = [self._preprocess_text(text) for text in texts]
+        valid_indices = [i for i, text in enumerate(processed_texts) if text]
+        vectors: Dict[int, List[float]] = {}
+        error_message = ""
+        
+        try:
+            valid_texts = [processed_texts[i] for i in valid_indices]
+            if valid_texts and self.model is not None and self.encoder is not None:
+                embeddings = await self.encoder.aencode(
+                    valid_texts,
+                    normalize_embeddings=self.normalize_embeddings,
+                    batch_size=self.batch_size
+                )
+                for i, embedding in zip(valid_indices, embeddings):
+                    vectors[i] = np.asarray(embedding, dtype=np.float64).tolist()
+            else:
+                for i in valid_indices:
+                    vectors[i] = self._encode_fallback(processed_texts[i])
+        except Exception as e:
+            logger.error(f"批量向量化失敗: {e}")
+            error_message = str(e)
+        
+        processing_time = time.time() - start_time
+        results = []
+        for i, text in enumerate(texts):
+            vector = vectors.get(i)
+            if vector is None:
                 results.append(VectorizationResult(
                     success=False,
                     text=text,
-                    error_message=str(e)
+                    error_message=error_message or "文字預處理失敗",
+                    processing_time=processing_time
+                ))
+            else:
+                results.append(VectorizationResult(
+                    success=True,
+                    vector=vector,
+                    text=text,
+                    dimension=len(vector),
+                    processing_time=processing_time
                 ))
         
         return results
@@ -246,17 +289,11 @@ class Text2VecModel:
             Optional[List[float]]: 向量化結果
         """
         try:
-            if self.model is None:
+            if self.model is None or self.batcher is None:
                 return None
                 
-            # 使用 sentence_transformers 進行向量化
-            embedding = self.model.encode(
-                text,
-                normalize_embeddings=self.normalize_embeddings
-            )
-            
-            # 轉換為列表 - 修正向量處理
-            import numpy as np
+            # 經由微批次處理器向量化，與並發查詢合併為一次模型呼叫，且不阻塞事件迴圈
+            embedding = await self.batcher.aencode(text)
             
             # 直接轉換為 numpy 陣列然後轉為列表
             embedding_array = np.array(embedding, dtype=np.float64)
@@ -307,13 +344,21 @@ class Text2VecModel:
             "max_length": self.max_length,
             "normalize_embeddings": self.normalize_embeddings,
             "model_available": self.model is not None,
+            "device": self.encoder.device if self.encoder else None,
+            "batching": self.batcher.get_metrics() if self.batcher else None,
             "text2vec_available": TEXT2VEC_AVAILABLE
         }
 
 
-def get_bgem3_model():
-    """獲取 BGE-M3 模型實例"""
-    return Text2VecModel()
+_default_model: Optional[Text2VecModel] = None
+
+
+def get_bgem3_model() -> Text2VecModel:
+    """獲取 BGE-M3 模型實例（程序內共用）"""
+    global _default_model
+    if _default_model is None:
+        _default_model = Text2VecModel()
+    return _default_model
 
 
 async def test_bgem3_model():
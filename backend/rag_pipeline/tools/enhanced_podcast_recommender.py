@@ -94,6 +94,8 @@ class EnhancedPodcastRecommender:
         
         # 初始化組件
         self.milvus_client = None
+        self.milvus_manager = None
+        self.milvus_collection = None
         self.llm_client = None
         self.langfuse_client = None
         
@@ -126,23 +128,17 @@ class EnhancedPodcastRecommender:
     async def _initialize_milvus(self) -> None:
         """初始化 Milvus 客戶端"""
         try:
-            from pymilvus import connections, Collection
+            from utils.milvus_client_manager import get_milvus_manager
             
-            # 連接到 Milvus
-            connections.connect(
-                alias="default",
+            # 連線與集合載入由共用管理器負責
+            self.milvus_manager = get_milvus_manager()
+            self.milvus_collection = self.milvus_manager.get_collection(
+                self.collection_name,
                 host=self.milvus_host,
                 port=self.milvus_port
             )
-            
-            # 檢查集合是否存在
-            from pymilvus import utility
-            if utility.has_collection(self.collection_name):
-                self.milvus_collection = Collection(self.collection_name)
+            if self.milvus_collection is not None:
                 logger.info(f"Milvus 集合 '{self.collection_name}' 連接成功")
-            else:
-                logger.warning(f"Milvus 集合 '{self.collection_name}' 不存在")
-                self.milvus_collection = None
                 
         except ImportError:
             logger.warning("pymilvus 未安裝，Milvus 功能將被禁用")
@@ -281,19 +277,16 @@ class EnhancedPodcastRecommender:
             # 生成查詢向量
             query_vector = await self._generate_query_embedding(query)
             
-            # 執行向量搜尋
-            search_params = {
-                "metric_type": "COSINE",
-                "params": {"nprobe": 10}
-            }
-            
-            # 修正：使用正確的欄位名稱
-            results = self.milvus_collection.search(
-                data=[query_vector],
+            # 執行向量搜尋（於共用管理器的有界執行緒池中執行）
+            results = await self.milvus_manager.asearch(
+                self.collection_name,
+                [query_vector],
                 anns_field="embedding",
-                param=search_params,
+                param={"metric_type": "COSINE", "params": {"nprobe": 10}},
                 limit=limit,
-                output_fields=["podcast_id", "episode_title", "chunk_text", "category", "tags", "podcast_name"]
+                output_fields=["podcast_id", "episode_title", "chunk_text", "category", "tags", "podcast_name"],
+                host=self.milvus_host,
+                port=self.milvus_port
             )
             
             # 格式化結果
@@ -383,6 +376,11 @@ class EnhancedPodcastRecommender:
                 except Exception as e:
                     logger.warning(f"OpenAI 嵌入失敗: {e}")
             
+            # 備用：使用程序內共用的 BGE-M3 模型
+            local_embedding = await self._generate_local_embedding(query)
+            if local_embedding:
+                return local_embedding
+            
             # 備用：使用本地 Ollama 嵌入模型
             if os.getenv("OLLAMA_HOST"):
                 return await self._generate_ollama_embedding(query)
@@ -394,11 +392,31 @@ class EnhancedPodcastRecommender:
             logger.error(f"生成查詢向量失敗: {e}")
             return self._simple_embedding(query)
     
+    async def _generate_local_embedding(self, query: str) -> Optional[List[float]]:
+        """使用程序內共用的 BGE-M3 查詢模型生成嵌入向量（與檢索共用同一編碼器與微批次處理器）"""
+        try:
+            try:
+                from .bgem3_model import get_bgem3_model
+            except ImportError:
+                from bgem3_model import get_bgem3_model
+            
+            model = get_bgem3_model()
+            if model.model is None:
+                return None
+            
+            result = await model.encode(query)
+            return result.vector if result.success else None
+            
+        except Exception as e:
+            logger.warning(f"本地 BGE-M3 嵌入失敗: {e}")
+            return None
+    
     async def _generate_ollama_embedding(self, query: str) -> List[float]:
         """生成 Ollama 嵌入向量"""
         try:
-            import aiohttp
+            from utils.llm_http_client import get_llm_http_client
             
+            client = get_llm_http_client()
             ollama_host = os.getenv("OLLAMA_HOST", "http://localhost:11434")
             
             # 統一使用 BGE-M3 嵌入模型 (1024維)
@@ -409,33 +427,27 @@ class EnhancedPodcastRecommender:
             
             for model in embedding_models:
                 try:
-                    async with aiohttp.ClientSession() as session:
-                        async with session.post(
-                            f"{ollama_host}/api/embeddings",
-                            json={"model": model, "prompt": query},
-                            timeout=aiohttp.ClientTimeout(total=30)
-                        ) as response:
-                            
-                            if response.status == 200:
-                                data = await response.json()
-                                embedding = data.get("embedding", [])
-                                
-                                # 標準化向量維度為 1024
-                                if len(embedding) == 1024:
-                                    logger.info(f"使用 {model} 生成 1024 維嵌入向量")
-                                    return embedding
-                                elif len(embedding) > 1024:
-                                    # 截斷到 1024 維
-                                    logger.warning(f"{model} 生成 {len(embedding)} 維向量，截斷到 1024 維")
-                                    return embedding[:1024]
-                                else:
-                                    # 填充到 1024 維
-                                    logger.warning(f"{model} 生成 {len(embedding)} 維向量，填充到 1024 維")
-                                    return embedding + [0.0] * (1024 - len(embedding))
-                            else:
-                                logger.warning(f"{model} 嵌入失敗: {response.status}")
-                                continue
-                                
+                    data = await client.post_json(
+                        f"{ollama_host}/api/embeddings",
+                        {"model": model, "prompt": query},
+                        model=f"ollama:{model}",
+                        timeout=30
+                    )
+                    embedding = data.get("embedding", [])
+                    
+                    # 標準化向量維度為 1024
+                    if len(embedding) == 1024:
+                        logger.info(f"使用 {model} 生成 1024 維嵌入向量")
+                        return embedding
+                    elif len(embedding) > 1024:
+                        # 截斷到 1024 維
+                        logger.warning(f"{model} 生成 {len(embedding)} 維向量，截斷到 1024 維")
+                        return embedding[:1024]
+                    else:
+                        # 填充到 1024 維
+                        logger.warning(f"{model} 生成 {len(embedding)} 維向量，填充到 1024 維")
+                        return embedding + [0.0] * (1024 - len(embedding))
+                        
                 except Exception as e:
                     logger.warning(f"{model} 嵌入失敗: {e}")
                     continue
@@ -515,9 +527,9 @@ class EnhancedPodcastRecommender:
     async def _call_ollama_llm(self, prompt: str) -> str:
         """調用 Ollama LLM"""
         try:
-            import aiohttp
-            import json
+            from utils.llm_http_client import get_llm_http_client
             
+            client = get_llm_http_client()
             ollama_host = os.getenv("OLLAMA_HOST", "http://localhost:11434")
             
             # 嘗試多個 LLM 模型，按優先級排序
@@ -533,26 +545,21 @@ class EnhancedPodcastRecommender:
             
             for model in llm_models:
                 try:
-                    async with aiohttp.ClientSession() as session:
-                        async with session.post(
-                            f"{ollama_host}/api/generate",
-                            json={
-                                "model": model,
-                                "prompt": prompt,
-                                "stream": False
-                            },
-                            timeout=aiohttp.ClientTimeout(total=60)
-                        ) as response:
-                            if response.status == 200:
-                                data = await response.json()
-                                response_text = data.get("response", "")
-                                if response_text:
-                                    logger.info(f"使用 {model} 成功生成回應")
-                                    return response_text
-                            else:
-                                logger.warning(f"{model} 調用失敗: {response.status}")
-                                continue
-                                
+                    data = await client.post_json(
+                        f"{ollama_host}/api/generate",
+                        {
+                            "model": model,
+                            "prompt": prompt,
+                            "stream": False
+                        },
+                        model=f"ollama:{model}",
+                        timeout=60
+                    )
+                    response_text = data.get("response", "")
+                    if response_text:
+                        logger.info(f"使用 {model} 成功生成回應")
+                        return response_text
+                        
                 except Exception as e:
                     logger.warning(f"{model} 調用失敗: {e}")
                     continue
@@ -763,8 +770,8 @@ class EnhancedPodcastRecommender:
     async def cleanup(self) -> None:
         """清理資源"""
         try:
-            if self.milvus_collection:
-                self.milvus_collection.release()
+            # 集合由共用 Milvus 管理器持有，不在此釋放
+            self.milvus_collection = None
             
             if self.langfuse_client:
                 self.langfuse_client.flush()
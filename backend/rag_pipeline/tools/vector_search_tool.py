@@ -102,28 +102,23 @@ class MilvusVectorSearch:
         self.host = host
         self.port = port
         self.collection_name = collection_name
+        self.manager = None
         self.collection = None
         self._connect()
     
     def _connect(self):
-        """連接到 Milvus"""
+        """連接到 Milvus（連線與集合載入由共用管理器負責）"""
         try:
-            from pymilvus import connections, Collection, utility
+            from utils.milvus_client_manager import get_milvus_manager
             
-            # 連接到 Milvus
-            connections.connect(
-                alias="default",
+            self.manager = get_milvus_manager()
+            self.collection = self.manager.get_collection(
+                self.collection_name,
                 host=self.host,
                 port=self.port
             )
-            
-            # 檢查集合是否存在
-            if utility.has_collection(self.collection_name):
-                self.collection = Collection(self.collection_name)
-                self.collection.load()
+            if self.collection is not None:
                 logger.info(f"連接到 Milvus 集合: {self.collection_name}")
-            else:
-                logger.warning(f"Milvus 集合不存在: {self.collection_name}")
                 
         except ImportError:
             logger.warning("pymilvus 未安裝，向量搜尋功能不可用")
@@ -132,45 +127,69 @@ class MilvusVectorSearch:
             logger.error(f"連接 Milvus 失敗: {e}")
             self.collection = None
     
+    def _search_kwargs(self, top_k: int) -> Dict[str, Any]:
+        """共用搜尋參數"""
+        return {
+            "anns_field": "embedding",
+            "param": {
+                "metric_type": "IP",  # 內積相似度
+                "params": {"nprobe": 10}
+            },
+            "limit": top_k,
+            "output_fields": ["chunk_id", "chunk_text", "episode_title", "podcast_name", "tags"],
+            "host": self.host,
+            "port": self.port
+        }
+    
+    def _format_results(self, results: Any) -> List[VectorSearchResult]:
+        """格式化結果"""
+        search_results = []
+        for hit in results[0]:
+            result = VectorSearchResult(
+                chunk_id=hit.entity.get("chunk_id", ""),
+                chunk_text=hit.entity.get("chunk_text", ""),
+                similarity_score=float(hit.score),
+                metadata={
+                    "episode_title": hit.entity.get("episode_title", ""),
+                    "podcast_name": hit.entity.get("podcast_name", ""),
+                    "distance": float(hit.distance) if hasattr(hit, 'distance') else 0.0
+                },
+                tags=hit.entity.get("tags", []),
+                episode_title=hit.entity.get("episode_title", ""),
+                podcast_name=hit.entity.get("podcast_name", "")
+            )
+            search_results.append(result)
+        return search_results
+    
     def search(self, query_vector: np.ndarray, top_k: int = 5) -> List[VectorSearchResult]:
         """向量搜尋"""
         if not self.is_available():
             return []
         
         try:
-            # 執行向量搜尋
-            search_params = {
-                "metric_type": "IP",  # 內積相似度
-                "params": {"nprobe": 10}
-            }
-            
-            results = self.collection.search(
-                data=[query_vector.tolist()],
-                anns_field="embedding",
-                param=search_params,
-                limit=top_k,
-                output_fields=["chunk_id", "chunk_text", "episode_title", "podcast_name", "tags"]
+            results = self.manager.search(
+                self.collection_name,
+                [np.asarray(query_vector).tolist()],
+                **self._search_kwargs(top_k)
             )
+            return self._format_results(results)
             
-            # 格式化結果
-            search_results = []
-            for hit in results[0]:
-                result = VectorSearchResult(
-                    chunk_id=hit.entity.get("chunk_id", ""),
-                    chunk_text=hit.entity.get("chunk_text", ""),
-                    similarity_score=float(hit.score),
-                    metadata={
-                        "episode_title": hit.entity.get("episode_title", ""),
-                        "podcast_name": hit.entity.get("podcast_name", ""),
-                        "distance": float(hit.distance) if hasattr(hit, 'distance') else 0.0
-                    },
-                    tags=hit.entity.get("tags", []),
-                    episode_title=hit.entity.get("episode_title", ""),
-                    podcast_name=hit.entity.get("podcast_name", "")
-                )
-                search_results.append(result)
-            
-            return search_results
+        except Exception as e:
+            logger.error(f"向量搜尋失敗: {e}")
+            return []
+    
+    async def asearch(self, query_vector: np.ndarray, top_k: int = 5) -> List[VectorSearchResult]:
+        """非同步向量搜尋（於共用管理器的有界執行緒池中執行）"""
+        if not self.is_available():
+            return []
+        
+        try:
+            results = await self.manager.asearch(
+                self.collection_name,
+                [np.asarray(query_vector).tolist()],
+                **self._search_kwargs(top_k)
+            )
+            return self._format_results(results)
             
         except Exception as e:
             logger.error(f"向量搜尋失敗: {e}")
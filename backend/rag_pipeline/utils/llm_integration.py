@@ -26,6 +26,20 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 
 logger = logging.getLogger(__name__)
 
+try:
+    from core.llm_result_cache import get_llm_result_cache, make_cache_key
+    LLM_CACHE_AVAILABLE = True
+except ImportError as e:
+    logger.warning(f"LLM 結果快取不可用: {e}")
+    LLM_CACHE_AVAILABLE = False
+
+try:
+    from core.cross_encoder_reranker import get_cross_encoder_reranker
+    RERANKER_AVAILABLE = True
+except ImportError as e:
+    logger.warning(f"Cross-encoder 重排序器不可用: {e}")
+    RERANKER_AVAILABLE = False
+
 
 @dataclass
 class LLMConfig:
@@ -66,18 +80,34 @@ class LLMIntegrationService:
             logger.warning(f"LLM 服務健康檢查失敗: {e}")
             return False
     
-    async def generate_text(self, prompt: str, model: str = None) -> Optional[str]:
-        """生成文字"""
+    async def generate_text(self, prompt: str, model: str = None, use_cache: bool = True) -> Optional[str]:
+        """
+        生成文字
+        
+        查詢改寫、標籤提取等提示詞在不同用戶間高度重複，相同模型、提示詞與參數的結果
+        跨請求快取，並行中的相同呼叫只送出一次；失敗（None）不快取。
+        """
+        params = {
+            "model": model or self.config.model,
+            "max_tokens": self.config.max_tokens,
+            "temperature": self.config.temperature
+        }
+        if not use_cache or not LLM_CACHE_AVAILABLE:
+            return await self._generate_text(prompt, params)
+        
+        return await get_llm_result_cache().get_or_compute(
+            make_cache_key(self.base_url, prompt, params),
+            lambda: self._generate_text(prompt, params),
+            params=params
+        )
+    
+    async def _generate_text(self, prompt: str, params: Dict[str, Any]) -> Optional[str]:
+        """實際呼叫生成端點"""
         try:
             client = await self._get_client()
             response = await client.post(
                 f"{self.base_url}/generate",
-                json={
-                    "prompt": prompt,
-                    "model": model or self.config.model,
-                    "max_tokens": self.config.max_tokens,
-                    "temperature": self.config.temperature
-                }
+                json={"prompt": prompt, **params}
             )
             
             if response.status_code == 200:
@@ -195,48 +225,36 @@ class LLMIntegrationService:
                 "enhanced_at": datetime.now().isoformat()
             }
     
-    async def rerank_results(self, query: str, results: List[Dict[str, Any]], model: str = "qwen3:8b") -> List[Dict[str, Any]]:
-        """重新排序檢索結果"""
+    async def rerank_results(self, query: str, results: List[Dict[str, Any]],
+                             top_n: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        重新排序檢索結果
+        
+        以本機 cross-encoder 一次批次打分所有候選，不再呼叫生成式 LLM；
+        重排序器不可用或超過延遲預算時回傳原排序。
+        
+        Args:
+            query: 查詢
+            results: 檢索結果
+            top_n: 保留筆數，預設使用 RERANKER_TOP_N
+        """
         try:
-            if not results:
+            if not results or not RERANKER_AVAILABLE:
                 return results
             
-            # 創建重排序提示
-            rerank_prompt = f"""
-            請根據查詢的相關性對以下檢索結果進行重新排序：
-            
-            查詢：{query}
-            
-            檢索結果：
-            {self._format_results_for_rerank(results)}
-            
-            請根據相關性評分（0-10）重新排序，並返回 JSON 格式：
-            {{
-                "ranked_results": [
-                    {{"index": 0, "score": 8.5, "reason": "最相關的原因"}},
-                    {{"index": 1, "score": 7.2, "reason": "相關的原因"}}
-                ]
-            }}
-            """
-            
-            rerank_response = await self.generate_text(rerank_prompt, model)
-            if not rerank_response:
-                return results
-            
-            # 解析重排序結果
-            ranked_indices = self._parse_rerank_response(rerank_response)
-            if not ranked_indices:
-                return results
+            ranked = await get_cross_encoder_reranker().rerank(
+                query, results,
+                text_of=lambda r: r.get("content", r.get("chunk_text", "")),
+                id_of=lambda r: r.get("chunk_id", r.get("id")),
+                top_n=top_n
+            )
             
-            # 重新排序
             reranked_results = []
-            for rank_item in ranked_indices:
-                index = rank_item.get("index", 0)
-                if 0 <= index < len(results):
-                    result = results[index].copy()
-                    result["llm_score"] = rank_item.get("score", 0.0)
-                    result["llm_reason"] = rank_item.get("reason", "")
-                    reranked_results.append(result)
+            for result, score in ranked:
+                result = result.copy()
+                if score is not None:
+                    result["rerank_score"] = score
+                reranked_results.append(result)
             
             return reranked_results
             
@@ -280,33 +298,6 @@ class LLMIntegrationService:
         
         return []
     
-    def _format_results_for_rerank(self, results: List[Dict[str, Any]]) -> str:
-        """格式化結果用於重排序"""
-        formatted = []
-        for i, result in enumerate(results):
-            content = result.get("content", result.get("chunk_text", ""))
-            metadata = result.get("metadata", {})
-            title = metadata.get("title", f"結果 {i+1}")
-            formatted.append(f"{i+1}. {title}: {content[:200]}...")
-        
-        return "\n".join(formatted)
-    
-    def _parse_rerank_response(self, rerank_response: str) -> List[Dict[str, Any]]:
-        """解析重排序回應"""
-        try:
-            import json
-            # 嘗試提取 JSON 部分
-            start = rerank_response.find('{')
-            end = rerank_response.rfind('}') + 1
-            if start != -1 and end != 0:
-                json_str = rerank_response[start:end]
-                data = json.loads(json_str)
-                return data.get("ranked_results", [])
-        except Exception as e:
-            logger.warning(f"重排序回應解析失敗: {e}")
-        
-        return []
-    
     async def close(self):
         """關閉客戶端"""
         if self.client:
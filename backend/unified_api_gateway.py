@@ -855,6 +855,58 @@ async def get_one_minutes_episodes(category: str, tag: str = ""):
 
 # ==================== RAG Pipeline API ====================
 
+def _build_rag_query_data(request: ChatRequest, user_context: Dict[str, Any]) -> Dict[str, Any]:
+    """準備 RAG Pipeline 查詢資料，包含用戶上下文"""
+    return {
+        "query": request.query,
+        "user_id": request.user_id,
+        "session_id": request.session_id,
+        "enable_tts": request.enable_tts,
+        "voice": request.voice,
+        "speed": request.speed,
+        "metadata": {
+            **request.metadata,
+            "user_context": user_context,
+            "timestamp": datetime.now().isoformat()
+        }
+    }
+
+def _sse_error(detail: str) -> bytes:
+    """串流失敗時送出的 SSE error 事件"""
+    return f"event: error\ndata: {json.dumps({'detail': detail}, ensure_ascii=False)}\n\n".encode("utf-8")
+
+@app.post("/api/v1/query/stream")
+async def rag_query_stream(request: ChatRequest):
+    """RAG Pipeline 串流查詢（整合用戶上下文，收到的 SSE 事件立即轉送）"""
+    user_context = podwise_service.get_user_context_for_rag(request.user_id)
+    rag_url = SERVICE_CONFIGS["rag_pipeline"]["url"]
+    query_data = _build_rag_query_data(request, user_context)
+    
+    async def relay():
+        try:
+            # 逾時套用於每次讀取，即兩段輸出之間的等待時間
+            async with httpx.AsyncClient(timeout=60.0) as client:
+                async with client.stream("POST", f"{rag_url}/api/v1/query/stream", json=query_data) as response:
+                    if response.status_code != 200:
+                        yield _sse_error(f"RAG Pipeline 回應錯誤: {response.status_code}")
+                        return
+                    async for chunk in response.aiter_raw():
+                        yield chunk
+        except Exception as e:
+            logger.error(f"RAG Pipeline 串流查詢失敗: {e}")
+            yield _sse_error(str(e))
+    
+    return StreamingResponse(
+        relay(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/api/v1/rag/query/stream")
+async def rag_query_stream_alias(request: ChatRequest):
+    """RAG Pipeline 串流查詢別名端點"""
+    return await rag_query_stream(request)
+
 @app.post("/api/v1/rag/query")
 async def rag_query_alias(request: ChatRequest):
     """RAG Pipeline 查詢別名端點"""
@@ -871,19 +923,7 @@ async def rag_query(request: ChatRequest):
         rag_url = SERVICE_CONFIGS["rag_pipeline"]["url"]
         
         # 準備查詢資料，包含用戶上下文
-        query_data = {
-            "query": request.query,
-            "user_id": request.user_id,
-            "session_id": request.session_id,
-            "enable_tts": request.enable_tts,
-            "voice": request.voice,
-            "speed": request.speed,
-            "metadata": {
-                **request.metadata,
-                "user_context": user_context,
-                "timestamp": datetime.now().isoformat()
-            }
-        }
+        query_data = _build_rag_query_data(request, user_context)
         
         async with httpx.AsyncClient(timeout=60.0) as client:
             response = await client.post(f"{rag_url}/api/v1/query", json=query_data)
@@ -5,11 +5,23 @@ Podwise 工具模組
 提供各種共用工具和服務
 """
 
-# 核心服務
-from .minio_episode_service import MinioEpisodeService
+import logging
 
-# 工具函數
-from .audio_stream_service import AudioStreamService
+logger = logging.getLogger(__name__)
+
+# 核心服務（依賴 psycopg2，缺少時不影響其他工具模組）
+try:
+    from .minio_episode_service import MinioEpisodeService
+except ImportError as e:
+    logger.warning(f"MinioEpisodeService 導入失敗: {e}")
+    MinioEpisodeService = None
+
+# 工具函數（依賴 fastapi，缺少時不影響其他工具模組）
+try:
+    from .audio_stream_service import AudioStreamService
+except ImportError as e:
+    logger.warning(f"AudioStreamService 導入失敗: {e}")
+    AudioStreamService = None
 
 __all__ = [
     # 核心服務
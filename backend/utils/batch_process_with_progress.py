@@ -12,6 +12,7 @@ import os
 import json
 import sys
 import time
+import importlib.util
 from pathlib import Path
 from typing import Dict, List, Set, Any, Optional, Tuple
 import logging
@@ -23,6 +24,19 @@ import numpy as np
 from tqdm import tqdm
 import traceback
 
+try:
+    from embedding_registry import get_shared_encoder
+    from bulk_embedder import get_bulk_embedder
+except ImportError:
+    from utils.embedding_registry import get_shared_encoder
+    from utils.bulk_embedder import get_bulk_embedder
+
+# chunk_store 直接載入模組檔案，避免 vector_pipeline/core/__init__ 匯入 MongoDB 等依賴
+_chunk_store_spec = importlib.util.spec_from_file_location(
+    "chunk_store", Path(__file__).resolve().parent.parent / "vector_pipeline" / "core" / "chunk_store.py")
+chunk_store = importlib.util.module_from_spec(_chunk_store_spec)
+_chunk_store_spec.loader.exec_module(chunk_store)
+
 # 載入環境變數
 load_dotenv('backend/.env')
 
@@ -31,21 +45,28 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 logger = logging.getLogger(__name__)
 
 class BGE_M3_Embedding:
-    """BGE-M3 embedding 生成器"""
+    """
+    BGE-M3 embedding 生成器
+    
+    批次生成走 bulk_embedder（由其自行載入模型與偵測設備），
+    只有單筆生成才在首次呼叫時載入共用模型
+    """
     
     def __init__(self):
         self.model = None
-        self.device = 'cuda'
-        self.load_model()
+        # None 表示交由 bulk_embedder 自動偵測；載入共用模型後為實際使用的設備
+        self.device = None
     
     def load_model(self):
         """載入 BGE-M3 模型"""
         try:
-            from sentence_transformers import SentenceTransformer
+            self.device = 'cuda'
             logger.info(f"嘗試載入 BGE-M3 模型到 {self.device}...")
             
-            # 嘗試載入到 GPU
-            self.model = SentenceTransformer('BAAI/bge-m3', device=self.device)
+            # 嘗試載入到 GPU（由共用註冊表載入，同一程序只載入一次）
+            self.model = get_shared_encoder('BAAI/bge-m3', self.device).model
+            if self.model is None:
+                raise Exception("共用 BGE-M3 模型不可用")
             
             # 測試模型是否正常工作
             test_text = "測試文本"
@@ -64,7 +85,9 @@ class BGE_M3_Embedding:
             try:
                 logger.info("嘗試載入 BGE-M3 模型到 CPU...")
                 self.device = 'cpu'
-                self.model = SentenceTransformer('BAAI/bge-m3', device=self.device)
+                self.model = get_shared_encoder('BAAI/bge-m3', self.device).model
+                if self.model is None:
+                    raise Exception("共用 BGE-M3 模型不可用")
                 
                 # 測試模型
                 test_text = "測試文本"
@@ -79,28 +102,43 @@ class BGE_M3_Embedding:
             except Exception as e2:
                 logger.error(f"CPU 載入也失敗: {str(e2)}")
                 logger.error("❌ 無法載入 BGE-M3 模型，請檢查安裝")
+                self.model = None
                 return False
     
     def generate_embedding(self, text: str) -> List[float]:
-        """生成 BGE-M3 embedding"""
-        if not self.model:
+        """生成單筆 BGE-M3 embedding（首次呼叫時才載入模型）"""
+        if self.model is None and not self.load_model():
             logger.error("BGE-M3 模型未載入")
             return [0.0] * 1024
         
         try:
-            # 生成 embedding
             embedding = self.model.encode(text, normalize_embeddings=True)
-            embedding_list = embedding.tolist()
             
             # 檢查 embedding 是否為零向量
             if np.allclose(embedding, 0):
                 logger.warning(f"⚠️ 警告：文本 '{text[:50]}...' 產生零向量 embedding")
             
-            return embedding_list
+            return embedding.tolist()
             
         except Exception as e:
             logger.error(f"生成 embedding 失敗: {str(e)}")
             return [0.0] * 1024
+    
+    def generate_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """批次生成 BGE-M3 embedding（依長度分批、CPU 上多程序編碼，順序與輸入相同）"""
+        try:
+            embeddings = get_bulk_embedder('BAAI/bge-m3', self.device).encode(texts, normalize=True)
+            
+            # 檢查 embedding 是否為零向量
+            for text, embedding in zip(texts, embeddings):
+                if np.allclose(embedding, 0):
+                    logger.warning(f"⚠️ 警告：文本 '{text[:50]}...' 產生零向量 embedding")
+            
+            return embeddings.tolist()
+            
+        except Exception as e:
+            logger.error(f"生成 embedding 失敗: {str(e)}")
+            return [[0.0] * 1024 for _ in texts]
 
 class MilvusConnector:
     """Milvus 連線器"""
@@ -262,8 +300,7 @@ class BatchProcessor:
             'password': os.getenv('POSTGRES_PASSWORD', '111111')
         }
         
-        # 初始化組件
-        self.embedding_generator = BGE_M3_Embedding()
+        # 初始化組件（僅補資料模式，不需要 embedding 模型）
         self.milvus_connector = MilvusConnector()
         
         # 統計資訊
@@ -277,6 +314,9 @@ class BatchProcessor:
         
         # 載入已處理的檔案清單
         self.processed_files_set = self.load_processed_files()
+        
+        # 目前載入的 chunk store 資料集：(資料集目錄, {來源檔名: 文件})
+        self._loaded_store: Optional[Tuple[Path, Dict[str, Dict]]] = None
     
     def clear_output_directory(self):
         """清空輸出目錄"""
@@ -310,7 +350,7 @@ class BatchProcessor:
             # 掃描已處理的檔案
             processed_files = []
             if self.output_path.exists():
-                for json_file in self.output_path.rglob("*.json"):
+                for json_file in chunk_store.list_stage_sources(self.output_path, recursive=True):
                     processed_files.append(str(json_file))
             
             progress_info = {
@@ -330,13 +370,22 @@ class BatchProcessor:
             logger.error(f"❌ 保存進度失敗: {str(e)}")
     
     def scan_all_files(self) -> List[Path]:
-        """掃描所有需要處理的檔案，跳過已處理的檔案"""
+        """
+        掃描所有需要處理的檔案，跳過已處理的檔案
+        
+        chunk store 資料集中的每份文件以「資料集目錄/來源檔名」表示，與原本的 JSON 路徑對應
+        """
         all_files = []
         rss_dirs = [d for d in self.stage3_path.iterdir() if d.is_dir() and d.name.startswith("RSS_")]
         
         for rss_dir in rss_dirs:
-            json_files = list(rss_dir.glob("*.json"))
-            all_files.extend(json_files)
+            for source in chunk_store.list_stage_sources(rss_dir):
+                if chunk_store.is_chunk_store(source):
+                    records = chunk_store.read_records(source, columns=['source_file'])
+                    names = dict.fromkeys(record.get('source_file') or source.name for record in records)
+                    all_files.extend(source / name for name in names)
+                else:
+                    all_files.append(source)
         
         # 過濾掉已處理的檔案
         unprocessed_files = []
@@ -576,11 +625,21 @@ class BatchProcessor:
         
         return value
     
+    def load_document(self, file_path: Path) -> Dict:
+        """讀取 JSON 檔案，或 chunk store 資料集中的一份文件（同一資料集只讀取一次）"""
+        if file_path.is_file():
+            with open(file_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        
+        store_path = file_path.parent
+        if self._loaded_store is None or self._loaded_store[0] != store_path:
+            self._loaded_store = (store_path, dict(chunk_store.read_documents(store_path)))
+        return self._loaded_store[1][file_path.name]
+    
     def process_single_file(self, file_path: Path, pg_episodes: Dict) -> Tuple[List[Dict], Dict]:
-        """處理單一 JSON 檔案"""
+        """處理單一 JSON 檔案或 chunk store 資料集中的一份文件"""
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            data = self.load_document(file_path)
             
             # 解析檔名
             podcast_id, episode_title, ep_match, main_title = self.extract_info_from_filename(file_path.name)
@@ -717,12 +776,11 @@ class BatchProcessor:
     def save_fixed_json(self, fixed_data: Dict, original_file_path: Path):
         """儲存修正後的 JSON 檔案"""
         try:
-            # 建立對應的輸出目錄
-            output_dir = self.output_path / original_file_path.parent.name
-            output_dir.mkdir(exist_ok=True)
+            # 建立對應的輸出目錄（與 scan_all_files 檢查的輸出路徑相同）
+            output_file = self.output_path / original_file_path.relative_to(self.stage3_path)
+            output_file.parent.mkdir(parents=True, exist_ok=True)
             
             # 儲存修正後的檔案
-            output_file = output_dir / original_file_path.name
             with open(output_file, 'w', encoding='utf-8') as f:
                 json.dump(fixed_data, f, ensure_ascii=False, indent=2)
             
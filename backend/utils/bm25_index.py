@@ -0,0 +1,444 @@
+#!/usr/bin/env python3
+"""
+BM25 稀疏索引
+
+以 jieba 分詞的 BM25 詞彙索引，離線建置、啟動時以 mmap 開啟：
+- 建置時即計算每個 posting 的 BM25 分數（impact），查詢只需累加
+- 詞表、posting、文件內容皆為扁平陣列 + 位移表，可直接 np.load(mmap_mode='r')
+- 查詢只觸及查詢詞的 posting 與 top-k 文件，不需載入整份索引
+- 每個詞的 posting 依分數遞減排列，極常見詞只讀取前 BM25_MAX_POSTINGS 筆
+  （其 idf 很低，截斷對排序影響極小），讓百萬級語料的查詢維持在毫秒級
+
+目錄格式:
+    meta.json              參數 (k1, b, 文件數, 平均長度, 分詞器)
+    terms.bin              排序後詞彙 (UTF-8 串接)
+    term_offsets.npy       int64, 詞彙在 terms.bin 的位移 (n_terms + 1)
+    posting_offsets.npy    int64, 詞彙在 posting 陣列的位移 (n_terms + 1)
+    posting_docs.npy       int32, 文件編號（每個詞內依分數遞減）
+    posting_scores.npy     float32, BM25 impact 分數
+    docs.bin               文件內容 (每筆一個 JSON，UTF-8 串接)
+    doc_offsets.npy        int64, 文件在 docs.bin 的位移 (n_docs + 1)
+
+重建時先寫入同層暫存目錄，完成後以 os.replace 換上；服務端每 BM25_RELOAD_CHECK_SECONDS
+比對 meta.json 的 build_id，變更時開啟新索引（舊索引的 mmap 在換上後仍可讀到查詢結束）。
+
+作者: Podwise Team
+版本: 1.0.0
+"""
+
+import os
+import re
+import json
+import time
+import uuid
+import shutil
+import logging
+import queue
+import threading
+from array import array
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+try:
+    import jieba
+    JIEBA_AVAILABLE = True
+except ImportError:
+    JIEBA_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+INDEX_VERSION = 1
+DEFAULT_INDEX_PATH = os.getenv("BM25_INDEX_PATH", "data/bm25_index")
+MAX_POSTINGS_PER_TERM = int(os.getenv("BM25_MAX_POSTINGS", "50000"))
+RELOAD_CHECK_SECONDS = float(os.getenv("BM25_RELOAD_CHECK_SECONDS", "30"))
+DOC_FIELDS = ("chunk_id", "chunk_text", "podcast_name", "episode_title", "category")
+
+# 常見虛詞不進索引
+STOPWORDS = frozenset(
+    "的 了 是 在 和 與 及 或 也 就 都 而 且 但 這 那 這個 那個 一個 我 你 他 她 它 我們 你們 他們 "
+    "有 沒有 要 會 能 可以 就是 然後 因為 所以 如果 還 很 嗎 呢 吧 啊 喔 哦 嗯 對 把 被 讓 給 從 到 "
+    "the a an and or of to in on for is are was were be it this that with as at by".split()
+)
+
+# 只保留含中英文或數字的詞
+_TOKEN_PATTERN = re.compile(r"[\w一-鿿]", re.UNICODE)
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    分詞（建置與查詢共用）
+
+    有 jieba 時以 jieba 分詞，否則退回中文單字 + 英數詞。
+
+    Args:
+        text: 輸入文本
+
+    Returns:
+        List[str]: 詞彙列表
+    """
+    text = (text or "").lower()
+    if JIEBA_AVAILABLE:
+        tokens = jieba.lcut(text)
+    else:
+        tokens = re.findall(r"[a-z0-9]+|[一-鿿]", text)
+    return [
+        token for token in (t.strip() for t in tokens)
+        if token and token not in STOPWORDS and _TOKEN_PATTERN.search(token)
+    ]
+
+
+def tokenizer_name() -> str:
+    """目前使用的分詞器名稱（記錄在索引中，避免建置與查詢不一致）"""
+    return "jieba" if JIEBA_AVAILABLE else "char"
+
+
+@dataclass
+class BM25Hit:
+    """BM25 檢索結果"""
+    chunk_id: str
+    score: float
+    chunk_text: str
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+
+class BM25IndexBuilder:
+    """BM25 索引建置器（離線使用）"""
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        """
+        初始化建置器
+
+        Args:
+            k1: 詞頻飽和參數
+            b: 文件長度正規化參數
+        """
+        self.k1 = k1
+        self.b = b
+        self._vocab: Dict[str, int] = {}
+        self._term_ids = array("i")
+        self._doc_ids = array("i")
+        self._tfs = array("i")
+        self._doc_lengths = array("i")
+        self._docs: List[bytes] = []
+
+    @property
+    def num_docs(self) -> int:
+        return len(self._doc_lengths)
+
+    def add(self, document: Dict[str, Any]) -> None:
+        """
+        加入一筆文件
+
+        Args:
+            document: 至少含 chunk_id 與 chunk_text 的字典
+        """
+        doc_id = self.num_docs
+        counts = Counter(tokenize(str(document.get("chunk_text", ""))))
+        for term, tf in counts.items():
+            term_id = self._vocab.setdefault(term, len(self._vocab))
+            self._term_ids.append(term_id)
+            self._doc_ids.append(doc_id)
+            self._tfs.append(tf)
+        self._doc_lengths.append(sum(counts.values()))
+        stored = {name: str(document.get(name, "") or "") for name in DOC_FIELDS}
+        self._docs.append(json.dumps(stored, ensure_ascii=False).encode("utf-8"))
+
+    def add_all(self, documents: Iterable[Dict[str, Any]]) -> int:
+        """加入多筆文件，回傳加入數量"""
+        count = 0
+        for document in documents:
+            self.add(document)
+            count += 1
+        return count
+
+    def save(self, index_dir: str) -> Dict[str, Any]:
+        """
+        計算 BM25 分數並寫出索引
+
+        先寫入同層暫存目錄，全部檔案完成後才換上 index_dir，
+        讀取端不會開啟到寫到一半的索引。
+
+        Args:
+            index_dir: 輸出目錄
+
+        Returns:
+            Dict[str, Any]: 索引中繼資料
+        """
+        target = Path(index_dir).resolve()
+        target.parent.mkdir(parents=True, exist_ok=True)
+        build_id = uuid.uuid4().hex
+        path = target.with_name(f".{target.name}.{build_id}.tmp")
+        path.mkdir()
+        try:
+            meta = self._write(path, build_id)
+            _swap_in(path, target)
+        except BaseException:
+            shutil.rmtree(path, ignore_errors=True)
+            raise
+        logger.info(f"✅ BM25 索引已寫出: {target} ({meta['num_docs']} 文件, {meta['num_terms']} 詞彙)")
+        return meta
+
+    def _write(self, path: Path, build_id: str) -> Dict[str, Any]:
+        """將索引檔案寫入 path，回傳中繼資料"""
+
+        doc_lengths = np.frombuffer(self._doc_lengths, dtype=np.int32).astype(np.float32)
+        num_docs = len(doc_lengths)
+        avgdl = float(doc_lengths.mean()) if num_docs else 0.0
+
+        # 詞彙排序後重新編號，查詢時可二分搜尋
+        terms = sorted(self._vocab, key=self._vocab.get)
+        order = sorted(range(len(terms)), key=terms.__getitem__)
+        remap = np.empty(len(terms), dtype=np.int64)
+        remap[order] = np.arange(len(terms))
+        sorted_terms = [terms[i] for i in order]
+
+        term_ids = remap[np.frombuffer(self._term_ids, dtype=np.int32)]
+        doc_ids = np.frombuffer(self._doc_ids, dtype=np.int32)
+        tfs = np.frombuffer(self._tfs, dtype=np.int32).astype(np.float32)
+
+        df = np.bincount(term_ids, minlength=len(sorted_terms)).astype(np.float32)
+        idf = np.log(1.0 + (num_docs - df + 0.5) / (df + 0.5))
+        norm = self.k1 * (1.0 - self.b + self.b * doc_lengths[doc_ids] / max(avgdl, 1e-9))
+        scores = (idf[term_ids] * tfs * (self.k1 + 1.0) / (tfs + norm)).astype(np.float32)
+
+        # 依詞彙分組，組內依分數遞減
+        permutation = np.lexsort((-scores, term_ids))
+        doc_ids = doc_ids[permutation]
+        scores = scores[permutation]
+
+        posting_offsets = np.zeros(len(sorted_terms) + 1, dtype=np.int64)
+        np.cumsum(df.astype(np.int64), out=posting_offsets[1:])
+
+        encoded_terms = [term.encode("utf-8") for term in sorted_terms]
+        term_offsets = np.zeros(len(encoded_terms) + 1, dtype=np.int64)
+        np.cumsum([len(t) for t in encoded_terms], out=term_offsets[1:])
+        doc_offsets = np.zeros(num_docs + 1, dtype=np.int64)
+        np.cumsum([len(d) for d in self._docs], out=doc_offsets[1:])
+
+        (path / "terms.bin").write_bytes(b"".join(encoded_terms))
+        (path / "docs.bin").write_bytes(b"".join(self._docs))
+        np.save(path / "term_offsets.npy", term_offsets)
+        np.save(path / "posting_offsets.npy", posting_offsets)
+        np.save(path / "posting_docs.npy", doc_ids.astype(np.int32))
+        np.save(path / "posting_scores.npy", scores)
+        np.save(path / "doc_offsets.npy", doc_offsets)
+
+        meta = {
+            "version": INDEX_VERSION,
+            "k1": self.k1,
+            "b": self.b,
+            "num_docs": num_docs,
+            "num_terms": len(sorted_terms),
+            "num_postings": int(len(doc_ids)),
+            "avgdl": avgdl,
+            "tokenizer": tokenizer_name(),
+            "build_id": build_id,
+            "built_at": time.strftime("%Y-%m-%dT%H:%M:%S")
+        }
+        (path / "meta.json").write_text(json.dumps(meta, ensure_ascii=False, indent=2), encoding="utf-8")
+        return meta
+
+
+def _swap_in(new_dir: Path, target: Path) -> None:
+    """
+    以 new_dir 取代 target
+
+    os.replace 無法覆蓋非空目錄：舊目錄先改名為同層備份，再將新目錄改名為 target，
+    最後刪除備份。已開啟舊索引的行程持有的 mmap 在檔案刪除後仍然有效。
+    """
+    backup = None
+    if target.exists():
+        backup = target.with_name(f".{target.name}.{uuid.uuid4().hex}.old")
+        os.replace(target, backup)
+    try:
+        os.replace(new_dir, target)
+    except OSError:
+        if backup is not None:
+            os.replace(backup, target)
+        raise
+    if backup is not None:
+        shutil.rmtree(backup, ignore_errors=True)
+
+
+def read_build_id(index_dir: str) -> Optional[str]:
+    """讀取索引的 build_id，索引不存在或正在換上時回傳 None"""
+    try:
+        meta = json.loads(Path(index_dir, "meta.json").read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    # 舊版索引沒有 build_id，以建置時間代替
+    return meta.get("build_id") or meta.get("built_at")
+
+
+class BM25Index:
+    """BM25 索引（唯讀，mmap 開啟）"""
+
+    def __init__(self, index_dir: str, max_postings_per_term: int = MAX_POSTINGS_PER_TERM):
+        """
+        開啟索引
+
+        Args:
+            index_dir: 索引目錄
+            max_postings_per_term: 每個查詢詞最多讀取的 posting 數
+        """
+        path = Path(index_dir)
+        self.max_postings_per_term = max(1, max_postings_per_term)
+        self._accumulators: "queue.SimpleQueue[np.ndarray]" = queue.SimpleQueue()
+        self.index_dir = str(path)
+        self.meta: Dict[str, Any] = json.loads((path / "meta.json").read_text(encoding="utf-8"))
+        if self.meta.get("version") != INDEX_VERSION:
+            raise ValueError(f"不支援的 BM25 索引版本: {self.meta.get('version')}")
+        if self.meta.get("tokenizer") != tokenizer_name():
+            logger.warning(f"⚠️ BM25 索引分詞器 ({self.meta.get('tokenizer')}) 與目前環境 ({tokenizer_name()}) 不一致")
+
+        self._terms = np.memmap(path / "terms.bin", dtype=np.uint8, mode="r") \
+            if (path / "terms.bin").stat().st_size else np.zeros(0, dtype=np.uint8)
+        self._docs = np.memmap(path / "docs.bin", dtype=np.uint8, mode="r") \
+            if (path / "docs.bin").stat().st_size else np.zeros(0, dtype=np.uint8)
+        self._term_offsets = np.load(path / "term_offsets.npy", mmap_mode="r")
+        self._posting_offsets = np.load(path / "posting_offsets.npy", mmap_mode="r")
+        self._posting_docs = np.load(path / "posting_docs.npy", mmap_mode="r")
+        self._posting_scores = np.load(path / "posting_scores.npy", mmap_mode="r")
+        self._doc_offsets = np.load(path / "doc_offsets.npy", mmap_mode="r")
+        self.num_terms = len(self._term_offsets) - 1
+        self.num_docs = len(self._doc_offsets) - 1
+        self.build_id = self.meta.get("build_id") or self.meta.get("built_at")
+
+    def _term_at(self, index: int) -> bytes:
+        return self._terms[self._term_offsets[index]:self._term_offsets[index + 1]].tobytes()
+
+    def _lookup(self, term: str) -> int:
+        """二分搜尋詞彙編號，不存在時回傳 -1"""
+        target = term.encode("utf-8")
+        low, high = 0, self.num_terms
+        while low < high:
+            mid = (low + high) // 2
+            if self._term_at(mid) < target:
+                low = mid + 1
+            else:
+                high = mid
+        if low < self.num_terms and self._term_at(low) == target:
+            return low
+        return -1
+
+    def _document(self, doc_id: int) -> Dict[str, Any]:
+        raw = self._docs[self._doc_offsets[doc_id]:self._doc_offsets[doc_id + 1]].tobytes()
+        return json.loads(raw.decode("utf-8"))
+
+    def search(self, query: str, top_k: int = 10) -> List[BM25Hit]:
+        """
+        BM25 檢索
+
+        Args:
+            query: 查詢文本
+            top_k: 返回數量
+
+        Returns:
+            List[BM25Hit]: 依分數排序的結果
+        """
+        term_ids = {self._lookup(term) for term in tokenize(query)}
+        term_ids.discard(-1)
+        if not term_ids or top_k <= 0:
+            return []
+
+        # 以整份文件長度的累加器計分，只重設碰過的位置；累加器在並發查詢間重用
+        try:
+            accumulator = self._accumulators.get_nowait()
+        except queue.Empty:
+            accumulator = np.zeros(self.num_docs, dtype=np.float32)
+
+        try:
+            doc_parts = []
+            for term_id in term_ids:
+                start = int(self._posting_offsets[term_id])
+                end = min(int(self._posting_offsets[term_id + 1]), start + self.max_postings_per_term)
+                docs = np.asarray(self._posting_docs[start:end])
+                # 同一詞內文件不重複，可直接以索引累加
+                accumulator[docs] += self._posting_scores[start:end]
+                doc_parts.append(docs)
+
+            candidates = np.concatenate(doc_parts)
+            candidate_scores = accumulator[candidates]
+            # 每份文件最多重複出現 len(doc_parts) 次，取足夠數量後再去重
+            limit = min(len(candidates), top_k * len(doc_parts))
+            selected = np.argpartition(-candidate_scores, limit - 1)[:limit]
+            unique_docs = np.unique(candidates[selected])
+            unique_scores = accumulator[unique_docs]
+            order = np.argsort(-unique_scores, kind="stable")[:top_k]
+            doc_ids, scores = unique_docs[order], unique_scores[order]
+            accumulator[candidates] = 0.0
+        finally:
+            self._accumulators.put(accumulator)
+
+        hits = []
+        for doc_id, score in zip(doc_ids, scores):
+            document = self._document(int(doc_id))
+            hits.append(BM25Hit(
+                chunk_id=document.pop("chunk_id", ""),
+                score=float(score),
+                chunk_text=document.pop("chunk_text", ""),
+                metadata=document
+            ))
+        return hits
+
+    def get_info(self) -> Dict[str, Any]:
+        """獲取索引資訊"""
+        return {"index_dir": self.index_dir, **self.meta}
+
+
+# 全域索引（依路徑快取）：路徑 -> [索引, 開啟時的 build_id, 上次檢查時間]
+_indexes: Dict[str, List[Any]] = {}
+_indexes_lock = threading.Lock()
+
+
+def _open_index(key: str) -> Optional[BM25Index]:
+    if not os.path.exists(os.path.join(key, "meta.json")):
+        logger.warning(f"⚠️ BM25 索引不存在: {key}，稀疏檢索停用")
+        return None
+    try:
+        index = BM25Index(key)
+        logger.info(f"✅ BM25 索引已開啟: {key} ({index.num_docs} 文件)")
+        return index
+    except Exception as e:
+        logger.error(f"BM25 索引開啟失敗: {e}")
+        return None
+
+
+def get_bm25_index(index_dir: str = DEFAULT_INDEX_PATH) -> Optional[BM25Index]:
+    """
+    獲取 BM25 索引，不存在或開啟失敗時回傳 None
+
+    每 RELOAD_CHECK_SECONDS 比對一次 meta.json 的 build_id，索引重建後開啟新版本；
+    開啟失敗的版本不會重試，直到 build_id 再次變更。
+
+    Args:
+        index_dir: 索引目錄
+
+    Returns:
+        Optional[BM25Index]: 索引實例
+    """
+    key = os.path.abspath(index_dir)
+    entry = _indexes.get(key)
+    if entry is not None and time.monotonic() - entry[2] < RELOAD_CHECK_SECONDS:
+        return entry[0]
+
+    with _indexes_lock:
+        entry = _indexes.get(key)
+        if entry is None:
+            index = _open_index(key)
+            entry = _indexes[key] = [index, index.build_id if index else read_build_id(key), time.monotonic()]
+        elif time.monotonic() - entry[2] >= RELOAD_CHECK_SECONDS:
+            entry[2] = time.monotonic()
+            build_id = read_build_id(key)
+            # 換上過程中 meta.json 短暫不存在，沿用目前索引
+            if build_id is not None and build_id != entry[1]:
+                index = _open_index(key)
+                entry[1] = build_id
+                if index is not None:
+                    logger.info(f"🔄 BM25 索引已重新載入: {key} (build_id={build_id})")
+                    entry[0] = index
+    return entry[0]
@@ -0,0 +1,426 @@
+#!/usr/bin/env python3
+"""
+大量嵌入執行器
+
+離線灌庫時一次產生大量 chunk 的嵌入向量：
+- 依 token 長度排序後切批次，每批以「批次大小 × 最長長度」的 padding token 預算控制，
+  長度相近的文本放在同一批，避免短文本被補齊到長文本的長度
+- CPU 上以多個工作程序平行編碼，每個程序固定 torch 執行緒數並可綁定 CPU 核心，
+  避免多個程序的執行緒互相搶佔；GPU 或單一工作程序時直接在本程序編碼
+- 輸入以視窗為單位排序，結果依輸入順序逐視窗串流回傳，記憶體只保留進行中的視窗
+- 送出前先查詢磁碟嵌入快取（utils/embedding_cache.py），只編碼未命中的文本並寫回快取，
+  未變動的語料重新灌庫時不需經過模型
+- BULK_EMBED_MODEL=stub 或 model_path="stub" 使用確定性的替代模型（計算量與 padding 長度成正比），
+  供基準測試與無模型環境驗證流程
+
+作者: Podwise Team
+版本: 1.0.0
+"""
+
+import os
+import time
+import atexit
+import hashlib
+import logging
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import islice
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+    from .token_counter import TokenCounter
+    from .embedding_cache import EmbeddingCache, get_embedding_cache
+except ImportError:
+    from token_counter import TokenCounter
+    from embedding_cache import EmbeddingCache, get_embedding_cache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL_PATH = os.getenv("BULK_EMBED_MODEL", "BAAI/bge-m3")
+DEFAULT_WORKERS = int(os.getenv("BULK_EMBED_WORKERS", "0"))  # 0 表示依 CPU 核心數自動決定
+DEFAULT_THREADS_PER_WORKER = int(os.getenv("BULK_EMBED_THREADS_PER_WORKER", "4"))
+DEFAULT_MAX_BATCH_SIZE = int(os.getenv("BULK_EMBED_MAX_BATCH_SIZE", "64"))
+DEFAULT_MAX_BATCH_TOKENS = int(os.getenv("BULK_EMBED_MAX_BATCH_TOKENS", "16384"))
+DEFAULT_WINDOW_SIZE = int(os.getenv("BULK_EMBED_WINDOW_SIZE", "2048"))
+PIN_CPUS = os.getenv("BULK_EMBED_PIN_CPUS", "true").lower() == "true"
+
+STUB_MODEL = "stub"
+STUB_DIM = 1024
+
+
+class StubEmbeddingModel:
+    """確定性的替代模型：向量由文本雜湊決定，計算量為每批固定成本加上 批次大小 × 最長長度，介面同 encode"""
+
+    def __init__(self, dim: int = STUB_DIM, hidden: int = 64):
+        self.dim = dim
+        self._weights = np.random.default_rng(0).standard_normal((hidden, hidden)).astype(np.float32) / hidden
+
+    def encode(self, texts, normalize_embeddings: bool = True, batch_size: int = 32,
+               show_progress_bar: bool = False, **kwargs) -> np.ndarray:
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        vectors = []
+        for start in range(0, len(texts), max(1, batch_size)):
+            batch = texts[start:start + batch_size]
+            # 模擬 transformer 對補齊後序列的計算
+            padded = max(1, max(len(text) for text in batch))
+            hidden = np.ones((len(batch), padded, self._weights.shape[0]), dtype=np.float32)
+            # 每次前向傳遞的固定成本（tokenize、呼叫開銷）
+            overhead = np.ones((256, self._weights.shape[0]), dtype=np.float32)
+            for _ in range(4):
+                hidden = np.tanh(hidden @ self._weights)
+                overhead = np.tanh(overhead @ self._weights)
+            for text in batch:
+                seed = int(hashlib.md5(text.encode("utf-8")).hexdigest()[:8], 16)
+                vectors.append(np.random.default_rng(seed).standard_normal(self.dim).astype(np.float32))
+        result = np.stack(vectors) if vectors else np.zeros((0, self.dim), dtype=np.float32)
+        if normalize_embeddings and len(result):
+            result /= np.linalg.norm(result, axis=1, keepdims=True)
+        return result[0] if single else result
+
+
+def _load_encoder(model_path: str, device: Optional[str]):
+    """載入編碼器：stub 或共用註冊表中的 SentenceTransformer"""
+    if model_path == STUB_MODEL:
+        return StubEmbeddingModel()
+    try:
+        from .embedding_registry import get_shared_encoder
+    except ImportError:
+        from embedding_registry import get_shared_encoder
+    encoder = get_shared_encoder(model_path, device)
+    if not encoder.available:
+        raise RuntimeError(f"嵌入模型不可用: {model_path}")
+    return encoder
+
+
+def _resolve_device(device: Optional[str]) -> str:
+    if device and device != "auto":
+        return device
+    try:
+        import torch
+        return "cuda" if torch.cuda.is_available() else "cpu"
+    except ImportError:
+        return "cpu"
+
+
+# ---- 工作程序 ----
+
+_worker_encoder = None
+
+
+def _init_worker(model_path: str, device: str, threads: int, cpu_queue) -> None:
+    """工作程序初始化：固定執行緒數、綁定 CPU 核心並載入模型"""
+    global _worker_encoder
+    for name in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS", "TOKENIZERS_PARALLELISM"):
+        os.environ[name] = "false" if name == "TOKENIZERS_PARALLELISM" else str(threads)
+    if cpu_queue is not None and hasattr(os, "sched_setaffinity"):
+        try:
+            cpus = cpu_queue.get_nowait()
+            os.sched_setaffinity(0, cpus)
+        except Exception as e:
+            logger.warning(f"綁定 CPU 核心失敗: {e}")
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    _worker_encoder = _load_encoder(model_path, device)
+
+
+def _encode_batch(texts: List[str], normalize: bool) -> np.ndarray:
+    """工作程序中編碼一批文本"""
+    vectors = _worker_encoder.encode(texts, normalize_embeddings=normalize,
+                                     batch_size=len(texts), show_progress_bar=False)
+    return np.asarray(vectors, dtype=np.float32)
+
+
+def plan_batches(lengths: Sequence[int], max_batch_size: int, max_batch_tokens: int) -> List[List[int]]:
+    """
+    依長度排序後切批次
+
+    Args:
+        lengths: 每筆文本的 token 長度
+        max_batch_size: 每批最多筆數
+        max_batch_tokens: 每批 padding 後的 token 上限（批次大小 × 最長長度），單筆超過時自成一批
+
+    Returns:
+        List[List[int]]: 每批的輸入索引，由長到短排列（長批次先送出，工作程序負載較平均）
+    """
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    batches: List[List[int]] = []
+    current: List[int] = []
+    for index in order:
+        longest = max(lengths[index], 1)
+        if current and (len(current) >= max_batch_size or (len(current) + 1) * longest > max_batch_tokens):
+            batches.append(current)
+            current = []
+        current.append(index)
+    if current:
+        batches.append(current)
+    batches.reverse()
+    return batches
+
+
+class BulkEmbedder:
+    """大量嵌入執行器"""
+
+    def __init__(self,
+                 model_path: str = DEFAULT_MODEL_PATH,
+                 device: Optional[str] = None,
+                 workers: int = DEFAULT_WORKERS,
+                 threads_per_worker: int = DEFAULT_THREADS_PER_WORKER,
+                 max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+                 max_batch_tokens: int = DEFAULT_MAX_BATCH_TOKENS,
+                 window_size: int = DEFAULT_WINDOW_SIZE,
+                 pin_cpus: bool = PIN_CPUS,
+                 cache: Optional[EmbeddingCache] = None,
+                 use_cache: bool = True):
+        """
+        初始化執行器（工作程序於首次編碼時啟動）
+
+        Args:
+            model_path: 嵌入模型路徑，stub 表示確定性替代模型
+            device: 設備，None 或 auto 時自動偵測；cuda 時固定在本程序編碼
+            workers: 工作程序數，0 表示 CPU 核心數 / threads_per_worker
+            threads_per_worker: 每個工作程序的 torch 執行緒數
+            max_batch_size: 每批最多筆數
+            max_batch_tokens: 每批 padding 後的 token 上限
+            window_size: 排序視窗大小（筆），結果以視窗為單位依輸入順序回傳
+            pin_cpus: 是否將每個工作程序綁定到不重疊的 CPU 核心
+            cache: 嵌入快取，未指定時使用共用快取（EMBEDDING_CACHE_* 環境變數）
+            use_cache: 是否使用嵌入快取
+        """
+        self.model_path = model_path
+        self.device = _resolve_device(device) if model_path != STUB_MODEL else "cpu"
+        cpus = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count() or 1))
+        self.threads_per_worker = max(1, threads_per_worker)
+        if self.device != "cpu":
+            self.workers = 1
+        elif workers and workers > 0:
+            self.workers = workers
+        else:
+            self.workers = max(1, len(cpus) // self.threads_per_worker)
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_batch_tokens = max(1, max_batch_tokens)
+        self.window_size = max(1, window_size)
+        self.pin_cpus = pin_cpus
+        self._cpus = cpus
+        self.cache = (cache or get_embedding_cache()) if use_cache else None
+
+        self._lock = threading.Lock()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._local_encoder = None
+        self._token_counter: Optional[TokenCounter] = None
+
+        self._items = 0
+        self._encoded = 0
+        self._batches = 0
+        self._tokens = 0
+        self._padded_tokens = 0
+        self._seconds = 0.0
+
+    @property
+    def uses_processes(self) -> bool:
+        """是否以多個工作程序編碼"""
+        return self.workers > 1
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                context = multiprocessing.get_context("spawn")
+                cpu_queue = None
+                if self.pin_cpus and hasattr(os, "sched_setaffinity") and len(self._cpus) >= self.workers:
+                    cpu_queue = context.Queue()
+                    per_worker = len(self._cpus) // self.workers
+                    for worker in range(self.workers):
+                        cpu_queue.put(self._cpus[worker * per_worker:(worker + 1) * per_worker])
+                threads = self.threads_per_worker
+                if cpu_queue is not None:
+                    threads = min(threads, len(self._cpus) // self.workers)
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=context,
+                    initializer=_init_worker,
+                    initargs=(self.model_path, self.device, threads, cpu_queue)
+                )
+                logger.info(f"🚀 大量嵌入工作程序啟動: {self.workers} 個程序 × {threads} 執行緒 "
+                            f"({self.model_path}, 綁定核心: {cpu_queue is not None})")
+        return self._pool
+
+    def _get_local_encoder(self):
+        with self._lock:
+            if self._local_encoder is None:
+                self._local_encoder = _load_encoder(self.model_path, self.device)
+        return self._local_encoder
+
+    def _count_tokens(self, texts: List[str]) -> List[int]:
+        if self.model_path == STUB_MODEL:
+            return [len(text) for text in texts]
+        if self._token_counter is None:
+            self._token_counter = TokenCounter(model_name=self.model_path)
+        return self._token_counter.count_batch(texts)
+
+    def _cache_model_id(self, normalize: bool) -> str:
+        """快取鍵值中的模型識別：模型路徑加上是否正規化"""
+        return f"{self.model_path}|normalize={normalize}"
+
+    def _submit(self, texts: List[str], normalize: bool,
+                max_batch_size: int) -> Tuple[List[Optional[np.ndarray]], List[Tuple[List[int], Future]]]:
+        """查詢快取，未命中的文本切批次並送出，回傳 (快取結果, [(視窗內索引, future)])"""
+        if self.cache is not None:
+            cached = self.cache.get_many(self._cache_model_id(normalize), texts)
+        else:
+            cached = [None] * len(texts)
+        missing = [i for i, vector in enumerate(cached) if vector is None]
+        if not missing:
+            return cached, []
+
+        lengths = self._count_tokens([texts[i] for i in missing])
+        batches = [[missing[i] for i in batch]
+                   for batch in plan_batches(lengths, max_batch_size, self.max_batch_tokens)]
+        lengths = dict(zip(missing, lengths))
+        self._tokens += sum(lengths.values())
+        self._padded_tokens += sum(len(batch) * max(lengths[i] for i in batch) for batch in batches)
+        self._batches += len(batches)
+        self._encoded += len(missing)
+
+        submitted = []
+        for batch in batches:
+            batch_texts = [texts[i] for i in batch]
+            if self.uses_processes:
+                future = self._get_pool().submit(_encode_batch, batch_texts, normalize)
+            else:
+                future = Future()
+                try:
+                    future.set_result(np.asarray(self._get_local_encoder().encode(
+                        batch_texts, normalize_embeddings=normalize,
+                        batch_size=len(batch_texts), show_progress_bar=False
+                    ), dtype=np.float32))
+                except Exception as e:
+                    future.set_exception(e)
+            submitted.append((batch, future))
+        return cached, submitted
+
+    def _collect(self, texts: List[str], normalize: bool, cached: List[Optional[np.ndarray]],
+                 submitted: List[Tuple[List[int], Future]]) -> np.ndarray:
+        """等待視窗內所有批次完成，新向量寫回快取，與快取結果依輸入順序組回"""
+        encoded = [(batch, future.result()) for batch, future in submitted]
+        if encoded:
+            dim = encoded[0][1].shape[1]
+        else:
+            dim = next((vector.shape[0] for vector in cached if vector is not None), 0)
+        result = np.empty((len(texts), dim), dtype=np.float32)
+        for i, vector in enumerate(cached):
+            if vector is not None:
+                result[i] = vector
+        for batch, vectors in encoded:
+            result[batch] = vectors
+            if self.cache is not None:
+                self.cache.put_many(self._cache_model_id(normalize), [texts[i] for i in batch], vectors)
+        return result
+
+    def encode_iter(self,
+                    texts: Iterable[str],
+                    normalize: bool = True,
+                    max_batch_size: Optional[int] = None) -> Iterator[np.ndarray]:
+        """
+        串流編碼
+
+        Args:
+            texts: 文本（可為生成器）
+            normalize: 是否正規化
+            max_batch_size: 每批最多筆數，預設使用初始化設定
+
+        Yields:
+            np.ndarray: 依輸入順序的嵌入向量，每次一個視窗 (視窗筆數, 維度)
+        """
+        batch_size = max(1, max_batch_size or self.max_batch_size)
+        iterator = iter(texts)
+        in_flight: Deque[Tuple[List[str], Any, float]] = deque()
+        # 多程序時保留兩個視窗在途，收集前一個視窗時工作程序已在處理下一個
+        max_in_flight = 2 if self.uses_processes else 1
+
+        while True:
+            window = [str(text or "") for text in islice(iterator, self.window_size)]
+            if window:
+                in_flight.append((window, self._submit(window, normalize, batch_size), time.perf_counter()))
+            if in_flight and (not window or len(in_flight) >= max_in_flight):
+                pending, (cached, submitted), started = in_flight.popleft()
+                vectors = self._collect(pending, normalize, cached, submitted)
+                self._items += len(pending)
+                self._seconds += time.perf_counter() - started
+                yield vectors
+            if not window and not in_flight:
+                break
+
+    def encode(self,
+               texts: Sequence[str],
+               normalize: bool = True,
+               max_batch_size: Optional[int] = None) -> np.ndarray:
+        """
+        編碼所有文本
+
+        Returns:
+            np.ndarray: (len(texts), 維度) 的嵌入向量，順序與輸入相同
+        """
+        parts = list(self.encode_iter(texts, normalize=normalize, max_batch_size=max_batch_size))
+        if not parts:
+            return np.zeros((0, 0), dtype=np.float32)
+        return np.vstack(parts)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """獲取編碼統計"""
+        return {
+            "model": self.model_path,
+            "device": self.device,
+            "workers": self.workers,
+            "threads_per_worker": self.threads_per_worker,
+            "items": self._items,
+            "encoded": self._encoded,
+            "batches": self._batches,
+            "tokens": self._tokens,
+            "padded_tokens": self._padded_tokens,
+            "padding_efficiency": self._tokens / self._padded_tokens if self._padded_tokens else 1.0,
+            "items_per_sec": self._items / self._seconds if self._seconds > 0 else 0.0,
+            "cache": self.cache.get_stats() if self.cache is not None else None
+        }
+
+    def close(self) -> None:
+        """關閉工作程序"""
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=True)
+                self._pool = None
+
+    def __enter__(self) -> "BulkEmbedder":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+
+_embedders: Dict[Tuple[str, str], BulkEmbedder] = {}
+_embedders_lock = threading.Lock()
+
+
+def get_bulk_embedder(model_path: str = DEFAULT_MODEL_PATH, device: Optional[str] = None) -> BulkEmbedder:
+    """獲取共用大量嵌入執行器（每個模型與設備一個，程序結束時關閉工作程序）"""
+    key = (model_path, _resolve_device(device) if model_path != STUB_MODEL else "cpu")
+    embedder = _embedders.get(key)
+    if embedder is None:
+        with _embedders_lock:
+            embedder = _embedders.get(key)
+            if embedder is None:
+                embedder = BulkEmbedder(model_path=model_path, device=device)
+                _embedders[key] = embedder
+    return embedder
+
+
+@atexit.register
+def _close_embedders() -> None:
+    for embedder in list(_embedders.values()):
+        embedder.close()
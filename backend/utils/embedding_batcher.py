@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+嵌入微批次處理器
+
+將多個並發呼叫者的單筆文本合併成一次模型前向計算：
+- 最大批次大小與最大等待時間可配置
+- 同步與非同步呼叫者皆可使用（以背景執行緒收集批次）
+- 提供佇列深度與批次大小指標
+
+作者: Podwise Team
+版本: 1.0.0
+"""
+
+import time
+import queue
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Callable, Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 批次大小直方圖的上界
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+
+
+class EmbeddingBatcher:
+    """嵌入微批次處理器"""
+
+    def __init__(self,
+                 encode_fn: Callable[[List[str]], np.ndarray],
+                 max_batch_size: int = 32,
+                 max_wait_ms: float = 5.0,
+                 name: str = "embedding"):
+        """
+        初始化微批次處理器
+
+        Args:
+            encode_fn: 批次編碼函數，輸入文本列表，輸出 (N, D) 陣列
+            max_batch_size: 單次模型呼叫的最大文本數
+            max_wait_ms: 收到第一筆後最多等待多久湊滿批次（毫秒）
+            name: 名稱（用於執行緒與日誌）
+        """
+        self.encode_fn = encode_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.name = name
+
+        self._queue: "queue.Queue[Tuple[str, Future]]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._closed = False
+
+        # 指標
+        self._metrics_lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+        self._max_observed_batch = 0
+        self._last_batch_size = 0
+        self._encode_time = 0.0
+        self._errors = 0
+        self._histogram = {bucket: 0 for bucket in BATCH_SIZE_BUCKETS}
+        self._histogram_overflow = 0
+
+    def _ensure_worker(self) -> None:
+        """延遲啟動背景執行緒"""
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._start_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._run,
+                    name=f"{self.name}-batcher",
+                    daemon=True
+                )
+                self._worker.start()
+
+    def submit(self, text: str) -> Future:
+        """
+        提交單筆文本
+
+        Args:
+            text: 輸入文本
+
+        Returns:
+            Future: 完成時結果為該文本的嵌入向量
+        """
+        if self._closed:
+            raise RuntimeError("微批次處理器已關閉")
+
+        future: Future = Future()
+        self._queue.put((text, future))
+        self._ensure_worker()
+        return future
+
+    def encode(self, text: str, timeout: Optional[float] = None) -> np.ndarray:
+        """同步編碼單筆文本（與其他並發呼叫合併）"""
+        return self.submit(text).result(timeout=timeout)
+
+    async def aencode(self, text: str) -> np.ndarray:
+        """非同步編碼單筆文本（與其他並發呼叫合併）"""
+        return await asyncio.wrap_future(self.submit(text))
+
+    def _collect_batch(self) -> List[Tuple[str, Future]]:
+        """收集一個批次：阻塞等待第一筆，之後於等待視窗內湊滿"""
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        """背景執行緒主迴圈"""
+        while not self._closed:
+            batch = self._collect_batch()
+            batch = [item for item in batch if item[1].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            texts = [text for text, _ in batch]
+            start_time = time.perf_counter()
+            try:
+                embeddings = self.encode_fn(texts)
+                for (_, future), embedding in zip(batch, embeddings):
+                    future.set_result(embedding)
+            except Exception as e:
+                logger.error(f"微批次編碼失敗 (批次大小 {len(texts)}): {e}")
+                with self._metrics_lock:
+                    self._errors += 1
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            finally:
+                self._record_batch(len(texts), time.perf_counter() - start_time)
+
+    def _record_batch(self, size: int, elapsed: float) -> None:
+        """記錄批次指標"""
+        with self._metrics_lock:
+            self._batches += 1
+            self._items += size
+            self._last_batch_size = size
+            self._max_observed_batch = max(self._max_observed_batch, size)
+            self._encode_time += elapsed
+            for bucket in BATCH_SIZE_BUCKETS:
+                if size <= bucket:
+                    self._histogram[bucket] += 1
+                    break
+            else:
+                self._histogram_overflow += 1
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """獲取佇列深度與批次大小指標"""
+        with self._metrics_lock:
+            histogram = {f"le_{bucket}": count for bucket, count in self._histogram.items()}
+            histogram["overflow"] = self._histogram_overflow
+            return {
+                "queue_depth": self._queue.qsize(),
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000.0,
+                "batches": self._batches,
+                "items": self._items,
+                "avg_batch_size": self._items / self._batches if self._batches else 0.0,
+                "max_observed_batch_size": self._max_observed_batch,
+                "last_batch_size": self._last_batch_size,
+                "avg_encode_ms": self._encode_time / self._batches * 1000.0 if self._batches else 0.0,
+                "errors": self._errors,
+                "batch_size_histogram": histogram
+            }
+
+    def close(self) -> None:
+        """關閉處理器，未處理的請求以例外結束"""
+        self._closed = True
+        while True:
+            try:
+                _, future = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if not future.done():
+                future.set_exception(RuntimeError("微批次處理器已關閉"))
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+內容定址的嵌入向量快取
+
+重新灌庫時，chunk_text 沒變的 chunk 直接讀回上次的向量，不再經過模型：
+- 鍵值為 sha256(模型識別 + 正規化後文本)，正規化為 NFKC、去頭尾空白並合併連續空白
+- 以 SQLite (WAL) 存在磁碟，多個程序可同時讀取，寫入由 SQLite 鎖序列化
+- 向量以 float32 bytes 存放，讀回與寫入時的值完全相同
+- 項目數上限由 EMBEDDING_CACHE_MAX_ENTRIES 控制，超出時依最後使用時間淘汰至上限的 90%
+- 查詢不寫入資料庫：最後使用時間以 EMBEDDING_CACHE_TOUCH_SECONDS 為粒度（預設每筆每小時最多一次），
+  先記在記憶體，於下次寫入、淘汰或關閉時一併更新
+- 統計命中率、寫入與淘汰筆數
+
+作者: Podwise Team
+版本: 1.0.0
+"""
+
+import os
+import re
+import time
+import hashlib
+import logging
+import sqlite3
+import threading
+import unicodedata
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+DEFAULT_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH",
+                               os.path.join(os.path.expanduser("~"), ".cache", "podwise", "embedding_cache.sqlite3"))
+DEFAULT_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "1000000"))
+# 最後使用時間的更新粒度（秒）：距上次記錄未超過此秒數的命中不更新
+TOUCH_INTERVAL_SECONDS = float(os.getenv("EMBEDDING_CACHE_TOUCH_SECONDS", "3600"))
+
+# 淘汰後保留的比例，避免每次寫入都觸發淘汰
+EVICT_TO_RATIO = 0.9
+# 單一 SQL 的參數數量上限
+_QUERY_CHUNK = 500
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """正規化文本：NFKC、去頭尾空白、合併連續空白"""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", text or "")).strip()
+
+
+def make_embedding_key(model_id: str, text: str) -> bytes:
+    """以模型識別與正規化文本產生快取鍵值"""
+    return hashlib.sha256(f"{model_id}\0{normalize_text(text)}".encode("utf-8")).digest()
+
+
+class EmbeddingCache:
+    """磁碟嵌入向量快取"""
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_entries: int = DEFAULT_MAX_ENTRIES):
+        """
+        開啟（或建立）快取
+
+        Args:
+            path: SQLite 檔案路徑
+            max_entries: 最大項目數
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.max_entries = max(1, max_entries)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30.0, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key BLOB PRIMARY KEY, model TEXT, dim INTEGER, vector BLOB, last_used REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used)")
+        self._conn.commit()
+        self._entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+        # 待更新的最後使用時間（key → 命中時間），於下次寫入交易中一併更新
+        self._pending_touches: Dict[bytes, float] = {}
+
+        self._hits = 0
+        self._misses = 0
+        self._writes = 0
+        self._evictions = 0
+
+    def get_many(self, model_id: str, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """
+        批次查詢
+
+        Args:
+            model_id: 模型識別（模型路徑加上是否正規化等影響輸出的設定）
+            texts: 文本列表
+
+        Returns:
+            List[Optional[np.ndarray]]: 與 texts 對應的 float32 向量，未命中為 None
+        """
+        keys = [make_embedding_key(model_id, text) for text in texts]
+        found: Dict[bytes, np.ndarray] = {}
+        unique = list(dict.fromkeys(keys))
+        now = time.time()
+        with self._lock:
+            for start in range(0, len(unique), _QUERY_CHUNK):
+                part = unique[start:start + _QUERY_CHUNK]
+                rows = self._conn.execute(
+                    f"SELECT key, dim, vector, last_used FROM embeddings "
+                    f"WHERE key IN ({','.join('?' * len(part))})", part
+                ).fetchall()
+                for key, dim, vector, last_used in rows:
+                    key = bytes(key)
+                    found[key] = np.frombuffer(vector, dtype=np.float32, count=dim).copy()
+                    if last_used is None or now - last_used >= TOUCH_INTERVAL_SECONDS:
+                        self._pending_touches[key] = now
+
+            results = [found.get(key) for key in keys]
+            hits = sum(result is not None for result in results)
+            self._hits += hits
+            self._misses += len(keys) - hits
+        return results
+
+    def put_many(self, model_id: str, texts: Sequence[str], vectors: Any) -> None:
+        """
+        批次寫入
+
+        Args:
+            model_id: 模型識別
+            texts: 文本列表
+            vectors: 與 texts 對應的向量 (N, D)
+        """
+        if not len(texts):
+            return
+        vectors = np.asarray(vectors, dtype=np.float32)
+        now = time.time()
+        rows = [
+            (make_embedding_key(model_id, text), model_id, int(vector.shape[0]), vector.tobytes(), now)
+            for text, vector in zip(texts, vectors)
+        ]
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, model, dim, vector, last_used) VALUES (?, ?, ?, ?, ?)", rows
+            )
+            inserted = self._conn.total_changes - before
+            self._apply_touches()
+            self._conn.commit()
+            self._writes += inserted
+            self._entries += inserted
+            if self._entries > self.max_entries:
+                self._evict()
+
+    def _apply_touches(self) -> None:
+        """將待更新的最後使用時間寫入目前的交易（需持有鎖，由呼叫端 commit）"""
+        if self._pending_touches:
+            self._conn.executemany("UPDATE embeddings SET last_used = ? WHERE key = ?",
+                                   [(used, key) for key, used in self._pending_touches.items()])
+            self._pending_touches.clear()
+
+    def flush(self) -> None:
+        """立即寫入待更新的最後使用時間"""
+        with self._lock:
+            if self._pending_touches:
+                self._apply_touches()
+                self._conn.commit()
+
+    def _evict(self) -> None:
+        """依最後使用時間淘汰至上限的 90%（需持有鎖）"""
+        # 其他程序也可能寫入，淘汰前重新計數
+        self._entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        excess = self._entries - int(self.max_entries * EVICT_TO_RATIO)
+        if excess <= 0:
+            return
+        self._conn.execute(
+            "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY last_used LIMIT ?)", (excess,)
+        )
+        self._conn.commit()
+        self._entries -= excess
+        self._evictions += excess
+        logger.info(f"嵌入快取淘汰 {excess} 筆最久未使用的向量（剩餘 {self._entries} 筆）")
+
+    def clear(self) -> None:
+        """清空快取"""
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+            self._pending_touches.clear()
+            self._entries = 0
+
+    def close(self) -> None:
+        """關閉連線（先寫入待更新的最後使用時間）"""
+        with self._lock:
+            self._apply_touches()
+            self._conn.commit()
+            self._conn.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """獲取快取統計"""
+        lookups = self._hits + self._misses
+        return {
+            "path": self.path,
+            "entries": self._entries,
+            "max_entries": self.max_entries,
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": self._hits / lookups if lookups else 0.0,
+            "writes": self._writes,
+            "evictions": self._evictions
+        }
+
+
+_cache: Optional[EmbeddingCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """獲取共用嵌入快取（單例）；EMBEDDING_CACHE_ENABLED=false 或開啟失敗時回傳 None"""
+    global _cache
+    if not CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                try:
+                    _cache = EmbeddingCache()
+                except Exception as e:
+                    logger.warning(f"嵌入快取開啟失敗，不使用快取: {e}")
+                    return None
+    return _cache
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+共用嵌入模型註冊表
+
+每個程序只載入一份 SentenceTransformer 權重，供所有模組共用：
+- 延遲載入，首次使用時才初始化
+- 以 (模型路徑, 設備) 為鍵，執行緒安全
+- 非同步編碼在有界執行緒池中執行，不阻塞事件迴圈
+- 單筆查詢可經由微批次處理器合併成一次模型呼叫
+- 載入失敗後經過退避時間（EMBEDDING_LOAD_RETRY_SECONDS）才重新嘗試
+
+作者: Podwise Team
+版本: 1.0.0
+"""
+
+import os
+import time
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple, Union
+
+import numpy as np
+
+try:
+    from .embedding_batcher import EmbeddingBatcher
+except ImportError:
+    from embedding_batcher import EmbeddingBatcher
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL_PATH = "BAAI/bge-m3"
+EXECUTOR_WORKERS = int(os.getenv("EMBEDDING_EXECUTOR_WORKERS", "2"))
+MAX_BATCH_SIZE = int(os.getenv("EMBEDDING_MAX_BATCH_SIZE", "32"))
+MAX_WAIT_MS = float(os.getenv("EMBEDDING_MAX_WAIT_MS", "5"))
+LOAD_RETRY_SECONDS = float(os.getenv("EMBEDDING_LOAD_RETRY_SECONDS", "60"))
+
+
+def _resolve_device(device: Optional[str]) -> str:
+    """解析設備名稱，auto / None 時自動偵測"""
+    if device and device != "auto":
+        return device
+    try:
+        import torch
+        return "cuda" if torch.cuda.is_available() else "cpu"
+    except ImportError:
+        return "cpu"
+
+
+class SharedEncoder:
+    """共用編碼器，包裝單一 SentenceTransformer 實例"""
+
+    def __init__(self, model_path: str, device: str, executor: ThreadPoolExecutor):
+        """
+        初始化共用編碼器（不立即載入模型）
+
+        Args:
+            model_path: 模型路徑
+            device: 設備 (cpu/cuda)
+            executor: 執行編碼的執行緒池
+        """
+        self.model_path = model_path
+        self.device = device
+        self._executor = executor
+        self._model = None
+        self._load_error: Optional[str] = None
+        self._load_failed_at = 0.0
+        self._lock = threading.Lock()
+        self._batchers: Dict[bool, EmbeddingBatcher] = {}
+        self.encode_calls = 0
+
+    def _in_backoff(self) -> bool:
+        """上次載入失敗後是否仍在退避時間內"""
+        return (self._load_error is not None
+                and time.monotonic() - self._load_failed_at < LOAD_RETRY_SECONDS)
+
+    @property
+    def model(self):
+        """取得模型實例，首次存取時載入；載入失敗回傳 None，退避時間過後再重試"""
+        if self._model is not None or self._in_backoff():
+            return self._model
+
+        with self._lock:
+            if self._model is None and not self._in_backoff():
+                try:
+                    from sentence_transformers import SentenceTransformer
+                    logger.info(f"載入共用嵌入模型: {self.model_path} (設備: {self.device})")
+                    self._model = SentenceTransformer(self.model_path, device=self.device)
+                    self._load_error = None
+                    logger.info(f"✅ 共用嵌入模型載入成功: {self.model_path}")
+                except Exception as e:
+                    self._load_error = str(e)
+                    self._load_failed_at = time.monotonic()
+                    logger.error(f"共用嵌入模型載入失敗，{LOAD_RETRY_SECONDS:g} 秒後重試: {e}")
+        return self._model
+
+    @property
+    def available(self) -> bool:
+        """模型是否可用"""
+        return self.model is not None
+
+    @property
+    def is_loaded(self) -> bool:
+        """模型是否已載入（不觸發載入）"""
+        return self._model is not None
+
+    def encode(self,
+               texts: Union[str, List[str]],
+               normalize_embeddings: bool = True,
+               batch_size: int = 32,
+               show_progress_bar: bool = False) -> np.ndarray:
+        """
+        同步編碼
+
+        Args:
+            texts: 單一文本或文本列表
+            normalize_embeddings: 是否正規化
+            batch_size: 批次大小
+            show_progress_bar: 是否顯示進度條
+
+        Returns:
+            np.ndarray: 嵌入向量
+        """
+        model = self.model
+        if model is None:
+            raise RuntimeError(f"嵌入模型不可用: {self._load_error}")
+
+        self.encode_calls += 1
+        return model.encode(
+            texts,
+            normalize_embeddings=normalize_embeddings,
+            batch_size=batch_size,
+            show_progress_bar=show_progress_bar
+        )
+
+    async def aencode(self,
+                      texts: Union[str, List[str]],
+                      normalize_embeddings: bool = True,
+                      batch_size: int = 32) -> np.ndarray:
+        """
+        非同步編碼，於執行緒池中執行以避免阻塞事件迴圈
+
+        Args:
+            texts: 單一文本或文本列表
+            normalize_embeddings: 是否正規化
+            batch_size: 批次大小
+
+        Returns:
+            np.ndarray: 嵌入向量
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor,
+            lambda: self.encode(texts, normalize_embeddings=normalize_embeddings, batch_size=batch_size)
+        )
+
+    def get_batcher(self,
+                    normalize_embeddings: bool = True,
+                    max_batch_size: int = MAX_BATCH_SIZE,
+                    max_wait_ms: float = MAX_WAIT_MS) -> EmbeddingBatcher:
+        """
+        取得微批次處理器，合併並發的單筆查詢
+
+        批次參數只在首次建立時生效，之後同一編碼器共用同一個處理器。
+
+        Args:
+            normalize_embeddings: 是否正規化
+            max_batch_size: 最大批次大小
+            max_wait_ms: 最大等待時間（毫秒）
+
+        Returns:
+            EmbeddingBatcher: 微批次處理器
+        """
+        batcher = self._batchers.get(normalize_embeddings)
+        if batcher is not None:
+            return batcher
+
+        with self._lock:
+            batcher = self._batchers.get(normalize_embeddings)
+            if batcher is None:
+                batcher = EmbeddingBatcher(
+                    lambda texts: self.encode(
+                        texts,
+                        normalize_embeddings=normalize_embeddings,
+                        batch_size=max_batch_size
+                    ),
+                    max_batch_size=max_batch_size,
+                    max_wait_ms=max_wait_ms,
+                    name=f"embedding-{self.device}"
+                )
+                self._batchers[normalize_embeddings] = batcher
+        return batcher
+
+    def get_info(self) -> Dict[str, Any]:
+        """獲取編碼器資訊"""
+        return {
+            "model_path": self.model_path,
+            "device": self.device,
+            "loaded": self.is_loaded,
+            "load_error": self._load_error,
+            "encode_calls": self.encode_calls,
+            "batchers": {
+                ("normalized" if normalized else "raw"): batcher.get_metrics()
+                for normalized, batcher in self._batchers.items()
+            }
+        }
+
+
+class EmbeddingRegistry:
+    """嵌入模型註冊表，每個 (模型路徑, 設備) 只保留一個編碼器"""
+
+    def __init__(self, max_workers: int = EXECUTOR_WORKERS):
+        """
+        初始化註冊表
+
+        Args:
+            max_workers: 編碼執行緒池大小
+        """
+        self._encoders: Dict[Tuple[str, str], SharedEncoder] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, max_workers),
+            thread_name_prefix="embedding"
+        )
+
+    def get(self, model_path: str = DEFAULT_MODEL_PATH, device: Optional[str] = None) -> SharedEncoder:
+        """
+        取得共用編碼器
+
+        Args:
+            model_path: 模型路徑
+            device: 設備，None 或 auto 時自動偵測
+
+        Returns:
+            SharedEncoder: 共用編碼器
+        """
+        key = (model_path, _resolve_device(device))
+        encoder = self._encoders.get(key)
+        if encoder is not None:
+            return encoder
+
+        with self._lock:
+            encoder = self._encoders.get(key)
+            if encoder is None:
+                encoder = SharedEncoder(key[0], key[1], self._executor)
+                self._encoders[key] = encoder
+        return encoder
+
+    def get_stats(self) -> List[Dict[str, Any]]:
+        """獲取所有編碼器狀態"""
+        return [encoder.get_info() for encoder in self._encoders.values()]
+
+
+# 全域註冊表
+_registry: Optional[EmbeddingRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_embedding_registry() -> EmbeddingRegistry:
+    """獲取全域嵌入模型註冊表"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = EmbeddingRegistry()
+    return _registry
+
+
+def get_shared_encoder(model_path: str = DEFAULT_MODEL_PATH, device: Optional[str] = None) -> SharedEncoder:
+    """獲取共用編碼器"""
+    return get_embedding_registry().get(model_path, device)
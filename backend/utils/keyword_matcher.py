@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+多關鍵字比對引擎
+
+將整份標籤詞庫（標籤、同義詞、專業名詞）一次編譯成 Aho-Corasick 自動機，
+每段文本只掃描一次即找出所有出現的關鍵字，成本與詞庫大小無關：
+- 語意同逐一 `keyword.lower() in text.lower()`：子字串比對、不分大小寫、可重疊
+- 每個關鍵字可附帶 payload（例如所屬標籤或類別），同一關鍵字可出現多次（各自計分）
+- 比對結果依加入順序回傳，與原本依詞庫順序逐一檢查的結果一致
+- 純 Python 實作；不在詞庫字元集中的字元直接重設狀態，中文逐字稿大多數字元不需查表
+- 入庫貼標（vector_pipeline、rag_pipeline/scripts/tag_processor.py）與查詢時分類（rag_pipeline）共用
+
+作者: Podwise Team
+版本: 1.0.0
+"""
+
+import logging
+import threading
+from typing import Any, Dict, Iterable, Iterator, List, Sequence, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+
+class _Automaton:
+    """Aho-Corasick 自動機"""
+
+    def __init__(self, keys: Sequence[str]):
+        goto: List[Dict[str, int]] = [{}]
+        outputs: List[List[int]] = [[]]
+        for key_id, key in enumerate(keys):
+            state = 0
+            for char in key:
+                next_state = goto[state].get(char)
+                if next_state is None:
+                    next_state = len(goto)
+                    goto[state][char] = next_state
+                    goto.append({})
+                    outputs.append([])
+                state = next_state
+            outputs[state].append(key_id)
+
+        # 廣度優先建立失敗連結，並把失敗鏈上的輸出合併到每個節點
+        fail = [0] * len(goto)
+        queue = list(goto[0].values())
+        for state in queue:
+            for char, next_state in goto[state].items():
+                queue.append(next_state)
+                fallback = fail[state]
+                while fallback and char not in goto[fallback]:
+                    fallback = fail[fallback]
+                target = goto[fallback].get(char, 0)
+                fail[next_state] = target if target != next_state else 0
+                if outputs[fail[next_state]]:
+                    outputs[next_state] = outputs[next_state] + outputs[fail[next_state]]
+
+        self._goto = goto
+        self._fail = fail
+        self._outputs = [tuple(output) if output else None for output in outputs]
+        self.alphabet = frozenset(goto[0]).union(*(node.keys() for node in goto))
+
+    def iter(self, text: str) -> Iterator[Tuple[int, int]]:
+        """逐一產生 (結尾索引, 關鍵字編號)"""
+        goto, fail, outputs, alphabet = self._goto, self._fail, self._outputs, self.alphabet
+        state = 0
+        for index, char in enumerate(text):
+            if char not in alphabet:
+                state = 0
+                continue
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            output = outputs[state]
+            if output:
+                for key_id in output:
+                    yield index, key_id
+
+    def matched_ids(self, text: str) -> set:
+        """出現過的關鍵字編號（不需位置時較快）"""
+        goto, fail, outputs, alphabet = self._goto, self._fail, self._outputs, self.alphabet
+        matched = set()
+        state = 0
+        for char in text:
+            if char not in alphabet:
+                state = 0
+                continue
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            output = outputs[state]
+            if output:
+                matched.update(output)
+        return matched
+
+
+KeywordEntry = Union[str, Tuple[str, Any]]
+
+
+class KeywordMatcher:
+    """多關鍵字比對器"""
+
+    def __init__(self, entries: Iterable[KeywordEntry] = (), case_sensitive: bool = False):
+        """
+        初始化比對器（首次比對時編譯）
+
+        Args:
+            entries: 關鍵字，或 (關鍵字, payload)
+            case_sensitive: 是否區分大小寫，預設不區分（關鍵字與文本皆轉小寫）
+        """
+        self.case_sensitive = case_sensitive
+        self._keywords: List[str] = []
+        self._payloads: List[Any] = []
+        self._key_ids: Dict[str, int] = {}
+        self._key_entries: List[List[int]] = []
+        self._automaton = None
+        self._lock = threading.Lock()
+        self.add_many(entries)
+
+    def _normalize(self, text: str) -> str:
+        return text if self.case_sensitive else text.lower()
+
+    def add(self, keyword: str, payload: Any = None) -> None:
+        """
+        加入關鍵字（空字串略過）
+
+        Args:
+            keyword: 關鍵字
+            payload: 附帶資料，未指定時為關鍵字本身
+        """
+        if not keyword:
+            return
+        key = self._normalize(keyword)
+        key_id = self._key_ids.get(key)
+        if key_id is None:
+            key_id = len(self._key_entries)
+            self._key_ids[key] = key_id
+            self._key_entries.append([])
+        self._key_entries[key_id].append(len(self._keywords))
+        self._keywords.append(keyword)
+        self._payloads.append(keyword if payload is None else payload)
+        self._automaton = None
+
+    def add_many(self, entries: Iterable[KeywordEntry]) -> None:
+        """批次加入關鍵字或 (關鍵字, payload)"""
+        for entry in entries:
+            if isinstance(entry, tuple):
+                self.add(entry[0], entry[1])
+            else:
+                self.add(entry)
+
+    def _get_automaton(self):
+        automaton = self._automaton
+        if automaton is None:
+            with self._lock:
+                if self._automaton is None:
+                    self._automaton = _Automaton(list(self._key_ids))
+                    logger.debug(f"關鍵字自動機編譯完成: {len(self._key_ids)} 個關鍵字")
+                automaton = self._automaton
+        return automaton
+
+    def _matched_key_ids(self, text: str) -> set:
+        if not text or not self._key_entries:
+            return set()
+        return self._get_automaton().matched_ids(self._normalize(text))
+
+    def search(self, text: str) -> List[Tuple[str, Any]]:
+        """
+        找出文本中出現的關鍵字
+
+        Args:
+            text: 文本
+
+        Returns:
+            List[Tuple[str, Any]]: (關鍵字, payload)，依加入順序，每個加入的項目至多一次
+        """
+        entry_ids = sorted(entry_id for key_id in self._matched_key_ids(text)
+                           for entry_id in self._key_entries[key_id])
+        return [(self._keywords[entry_id], self._payloads[entry_id]) for entry_id in entry_ids]
+
+    def find_keywords(self, text: str) -> List[str]:
+        """找出文本中出現的關鍵字（依加入順序、不重複）"""
+        return list(dict.fromkeys(keyword for keyword, _ in self.search(text)))
+
+    def find_payloads(self, text: str) -> List[Any]:
+        """找出文本中出現的關鍵字的 payload（依加入順序，可重複）"""
+        return [payload for _, payload in self.search(text)]
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int, str]]:
+        """
+        逐一產生每次出現的位置
+
+        Yields:
+            (起始索引, 結束索引（不含）, 關鍵字)；索引以正規化（轉小寫）後的文本計算
+        """
+        if not text or not self._key_entries:
+            return
+        automaton = self._get_automaton()
+        for end, key_id in automaton.iter(self._normalize(text)):
+            keyword = self._keywords[self._key_entries[key_id][0]]
+            yield end - len(self._normalize(keyword)) + 1, end + 1, keyword
+
+    def __len__(self) -> int:
+        return len(self._keywords)
+
+    def __contains__(self, keyword: str) -> bool:
+        return self._normalize(keyword) in self._key_ids
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+延遲統計
+
+Milvus 客戶端管理器與 LLM HTTP 客戶端共用的滾動視窗延遲統計，
+提供呼叫次數、錯誤數、平均與 p50/p95 延遲
+
+作者: Podwise Team
+版本: 1.0.0
+"""
+
+from collections import deque
+from typing import Any, Deque, Dict
+
+LATENCY_WINDOW = 1024
+
+
+class LatencyTracker:
+    """單一操作的延遲統計（滾動視窗）"""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.samples: Deque[float] = deque(maxlen=window)
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+
+    def record(self, elapsed: float, success: bool) -> None:
+        self.samples.append(elapsed)
+        self.count += 1
+        self.total += elapsed
+        if not success:
+            self.errors += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        ordered = sorted(self.samples)
+
+        def pct(p: float) -> float:
+            if not ordered:
+                return 0.0
+            return ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000.0
+
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "avg_ms": self.total / self.count * 1000.0 if self.count else 0.0,
+            "p50_ms": pct(0.50),
+            "p95_ms": pct(0.95),
+            "last_ms": self.samples[-1] * 1000.0 if self.samples else 0.0
+        }
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+共用 LLM HTTP 客戶端
+
+所有 LLM 後端（Ollama、OpenAI 相容端點）共用的非同步 HTTP 存取層：
+- 單一 aiohttp 連線池，keep-alive 重用連線，總連線數與每主機連線數有上限
+- 每個模型有獨立的並發上限，超出的請求排隊等待；佇列已滿或等待逾時即拒絕
+- 支援一般 JSON 回應與逐行串流（Ollama NDJSON / OpenAI SSE）
+- 記錄每個模型的排隊、執行中請求數與延遲 p50/p95
+
+作者: Podwise Team
+版本: 1.0.0
+"""
+
+import os
+import time
+import asyncio
+import logging
+import threading
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
+
+try:
+    import aiohttp
+    AIOHTTP_AVAILABLE = True
+except ImportError:
+    aiohttp = None
+    AIOHTTP_AVAILABLE = False
+
+from .latency_tracker import LatencyTracker
+
+logger = logging.getLogger(__name__)
+
+MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "32"))
+MAX_CONNECTIONS_PER_HOST = int(os.getenv("LLM_MAX_CONNECTIONS_PER_HOST", "16"))
+MODEL_CONCURRENCY = int(os.getenv("LLM_MODEL_CONCURRENCY", "4"))
+MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "64"))
+QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "30"))
+KEEPALIVE_TIMEOUT = float(os.getenv("LLM_KEEPALIVE_TIMEOUT", "60"))
+CONNECT_TIMEOUT = 10.0
+
+
+class LLMClientBusyError(RuntimeError):
+    """模型排隊已滿或等待逾時"""
+
+
+class LLMHTTPError(RuntimeError):
+    """LLM 端點回傳非 200 狀態碼"""
+
+    def __init__(self, status: int, body: str):
+        super().__init__(f"LLM API 錯誤: {status} - {body[:200]}")
+        self.status = status
+        self.body = body
+
+
+class _ModelLimiter:
+    """單一模型的並發上限與排隊統計"""
+
+    def __init__(self, limit: int, max_queue: int):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.semaphore = asyncio.Semaphore(limit)
+        self.in_flight = 0
+        self.waiting = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.latency = LatencyTracker()
+
+    def snapshot(self) -> Dict[str, Any]:
+        stats = self.latency.snapshot()
+        stats.update({
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "rejected": self.rejected,
+            "avg_wait_ms": self.total_wait / stats["count"] * 1000.0 if stats["count"] else 0.0
+        })
+        return stats
+
+
+class LLMHTTPClient:
+    """共用 LLM HTTP 客戶端"""
+
+    def __init__(self,
+                 max_connections: int = MAX_CONNECTIONS,
+                 max_connections_per_host: int = MAX_CONNECTIONS_PER_HOST,
+                 model_concurrency: int = MODEL_CONCURRENCY,
+                 max_queue: int = MAX_QUEUE,
+                 queue_timeout: float = QUEUE_TIMEOUT):
+        """
+        初始化客戶端
+
+        Args:
+            max_connections: 連線池總連線數上限
+            max_connections_per_host: 每個主機的連線數上限
+            model_concurrency: 未另行設定時，每個模型同時執行的請求數上限
+            max_queue: 每個模型排隊等待的請求數上限
+            queue_timeout: 排隊等待逾時（秒）
+        """
+        self.max_connections = max_connections
+        self.max_connections_per_host = max_connections_per_host
+        self.model_concurrency = model_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+
+        self._lock = threading.RLock()
+        self._session: Optional["aiohttp.ClientSession"] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._limiters: Dict[str, _ModelLimiter] = {}
+        self._model_limits: Dict[str, int] = {}
+
+    # ---------------------------------------------------------------- 連線池
+
+    def _bind_loop(self) -> None:
+        """session 與 semaphore 綁定事件迴圈，迴圈更換時（例如測試或腳本多次 asyncio.run）重新建立"""
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        with self._lock:
+            if self._loop is loop:
+                return
+            if self._session is not None and not self._session.closed:
+                logger.warning("事件迴圈已更換，捨棄舊的 LLM 連線池")
+            self._session = None
+            self._limiters = {}
+            self._loop = loop
+
+    def _get_session(self) -> "aiohttp.ClientSession":
+        if not AIOHTTP_AVAILABLE:
+            raise RuntimeError("aiohttp 未安裝，無法呼叫 LLM")
+        self._bind_loop()
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_connections,
+                limit_per_host=self.max_connections_per_host,
+                keepalive_timeout=KEEPALIVE_TIMEOUT
+            )
+            self._session = aiohttp.ClientSession(connector=connector)
+            logger.info(f"✅ LLM 連線池已建立 (上限 {self.max_connections}，每主機 {self.max_connections_per_host})")
+        return self._session
+
+    def set_model_concurrency(self, model: str, limit: int) -> None:
+        """設定單一模型的並發上限（下次建立限流器時生效）"""
+        with self._lock:
+            self._model_limits[model] = max(1, int(limit))
+            self._limiters.pop(model, None)
+
+    def _get_limiter(self, model: str) -> _ModelLimiter:
+        self._bind_loop()
+        limiter = self._limiters.get(model)
+        if limiter is None:
+            with self._lock:
+                limiter = self._limiters.get(model)
+                if limiter is None:
+                    limit = self._model_limits.get(model, self.model_concurrency)
+                    limiter = _ModelLimiter(limit, self.max_queue)
+                    self._limiters[model] = limiter
+        return limiter
+
+    @asynccontextmanager
+    async def _slot(self, model: str):
+        """取得模型執行名額；名額用完時排隊，佇列已滿或等待逾時拋出 LLMClientBusyError"""
+        limiter = self._get_limiter(model)
+        # 以執行中加排隊中的請求數判斷：同一批併發請求的 acquire 尚未完成時 semaphore 仍未鎖定
+        if limiter.in_flight + limiter.waiting >= limiter.limit + limiter.max_queue:
+            limiter.rejected += 1
+            raise LLMClientBusyError(f"模型 {model} 排隊已滿 ({limiter.waiting})")
+
+        wait_start = time.perf_counter()
+        limiter.waiting += 1
+        try:
+            await asyncio.wait_for(limiter.semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            limiter.rejected += 1
+            raise LLMClientBusyError(f"模型 {model} 排隊逾時 ({self.queue_timeout}s)")
+        finally:
+            limiter.waiting -= 1
+
+        limiter.total_wait += time.perf_counter() - wait_start
+        limiter.in_flight += 1
+        start = time.perf_counter()
+        success = False
+        try:
+            yield
+            success = True
+        except GeneratorExit:
+            # 串流呼叫端讀到所需內容後提前關閉，不算失敗
+            success = True
+            raise
+        finally:
+            limiter.in_flight -= 1
+            limiter.semaphore.release()
+            limiter.latency.record(time.perf_counter() - start, success)
+
+    # ---------------------------------------------------------------- 請求
+
+    async def post_json(self,
+                        url: str,
+                        payload: Dict[str, Any],
+                        model: str,
+                        headers: Optional[Dict[str, str]] = None,
+                        timeout: float = 120.0) -> Dict[str, Any]:
+        """
+        發送 JSON 請求並回傳解析後的 JSON 回應
+
+        Args:
+            url: 端點 URL
+            payload: 請求內容
+            model: 模型鍵（用於並發限制與統計）
+            headers: 額外標頭
+            timeout: 整體逾時（秒，不含排隊時間）
+        """
+        session = self._get_session()
+        async with self._slot(model):
+            async with session.post(
+                url,
+                json=payload,
+                headers=headers,
+                timeout=aiohttp.ClientTimeout(total=timeout, connect=CONNECT_TIMEOUT)
+            ) as response:
+                if response.status != 200:
+                    raise LLMHTTPError(response.status, await response.text())
+                return await response.json(content_type=None)
+
+    async def stream_lines(self,
+                           url: str,
+                           payload: Dict[str, Any],
+                           model: str,
+                           headers: Optional[Dict[str, str]] = None,
+                           read_timeout: float = 120.0) -> AsyncIterator[str]:
+        """
+        發送請求並逐行回傳串流回應（略過空行）
+
+        整個串流期間佔用一個模型名額；呼叫端提前結束（aclose）時釋放名額並歸還連線。
+
+        Args:
+            read_timeout: 兩段輸出之間的讀取逾時（秒）
+        """
+        session = self._get_session()
+        async with self._slot(model):
+            async with session.post(
+                url,
+                json=payload,
+                headers=headers,
+                timeout=aiohttp.ClientTimeout(total=None, connect=CONNECT_TIMEOUT, sock_read=read_timeout)
+            ) as response:
+                if response.status != 200:
+                    raise LLMHTTPError(response.status, await response.text())
+                async for raw_line in response.content:
+                    line = raw_line.decode("utf-8", errors="replace").strip()
+                    if line:
+                        yield line
+
+    # ---------------------------------------------------------------- 狀態
+
+    def get_stats(self) -> Dict[str, Any]:
+        """連線池與各模型排隊、延遲統計"""
+        connector = self._session.connector if self._session is not None and not self._session.closed else None
+        # aiohttp 未公開連線池狀態，讀取內部欄位（版本不符時回報 0）
+        active = len(getattr(connector, "_acquired", ())) if connector else 0
+        idle = sum(len(conns) for conns in getattr(connector, "_conns", {}).values()) if connector else 0
+        return {
+            "aiohttp_available": AIOHTTP_AVAILABLE,
+            "max_connections": self.max_connections,
+            "max_connections_per_host": self.max_connections_per_host,
+            "active_connections": active,
+            "idle_connections": idle,
+            "models": {model: limiter.snapshot() for model, limiter in list(self._limiters.items())}
+        }
+
+    async def close(self) -> None:
+        """關閉連線池"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+_manager: Optional[LLMHTTPClient] = None
+_manager_lock = threading.Lock()
+
+
+def get_llm_http_client() -> LLMHTTPClient:
+    """獲取共用 LLM HTTP 客戶端（單例）"""
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = LLMHTTPClient()
+    return _manager
@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+"""
+共用 Milvus 客戶端管理器
+
+所有檢索程式碼共用的 Milvus 存取層：
+- 連線依 (uri/host, port, user) 重用，不重複 connect
+- 集合只在首次使用時 load，之後保持載入狀態
+- 阻塞的 pymilvus 呼叫在有界執行緒池中執行，不阻塞事件迴圈
+- 記錄每次呼叫延遲，提供 p50/p95 統計
+- 集合重新載入或灌庫寫入後通知監聽者（例如回應快取失效），
+  並可經由 RAG_CACHE_INVALIDATE_URLS 通知其他程序的 RAG 服務
+
+作者: Podwise Team
+版本: 1.0.0
+"""
+
+import os
+import json
+import time
+import asyncio
+import logging
+import threading
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .latency_tracker import LatencyTracker
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = os.getenv("MILVUS_HOST", "192.168.32.86")
+DEFAULT_PORT = int(os.getenv("MILVUS_PORT", "19530"))
+DEFAULT_URI = os.getenv("MILVUS_URI", "")
+EXECUTOR_WORKERS = int(os.getenv("MILVUS_EXECUTOR_WORKERS", "8"))
+# 灌庫寫入後要通知的快取失效端點（逗號分隔），例如 http://rag:8004/api/v1/cache/invalidate
+CACHE_INVALIDATE_URLS = [url.strip() for url in os.getenv("RAG_CACHE_INVALIDATE_URLS", "").split(",") if url.strip()]
+CACHE_INVALIDATE_TIMEOUT = float(os.getenv("RAG_CACHE_INVALIDATE_TIMEOUT", "3"))
+# 與 RAG 服務相同的快取管理權杖，設定時隨失效通知送出
+CACHE_ADMIN_TOKEN = os.getenv("RAG_CACHE_ADMIN_TOKEN", "")
+
+
+class MilvusClientManager:
+    """共用 Milvus 客戶端管理器"""
+
+    def __init__(self, max_workers: int = EXECUTOR_WORKERS):
+        """
+        初始化管理器
+
+        Args:
+            max_workers: 阻塞呼叫執行緒池大小（同時也是並發呼叫上限）
+        """
+        self._lock = threading.RLock()
+        self._aliases: Dict[Tuple[str, str], str] = {}
+        self._collections: Dict[Tuple[str, str], Any] = {}
+        self._latency: Dict[str, LatencyTracker] = {}
+        self._reload_listeners: List[Callable[[str], None]] = []
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, max_workers),
+            thread_name_prefix="milvus"
+        )
+
+    # ==================== 連線與集合 ====================
+
+    @staticmethod
+    def _endpoint(host: Optional[str], port: Optional[int], uri: Optional[str]) -> str:
+        uri = uri if uri is not None else DEFAULT_URI
+        if uri:
+            return uri
+        return f"{host or DEFAULT_HOST}:{port or DEFAULT_PORT}"
+
+    def get_alias(self,
+                  host: Optional[str] = None,
+                  port: Optional[int] = None,
+                  uri: Optional[str] = None,
+                  user: str = "",
+                  password: str = "") -> str:
+        """
+        取得（必要時建立）共用連線別名
+
+        Args:
+            host: Milvus 主機
+            port: Milvus 端口
+            uri: Milvus URI（Milvus Lite 檔案路徑或 http URI，優先於 host/port）
+            user: 使用者名稱
+            password: 密碼
+
+        Returns:
+            str: pymilvus 連線別名
+        """
+        endpoint = self._endpoint(host, port, uri)
+        key = (endpoint, user)
+        alias = self._aliases.get(key)
+        if alias is not None:
+            return alias
+
+        with self._lock:
+            alias = self._aliases.get(key)
+            if alias is None:
+                from pymilvus import connections
+
+                alias = f"podwise_{len(self._aliases)}"
+                kwargs: Dict[str, Any] = {"alias": alias}
+                if endpoint == uri or (uri is None and DEFAULT_URI):
+                    kwargs["uri"] = endpoint
+                else:
+                    kwargs["host"] = host or DEFAULT_HOST
+                    kwargs["port"] = str(port or DEFAULT_PORT)
+                if user:
+                    kwargs["user"] = user
+                    kwargs["password"] = password
+                start = time.perf_counter()
+                connections.connect(**kwargs)
+                self._record("connect", time.perf_counter() - start, True)
+                self._aliases[key] = alias
+                logger.info(f"✅ Milvus 連線建立: {endpoint} (別名 {alias})")
+        return alias
+
+    def has_collection(self, collection_name: str, **conn_kwargs) -> bool:
+        """檢查集合是否存在"""
+        from pymilvus import utility
+        alias = self.get_alias(**conn_kwargs)
+        return utility.has_collection(collection_name, using=alias)
+
+    def get_collection(self, collection_name: str, load: bool = True, **conn_kwargs) -> Optional[Any]:
+        """
+        取得共用集合物件，首次取得時載入，之後不再重複 load
+
+        Args:
+            collection_name: 集合名稱
+            load: 是否確保集合已載入
+            **conn_kwargs: 傳給 get_alias 的連線參數
+
+        Returns:
+            Optional[Collection]: 集合物件，不存在時回傳 None
+        """
+        alias = self.get_alias(**conn_kwargs)
+        key = (alias, collection_name)
+        collection = self._collections.get(key)
+        if collection is not None:
+            return collection
+
+        with self._lock:
+            collection = self._collections.get(key)
+            if collection is None:
+                from pymilvus import Collection, utility
+
+                if not utility.has_collection(collection_name, using=alias):
+                    logger.warning(f"⚠️ Milvus 集合 '{collection_name}' 不存在")
+                    return None
+                collection = Collection(collection_name, using=alias)
+                if load:
+                    start = time.perf_counter()
+                    collection.load()
+                    self._record("load", time.perf_counter() - start, True)
+                self._collections[key] = collection
+                logger.info(f"✅ Milvus 集合 '{collection_name}' 已載入並快取")
+        return collection
+
+    def reload_collection(self, collection_name: str, **conn_kwargs) -> Optional[Any]:
+        """
+        重新載入集合（資料更新後呼叫），並通知監聽者
+
+        Args:
+            collection_name: 集合名稱
+            **conn_kwargs: 連線參數
+
+        Returns:
+            Optional[Collection]: 重新載入後的集合物件
+        """
+        alias = self.get_alias(**conn_kwargs)
+        with self._lock:
+            collection = self._collections.pop((alias, collection_name), None)
+            if collection is not None:
+                try:
+                    collection.release()
+                except Exception as e:
+                    logger.warning(f"釋放集合失敗: {e}")
+        collection = self.get_collection(collection_name, **conn_kwargs)
+        self.notify_collection_updated(collection_name)
+        return collection
+
+    def notify_collection_updated(self, collection_name: str) -> None:
+        """通知監聽者集合內容已變更（重新載入或灌庫寫入後）"""
+        for listener in list(self._reload_listeners):
+            try:
+                listener(collection_name)
+            except Exception as e:
+                logger.warning(f"集合更新通知失敗: {e}")
+
+    def add_reload_listener(self, listener: Callable[[str], None]) -> None:
+        """註冊集合重新載入或資料更新時的回呼"""
+        with self._lock:
+            if listener not in self._reload_listeners:
+                self._reload_listeners.append(listener)
+
+    # ==================== 搜尋與查詢 ====================
+
+    def _record(self, operation: str, elapsed: float, success: bool) -> None:
+        tracker = self._latency.get(operation)
+        if tracker is None:
+            tracker = self._latency.setdefault(operation, LatencyTracker())
+        tracker.record(elapsed, success)
+
+    def _timed(self, operation: str, func: Callable[[], Any]) -> Any:
+        start = time.perf_counter()
+        success = False
+        try:
+            result = func()
+            success = True
+            return result
+        finally:
+            self._record(operation, time.perf_counter() - start, success)
+
+    def search(self,
+               collection_name: str,
+               data: List[List[float]],
+               anns_field: str = "embedding",
+               param: Optional[Dict[str, Any]] = None,
+               limit: int = 10,
+               output_fields: Optional[List[str]] = None,
+               expr: Optional[str] = None,
+               **conn_kwargs) -> Any:
+        """
+        同步向量搜尋（集合保持載入，不重複 load）
+
+        Args:
+            collection_name: 集合名稱
+            data: 查詢向量列表
+            anns_field: 向量欄位
+            param: 搜尋參數
+            limit: 返回數量
+            output_fields: 輸出欄位
+            expr: 過濾條件
+            **conn_kwargs: 連線參數
+
+        Returns:
+            pymilvus 搜尋結果；集合不存在時回傳空列表
+        """
+        collection = self.get_collection(collection_name, **conn_kwargs)
+        if collection is None:
+            return []
+        search_params = param or {"metric_type": "COSINE", "params": {"nprobe": 10}}
+        return self._timed("search", lambda: collection.search(
+            data=data,
+            anns_field=anns_field,
+            param=search_params,
+            limit=limit,
+            output_fields=output_fields,
+            expr=expr
+        ))
+
+    async def asearch(self, collection_name: str, data: List[List[float]], **kwargs) -> Any:
+        """非同步向量搜尋，於有界執行緒池中執行"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor,
+            lambda: self.search(collection_name, data, **kwargs)
+        )
+
+    def query(self,
+              collection_name: str,
+              expr: str,
+              output_fields: Optional[List[str]] = None,
+              limit: Optional[int] = None,
+              **conn_kwargs) -> List[Dict[str, Any]]:
+        """同步標量查詢"""
+        collection = self.get_collection(collection_name, **conn_kwargs)
+        if collection is None:
+            return []
+        query_kwargs: Dict[str, Any] = {"expr": expr, "output_fields": output_fields}
+        if limit is not None:
+            query_kwargs["limit"] = limit
+        return self._timed("query", lambda: collection.query(**query_kwargs))
+
+    async def aquery(self, collection_name: str, expr: str, **kwargs) -> List[Dict[str, Any]]:
+        """非同步標量查詢，於有界執行緒池中執行"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor,
+            lambda: self.query(collection_name, expr, **kwargs)
+        )
+
+    # ==================== 狀態 ====================
+
+    def get_stats(self) -> Dict[str, Any]:
+        """獲取連線、集合與各操作延遲統計"""
+        return {
+            "connections": len(self._aliases),
+            "loaded_collections": [name for _, name in self._collections.keys()],
+            "latency": {op: tracker.snapshot() for op, tracker in self._latency.items()}
+        }
+
+    def release_all(self) -> None:
+        """釋放所有集合與連線"""
+        from pymilvus import connections
+
+        with self._lock:
+            for collection in self._collections.values():
+                try:
+                    collection.release()
+                except Exception as e:
+                    logger.warning(f"釋放集合失敗: {e}")
+            self._collections.clear()
+            for alias in self._aliases.values():
+                try:
+                    connections.disconnect(alias)
+                except Exception as e:
+                    logger.warning(f"斷開連線失敗: {e}")
+            self._aliases.clear()
+
+
+# 全域實例
+_manager: Optional[MilvusClientManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_milvus_manager() -> MilvusClientManager:
+    """獲取全域 Milvus 客戶端管理器"""
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = MilvusClientManager()
+    return _manager
+
+
+def notify_collection_updated(collection_name: str) -> int:
+    """
+    灌庫寫入提交後呼叫：通知本程序的監聽者，並 POST 到 RAG_CACHE_INVALIDATE_URLS，
+    讓另一個程序中的 RAG 服務清空語意回應快取
+
+    Args:
+        collection_name: 集合名稱
+
+    Returns:
+        int: 成功通知的遠端端點數
+    """
+    if _manager is not None:
+        _manager.notify_collection_updated(collection_name)
+
+    notified = 0
+    payload = json.dumps({"collection": collection_name}).encode("utf-8")
+    headers = {"Content-Type": "application/json"}
+    if CACHE_ADMIN_TOKEN:
+        headers["X-Cache-Admin-Token"] = CACHE_ADMIN_TOKEN
+    for url in CACHE_INVALIDATE_URLS:
+        request = urllib.request.Request(url, data=payload, method="POST", headers=headers)
+        try:
+            with urllib.request.urlopen(request, timeout=CACHE_INVALIDATE_TIMEOUT) as response:
+                response.read()
+            notified += 1
+        except Exception as e:
+            logger.warning(f"通知快取失效失敗 ({url}): {e}")
+    if CACHE_INVALIDATE_URLS:
+        logger.info(f"集合 {collection_name} 已更新，通知 {notified}/{len(CACHE_INVALIDATE_URLS)} 個快取失效端點")
+    return notified
@@ -23,6 +23,7 @@ import pandas as pd
 import numpy as np
 
 from .common_utils import normalize_text, create_logger
+from .keyword_matcher import KeywordMatcher
 
 logger = create_logger(__name__)
 
@@ -156,6 +157,13 @@ class UnifiedTagProcessor:
         
         if tag_csv_path and Path(tag_csv_path).exists():
             self._load_tag_info(tag_csv_path)
+        
+        # 標籤名稱與同義詞編譯成單一自動機
+        self.matcher = KeywordMatcher(
+            (keyword, tag_name)
+            for tag_name, tag_info in self.tag_info_map.items()
+            for keyword in [tag_name] + tag_info.synonyms
+        )
     
     def _load_tag_info(self, csv_path: str):
         """載入標籤資訊"""
@@ -196,20 +204,9 @@ class UnifiedTagProcessor:
         if not text:
             return []
         
-        text_lower = normalize_text(text)
-        found_tags = []
-        
-        # 精確匹配標籤
-        for tag_name, tag_info in self.tag_info_map.items():
-            if tag_name.lower() in text_lower:
-                found_tags.append((tag_name, tag_info.weight))
-                continue
-            
-            # 匹配同義詞
-            for synonym in tag_info.synonyms:
-                if synonym.lower() in text_lower:
-                    found_tags.append((tag_name, tag_info.weight))
-                    break
+        # 匹配標籤名稱或同義詞，每個標籤只取一次
+        matched = dict.fromkeys(self.matcher.find_payloads(normalize_text(text)))
+        found_tags = [(tag_name, self.tag_info_map[tag_name].weight) for tag_name in matched]
         
         # 按權重排序並返回前 max_tags 個
         found_tags.sort(key=lambda x: x[1], reverse=True)
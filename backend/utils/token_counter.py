@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+共用 Token 計數器
+
+以本機 tokenizer 計算文字的 token 數，供上下文打包、切塊等需要 token 預算的模組共用：
+- 優先使用 tokenizers（Rust 實作）載入 tokenizer.json：QWEN_TOKENIZER_PATH 指定的檔案，
+  或 transformers 本機快取中的 CONTEXT_TOKENIZER_MODEL（只讀本機檔案，不連網）
+- 無法載入時以字元規則估算：CJK 字元每字 1 token，英數字每 4 字元約 1 token，標點 1 token
+- 批次計數走 encode_batch，避免逐句呼叫
+
+作者: Podwise Team
+版本: 1.0.0
+"""
+
+import os
+import re
+import logging
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+TOKENIZER_PATH = os.getenv("QWEN_TOKENIZER_PATH", "")
+TOKENIZER_MODEL = os.getenv("CONTEXT_TOKENIZER_MODEL", "Qwen/Qwen2.5-7B-Instruct")
+
+# CJK 統一表意文字、擴充 A、相容表意文字、全形標點與假名
+_CJK_PATTERN = r"[　-〿぀-ヿ㐀-䶿一-鿿豈-﫿＀-￯]"
+_ESTIMATE_PATTERN = re.compile(rf"{_CJK_PATTERN}|[A-Za-z0-9_]+|[^\s]")
+
+
+def estimate_tokens(text: str) -> int:
+    """以字元規則估算 token 數（無 tokenizer 時使用）"""
+    count = 0
+    for piece in _ESTIMATE_PATTERN.findall(text or ""):
+        if len(piece) > 1:
+            count += (len(piece) + 3) // 4
+        else:
+            count += 1
+    return count
+
+
+def _load_tokenizer(tokenizer_path: str, model_name: str):
+    """載入本機快速 tokenizer，失敗回傳 None"""
+    if tokenizer_path and os.path.exists(tokenizer_path):
+        try:
+            from tokenizers import Tokenizer
+            path = tokenizer_path
+            if os.path.isdir(path):
+                path = os.path.join(path, "tokenizer.json")
+            return Tokenizer.from_file(path)
+        except Exception as e:
+            logger.warning(f"載入 tokenizer 檔案失敗 {tokenizer_path}: {e}")
+
+    if model_name:
+        try:
+            from transformers import AutoTokenizer
+            tokenizer = AutoTokenizer.from_pretrained(model_name, local_files_only=True, use_fast=True)
+            return getattr(tokenizer, "backend_tokenizer", None)
+        except Exception as e:
+            logger.info(f"本機快取中沒有 {model_name} tokenizer，改用字元估算: {e}")
+    return None
+
+
+class TokenCounter:
+    """Token 計數器"""
+
+    def __init__(self, tokenizer_path: Optional[str] = None, model_name: Optional[str] = None):
+        """
+        初始化 Token 計數器
+
+        Args:
+            tokenizer_path: tokenizer.json 檔案或其所在目錄
+            model_name: transformers 本機快取中的模型名稱
+        """
+        self._tokenizer = _load_tokenizer(
+            TOKENIZER_PATH if tokenizer_path is None else tokenizer_path,
+            TOKENIZER_MODEL if model_name is None else model_name
+        )
+        self.backend = "tokenizers" if self._tokenizer is not None else "estimate"
+        logger.info(f"Token 計數器使用 {self.backend}")
+
+    def count(self, text: str) -> int:
+        """計算單段文字的 token 數"""
+        if not text:
+            return 0
+        if self._tokenizer is None:
+            return estimate_tokens(text)
+        return len(self._tokenizer.encode(text, add_special_tokens=False).ids)
+
+    def count_batch(self, texts: Sequence[str]) -> List[int]:
+        """批次計算多段文字的 token 數"""
+        if self._tokenizer is None:
+            return [estimate_tokens(text) for text in texts]
+        if not texts:
+            return []
+        encodings = self._tokenizer.encode_batch(list(texts), add_special_tokens=False)
+        return [len(encoding.ids) for encoding in encodings]
+
+
+_counters: Dict[Tuple[Optional[str], Optional[str]], TokenCounter] = {}
+_counter_lock = threading.Lock()
+
+
+def get_token_counter(tokenizer_path: Optional[str] = None, model_name: Optional[str] = None) -> TokenCounter:
+    """
+    獲取共用 Token 計數器（每組 tokenizer 設定一個實例）
+
+    Args:
+        tokenizer_path: tokenizer.json 檔案或其所在目錄，None 表示 QWEN_TOKENIZER_PATH
+        model_name: transformers 本機快取中的模型名稱，None 表示 CONTEXT_TOKENIZER_MODEL
+    """
+    key = (tokenizer_path, model_name)
+    counter = _counters.get(key)
+    if counter is None:
+        with _counter_lock:
+            counter = _counters.get(key)
+            if counter is None:
+                counter = _counters[key] = TokenCounter(tokenizer_path, model_name)
+    return counter
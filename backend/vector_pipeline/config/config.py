@@ -34,6 +34,14 @@ class VectorPipelineConfig:
             'min_chunk_size': int(os.getenv('MIN_CHUNK_SIZE', '100'))
         }
         
+        self.postgres = {
+            'host': os.getenv('POSTGRES_HOST', 'localhost'),
+            'port': int(os.getenv('POSTGRES_PORT', '5432')),
+            'database': os.getenv('POSTGRES_DB', 'podcast'),
+            'user': os.getenv('POSTGRES_USER', 'bdse37'),
+            'password': os.getenv('POSTGRES_PASSWORD', '')
+        }
+        
         self.database = {
             'postgresql_url': os.getenv('POSTGRESQL_URL'),
             'mongodb_url': os.getenv('MONGODB_URL')
@@ -61,6 +69,10 @@ class VectorPipelineConfig:
         """Get database configuration."""
         return self.database
     
+    def get_postgres_config(self) -> Dict[str, Any]:
+        """Get PostgreSQL configuration (episode / podcast metadata)."""
+        return self.postgres
+    
     def get_logging_config(self) -> Dict[str, Any]:
         """Get logging configuration."""
         return self.logging
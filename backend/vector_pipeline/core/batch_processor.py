@@ -16,7 +16,11 @@ import time
 from dataclasses import dataclass
 from abc import ABC, abstractmethod
 
+from .chunk_store import is_chunk_store, list_stage_sources, read_records, write_chunk_store
 from .tag_processor import UnifiedTagProcessor
+from .stage_manifest import (
+    StageManifest, get_stage_manifest, file_hash, STAGE1_FILES, TAGGING_STAGE, STATUS_DONE
+)
 
 logger = logging.getLogger(__name__)
 
@@ -55,61 +59,138 @@ class BaseProcessor(ABC):
 class TaggingProcessor(BaseProcessor):
     """標籤處理器"""
     
-    def __init__(self, tag_csv_path: str = "../utils/TAG_info.csv"):
+    def __init__(self, tag_csv_path: str = "../utils/TAG_info.csv", manifest: Optional[StageManifest] = None):
         """
         初始化標籤處理器
         
         Args:
             tag_csv_path: TAG_info.csv 檔案路徑
+            manifest: 階段狀態清單，預設為 data/stage_manifest.sqlite3
         """
         self.tag_processor = UnifiedTagProcessor(tag_csv_path)
         self.stage1_path = Path("data/stage1_chunking")
         self.stage3_path = Path("data/stage3_tagging")
         self.progress_file = Path("tagging_progress.json")
+        self.manifest = manifest or get_stage_manifest(data_dir="data")
         
         # 確保輸出目錄存在
         self.stage3_path.mkdir(parents=True, exist_ok=True)
         
-        # 載入進度追蹤
-        self.processed_files = self._load_progress()
+        # 舊版進度檔匯入清單
+        self._migrate_progress_file()
         
         logger.info("標籤處理器初始化完成")
-        logger.info(f"已處理檔案數: {len(self.processed_files)}")
+        logger.info(f"已處理檔案數: {self.manifest.counts(TAGGING_STAGE).get(STATUS_DONE, 0)}")
     
-    def _load_progress(self) -> set:
-        """載入進度追蹤檔案"""
-        if self.progress_file.exists():
-            try:
-                with open(self.progress_file, 'r', encoding='utf-8') as f:
-                    progress_data = json.load(f)
-                    return set(progress_data.get('processed_files', []))
-            except Exception as e:
-                logger.warning(f"載入進度檔案失敗: {e}")
-        return set()
-    
-    def _save_progress(self):
-        """儲存進度追蹤檔案"""
+    def _migrate_progress_file(self):
+        """清單中尚無標籤進度時，匯入舊版 tagging_progress.json（視為已處理目前的 stage1 內容）"""
+        if not self.progress_file.exists() or self.manifest.counts(TAGGING_STAGE):
+            return
         try:
-            progress_data = {
-                'processed_files': list(self.processed_files),
-                'last_updated': datetime.now().isoformat(),
-                'total_processed': len(self.processed_files)
-            }
-            with open(self.progress_file, 'w', encoding='utf-8') as f:
-                json.dump(progress_data, f, ensure_ascii=False, indent=2)
+            with open(self.progress_file, 'r', encoding='utf-8') as f:
+                processed_files = json.load(f).get('processed_files', [])
         except Exception as e:
-            logger.error(f"儲存進度檔案失敗: {e}")
+            logger.warning(f"載入進度檔案失敗: {e}")
+            return
+        
+        keys = [Path(relative_path).as_posix() for relative_path in processed_files]
+        self.manifest.scan(STAGE1_FILES, self.stage1_path)
+        sources = self.manifest.get_many(STAGE1_FILES, keys)
+        self.manifest.mark_done(TAGGING_STAGE, [
+            (key, None, sources[key].content_hash if key in sources else None) for key in keys
+        ])
+        logger.info(f"已從 {self.progress_file} 匯入 {len(keys)} 筆處理紀錄")
+    
+    def _file_key(self, input_file: Path) -> str:
+        """清單中的 key：相對於 stage1 目錄的路徑（chunk store 資料集為其取代的 JSON 檔名）"""
+        key = input_file.relative_to(self.stage1_path).as_posix()
+        return f"{key}.json" if is_chunk_store(input_file) else key
     
     def _is_file_processed(self, input_file: Path) -> bool:
-        """檢查檔案是否已處理"""
-        relative_path = str(input_file.relative_to(self.stage1_path))
-        return relative_path in self.processed_files
+        """檢查檔案是否已處理（stage1 內容已掃描時，需與處理時的內容相同）"""
+        key = self._file_key(input_file)
+        entry = self.manifest.get(TAGGING_STAGE, key)
+        if entry is None or entry.status != STATUS_DONE:
+            return False
+        source = self.manifest.get(STAGE1_FILES, key)
+        return source is None or source.content_hash == entry.source_hash
     
-    def _mark_file_processed(self, input_file: Path):
+    def _mark_file_processed(self, input_file: Path, output_file: Path):
         """標記檔案為已處理"""
-        relative_path = str(input_file.relative_to(self.stage1_path))
-        self.processed_files.add(relative_path)
-        self._save_progress()
+        key = self._file_key(input_file)
+        source = self.manifest.get(STAGE1_FILES, key)
+        source_hash = source.content_hash if source is not None else file_hash(input_file)
+        self.manifest.mark_done(TAGGING_STAGE, [(key, output_file, source_hash)])
+    
+    def _tag_file(self, input_file: Path, output_file: Path) -> Dict[str, Any]:
+        """
+        為單一 JSON 檔案或 chunk store 資料集的 chunks 加上標籤並以相同格式寫出
+        
+        Returns:
+            輸出資料
+            
+        Raises:
+            ValueError: 檔案缺少 chunks 欄位
+        """
+        columnar = is_chunk_store(input_file)
+        if columnar:
+            data = {'chunks': read_records(input_file)}
+        else:
+            with open(input_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        
+        # 檢查檔案結構
+        if 'chunks' not in data:
+            raise ValueError(f"檔案 {input_file} 缺少 chunks 欄位")
+        
+        # 處理每個 chunk
+        processed_chunks = []
+        for i, chunk in enumerate(data['chunks']):
+            if 'chunk_text' not in chunk:
+                logger.warning(f"Chunk {i} 缺少 chunk_text 欄位，跳過")
+                continue
+            
+            # 使用統一標籤處理器提取標籤
+            chunk_text = chunk['chunk_text']
+            tags = self.tag_processor.extract_enhanced_tags(chunk_text)
+            
+            # 建立處理後的 chunk
+            processed_chunk = {
+                **chunk,  # 保留原始資料
+                'tags': tags,  # 新增標籤欄位
+                'tag_count': len(tags),  # 標籤數量
+                'processed_at': datetime.now().isoformat()
+            }
+            
+            processed_chunks.append(processed_chunk)
+            
+            # 記錄處理進度
+            if (i + 1) % 10 == 0:
+                logger.info(f"已處理 {i + 1}/{len(data['chunks'])} 個 chunks")
+        
+        # 建立輸出資料結構
+        output_data = {
+            **data,  # 保留原始資料
+            'chunks': processed_chunks,
+            'total_chunks': len(processed_chunks),
+            'total_tags': sum(len(chunk['tags']) for chunk in processed_chunks),
+            'processed_at': datetime.now().isoformat(),
+            'tagging_system': 'UnifiedTagProcessor'
+        }
+        
+        # 確保輸出目錄存在
+        output_file.parent.mkdir(parents=True, exist_ok=True)
+        
+        # 寫入輸出檔案（chunk store 的文件層級欄位已在每個 chunk 中）
+        if columnar:
+            write_chunk_store(output_file, processed_chunks)
+        else:
+            with open(output_file, 'w', encoding='utf-8') as f:
+                json.dump(output_data, f, ensure_ascii=False, indent=2)
+        
+        logger.info(f"成功處理檔案: {input_file} -> {output_file}")
+        logger.info(f"處理了 {len(processed_chunks)} 個 chunks，總標籤數: {output_data['total_tags']}")
+        return output_data
     
     def process_single_file(self, input_file: Path, output_file: Path) -> bool:
         """
@@ -129,78 +210,70 @@ class TaggingProcessor(BaseProcessor):
         
         try:
             logger.info(f"開始處理檔案: {input_file}")
-            
-            # 讀取 JSON 檔案
-            with open(input_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            # 檢查檔案結構
-            if 'chunks' not in data:
-                logger.warning(f"檔案 {input_file} 缺少 chunks 欄位，跳過")
-                return False
-            
-            # 處理每個 chunk
-            processed_chunks = []
-            for i, chunk in enumerate(data['chunks']):
-                if 'chunk_text' not in chunk:
-                    logger.warning(f"Chunk {i} 缺少 chunk_text 欄位，跳過")
-                    continue
-                
-                # 使用統一標籤處理器提取標籤
-                chunk_text = chunk['chunk_text']
-                tags = self.tag_processor.extract_enhanced_tags(chunk_text)
-                
-                # 建立處理後的 chunk
-                processed_chunk = {
-                    **chunk,  # 保留原始資料
-                    'tags': tags,  # 新增標籤欄位
-                    'tag_count': len(tags),  # 標籤數量
-                    'processed_at': datetime.now().isoformat()
-                }
-                
-                processed_chunks.append(processed_chunk)
-                
-                # 記錄處理進度
-                if (i + 1) % 10 == 0:
-                    logger.info(f"已處理 {i + 1}/{len(data['chunks'])} 個 chunks")
-            
-            # 建立輸出資料結構
-            output_data = {
-                **data,  # 保留原始資料
-                'chunks': processed_chunks,
-                'total_chunks': len(processed_chunks),
-                'total_tags': sum(len(chunk['tags']) for chunk in processed_chunks),
-                'processed_at': datetime.now().isoformat(),
-                'tagging_system': 'UnifiedTagProcessor'
-            }
-            
-            # 確保輸出目錄存在
-            output_file.parent.mkdir(parents=True, exist_ok=True)
-            
-            # 寫入輸出檔案
-            with open(output_file, 'w', encoding='utf-8') as f:
-                json.dump(output_data, f, ensure_ascii=False, indent=2)
+            self._tag_file(input_file, output_file)
             
             # 標記為已處理
-            self._mark_file_processed(input_file)
-            
-            logger.info(f"成功處理檔案: {input_file} -> {output_file}")
-            logger.info(f"處理了 {len(processed_chunks)} 個 chunks，總標籤數: {output_data['total_tags']}")
-            
+            self._mark_file_processed(input_file, output_file)
             return True
             
+        except ValueError as e:
+            logger.warning(f"{e}，跳過")
+            self.manifest.fail(TAGGING_STAGE, self._file_key(input_file), str(e))
+            return False
         except Exception as e:
             logger.error(f"處理檔案 {input_file} 時發生錯誤: {e}")
+            self.manifest.fail(TAGGING_STAGE, self._file_key(input_file), str(e))
             return False
     
+    def process_pending(self, rss_folder: Optional[str] = None, worker: Optional[str] = None,
+                        batch_size: int = 16) -> ProcessingStats:
+        """
+        依清單處理新增或內容變動的 stage1 檔案，可由多個行程同時執行（各自領取不同檔案）
+        
+        Args:
+            rss_folder: 只處理此 RSS 資料夾，None 表示全部
+            worker: 工作者識別，預設為主機:行程:執行緒
+            batch_size: 每次領取的檔案數
+            
+        Returns:
+            ProcessingStats: 處理統計資訊
+        """
+        start_time = time.time()
+        prefix = f"{rss_folder}/" if rss_folder else ""
+        stats = ProcessingStats()
+        
+        self.manifest.scan(STAGE1_FILES, self.stage1_path, subdir=rss_folder)
+        self.manifest.plan(STAGE1_FILES, TAGGING_STAGE, prefix=prefix)
+        
+        for entry in self.manifest.iter_claims(TAGGING_STAGE, batch_size=batch_size, worker=worker, prefix=prefix):
+            stats.total_files += 1
+            input_file = self.stage1_path / entry.source_path
+            output_file = self.stage3_path / entry.source_path
+            try:
+                output_data = self._tag_file(input_file, output_file)
+                self.manifest.complete(entry, output_file)
+                stats.successful_files += 1
+                stats.total_chunks += output_data['total_chunks']
+                stats.total_tags += output_data['total_tags']
+            except Exception as e:
+                logger.error(f"處理檔案 {input_file} 時發生錯誤: {e}")
+                self.manifest.fail(TAGGING_STAGE, entry.key, str(e))
+                stats.failed_files += 1
+                stats.failed_files_list.append(str(input_file))
+        
+        stats.processing_time = time.time() - start_time
+        logger.info(f"清單處理完成: {stats}")
+        return stats
+    
     def get_processor_name(self) -> str:
         """獲取處理器名稱"""
         return "TaggingProcessor"
     
     def show_processing_status(self):
         """顯示處理狀態"""
-        total_files = len(list(self.stage1_path.rglob("*.json")))
-        processed_files = len(self.processed_files)
+        self.manifest.scan(STAGE1_FILES, self.stage1_path)
+        total_files = sum(self.manifest.counts(STAGE1_FILES).values())
+        processed_files = self.manifest.counts(TAGGING_STAGE).get(STATUS_DONE, 0)
         unprocessed_files = total_files - processed_files
         
         logger.info("=== 標籤處理狀態統計 ===")
@@ -246,11 +319,11 @@ class BatchProcessor:
         # 統計資訊
         stats = ProcessingStats()
         
-        # 尋找所有 JSON 檔案
-        json_files = list(input_path.rglob("*.json"))
+        # 尋找所有 JSON 檔案與 chunk store 資料集
+        json_files = list_stage_sources(input_path, recursive=True)
         stats.total_files = len(json_files)
         
-        logger.info(f"找到 {len(json_files)} 個 JSON 檔案")
+        logger.info(f"找到 {len(json_files)} 個 JSON 檔案 / chunk store 資料集")
         
         # 處理每個檔案
         for i, json_file in enumerate(json_files, 1):
@@ -266,10 +339,9 @@ class BatchProcessor:
                 stats.successful_files += 1
                 # 讀取輸出檔案統計資訊
                 try:
-                    with open(output_file, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                    stats.total_chunks += data.get('total_chunks', 0)
-                    stats.total_tags += data.get('total_tags', 0)
+                    records = read_records(output_file, columns=['tags'])
+                    stats.total_chunks += len(records)
+                    stats.total_tags += sum(len(record.get('tags') or []) for record in records)
                 except Exception as e:
                     logger.warning(f"讀取統計資訊失敗 {output_file}: {e}")
             else:
@@ -0,0 +1,464 @@
+#!/usr/bin/env python3
+"""
+列式分片中間格式 (Chunk Store)
+
+取代各階段以 indent=2 JSON 輸出的 chunk 列表：
+- chunk 的 metadata 依欄位分開存放，數值欄位為 .npy，字串與其他欄位為 UTF-8 串接 + 位移表
+- embedding 存成連續的 float32 矩陣，可直接 np.load(mmap_mode='r')，不需解析
+- 每個分片固定列數，寫入時逐分片落盤，讀取時逐分片載入，不需一次載入整個資料集
+- 寫入先寫到暫存目錄，完成後才換名，中途失敗不會留下不完整的資料集
+
+目錄格式:
+    manifest.json                資料集描述 (格式版本、總列數、embedding 維度、欄位與分片)
+    shard_00000/
+        <欄位>.npy               int64 / float64 / bool 欄位
+        <欄位>.bin               str / json 欄位內容 (UTF-8 串接；json 欄位每格一個 JSON)
+        <欄位>.offsets.npy       int64, 每格在 .bin 的位移 (rows + 1)
+        embedding.npy            float32, (rows, dim)
+
+欄位型別依每個分片的值推斷；某列缺少的欄位讀回時為 None。
+
+作者: Podwise Team
+版本: 1.0.0
+"""
+
+import os
+import json
+import shutil
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+STORE_FORMAT = "podwise-chunk-store"
+STORE_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+DEFAULT_SHARD_ROWS = int(os.getenv("CHUNK_STORE_SHARD_ROWS", "4096"))
+EMBEDDING_FIELD = "embedding"
+
+PathLike = Union[str, Path]
+
+
+def _infer_type(values: List[Any]) -> str:
+    """推斷欄位型別：bool / int64 / float64 / str / json"""
+    if not values or any(value is None for value in values):
+        return "json"
+    if all(isinstance(value, bool) for value in values):
+        return "bool"
+    if any(isinstance(value, bool) for value in values):
+        return "json"
+    if all(isinstance(value, int) for value in values):
+        if all(-2 ** 63 <= value < 2 ** 63 for value in values):
+            return "int64"
+        return "json"
+    if all(isinstance(value, (int, float)) for value in values):
+        return "float64"
+    if all(isinstance(value, str) for value in values):
+        return "str"
+    return "json"
+
+
+def _embedding_matrix(values: List[Any]) -> Optional[np.ndarray]:
+    """所有列都有相同維度的數值向量時回傳 float32 矩陣，否則回傳 None"""
+    if not values or any(not isinstance(value, (list, tuple, np.ndarray)) or len(value) == 0 for value in values):
+        return None
+    dim = len(values[0])
+    if any(len(value) != dim for value in values):
+        return None
+    try:
+        return np.asarray(values, dtype=np.float32).reshape(len(values), dim)
+    except (TypeError, ValueError):
+        return None
+
+
+def _write_blob_column(shard_dir: Path, name: str, encoded: List[bytes]) -> None:
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(item) for item in encoded], out=offsets[1:])
+    with open(shard_dir / f"{name}.bin", "wb") as f:
+        f.write(b"".join(encoded))
+    np.save(shard_dir / f"{name}.offsets.npy", offsets)
+
+
+def is_chunk_store(path: PathLike) -> bool:
+    """路徑是否為 chunk store 資料集"""
+    manifest = Path(path) / MANIFEST_FILE
+    if not manifest.is_file():
+        return False
+    try:
+        with open(manifest, "r", encoding="utf-8") as f:
+            return json.load(f).get("format") == STORE_FORMAT
+    except Exception:
+        return False
+
+
+class ChunkStoreWriter:
+    """Chunk store 寫入器"""
+
+    def __init__(self,
+                 path: PathLike,
+                 shard_rows: int = DEFAULT_SHARD_ROWS,
+                 embedding_field: str = EMBEDDING_FIELD):
+        """
+        初始化寫入器（已存在的資料集會在 close() 時被取代）
+
+        Args:
+            path: 資料集目錄
+            shard_rows: 每個分片的列數
+            embedding_field: 存成 float32 矩陣的欄位
+        """
+        self.path = Path(path)
+        self.shard_rows = max(1, shard_rows)
+        self.embedding_field = embedding_field
+        self._tmp_path = self.path.with_name(self.path.name + ".tmp")
+        if self._tmp_path.exists():
+            shutil.rmtree(self._tmp_path)
+        self._tmp_path.mkdir(parents=True)
+
+        self._buffer: List[Dict[str, Any]] = []
+        self._shards: List[Dict[str, Any]] = []
+        self._columns: Dict[str, str] = {}
+        self._embedding_dim: Optional[int] = None
+        self._rows = 0
+        self._closed = False
+
+    def write(self, record: Dict[str, Any]) -> None:
+        """寫入一筆 chunk"""
+        self._buffer.append(record)
+        if len(self._buffer) >= self.shard_rows:
+            self._flush()
+
+    def write_many(self, records: Iterable[Dict[str, Any]]) -> int:
+        """寫入多筆 chunk，回傳筆數"""
+        count = 0
+        for record in records:
+            self.write(record)
+            count += 1
+        return count
+
+    def _flush(self) -> None:
+        if not self._buffer:
+            return
+        rows = self._buffer
+        self._buffer = []
+        shard_name = f"shard_{len(self._shards):05d}"
+        shard_dir = self._tmp_path / shard_name
+        shard_dir.mkdir()
+
+        names: List[str] = []
+        for record in rows:
+            for key in record:
+                if key not in names:
+                    names.append(key)
+
+        columns: Dict[str, str] = {}
+        embedding_dim = None
+        for name in names:
+            values = [record.get(name) for record in rows]
+            if name == self.embedding_field:
+                matrix = _embedding_matrix(values)
+                if matrix is not None:
+                    np.save(shard_dir / f"{name}.npy", matrix)
+                    embedding_dim = matrix.shape[1]
+                    columns[name] = "embedding"
+                    continue
+                logger.warning(f"分片 {shard_name} 的 {name} 維度不一致或有缺值，改以 JSON 欄位儲存")
+
+            column_type = _infer_type(values)
+            if column_type in ("bool", "int64", "float64"):
+                np.save(shard_dir / f"{name}.npy", np.asarray(values, dtype=column_type))
+            elif column_type == "str":
+                _write_blob_column(shard_dir, name, [value.encode("utf-8") for value in values])
+            else:
+                _write_blob_column(shard_dir, name, [
+                    json.dumps(value, ensure_ascii=False, default=str).encode("utf-8") for value in values
+                ])
+            columns[name] = column_type
+
+        if embedding_dim is not None:
+            if self._embedding_dim not in (None, embedding_dim):
+                logger.warning(f"分片 {shard_name} 的 embedding 維度 {embedding_dim} 與先前分片 {self._embedding_dim} 不同")
+            self._embedding_dim = self._embedding_dim or embedding_dim
+        for name, column_type in columns.items():
+            self._columns.setdefault(name, column_type)
+        self._shards.append({"name": shard_name, "rows": len(rows), "columns": columns})
+        self._rows += len(rows)
+
+    def close(self) -> Dict[str, Any]:
+        """寫出剩餘資料與 manifest，並將暫存目錄換名為資料集目錄"""
+        if self._closed:
+            return self.manifest
+        self._flush()
+        self.manifest = {
+            "format": STORE_FORMAT,
+            "version": STORE_VERSION,
+            "rows": self._rows,
+            "embedding_dim": self._embedding_dim,
+            "columns": self._columns,
+            "shards": self._shards,
+            "created_at": datetime.now().isoformat()
+        }
+        with open(self._tmp_path / MANIFEST_FILE, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, ensure_ascii=False, indent=2)
+
+        if self.path.is_dir():
+            shutil.rmtree(self.path)
+        elif self.path.exists():
+            self.path.unlink()
+        self._tmp_path.rename(self.path)
+        self._closed = True
+        return self.manifest
+
+    def abort(self) -> None:
+        """放棄寫入，刪除暫存目錄"""
+        if not self._closed:
+            shutil.rmtree(self._tmp_path, ignore_errors=True)
+            self._closed = True
+
+    def __enter__(self) -> "ChunkStoreWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class ChunkStore:
+    """Chunk store 讀取器"""
+
+    def __init__(self, path: PathLike, mmap: bool = True):
+        """
+        開啟資料集
+
+        Args:
+            path: 資料集目錄
+            mmap: 數值欄位與 embedding 是否以 mmap 開啟
+        """
+        self.path = Path(path)
+        manifest_path = self.path / MANIFEST_FILE
+        if not manifest_path.is_file():
+            raise FileNotFoundError(f"找不到 chunk store: {self.path}")
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        if self.manifest.get("format") != STORE_FORMAT or self.manifest.get("version") != STORE_VERSION:
+            raise ValueError(f"不支援的 chunk store 格式: {self.manifest.get('format')} v{self.manifest.get('version')}")
+        self.mmap_mode = "r" if mmap else None
+        self.rows: int = self.manifest["rows"]
+        self.embedding_dim: Optional[int] = self.manifest.get("embedding_dim")
+        self.columns: Dict[str, str] = self.manifest["columns"]
+        self.shards: List[Dict[str, Any]] = self.manifest["shards"]
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def read_column(self, shard: int, name: str) -> Union[np.ndarray, List[Any]]:
+        """
+        讀取單一分片的欄位
+
+        Returns:
+            數值欄位與 embedding 為 numpy 陣列，其餘為 list；分片中沒有此欄位時為全 None 的 list
+        """
+        info = self.shards[shard]
+        shard_dir = self.path / info["name"]
+        column_type = info["columns"].get(name)
+        if column_type is None:
+            return [None] * info["rows"]
+        if column_type in ("embedding", "bool", "int64", "float64"):
+            return np.load(shard_dir / f"{name}.npy", mmap_mode=self.mmap_mode)
+
+        offsets = np.load(shard_dir / f"{name}.offsets.npy").tolist()
+        with open(shard_dir / f"{name}.bin", "rb") as f:
+            blob = f.read()
+        values = [blob[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(info["rows"])]
+        if column_type == "json":
+            return [json.loads(value) for value in values]
+        return values
+
+    def embeddings(self, shard: int) -> Optional[np.ndarray]:
+        """單一分片的 embedding 矩陣 (rows, dim)，未以矩陣儲存時回傳 None"""
+        for name, column_type in self.shards[shard]["columns"].items():
+            if column_type == "embedding":
+                return self.read_column(shard, name)
+        return None
+
+    def iter_shards(self, columns: Optional[List[str]] = None) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """
+        逐分片讀取欄位
+
+        Args:
+            columns: 要讀取的欄位，None 表示全部
+
+        Yields:
+            (列數, {欄位: 值陣列})
+        """
+        for index, info in enumerate(self.shards):
+            names = columns if columns is not None else list(info["columns"])
+            yield info["rows"], {name: self.read_column(index, name) for name in names}
+
+    def iter_records(self,
+                     columns: Optional[List[str]] = None,
+                     embedding_as_list: bool = True) -> Iterator[Dict[str, Any]]:
+        """
+        逐筆讀取 chunk（與 JSON 輸出相同的字典格式）
+
+        Args:
+            columns: 要讀取的欄位，None 表示全部
+            embedding_as_list: embedding 轉為 Python list；False 時為 float32 陣列的檢視
+        """
+        for rows, data in self.iter_shards(columns):
+            converted = {}
+            for name, values in data.items():
+                if isinstance(values, np.ndarray) and values.ndim == 1:
+                    converted[name] = values.tolist()
+                elif isinstance(values, np.ndarray) and embedding_as_list:
+                    converted[name] = values.tolist()
+                else:
+                    converted[name] = values
+            for i in range(rows):
+                yield {name: values[i] for name, values in converted.items()}
+
+    def read_records(self, columns: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """讀取所有 chunk"""
+        return list(self.iter_records(columns))
+
+
+def write_chunk_store(path: PathLike,
+                      records: Iterable[Dict[str, Any]],
+                      shard_rows: int = DEFAULT_SHARD_ROWS) -> Dict[str, Any]:
+    """將 chunk 寫成 chunk store，回傳 manifest"""
+    with ChunkStoreWriter(path, shard_rows=shard_rows) as writer:
+        writer.write_many(records)
+    return writer.manifest
+
+
+def extract_records(data: Any) -> List[Dict[str, Any]]:
+    """
+    從 JSON 輸出取出 chunk 列表
+
+    支援 chunk 列表、含 chunks 欄位的文件（文件層級的純量欄位補進每個 chunk）與單一 chunk。
+    """
+    if isinstance(data, list):
+        return [item for item in data if isinstance(item, dict)]
+    if isinstance(data, dict):
+        chunks = data.get("chunks")
+        if isinstance(chunks, list):
+            shared = {key: value for key, value in data.items()
+                      if key != "chunks" and not isinstance(value, (list, dict))}
+            return [{**shared, **chunk} for chunk in chunks if isinstance(chunk, dict)]
+        return [data]
+    return []
+
+
+def read_records(path: PathLike, columns: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """
+    讀取 chunk store 資料集或 JSON 檔案中的 chunk
+
+    Args:
+        path: 資料集目錄或 JSON 檔案
+        columns: 只讀取的欄位（僅對 chunk store 有效），None 表示全部
+    """
+    path = Path(path)
+    if is_chunk_store(path):
+        return ChunkStore(path).read_records(columns)
+    with open(path, "r", encoding="utf-8") as f:
+        return extract_records(json.load(f))
+
+
+def read_documents(path: PathLike) -> List[Tuple[str, Dict[str, Any]]]:
+    """
+    以文件為單位讀取 JSON 檔案或 chunk store 資料集
+
+    JSON 檔案為一份文件（chunk 列表包成含 chunks 欄位的文件）；chunk store 依 source_file
+    欄位分組（無此欄位時整個資料集為一份文件），組內各 chunk 值相同的純量欄位提升為文件欄位。
+
+    Returns:
+        List[Tuple[str, Dict[str, Any]]]: (文件名稱, 含 chunks 欄位的文件)
+    """
+    path = Path(path)
+    if not is_chunk_store(path):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if not isinstance(data, dict):
+            data = {"chunks": extract_records(data)}
+        return [(path.name, data)]
+
+    groups: Dict[str, List[Dict[str, Any]]] = {}
+    for record in ChunkStore(path).iter_records():
+        groups.setdefault(record.get("source_file") or path.name, []).append(record)
+    documents = []
+    for name, records in groups.items():
+        document = {key: value for key, value in records[0].items()
+                    if key != "source_file" and not isinstance(value, (list, dict))
+                    and all(record.get(key) == value for record in records)}
+        document["chunks"] = records
+        documents.append((name, document))
+    return documents
+
+
+def list_stage_sources(root: PathLike, recursive: bool = False) -> List[Path]:
+    """
+    列出目錄中的階段輸出（JSON 檔案與 chunk store 資料集）
+
+    Args:
+        root: 目錄；本身是 chunk store 時只回傳自己
+        recursive: 是否遞迴子目錄
+    """
+    root = Path(root)
+    if is_chunk_store(root):
+        return [root]
+    sources: List[Path] = []
+    for child in sorted(root.iterdir()):
+        if child.is_file() and child.suffix == ".json" and not child.name.endswith(".backup"):
+            sources.append(child)
+        elif child.is_dir() and not child.name.endswith((".tmp", ".backup")):
+            if is_chunk_store(child):
+                sources.append(child)
+            elif recursive:
+                sources.extend(list_stage_sources(child, recursive=True))
+    return sources
+
+
+def convert_json_to_chunk_store(input_dir: PathLike,
+                                output_dir: PathLike,
+                                shard_rows: int = DEFAULT_SHARD_ROWS) -> Dict[str, Any]:
+    """
+    將既有的 JSON 階段輸出轉為 chunk store
+
+    每個含 JSON 檔案的目錄轉成一個資料集（保留相對路徑；目錄下另有子目錄要轉換時，
+    該目錄本身的檔案寫到 _root 子資料集），每筆 chunk 額外記錄來源檔名於 source_file 欄位。
+
+    Returns:
+        Dict[str, Any]: 轉換統計 (資料集數、檔案數、chunk 數、失敗檔案、轉換前後大小)
+    """
+    input_dir = Path(input_dir)
+    output_dir = Path(output_dir)
+    groups: Dict[Path, List[Path]] = {}
+    for json_file in sorted(input_dir.rglob("*.json")):
+        groups.setdefault(json_file.parent, []).append(json_file)
+
+    stats = {"datasets": 0, "files": 0, "chunks": 0, "failed_files": [], "json_bytes": 0, "store_bytes": 0}
+    for directory, files in groups.items():
+        target = output_dir / directory.relative_to(input_dir)
+        if any(directory in other.parents for other in groups):
+            target = target / "_root"
+        target.parent.mkdir(parents=True, exist_ok=True)
+        with ChunkStoreWriter(target, shard_rows=shard_rows) as writer:
+            for json_file in files:
+                try:
+                    records = read_records(json_file)
+                except Exception as e:
+                    logger.error(f"載入檔案 {json_file} 失敗: {e}")
+                    stats["failed_files"].append(str(json_file))
+                    continue
+                stats["chunks"] += writer.write_many({**record, "source_file": json_file.name} for record in records)
+                stats["files"] += 1
+                stats["json_bytes"] += json_file.stat().st_size
+        stats["datasets"] += 1
+        stats["store_bytes"] += sum(f.stat().st_size for f in target.rglob("*") if f.is_file())
+        logger.info(f"已轉換 {directory} → {target}（{len(files)} 個檔案）")
+    return stats
@@ -0,0 +1,481 @@
+"""
+增量灌庫（MongoDB → Milvus）
+只處理上次執行後新增或修改的逐字稿，耗時與變動量成正比，與語料庫大小無關
+
+- 每個 collection 記錄水位線：已處理的最大 `_id` 與時間戳欄位（INCREMENTAL_TIMESTAMP_FIELD）最大值，
+  下次只查詢 `_id` 或時間戳大於水位線的文件（時間戳欄位需在 MongoDB 建索引）
+- 每份文件記錄內容雜湊與其 chunk_id；內容未變（例如只更新時間戳）直接略過
+- chunk_id 由文件 `_id`、內容雜湊與 chunk 序號決定，修改後的文件寫入新 chunk 並刪除舊 chunk
+- 寫入 Milvus 前先把新 chunk_id 記為待完成，中途當機時下次執行先刪除這些未完成的 chunk 再重做，
+  舊 chunk 在新 chunk 寫入後才刪除，查詢端不會看到文件消失
+- full_scan 時掃描整個 collection 比對雜湊（適用沒有時間戳欄位的修改），並刪除 MongoDB 已移除文件的 chunk
+- chunk_document 以 ValueError 拒絕無法寫入的文件（例如缺少有效的 episode_id）：該文件不寫入也不記為完成，
+  改記錄在拒絕清單（`_id` 與內容雜湊），水位線照常前進；之後每次執行依 `_id` 重新讀取清單中的文件重試，
+  成功寫入後移出清單，少數無法寫入的文件不會讓後續執行退化成全量掃描
+"""
+
+import os
+import json
+import time
+import pickle
+import hashlib
+import logging
+import sqlite3
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STATE_PATH = os.getenv("INCREMENTAL_STATE_PATH", os.path.join("data", "incremental_state.sqlite3"))
+DEFAULT_TIMESTAMP_FIELD = os.getenv("INCREMENTAL_TIMESTAMP_FIELD", "updated_at")
+# 每組文件一起嵌入、寫入並提交狀態
+DEFAULT_GROUP_SIZE = int(os.getenv("INCREMENTAL_GROUP_SIZE", "32"))
+
+# 單一 SQL 的參數數量上限
+_QUERY_CHUNK = 500
+
+
+def document_hash(doc: Dict[str, Any]) -> str:
+    """以逐字稿內容與檔名計算文件雜湊"""
+    metadata = doc.get('_file_metadata') or {}
+    filename = metadata.get('filename', '') if isinstance(metadata, dict) else ''
+    payload = json.dumps([doc.get('text', ''), doc.get('file', ''), filename], ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def make_chunk_id(doc_id: str, content_hash: str, chunk_index: int) -> str:
+    """同一文件內容產生相同 chunk_id，重試時不會寫入重複資料"""
+    return f"{doc_id}_{content_hash[:16]}_{chunk_index}"
+
+
+def _is_greater(value: Any, current: Any) -> bool:
+    """比較水位線（型別不同無法比較時視為不大於）"""
+    if value is None:
+        return False
+    if current is None:
+        return True
+    try:
+        return value > current
+    except TypeError:
+        return False
+
+
+@dataclass
+class DocumentState:
+    """文件處理狀態"""
+    content_hash: Optional[str]
+    chunk_ids: List[str]
+    pending_chunk_ids: Optional[List[str]]
+
+
+class IngestStateStore:
+    """增量灌庫狀態（SQLite）"""
+
+    def __init__(self, path: str = DEFAULT_STATE_PATH):
+        """
+        開啟（或建立）狀態檔
+
+        Args:
+            path: SQLite 檔案路徑
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30.0, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            "collection_name TEXT NOT NULL, doc_id TEXT NOT NULL, content_hash TEXT, "
+            "chunk_ids TEXT NOT NULL DEFAULT '[]', pending_chunk_ids TEXT, updated_at REAL, "
+            "PRIMARY KEY (collection_name, doc_id))"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_documents_pending ON documents (collection_name) "
+            "WHERE pending_chunk_ids IS NOT NULL"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS watermarks ("
+            "collection_name TEXT PRIMARY KEY, last_id BLOB, last_timestamp BLOB, updated_at REAL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS rejected ("
+            "collection_name TEXT NOT NULL, doc_id TEXT NOT NULL, raw_id BLOB NOT NULL, content_hash TEXT, "
+            "reason TEXT, updated_at REAL, PRIMARY KEY (collection_name, doc_id))"
+        )
+        self._conn.commit()
+
+    def get_watermark(self, collection_name: str) -> Tuple[Any, Any]:
+        """取得 (最大 _id, 最大時間戳)，尚未處理過時為 (None, None)"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT last_id, last_timestamp FROM watermarks WHERE collection_name = ?", (collection_name,)
+            ).fetchone()
+        if not row:
+            return None, None
+        return tuple(pickle.loads(value) if value is not None else None for value in row)
+
+    def set_watermark(self, collection_name: str, last_id: Any, last_timestamp: Any) -> None:
+        """更新水位線（值以 pickle 保存，ObjectId 與 datetime 型別不變）"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO watermarks (collection_name, last_id, last_timestamp, updated_at) "
+                "VALUES (?, ?, ?, ?)",
+                (collection_name,
+                 pickle.dumps(last_id) if last_id is not None else None,
+                 pickle.dumps(last_timestamp) if last_timestamp is not None else None,
+                 time.time())
+            )
+            self._conn.commit()
+
+    def get_documents(self, collection_name: str, doc_ids: Sequence[str]) -> Dict[str, DocumentState]:
+        """批次查詢文件狀態"""
+        states: Dict[str, DocumentState] = {}
+        with self._lock:
+            for start in range(0, len(doc_ids), _QUERY_CHUNK):
+                part = list(doc_ids[start:start + _QUERY_CHUNK])
+                rows = self._conn.execute(
+                    "SELECT doc_id, content_hash, chunk_ids, pending_chunk_ids FROM documents "
+                    f"WHERE collection_name = ? AND doc_id IN ({','.join('?' * len(part))})",
+                    [collection_name] + part
+                ).fetchall()
+                for doc_id, content_hash, chunk_ids, pending in rows:
+                    states[doc_id] = DocumentState(
+                        content_hash, json.loads(chunk_ids), json.loads(pending) if pending is not None else None
+                    )
+        return states
+
+    def iter_doc_ids(self, collection_name: str) -> Iterator[str]:
+        """列出已處理過的文件 id"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT doc_id FROM documents WHERE collection_name = ?", (collection_name,)
+            ).fetchall()
+        for (doc_id,) in rows:
+            yield doc_id
+
+    def mark_pending(self, collection_name: str, entries: Iterable[Tuple[str, List[str]]]) -> None:
+        """寫入 Milvus 前記錄即將寫入的 chunk_id"""
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO documents (collection_name, doc_id, pending_chunk_ids, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (collection_name, doc_id) DO UPDATE SET "
+                "pending_chunk_ids = excluded.pending_chunk_ids, updated_at = excluded.updated_at",
+                [(collection_name, doc_id, json.dumps(chunk_ids), now) for doc_id, chunk_ids in entries]
+            )
+            self._conn.commit()
+
+    def mark_done(self, collection_name: str, entries: Iterable[Tuple[str, str, List[str]]]) -> None:
+        """新 chunk 寫入且舊 chunk 刪除後，記錄文件目前的雜湊與 chunk_id"""
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO documents "
+                "(collection_name, doc_id, content_hash, chunk_ids, pending_chunk_ids, updated_at) "
+                "VALUES (?, ?, ?, ?, NULL, ?)",
+                [(collection_name, doc_id, content_hash, json.dumps(chunk_ids), now)
+                 for doc_id, content_hash, chunk_ids in entries]
+            )
+            self._conn.commit()
+
+    def list_pending(self) -> List[Tuple[str, str, List[str]]]:
+        """列出未完成的文件：(collection, doc_id, 待完成的 chunk_id)"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT collection_name, doc_id, pending_chunk_ids FROM documents WHERE pending_chunk_ids IS NOT NULL"
+            ).fetchall()
+        return [(collection_name, doc_id, json.loads(pending)) for collection_name, doc_id, pending in rows]
+
+    def clear_pending(self, entries: Iterable[Tuple[str, str]]) -> None:
+        """清除待完成標記（未完成的 chunk 已刪除）"""
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE documents SET pending_chunk_ids = NULL WHERE collection_name = ? AND doc_id = ?",
+                list(entries)
+            )
+            self._conn.commit()
+
+    def mark_rejected(self, collection_name: str, entries: Iterable[Tuple[Any, str, str]]) -> None:
+        """記錄無法寫入的文件：(_id 原始值, 內容雜湊, 原因)；_id 以 pickle 保存供重新查詢"""
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO rejected "
+                "(collection_name, doc_id, raw_id, content_hash, reason, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                [(collection_name, str(raw_id), pickle.dumps(raw_id), content_hash, reason, now)
+                 for raw_id, content_hash, reason in entries]
+            )
+            self._conn.commit()
+
+    def list_rejected(self, collection_name: str) -> List[Tuple[Any, str]]:
+        """列出被拒絕的文件：(_id 原始值, 拒絕時的內容雜湊)"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT raw_id, content_hash FROM rejected WHERE collection_name = ?", (collection_name,)
+            ).fetchall()
+        return [(pickle.loads(raw_id), content_hash) for raw_id, content_hash in rows]
+
+    def clear_rejected(self, collection_name: str, doc_ids: Sequence[str]) -> None:
+        """將文件移出拒絕清單（已寫入、內容未變或已從 MongoDB 刪除）"""
+        with self._lock:
+            self._conn.executemany(
+                "DELETE FROM rejected WHERE collection_name = ? AND doc_id = ?",
+                [(collection_name, doc_id) for doc_id in doc_ids]
+            )
+            self._conn.commit()
+
+    def remove_documents(self, collection_name: str, doc_ids: Sequence[str]) -> None:
+        """移除文件狀態（文件已從 MongoDB 刪除）"""
+        with self._lock:
+            self._conn.executemany(
+                "DELETE FROM documents WHERE collection_name = ? AND doc_id = ?",
+                [(collection_name, doc_id) for doc_id in doc_ids]
+            )
+            self._conn.commit()
+
+    def close(self) -> None:
+        """關閉狀態檔"""
+        with self._lock:
+            self._conn.close()
+
+
+class IncrementalIngestor:
+    """增量灌庫執行器"""
+
+    def __init__(self,
+                 db: Any,
+                 state: IngestStateStore,
+                 writer: Any,
+                 collection_name: str,
+                 chunk_document: Callable[[Dict[str, Any], str], List[Dict[str, Any]]],
+                 embed_chunks: Callable[[List[Dict[str, Any]]], List[Dict[str, Any]]],
+                 timestamp_field: Optional[str] = DEFAULT_TIMESTAMP_FIELD,
+                 group_size: int = DEFAULT_GROUP_SIZE,
+                 batch_size: int = 100):
+        """
+        初始化增量灌庫執行器
+
+        Args:
+            db: MongoDB database
+            state: 狀態檔
+            writer: MilvusWriter
+            collection_name: Milvus 集合
+            chunk_document: 文件 → 已清理、標籤並準備好的 chunk 列表；無法寫入的文件拋出 ValueError
+            embed_chunks: chunk 列表 → Milvus 記錄列表（含 embedding）
+            timestamp_field: 文件修改時間欄位，None 表示只依 _id 偵測新文件
+            group_size: 每組文件數
+            batch_size: MongoDB cursor 批次大小
+        """
+        self.db = db
+        self.state = state
+        self.writer = writer
+        self.collection_name = collection_name
+        self.chunk_document = chunk_document
+        self.embed_chunks = embed_chunks
+        self.timestamp_field = timestamp_field
+        self.group_size = max(1, group_size)
+        self.batch_size = batch_size
+        self.stats: Dict[str, Any] = {}
+        # 目前 collection 拒絕清單中的文件 id
+        self._rejected_ids: set = set()
+
+    def _reset_stats(self) -> None:
+        self.stats = {
+            'scanned': 0, 'unchanged': 0, 'new': 0, 'modified': 0, 'deleted': 0,
+            'chunks_inserted': 0, 'chunks_deleted': 0, 'recovered': 0, 'errors': 0, 'rejected': 0, 'retried': 0
+        }
+
+    def build_query(self, source_collection: str, full_scan: bool = False) -> Dict[str, Any]:
+        """依水位線產生變動文件的查詢條件"""
+        last_id, last_timestamp = self.state.get_watermark(source_collection)
+        if full_scan or last_id is None:
+            return {}
+        conditions: List[Dict[str, Any]] = [{'_id': {'$gt': last_id}}]
+        if self.timestamp_field and last_timestamp is not None:
+            conditions.append({self.timestamp_field: {'$gt': last_timestamp}})
+        return conditions[0] if len(conditions) == 1 else {'$or': conditions}
+
+    def recover(self) -> int:
+        """刪除上次中斷時寫到一半的 chunk，回傳處理的文件數"""
+        pending = self.state.list_pending()
+        if not pending:
+            return 0
+        self.writer.delete_chunk_ids(self.collection_name,
+                                     [chunk_id for _, _, chunk_ids in pending for chunk_id in chunk_ids])
+        self.state.clear_pending((collection_name, doc_id) for collection_name, doc_id, _ in pending)
+        logger.warning(f"⚠️ 上次執行中斷，已清除 {len(pending)} 份文件未完成的 chunk，將重新處理")
+        return len(pending)
+
+    def run(self, collections: Optional[List[str]] = None, full_scan: bool = False) -> Dict[str, Any]:
+        """
+        執行增量灌庫
+
+        Args:
+            collections: MongoDB collection 名稱，預設全部
+            full_scan: 掃描整個 collection 比對內容雜湊並處理已刪除的文件
+
+        Returns:
+            Dict[str, Any]: 掃描、略過、新增、修改、刪除的文件數與 chunk 數
+        """
+        start_time = time.time()
+        self._reset_stats()
+        self.stats['recovered'] = self.recover()
+
+        for source_collection in collections or self.db.list_collection_names():
+            try:
+                self._run_collection(source_collection, full_scan)
+            except Exception as e:
+                self.stats['errors'] += 1
+                logger.error(f"增量灌庫 {source_collection} 失敗，水位線不更新: {e}")
+
+        if self.stats['chunks_inserted'] or self.stats['chunks_deleted']:
+            self.writer.flush(self.collection_name)
+        self.stats['elapsed_seconds'] = time.time() - start_time
+        logger.info(
+            f"🎉 增量灌庫完成：掃描 {self.stats['scanned']}、新增 {self.stats['new']}、修改 {self.stats['modified']}、"
+            f"刪除 {self.stats['deleted']}、未變動 {self.stats['unchanged']}、拒絕 {self.stats['rejected']}、重試 {self.stats['retried']} 份文件，"
+            f"寫入 {self.stats['chunks_inserted']} / 刪除 {self.stats['chunks_deleted']} 個 chunk，"
+            f"耗時 {self.stats['elapsed_seconds']:.2f}s"
+        )
+        return dict(self.stats)
+
+    def _run_collection(self, source_collection: str, full_scan: bool) -> None:
+        last_id, last_timestamp = self.state.get_watermark(source_collection)
+        projection = {'text': 1, 'file': 1, '_file_metadata': 1}
+        if self.timestamp_field:
+            projection[self.timestamp_field] = 1
+
+        rejected = self.state.list_rejected(source_collection)
+        self._rejected_ids = {str(raw_id) for raw_id, _ in rejected}
+        # full_scan 會重新讀取所有文件，不需另外重試
+        retried_ids = set() if full_scan else self._retry_rejected(source_collection, rejected, projection)
+        cursor = self.db[source_collection].find(
+            self.build_query(source_collection, full_scan), projection=projection, batch_size=self.batch_size
+        )
+
+        seen_ids = set()
+        group: List[Dict[str, Any]] = []
+        for doc in cursor:
+            if full_scan:
+                seen_ids.add(str(doc['_id']))
+            if _is_greater(doc['_id'], last_id):
+                last_id = doc['_id']
+            if self.timestamp_field and _is_greater(doc.get(self.timestamp_field), last_timestamp):
+                last_timestamp = doc[self.timestamp_field]
+            if str(doc['_id']) in retried_ids:
+                # 本次已重試（讀到的是最新內容）
+                continue
+            self.stats['scanned'] += 1
+            group.append(doc)
+            if len(group) >= self.group_size:
+                self._process_group(source_collection, group)
+                group = []
+        if group:
+            self._process_group(source_collection, group)
+
+        if full_scan:
+            removed = [doc_id for doc_id in self.state.iter_doc_ids(source_collection) if doc_id not in seen_ids]
+            self._remove_documents(source_collection, removed)
+            self.state.clear_rejected(source_collection, [doc_id for doc_id in self._rejected_ids
+                                                          if doc_id not in seen_ids])
+        # 整個 collection 處理完才更新水位線，中途失敗時下次從原水位線重新查詢（已完成的文件依雜湊略過）；
+        # 被拒絕的文件已記錄在拒絕清單，不阻擋水位線
+        self.state.set_watermark(source_collection, last_id, last_timestamp)
+
+    def _retry_rejected(self, source_collection: str, rejected: List[Tuple[Any, str]],
+                        projection: Dict[str, int]) -> set:
+        """依 _id 重新讀取先前被拒絕的文件並重試，回傳已重試的文件 id"""
+        if not rejected:
+            return set()
+
+        retried = set()
+        raw_ids = [raw_id for raw_id, _ in rejected]
+        for start in range(0, len(raw_ids), _QUERY_CHUNK):
+            part = raw_ids[start:start + _QUERY_CHUNK]
+            docs = list(self.db[source_collection].find(
+                {'_id': {'$in': part}}, projection=projection, batch_size=self.batch_size
+            ))
+            found = {str(doc['_id']) for doc in docs}
+            # 已從 MongoDB 刪除的文件不再重試
+            missing = [str(raw_id) for raw_id in part if str(raw_id) not in found]
+            if missing:
+                self.state.clear_rejected(source_collection, missing)
+                self._rejected_ids.difference_update(missing)
+            for offset in range(0, len(docs), self.group_size):
+                self._process_group(source_collection, docs[offset:offset + self.group_size])
+            retried |= found
+        self.stats['retried'] += len(retried)
+        logger.info(f"🔁 {source_collection}: 重試 {len(retried)} 份先前被拒絕的文件")
+        return retried
+
+    def _process_group(self, source_collection: str, docs: List[Dict[str, Any]]) -> None:
+        """一組文件：切塊 → 記錄待完成 → 嵌入寫入 → 刪除舊 chunk → 記錄完成"""
+        known = self.state.get_documents(source_collection, [str(doc['_id']) for doc in docs])
+        prepared: List[Tuple[str, str, List[Dict[str, Any]], List[str]]] = []
+        rejected: List[Tuple[Any, str, str]] = []
+        for doc in docs:
+            doc_id = str(doc['_id'])
+            content_hash = document_hash(doc)
+            previous = known.get(doc_id)
+            if previous and previous.content_hash == content_hash:
+                self.stats['unchanged'] += 1
+                continue
+            try:
+                chunks = self.chunk_document(doc, source_collection)
+            except ValueError as e:
+                self.stats['rejected'] += 1
+                rejected.append((doc['_id'], content_hash, str(e)))
+                logger.warning(f"文件 {source_collection}/{doc_id} 無法寫入，記錄至拒絕清單: {e}")
+                continue
+            for index, chunk in enumerate(chunks):
+                chunk['chunk_id'] = make_chunk_id(doc_id, content_hash, index)
+            prepared.append((doc_id, content_hash, chunks, previous.chunk_ids if previous else []))
+            self.stats['modified' if previous and previous.content_hash else 'new'] += 1
+        if rejected:
+            self.state.mark_rejected(source_collection, rejected)
+            self._rejected_ids.update(str(raw_id) for raw_id, _, _ in rejected)
+        if not prepared:
+            self._clear_accepted(source_collection, docs, rejected)
+            return
+
+        self.state.mark_pending(source_collection, [
+            (doc_id, [chunk['chunk_id'] for chunk in chunks]) for doc_id, _, chunks, _ in prepared
+        ])
+        records = self.embed_chunks([chunk for _, _, chunks, _ in prepared for chunk in chunks])
+        if records:
+            self.stats['chunks_inserted'] += self.writer.batch_insert(self.collection_name, records)
+
+        new_ids = {chunk['chunk_id'] for _, _, chunks, _ in prepared for chunk in chunks}
+        stale_ids = [chunk_id for _, _, _, old_ids in prepared for chunk_id in old_ids if chunk_id not in new_ids]
+        if stale_ids:
+            self.stats['chunks_deleted'] += self.writer.delete_chunk_ids(self.collection_name, stale_ids)
+
+        self.state.mark_done(source_collection, [
+            (doc_id, content_hash, [chunk['chunk_id'] for chunk in chunks])
+            for doc_id, content_hash, chunks, _ in prepared
+        ])
+        self._clear_accepted(source_collection, docs, rejected)
+
+    def _clear_accepted(self, source_collection: str, docs: List[Dict[str, Any]],
+                        rejected: List[Tuple[Any, str, str]]) -> None:
+        """寫入成功或內容未變的文件移出拒絕清單"""
+        rejected_now = {str(raw_id) for raw_id, _, _ in rejected}
+        accepted = [str(doc['_id']) for doc in docs
+                    if str(doc['_id']) in self._rejected_ids and str(doc['_id']) not in rejected_now]
+        if accepted:
+            self.state.clear_rejected(source_collection, accepted)
+            self._rejected_ids.difference_update(accepted)
+
+    def _remove_documents(self, source_collection: str, doc_ids: List[str]) -> None:
+        """刪除 MongoDB 已移除文件的 chunk 與狀態"""
+        if not doc_ids:
+            return
+        states = self.state.get_documents(source_collection, doc_ids)
+        chunk_ids = [chunk_id for state in states.values() for chunk_id in state.chunk_ids]
+        if chunk_ids:
+            self.stats['chunks_deleted'] += self.writer.delete_chunk_ids(self.collection_name, chunk_ids)
+        self.state.remove_documents(source_collection, doc_ids)
+        self.stats['deleted'] += len(doc_ids)
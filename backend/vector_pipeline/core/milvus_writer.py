@@ -3,13 +3,84 @@ Milvus 資料寫入器
 負責將向量資料寫入 Milvus 向量資料庫
 """
 
+import os
+import sys
+import json
+import time
 import logging
-from typing import Dict, List, Any, Optional
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import islice
+from typing import Deque, Dict, List, Any, Iterable, Iterator, Optional, Set
 from pymilvus import connections, Collection, FieldSchema, CollectionSchema, DataType, utility
 import numpy as np
 
+# 添加後端根目錄到 Python 路徑以使用共用 Milvus 管理器的更新通知
+backend_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if backend_root not in sys.path:
+    sys.path.insert(0, backend_root)
+
+from utils.milvus_client_manager import notify_collection_updated
+
 logger = logging.getLogger(__name__)
 
+# 以主鍵查詢既有 chunk_id 時每次 `in` 表達式的 id 數量
+EXISTS_QUERY_BATCH = int(os.getenv("MILVUS_EXISTS_QUERY_BATCH", "1000"))
+# 分頁掃描主鍵時每頁筆數
+ID_SCAN_PAGE_SIZE = int(os.getenv("MILVUS_ID_SCAN_PAGE_SIZE", "10000"))
+# 每次 insert 的筆數與同時在途的 insert 數
+INSERT_BATCH_SIZE = int(os.getenv("MILVUS_INSERT_BATCH_SIZE", "256"))
+INSERT_MAX_IN_FLIGHT = int(os.getenv("MILVUS_INSERT_MAX_IN_FLIGHT", "4"))
+
+# 檔案匯入（bulk import）：資料先寫成 parquet 上傳到 Milvus 使用的物件儲存，再由 Milvus 匯入
+BULK_IMPORT_ENDPOINT = os.getenv("MILVUS_BULK_ENDPOINT", os.getenv("MINIO_ENDPOINT", "192.168.32.66:30090"))
+BULK_IMPORT_ACCESS_KEY = os.getenv("MILVUS_BULK_ACCESS_KEY", os.getenv("MINIO_ROOT_USER", "bdse37"))
+BULK_IMPORT_SECRET_KEY = os.getenv("MILVUS_BULK_SECRET_KEY", os.getenv("MINIO_ROOT_PASSWORD", "11111111"))
+BULK_IMPORT_BUCKET = os.getenv("MILVUS_BULK_BUCKET", "a-bucket")
+BULK_IMPORT_REMOTE_PATH = os.getenv("MILVUS_BULK_REMOTE_PATH", "bulk_import")
+BULK_IMPORT_TIMEOUT = float(os.getenv("MILVUS_BULK_TIMEOUT", "3600"))
+
+# 欄位順序（必須與 schema 一致）
+FIELD_ORDER = [
+    "chunk_id", "chunk_index", "episode_id", "podcast_id",
+    "podcast_name", "author", "category", "episode_title",
+    "duration", "published_date", "apple_rating", "sentiment_rating", "total_rating",
+    "chunk_text", "embedding", "language",
+    "created_at", "source_model", "tags"
+]
+INT_FIELDS = ("chunk_index", "episode_id", "podcast_id")
+FLOAT_FIELDS = ("apple_rating", "sentiment_rating", "total_rating")
+
+
+def _chunk_id(value: Any) -> str:
+    """chunk_id 強制為 str，且如果是 list 只取第一個元素"""
+    if isinstance(value, list):
+        value = value[0] if value else ""
+    return "" if value is None else str(value)
+
+
+def _vector_column(values: List[Any]) -> List[List[float]]:
+    """
+    embedding 整欄轉為 float list：已是等長 float list 時只檢查長度，
+    其他形式（numpy 陣列、tuple）以 numpy 一次轉為 (N, D) float32
+    """
+    if values and all(type(value) is list for value in values):
+        dim = len(values[0])
+        if dim and all(len(value) == dim for value in values):
+            return values
+    matrix = np.asarray(values, dtype=np.float32)
+    if matrix.ndim != 2 or matrix.shape[1] == 0:
+        raise ValueError(f"embedding 維度不一致或為空: {matrix.shape}")
+    return matrix.tolist()
+
+
+def _numeric_column(values: List[Any], dtype) -> List[Any]:
+    """整欄轉型（缺值與空字串視為 0）"""
+    try:
+        return np.asarray(values, dtype=dtype).tolist()
+    except (TypeError, ValueError):
+        return np.asarray([0 if value in (None, "") else value for value in values], dtype=dtype).tolist()
+
 
 class MilvusWriter:
     """Milvus 資料寫入器"""
@@ -27,13 +98,19 @@ class MilvusWriter:
     def connect(self) -> None:
         """連接到 Milvus"""
         try:
-            connections.connect(
-                alias="default",
-                host=self.milvus_config["host"],
-                port=self.milvus_config["port"]
-            )
+            if self.milvus_config.get("uri"):
+                # uri 可為 Milvus 服務位址或 Milvus Lite 的本機檔案
+                connections.connect(alias="default", uri=self.milvus_config["uri"])
+                target = self.milvus_config["uri"]
+            else:
+                connections.connect(
+                    alias="default",
+                    host=self.milvus_config["host"],
+                    port=self.milvus_config["port"]
+                )
+                target = f"{self.milvus_config['host']}:{self.milvus_config['port']}"
             self.connected = True
-            logger.info(f"成功連接到 Milvus: {self.milvus_config['host']}:{self.milvus_config['port']}")
+            logger.info(f"成功連接到 Milvus: {target}")
         except Exception as e:
             logger.error(f"Milvus 連接失敗: {e}")
             raise
@@ -75,9 +152,9 @@ class MilvusWriter:
                 # 時間和評分欄位
                 FieldSchema(name="duration", dtype=DataType.VARCHAR, max_length=255),
                 FieldSchema(name="published_date", dtype=DataType.VARCHAR, max_length=64),
-                FieldSchema(name="apple_rating", dtype=DataType.FLOAT32),
-                FieldSchema(name="sentiment_rating", dtype=DataType.FLOAT32),
-                FieldSchema(name="total_rating", dtype=DataType.FLOAT32),
+                FieldSchema(name="apple_rating", dtype=DataType.FLOAT),
+                FieldSchema(name="sentiment_rating", dtype=DataType.FLOAT),
+                FieldSchema(name="total_rating", dtype=DataType.FLOAT),
                 
                 # 內容欄位
                 FieldSchema(name="chunk_text", dtype=DataType.VARCHAR, max_length=1024),
@@ -187,23 +264,14 @@ class MilvusWriter:
         try:
             collection = Collection(collection_name)
             
-            # 定義欄位順序（必須與 schema 一致）
-            field_order = [
-                "chunk_id", "chunk_index", "episode_id", "podcast_id", 
-                "podcast_name", "author", "category", "episode_title",
-                "duration", "published_date", "apple_rating", "sentiment_rating", "total_rating",
-                "chunk_text", "embedding", "language",
-                "created_at", "source_model", "tags"
-            ]
-            
             # 將 dict 轉換為 list of list（每個欄位一個 list）
-            insert_data = [data[field] for field in field_order]
+            insert_data = [data[field] for field in FIELD_ORDER]
             
             # 插入資料
-            insert_result = collection.insert(insert_data)
+            collection.insert(insert_data)
             inserted_count = len(data.get("chunk_id", []))
             
-            logger.info(f"成功插入 {inserted_count} 筆資料到集合 {collection_name}")
+            logger.debug(f"成功插入 {inserted_count} 筆資料到集合 {collection_name}")
             return inserted_count
             
         except Exception as e:
@@ -211,37 +279,46 @@ class MilvusWriter:
             raise
     
     def batch_insert(self, collection_name: str, data_list: List[Dict[str, Any]], 
-                    batch_size: int = 100) -> int:
+                    batch_size: int = INSERT_BATCH_SIZE, max_in_flight: int = INSERT_MAX_IN_FLIGHT,
+                    flush: bool = False) -> int:
         """
         批次插入資料
         
+        主執行緒整欄準備下一批的同時，最多 max_in_flight 個 insert 在背景執行緒等待 Milvus 回應。
+        預設不 flush（由 Milvus 自動封存 segment），整批灌庫結束時呼叫一次 flush() 即可。
+        
         Args:
             collection_name: 集合名稱
             data_list: 資料列表
-            batch_size: 批次大小
+            batch_size: 每次 insert 的筆數
+            max_in_flight: 同時在途的 insert 數，1 表示逐批同步插入
+            flush: 全部插入後是否 flush
             
         Returns:
             總插入資料數量
         """
         total_inserted = 0
+        max_in_flight = max(1, max_in_flight)
+        in_flight: Deque[Future] = deque()
         
         try:
-            for i in range(0, len(data_list), batch_size):
-                batch_data = data_list[i:i + batch_size]
-                
-                # 每次批次前檢查連線
-                if not self.connected:
-                    self.connect()
-                
-                # 準備插入資料格式
-                insert_data = self._prepare_batch_data(batch_data)
-                
-                # 插入批次資料
-                inserted_count = self.insert_data(collection_name, insert_data)
-                total_inserted += inserted_count
-                
-                logger.info(f"批次 {i//batch_size + 1}: 插入 {inserted_count} 筆資料")
+            # 每次呼叫前檢查連線
+            if not self.connected:
+                self.connect()
             
+            with ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="milvus-insert") as executor:
+                for i in range(0, len(data_list), batch_size):
+                    # 準備插入資料格式
+                    insert_data = self._prepare_batch_data(data_list[i:i + batch_size])
+                    if len(in_flight) >= max_in_flight:
+                        total_inserted += in_flight.popleft().result()
+                    in_flight.append(executor.submit(self.insert_data, collection_name, insert_data))
+                while in_flight:
+                    total_inserted += in_flight.popleft().result()
+            
+            if flush:
+                self.flush(collection_name)
+            logger.info(f"插入 {total_inserted} 筆資料到集合 {collection_name}")
             return total_inserted
             
         except Exception as e:
@@ -255,7 +332,10 @@ class MilvusWriter:
     
     def _prepare_batch_data(self, data_list: List[Dict[str, Any]]) -> Dict[str, List]:
         """
-        準備批次插入資料格式
+        準備批次插入資料格式（整欄處理）
+        
+        每個欄位一次取出整欄：數值欄位以 numpy 整欄轉型，embedding 為 numpy 陣列時整批轉為 float list，
+        向量長度不一致或缺少 embedding 時在送出前即報錯。
         
         Args:
             data_list: 資料列表
@@ -263,49 +343,205 @@ class MilvusWriter:
         Returns:
             格式化後的資料字典
         """
-        batch_data = {
-            "chunk_id": [],
-            "chunk_index": [],
-            "episode_id": [],
-            "podcast_id": [],
-            "podcast_name": [],
-            "author": [],
-            "category": [],
-            "episode_title": [],
-            "duration": [],
-            "published_date": [],
-            "apple_rating": [],
-            "sentiment_rating": [],
-            "total_rating": [],
-            "chunk_text": [],
-            "embedding": [],
-            "language": [],
-            "created_at": [],
-            "source_model": [],
-            "tags": []
-        }
-        
-        for data in data_list:
-            for key in batch_data:
-                if key in data:
-                    value = data[key]
-                    # 強制 chunk_id 為 str，且如果是 list 只取第一個元素
-                    if key == "chunk_id":
-                        if isinstance(value, list):
-                            value = value[0] if value else ""
-                        value = str(value)
-                    batch_data[key].append(value)
-                else:
-                    # 提供預設值
-                    if key == "embedding":
-                        batch_data[key].append([])
-                    elif key == "tags":
-                        batch_data[key].append("[]")  # 空的 JSON 陣列字串
-                    else:
-                        batch_data[key].append("")
+        batch_data: Dict[str, List] = {}
+        for key in FIELD_ORDER:
+            # 缺少的欄位提供預設值
+            default = "[]" if key == "tags" else ""  # tags 為空的 JSON 陣列字串
+            values = [data.get(key, default) for data in data_list]
+            if key == "chunk_id":
+                batch_data[key] = [_chunk_id(value) for value in values]
+            elif key in INT_FIELDS:
+                batch_data[key] = _numeric_column(values, np.int64)
+            elif key in FLOAT_FIELDS:
+                batch_data[key] = _numeric_column(values, np.float32)
+            elif key == "embedding":
+                batch_data[key] = _vector_column(values)
+            else:
+                batch_data[key] = [value if isinstance(value, str) else ("" if value is None else str(value))
+                                   for value in values]
         
         return batch_data
     
+    def flush(self, collection_name: str) -> None:
+        """
+        flush 集合（整批灌庫結束時呼叫一次），完成後通知 RAG 服務回應快取失效
+        
+        Args:
+            collection_name: 集合名稱
+        """
+        if not self.connected:
+            self.connect()
+            
+        try:
+            start_time = time.time()
+            Collection(collection_name).flush()
+            logger.info(f"集合 {collection_name} flush 完成，耗時: {time.time() - start_time:.2f}秒")
+        except Exception as e:
+            logger.error(f"flush 失敗: {e}")
+            raise
+        notify_collection_updated(collection_name)
+    
+    def bulk_import(self, collection_name: str, data_list: Iterable[Dict[str, Any]],
+                    timeout: float = BULK_IMPORT_TIMEOUT) -> int:
+        """
+        以檔案匯入方式寫入（首次大量灌庫用）
+        
+        資料以 RemoteBulkWriter 寫成 parquet 上傳到 Milvus 使用的物件儲存（MILVUS_BULK_* 環境變數），
+        再以 do_bulk_insert 由 Milvus 直接匯入，不經過逐批 insert。集合需已建立；
+        Milvus Lite 不支援此模式。
+        
+        Args:
+            collection_name: 集合名稱
+            data_list: 資料（可為生成器）
+            timeout: 等待匯入完成的秒數
+            
+        Returns:
+            匯入的資料數量
+        """
+        from pymilvus.bulk_writer import BulkFileType, RemoteBulkWriter
+        from pymilvus.client.types import BulkInsertState
+        
+        if not self.connected:
+            self.connect()
+            
+        collection = Collection(collection_name)
+        connect_param = RemoteBulkWriter.S3ConnectParam(
+            endpoint=BULK_IMPORT_ENDPOINT,
+            access_key=BULK_IMPORT_ACCESS_KEY,
+            secret_key=BULK_IMPORT_SECRET_KEY,
+            bucket_name=BULK_IMPORT_BUCKET
+        )
+        start_time = time.time()
+        rows = 0
+        with RemoteBulkWriter(schema=collection.schema, remote_path=BULK_IMPORT_REMOTE_PATH,
+                              connect_param=connect_param, file_type=BulkFileType.PARQUET) as writer:
+            iterator = iter(data_list)
+            while True:
+                batch = list(islice(iterator, INSERT_BATCH_SIZE))
+                if not batch:
+                    break
+                prepared = self._prepare_batch_data(batch)
+                for i in range(len(batch)):
+                    writer.append_row({key: prepared[key][i] for key in FIELD_ORDER})
+                rows += len(batch)
+            writer.commit()
+            batch_files = writer.batch_files
+        logger.info(f"已上傳 {rows} 筆資料（{len(batch_files)} 組檔案），耗時: {time.time() - start_time:.2f}秒")
+        
+        task_ids = [utility.do_bulk_insert(collection_name=collection_name, files=files) for files in batch_files]
+        imported = 0
+        deadline = time.time() + timeout
+        pending = list(task_ids)
+        while pending:
+            for task_id in list(pending):
+                state = utility.get_bulk_insert_state(task_id=task_id)
+                if state.state == BulkInsertState.ImportCompleted:
+                    imported += state.row_count
+                    pending.remove(task_id)
+                elif state.state in (BulkInsertState.ImportFailed, BulkInsertState.ImportFailedAndCleaned):
+                    raise RuntimeError(f"檔案匯入失敗 (task {task_id}): {state.failed_reason}")
+            if pending:
+                if time.time() > deadline:
+                    raise TimeoutError(f"檔案匯入逾時，未完成的任務: {pending}")
+                time.sleep(2)
+        
+        logger.info(f"檔案匯入完成，匯入 {imported} 筆資料到集合 {collection_name}，"
+                    f"總耗時: {time.time() - start_time:.2f}秒")
+        notify_collection_updated(collection_name)
+        return imported
+    
+    def filter_existing_chunk_ids(self, collection_name: str, chunk_ids: Iterable[str],
+                                  batch_size: int = EXISTS_QUERY_BATCH) -> Set[str]:
+        """
+        查詢哪些 chunk_id 已存在於集合
+
+        以主鍵 `chunk_id in [...]` 分批查詢，只回傳本次給定 id 中已存在的部分，
+        記憶體與查詢成本只和給定的 id 數量有關，與集合大小無關。
+        使用 Strong 一致性，同一次執行中先前插入的資料也會被查到。
+
+        Args:
+            collection_name: 集合名稱
+            chunk_ids: 要檢查的 chunk_id
+            batch_size: 每次查詢的 id 數量
+
+        Returns:
+            已存在的 chunk_id 集合
+        """
+        if not self.connected:
+            self.connect()
+
+        ids = list(dict.fromkeys(str(chunk_id) for chunk_id in chunk_ids if chunk_id))
+        if not ids or not utility.has_collection(collection_name):
+            return set()
+
+        collection = Collection(collection_name)
+        existing: Set[str] = set()
+        for i in range(0, len(ids), batch_size):
+            part = ids[i:i + batch_size]
+            results = collection.query(
+                expr=f"chunk_id in {json.dumps(part, ensure_ascii=False)}",
+                output_fields=["chunk_id"],
+                consistency_level="Strong"
+            )
+            existing.update(result["chunk_id"] for result in results)
+        return existing
+
+    def delete_chunk_ids(self, collection_name: str, chunk_ids: Iterable[str],
+                         batch_size: int = EXISTS_QUERY_BATCH) -> int:
+        """
+        依主鍵刪除 chunk（不存在的 id 直接略過）
+
+        Args:
+            collection_name: 集合名稱
+            chunk_ids: 要刪除的 chunk_id
+            batch_size: 每次 `in` 表達式的 id 數量
+
+        Returns:
+            送出刪除的 id 數量
+        """
+        if not self.connected:
+            self.connect()
+
+        ids = list(dict.fromkeys(str(chunk_id) for chunk_id in chunk_ids if chunk_id))
+        if not ids or not utility.has_collection(collection_name):
+            return 0
+
+        collection = Collection(collection_name)
+        for i in range(0, len(ids), batch_size):
+            collection.delete(f"chunk_id in {json.dumps(ids[i:i + batch_size], ensure_ascii=False)}")
+        logger.info(f"從集合 {collection_name} 刪除 {len(ids)} 個 chunk")
+        return len(ids)
+
+    def iter_chunk_ids(self, collection_name: str, page_size: int = ID_SCAN_PAGE_SIZE) -> Iterator[List[str]]:
+        """
+        分頁掃描集合內所有 chunk_id（不受單次查詢 16384 筆的限制）
+
+        Args:
+            collection_name: 集合名稱
+            page_size: 每頁筆數
+
+        Yields:
+            每頁的 chunk_id 列表
+        """
+        if not self.connected:
+            self.connect()
+
+        if not utility.has_collection(collection_name):
+            return
+        iterator = Collection(collection_name).query_iterator(
+            batch_size=page_size,
+            expr="chunk_id != ''",
+            output_fields=["chunk_id"]
+        )
+        try:
+            while True:
+                page = iterator.next()
+                if not page:
+                    break
+                yield [result["chunk_id"] for result in page]
+        finally:
+            iterator.close()
+
     def load_collection(self, collection_name: str) -> None:
         """
         載入集合到記憶體
@@ -7,13 +7,15 @@ Author: Podri Team
 License: MIT
 """
 
+import os
 import json
+import shutil
 import logging
 import uuid
 import re
 from abc import ABC, abstractmethod
 from pathlib import Path
-from typing import Dict, List, Optional, Set, Tuple, Any
+from typing import Dict, Iterator, List, Optional, Set, Tuple, Any
 from dataclasses import dataclass, asdict
 from datetime import datetime
 
@@ -22,6 +24,13 @@ from pymongo import MongoClient
 from pymongo.database import Database
 from pymongo.collection import Collection
 
+from .chunk_store import is_chunk_store, read_records, write_chunk_store
+from .incremental_ingest import DEFAULT_GROUP_SIZE, DEFAULT_TIMESTAMP_FIELD, IncrementalIngestor, IngestStateStore
+from .streaming_pipeline import DEFAULT_QUEUE_SIZE, StreamingPipeline, StreamStage
+
+# 階段輸出格式：columnar (chunk store) 或 json
+STAGE_OUTPUT_FORMAT = os.getenv("STAGE_OUTPUT_FORMAT", "columnar").lower()
+
 # 設定日誌
 logging.basicConfig(
     level=logging.INFO,
@@ -82,15 +91,36 @@ class BaseStageProcessor(ABC):
         pass
     
     def save_results(self, results: Any, filename: str) -> str:
-        """儲存結果到檔案"""
-        output_path = self.data_dir / filename
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(results, f, ensure_ascii=False, indent=2)
+        """
+        儲存結果
+        
+        STAGE_OUTPUT_FORMAT=columnar 且結果為 chunk 列表時寫成 chunk store 資料集
+        （目錄名為檔名去掉 .json），其餘情況寫成 JSON 檔案。
+        寫入後移除另一種格式的舊輸出，避免切換格式後 load_results 讀到過期資料。
+        """
+        store_path = self.data_dir / Path(filename).stem
+        json_path = self.data_dir / filename
+        if STAGE_OUTPUT_FORMAT == "columnar" and isinstance(results, list) \
+                and all(isinstance(item, dict) for item in results):
+            output_path = store_path
+            write_chunk_store(output_path, results)
+            if json_path.is_file():
+                json_path.unlink()
+        else:
+            output_path = json_path
+            with open(output_path, 'w', encoding='utf-8') as f:
+                json.dump(results, f, ensure_ascii=False, indent=2)
+            if is_chunk_store(store_path):
+                shutil.rmtree(store_path)
         logger.info(f"{self.stage_name} 結果已儲存到: {output_path}")
         return str(output_path)
     
     def load_results(self, filename: str) -> Any:
-        """從檔案載入結果"""
+        """從 chunk store 資料集或 JSON 檔案載入結果（優先讀取 chunk store）"""
+        store_path = self.data_dir / Path(filename).stem
+        if is_chunk_store(store_path):
+            return read_records(store_path)
+        
         input_path = self.data_dir / filename
         if not input_path.exists():
             raise FileNotFoundError(f"找不到檔案: {input_path}")
@@ -103,19 +133,19 @@ class Stage1TextChunker(BaseStageProcessor):
     """階段 1：文本切斷處理器"""
     
     def __init__(self, output_dir: str = "data/stage1_chunking"):
+        from .text_chunker import TextChunker
+        
         super().__init__(output_dir)
         self.stage_name = "文本切斷"
+        # 切分器與 tokenizer 跨文件共用
+        self.chunker = TextChunker(max_chunk_size=1024, overlap_size=100)
     
     def split_text_into_chunks(self, text: str) -> List[str]:
         """將文本切斷成 chunks - 使用統一的 TextChunker"""
-        from .text_chunker import TextChunker
-        
         if not text or not text.strip():
             return []
         
-        # 使用統一的 TextChunker
-        chunker = TextChunker(max_chunk_size=1024, overlap_size=100)
-        text_chunks = chunker.split_text_into_chunks(text, "temp_doc_id")
+        text_chunks = self.chunker.split_text_into_chunks(text, "temp_doc_id")
         
         # 轉換為簡單的字符串列表
         return [chunk.chunk_text for chunk in text_chunks]
@@ -148,7 +178,8 @@ class Stage1TextChunker(BaseStageProcessor):
                 'episode_id': str(doc.get('_id')),  # 保留原始 episode ID
                 'original_filename': filename,
                 'collection_name': collection_name,
-                'chunk_length': len(chunk_text)
+                'chunk_length': len(chunk_text),
+                'created_at': datetime.now().isoformat()
             }
             chunk_data.append(chunk_info)
         
@@ -180,14 +211,49 @@ class Stage1TextChunker(BaseStageProcessor):
         # 最後使用 _id
         return str(doc.get('_id', ''))
     
-    def process(self, mongodb_config: Dict[str, str]) -> List[Dict[str, Any]]:
+    def iter_documents(self, mongodb_config: Dict[str, Any]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        逐筆讀取 MongoDB 文件（cursor 分批取回，不一次載入整個 collection）
+        
+        Args:
+            mongodb_config: uri / database / collections（預設全部）/ limit / batch_size
+            
+        Yields:
+            Tuple[str, Dict[str, Any]]: (collection 名稱, 文件)
+        """
+        import os
+        client = MongoClient(mongodb_config.get('uri') or os.getenv("MONGO_URI", "mongodb://localhost:27017/podwise"))
+        try:
+            db = client[mongodb_config.get('database') or os.getenv("MONGO_DB", "podwise")]
+            collection_names = mongodb_config.get('collections') or db.list_collection_names()
+            limit = int(mongodb_config.get('limit') or 0)
+            for collection_name in collection_names:
+                cursor = db[collection_name].find(
+                    {}, projection={'text': 1, 'file': 1, '_file_metadata': 1},
+                    batch_size=int(mongodb_config.get('batch_size', 100))
+                )
+                if limit:
+                    cursor = cursor.limit(limit)
+                for doc in cursor:
+                    yield collection_name, doc
+        finally:
+            client.close()
+    
+    def iter_chunks(self, doc: Dict[str, Any], collection_name: str) -> Iterator[Dict[str, Any]]:
+        """逐筆產生單一文件的 chunks"""
+        result = self.process_document(doc, collection_name)
+        yield from result.get('chunks', [])
+    
+    def process(self, mongodb_config: Dict[str, Any]) -> List[Dict[str, Any]]:
         """處理 MongoDB 資料 - 實作 BaseStageProcessor 抽象方法"""
         logger.info("=== 開始階段 1: 文本切斷處理 ===")
         
-        # 這裡需要實作 MongoDB 連接和處理邏輯
-        # 暫時返回空列表，實際實作需要根據具體需求
-        logger.warning("Stage1TextChunker.process 方法需要實作 MongoDB 處理邏輯")
-        return []
+        chunks_data = []
+        for collection_name, doc in self.iter_documents(mongodb_config):
+            chunks_data.extend(self.iter_chunks(doc, collection_name))
+        
+        logger.info(f"階段 1 完成: 切出 {len(chunks_data)} 個 chunks")
+        return chunks_data
     
     def save_individual_file(self, result: Dict[str, Any], collection_dir: Path):
         """儲存個別檔案"""
@@ -207,13 +273,10 @@ class Stage1TextChunker(BaseStageProcessor):
     
     def save_results(self, results: List[Dict[str, Any]], filename: str):
         """儲存結果"""
-        output_file = self.data_dir / filename
         try:
-            with open(output_file, 'w', encoding='utf-8') as f:
-                json.dump(results, f, ensure_ascii=False, indent=2)
-            logger.info(f"結果已儲存: {output_file}")
+            return super().save_results(results, filename)
         except Exception as e:
-            logger.error(f"儲存結果失敗 {output_file}: {e}")
+            logger.error(f"儲存結果失敗 {self.data_dir / filename}: {e}")
     
     def _make_filename_safe(self, filename: str) -> str:
         """確保檔名安全"""
@@ -246,21 +309,19 @@ class Stage2TextCleaningProcessor(BaseStageProcessor):
         
         return cleaned
     
+    def clean_chunk(self, chunk_data: Dict) -> Dict:
+        """清理單一 chunk"""
+        return {
+            **chunk_data,
+            'cleaned_content': self.clean_text(chunk_data.get('content', chunk_data.get('chunk_text', ''))),
+            'cleaned_at': datetime.now().isoformat()
+        }
+    
     def process(self, chunks_data: List[Dict]) -> List[Dict]:
         """處理文本清理"""
         logger.info("=== 開始階段 2: 文本清理處理 ===")
         
-        processed_chunks = []
-        
-        for chunk_data in chunks_data:
-            cleaned_content = self.clean_text(chunk_data['content'])
-            
-            processed_chunk = {
-                **chunk_data,
-                'cleaned_content': cleaned_content,
-                'cleaned_at': datetime.now().isoformat()
-            }
-            processed_chunks.append(processed_chunk)
+        processed_chunks = [self.clean_chunk(chunk_data) for chunk_data in chunks_data]
         
         # 儲存結果
         self.save_results(processed_chunks, "cleaned_chunks.json")
@@ -305,6 +366,16 @@ class Stage3TaggingProcessor(BaseStageProcessor):
         
         return tags, tag_sources
     
+    def tag_chunk(self, chunk_data: Dict) -> Dict:
+        """為單一 chunk 提取標籤"""
+        tags, tag_sources = self.extract_tags(chunk_data['cleaned_content'])
+        return {
+            **chunk_data,
+            'tags': tags,
+            'tag_sources': tag_sources,
+            'tagged_at': datetime.now().isoformat()
+        }
+    
     def process(self, cleaned_chunks: List[Dict]) -> List[Dict]:
         """處理標籤提取"""
         logger.info("=== 開始階段 3: 標籤處理 ===")
@@ -312,19 +383,7 @@ class Stage3TaggingProcessor(BaseStageProcessor):
         if not self.tag_processor:
             raise RuntimeError("請先載入標籤處理器")
         
-        tagged_chunks = []
-        
-        for chunk_data in cleaned_chunks:
-            text = chunk_data['cleaned_content']
-            tags, tag_sources = self.extract_tags(text)
-            
-            tagged_chunk = {
-                **chunk_data,
-                'tags': tags,
-                'tag_sources': tag_sources,
-                'tagged_at': datetime.now().isoformat()
-            }
-            tagged_chunks.append(tagged_chunk)
+        tagged_chunks = [self.tag_chunk(chunk_data) for chunk_data in cleaned_chunks]
         
         # 儲存結果
         self.save_results(tagged_chunks, "tagged_chunks.json")
@@ -352,7 +411,7 @@ class Stage4EmbeddingPrepProcessor(BaseStageProcessor):
             'tag_sources': tagged_chunk['tag_sources'],
             'original_filename': tagged_chunk['original_filename'],
             'collection_name': tagged_chunk['collection_name'],
-            'created_at': tagged_chunk['created_at'],
+            'created_at': tagged_chunk.get('created_at', datetime.now().isoformat()),
             'prepared_at': datetime.now().isoformat()
         }
         
@@ -375,6 +434,125 @@ class Stage4EmbeddingPrepProcessor(BaseStageProcessor):
         return embedding_ready_data
 
 
+def _safe_int(value: Any, default: int = 0) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+# Milvus INT64 主鍵欄位只接受十進位數字；MongoDB ObjectId（24 位十六進位）不是合法的 episode_id
+_INT_ID_PATTERN = re.compile(r'^\d{1,18}$')
+
+
+def _parse_id(value: Any) -> Optional[int]:
+    text = str(value).strip() if value is not None else ''
+    return int(text) if _INT_ID_PATTERN.match(text) else None
+
+
+def apply_episode_metadata(chunk: Dict[str, Any], metadata: Any) -> Dict[str, Any]:
+    """
+    以 PostgreSQL 的 episode 元資料（EpisodeMetadataResolver.resolve 的結果）覆寫 chunk 的
+    episode_id、podcast_id、podcast_name、author、category 等欄位；metadata 為 None 時原樣返回
+    """
+    if metadata is None:
+        return chunk
+    return {
+        **chunk,
+        'episode_id': metadata.episode_id,
+        'podcast_id': metadata.podcast_id,
+        'podcast_name': metadata.podcast_name,
+        'author': metadata.author,
+        'category': metadata.category,
+        'episode_title': metadata.episode_title,
+        'duration': metadata.duration if metadata.duration is not None else chunk.get('duration', ''),
+        'published_date': metadata.published_date or chunk.get('published_date', ''),
+        'language': metadata.languages or chunk.get('language', 'zh-TW'),
+    }
+
+
+def check_record_ids(chunk: Dict[str, Any]) -> Tuple[int, int]:
+    """
+    檢查 chunk 可寫入 Milvus：episode_id / podcast_id 為整數且有 podcast_name
+    
+    Returns:
+        Tuple[int, int]: (episode_id, podcast_id)
+    
+    Raises:
+        ValueError: 缺少可用的 ID（例如只有 MongoDB ObjectId 且無法對應到 PostgreSQL），
+                    此類記錄寫入後無法依 episode 查詢，不應寫入
+    """
+    episode_id = _parse_id(chunk.get('episode_id'))
+    podcast_id = _parse_id(chunk.get('podcast_id'))
+    missing = [name for name, value in (('episode_id', episode_id), ('podcast_id', podcast_id),
+                                        ('podcast_name', chunk.get('podcast_name')))
+               if not value]
+    if missing:
+        raise ValueError(f"chunk {chunk.get('chunk_id', '')} 缺少可用的 {', '.join(missing)} "
+                         f"(episode_id={chunk.get('episode_id')!r})")
+    return episode_id, podcast_id
+
+
+def to_milvus_record(chunk: Dict[str, Any], source_model: str, metadata: Any = None) -> Dict[str, Any]:
+    """
+    將已嵌入的 chunk 轉為 Milvus schema 的欄位
+    
+    Args:
+        chunk: 已嵌入的 chunk
+        source_model: 嵌入模型名稱
+        metadata: PostgreSQL 的 episode 元資料，提供時先以 apply_episode_metadata 補齊
+    
+    Returns:
+        Dict[str, Any]: Milvus 記錄
+    
+    Raises:
+        ValueError: 見 check_record_ids
+    """
+    chunk = apply_episode_metadata(chunk, metadata)
+    episode_id, podcast_id = check_record_ids(chunk)
+    return {
+        'chunk_id': str(chunk.get('chunk_id', '')),
+        'chunk_index': _safe_int(chunk.get('chunk_index')),
+        'episode_id': episode_id,
+        'podcast_id': podcast_id,
+        'podcast_name': str(chunk.get('podcast_name', '')),
+        'author': str(chunk.get('author', '') or ''),
+        'category': str(chunk.get('category', '') or ''),
+        'episode_title': str(chunk.get('episode_title', chunk.get('original_filename', ''))),
+        'duration': str(chunk.get('duration', '')),
+        'published_date': str(chunk.get('published_date', '')),
+        'apple_rating': float(chunk.get('apple_rating', 0.0) or 0.0),
+        'sentiment_rating': float(chunk.get('sentiment_rating', 0.0) or 0.0),
+        'total_rating': float(chunk.get('total_rating', 0.0) or 0.0),
+        'chunk_text': str(chunk.get('content', chunk.get('chunk_text', '')))[:1024],
+        'embedding': chunk['embedding'],
+        'language': str(chunk.get('language', 'zh-TW')),
+        'created_at': str(chunk.get('created_at', '')),
+        'source_model': source_model,
+        'tags': json.dumps(chunk.get('tags', []), ensure_ascii=False)
+    }
+
+
+def make_record_builder(postgres_config: Optional[Dict[str, Any]], source_model: str):
+    """
+    建立 chunk → Milvus 記錄的轉換函數（串流與增量灌庫共用）
+    
+    提供 postgres_config 時先以 PostgreSQL 補齊 episode 元資料再轉換。
+    
+    Returns:
+        Tuple[Callable, Optional[EpisodeMetadataResolver]]: (轉換函數, 解析器，用畢需 close)
+    """
+    resolver = None
+    if postgres_config:
+        from .postgresql_mapper import EpisodeMetadataResolver
+        resolver = EpisodeMetadataResolver(postgres_config)
+    
+    def build(chunk: Dict[str, Any]) -> Dict[str, Any]:
+        return to_milvus_record(chunk, source_model, resolver.resolve(chunk) if resolver else None)
+    
+    return build, resolver
+
+
 class PipelineOrchestrator:
     """管線協調器"""
     
@@ -419,4 +597,182 @@ class PipelineOrchestrator:
         embedding_data = self.run_stage4(tagged_chunks)
         
         logger.info("🎉 完整管線執行完成")
-        return embedding_data 
\ No newline at end of file
+        return embedding_data
+    
+    def run_streaming(self,
+                      mongodb_config: Dict[str, Any],
+                      tag_csv_path: str,
+                      milvus_config: Dict[str, Any],
+                      collection_name: str,
+                      postgres_config: Optional[Dict[str, Any]],
+                      embedding_model: str = "BAAI/bge-m3",
+                      embedding_dim: int = 1024,
+                      embed_batch_size: int = 32,
+                      insert_batch_size: int = 100,
+                      tag_workers: int = 1,
+                      queue_size: int = DEFAULT_QUEUE_SIZE) -> Dict[str, Any]:
+        """
+        以串流方式執行所有階段並寫入 Milvus
+        
+        文件從 MongoDB cursor 逐筆讀出，經切塊、清理、標籤、嵌入後分批寫入 Milvus；
+        階段之間以有界佇列串接，不寫中間 JSON 檔，記憶體用量與語料庫大小無關。
+        
+        Args:
+            mongodb_config: MongoDB 設定（見 Stage1TextChunker.iter_documents）
+            tag_csv_path: 標籤 CSV 路徑
+            milvus_config: Milvus 連線設定
+            collection_name: 目標集合
+            postgres_config: PostgreSQL 設定（例如 config.get_postgres_config()），寫入前補齊 episode / podcast
+                             元資料；MongoDB 文件通常沒有整數 ID，傳入 None 時這類 chunk 全部會被拒絕
+            embedding_model: 嵌入模型
+            embedding_dim: 嵌入維度（集合不存在時建立用）
+            embed_batch_size: 嵌入批次大小
+            insert_batch_size: 寫入批次大小
+            tag_workers: 標籤階段工作執行緒數
+            queue_size: 各階段輸入佇列上限
+            
+        Returns:
+            Dict[str, Any]: 各階段吞吐量與佇列深度指標（rejected_chunks 為缺少有效 ID 而未寫入的 chunk 數）
+        """
+        from .vector_processor import VectorProcessor
+        from .milvus_writer import MilvusWriter
+        
+        self.stage3.load_tag_processor(tag_csv_path)
+        vector_processor = VectorProcessor(embedding_model)
+        writer = MilvusWriter(milvus_config)
+        writer.create_collection(collection_name, embedding_dim)
+        source_model = embedding_model.split('/')[-1]
+        if not postgres_config:
+            logger.warning("⚠️ 未提供 PostgreSQL 設定，缺少整數 episode_id / podcast_id 的 chunk 將不會寫入")
+        build_record, resolver = make_record_builder(postgres_config, source_model)
+        rejected = [0]
+        
+        def embed(batch: List[Dict]) -> List[Dict]:
+            embeddings = vector_processor.batch_generate_embeddings(
+                [chunk['content'] for chunk in batch], batch_size=len(batch)
+            )
+            return [{**chunk, 'embedding': embedding.tolist()} for chunk, embedding in zip(batch, embeddings)]
+        
+        def insert(batch: List[Dict]) -> List[int]:
+            records = []
+            for chunk in batch:
+                try:
+                    records.append(build_record(chunk))
+                except ValueError as e:
+                    rejected[0] += 1
+                    logger.warning(f"略過無法寫入的 chunk: {e}")
+            return [writer.batch_insert(collection_name, records, batch_size=insert_batch_size)] if records else []
+        
+        pipeline = StreamingPipeline(
+            source=self.stage1.iter_documents(mongodb_config),
+            stages=[
+                StreamStage("切塊", lambda item: self.stage1.iter_chunks(item[1], item[0]),
+                            queue_size=max(1, queue_size // 8)),
+                StreamStage("清理", lambda chunk: [self.stage2.clean_chunk(chunk)], queue_size=queue_size),
+                StreamStage("標籤", lambda chunk: [self.stage3.tag_chunk(chunk)],
+                            workers=tag_workers, queue_size=queue_size),
+                StreamStage("準備", lambda chunk: [self.stage4.prepare_for_embedding(chunk)], queue_size=queue_size),
+                StreamStage("嵌入", embed, batch_size=embed_batch_size, queue_size=max(queue_size, embed_batch_size)),
+                StreamStage("寫入", insert, batch_size=insert_batch_size,
+                            queue_size=max(queue_size, insert_batch_size)),
+            ],
+            name="向量管線"
+        )
+        try:
+            result = pipeline.run()
+            writer.flush(collection_name)
+            result['rejected_chunks'] = rejected[0]
+            return result
+        finally:
+            writer.close()
+            if resolver is not None:
+                resolver.close()
+    
+    def run_incremental(self,
+                        mongodb_config: Dict[str, Any],
+                        tag_csv_path: str,
+                        milvus_config: Dict[str, Any],
+                        collection_name: str,
+                        postgres_config: Optional[Dict[str, Any]],
+                        embedding_model: str = "BAAI/bge-m3",
+                        embedding_dim: int = 1024,
+                        state_path: Optional[str] = None,
+                        timestamp_field: Optional[str] = DEFAULT_TIMESTAMP_FIELD,
+                        group_size: int = DEFAULT_GROUP_SIZE,
+                        full_scan: bool = False) -> Dict[str, Any]:
+        """
+        增量灌庫：只處理上次執行後新增或修改的文件
+        
+        依各 collection 的 `_id` / 時間戳水位線查詢變動文件，內容雜湊未變的略過，
+        修改過的文件寫入新 chunk 並刪除舊 chunk；中斷後重新執行即可（見 core/incremental_ingest.py）。
+        
+        Args:
+            mongodb_config: MongoDB 設定（uri / database / collections / batch_size）
+            tag_csv_path: 標籤 CSV 路徑
+            milvus_config: Milvus 連線設定
+            collection_name: 目標集合
+            postgres_config: PostgreSQL 設定（例如 config.get_postgres_config()），寫入前補齊 episode / podcast
+                             元資料；傳入 None 時缺少整數 ID 的文件會被拒絕
+            embedding_model: 嵌入模型
+            embedding_dim: 嵌入維度（集合不存在時建立用）
+            state_path: 狀態檔路徑，預設為 {base_data_dir}/incremental_state.sqlite3
+            timestamp_field: 文件修改時間欄位，None 表示只偵測新文件
+            group_size: 每組一起嵌入與寫入的文件數
+            full_scan: 掃描整個 collection 比對內容並刪除已移除文件的 chunk
+            
+        Returns:
+            Dict[str, Any]: 掃描、略過、新增、修改、刪除的文件數與 chunk 數
+        """
+        from .vector_processor import VectorProcessor
+        from .milvus_writer import MilvusWriter
+        
+        self.stage3.load_tag_processor(tag_csv_path)
+        vector_processor = VectorProcessor(embedding_model)
+        writer = MilvusWriter(milvus_config)
+        writer.create_collection(collection_name, embedding_dim)
+        source_model = embedding_model.split('/')[-1]
+        state = IngestStateStore(state_path or str(self.base_data_dir / "incremental_state.sqlite3"))
+        if not postgres_config:
+            logger.warning("⚠️ 未提供 PostgreSQL 設定，缺少整數 episode_id / podcast_id 的文件將被拒絕")
+        _, resolver = make_record_builder(postgres_config, source_model)
+        
+        def chunk_document(doc: Dict[str, Any], source_collection: str) -> List[Dict[str, Any]]:
+            chunks = [
+                self.stage4.prepare_for_embedding(self.stage3.tag_chunk(self.stage2.clean_chunk(chunk)))
+                for chunk in self.stage1.iter_chunks(doc, source_collection)
+            ]
+            # 嵌入前先補齊並檢查 ID，無法寫入的文件整份拒絕（IncrementalIngestor 不更新水位線）
+            if chunks and resolver is not None:
+                metadata = resolver.resolve(chunks[0])
+                chunks = [apply_episode_metadata(chunk, metadata) for chunk in chunks]
+            for chunk in chunks:
+                check_record_ids(chunk)
+            return chunks
+        
+        def embed_chunks(chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+            if not chunks:
+                return []
+            embeddings = vector_processor.batch_generate_embeddings([chunk['content'] for chunk in chunks])
+            return [to_milvus_record({**chunk, 'embedding': embedding.tolist()}, source_model)
+                    for chunk, embedding in zip(chunks, embeddings)]
+        
+        client = MongoClient(mongodb_config.get('uri') or os.getenv("MONGO_URI", "mongodb://localhost:27017/podwise"))
+        try:
+            ingestor = IncrementalIngestor(
+                db=client[mongodb_config.get('database') or os.getenv("MONGO_DB", "podwise")],
+                state=state,
+                writer=writer,
+                collection_name=collection_name,
+                chunk_document=chunk_document,
+                embed_chunks=embed_chunks,
+                timestamp_field=timestamp_field,
+                group_size=group_size,
+                batch_size=int(mongodb_config.get('batch_size', 100))
+            )
+            return ingestor.run(mongodb_config.get('collections'), full_scan=full_scan)
+        finally:
+            client.close()
+            state.close()
+            writer.close()
+            if resolver is not None:
+                resolver.close() 
\ No newline at end of file
@@ -3,8 +3,10 @@ PostgreSQL Metadata Mapping 處理器
 負責查詢 episode 和 podcast 的完整 metadata
 """
 
+import re
 import logging
-from typing import Dict, List, Optional, Any
+import threading
+from typing import Dict, List, Optional, Any, Tuple
 import psycopg2
 from psycopg2.extras import RealDictCursor
 from dataclasses import dataclass
@@ -421,4 +423,86 @@ class PostgreSQLMapper:
         """關閉連接"""
         if self.connection:
             self.connection.close()
-            logger.info("PostgreSQL 連接已關閉") 
\ No newline at end of file
+            logger.info("PostgreSQL 連接已關閉")
+
+
+# 逐字稿檔名格式: RSS_<podcast_id>_podcast_<n>_<標題>
+_FILENAME_PATTERN = re.compile(r'^RSS_(\d+)_podcast_\d+_(.+)$')
+_COLLECTION_PATTERN = re.compile(r'^RSS_(\d+)$')
+
+
+def episode_lookup_key(chunk: Dict[str, Any]) -> Tuple[Optional[int], str]:
+    """
+    由 chunk 取得查詢 PostgreSQL 用的 (podcast_id, episode_title)
+
+    podcast_id 依序取自 chunk 的 podcast_id、MongoDB collection 名稱 (RSS_<id>)、檔名；
+    標題取自 episode_title，沒有時由檔名去除 RSS 前綴。
+    """
+    podcast_id = chunk.get('podcast_id')
+    podcast_id = int(podcast_id) if str(podcast_id or '').isdigit() else None
+    filename = str(chunk.get('original_filename', '') or '').strip()
+    match = _FILENAME_PATTERN.match(filename)
+    if podcast_id is None:
+        collection_match = _COLLECTION_PATTERN.match(str(chunk.get('collection_name', '') or ''))
+        if collection_match:
+            podcast_id = int(collection_match.group(1))
+        elif match:
+            podcast_id = int(match.group(1))
+    title = str(chunk.get('episode_title', '') or '').strip()
+    if not title:
+        title = (match.group(2) if match else filename).strip(' _')
+    return podcast_id, title
+
+
+class EpisodeMetadataResolver:
+    """
+    寫入 Milvus 前以 PostgreSQL 補齊 episode 元資料
+
+    MongoDB 逐字稿只有 ObjectId 與檔名，episode_id、podcast_id、podcast_name、author、category
+    需由 PostgreSQL 的 episodes / podcasts 表對應。結果依 (podcast_id, 標題) 快取（包含查無結果），
+    同一集的多個 chunk 只查詢一次；連線失敗後不再重試，呼叫端改以 chunk 本身的欄位驗證。
+    """
+
+    def __init__(self, postgres_config: Dict[str, Any]):
+        """
+        初始化解析器（首次查詢時才連線）
+
+        Args:
+            postgres_config: PostgreSQL 配置字典
+        """
+        self.mapper = PostgreSQLMapper(postgres_config)
+        self._cache: Dict[Tuple[int, str], Optional[EpisodeMetadata]] = {}
+        self._lock = threading.Lock()
+        self._disabled = False
+
+    def resolve(self, chunk: Dict[str, Any]) -> Optional[EpisodeMetadata]:
+        """
+        查詢 chunk 所屬 episode 的元資料
+
+        Args:
+            chunk: 含 collection_name / original_filename / episode_title 的 chunk
+
+        Returns:
+            Episode 元資料，無法對應時返回 None
+        """
+        podcast_id, title = episode_lookup_key(chunk)
+        if podcast_id is None or not title:
+            return None
+        key = (podcast_id, title)
+        with self._lock:
+            if key in self._cache:
+                return self._cache[key]
+            if self._disabled:
+                return None
+            try:
+                metadata = self.mapper.search_episode_by_podcast_and_title(podcast_id, title)
+            except Exception as e:
+                logger.error(f"PostgreSQL 無法連線，停止補齊 episode 元資料: {e}")
+                self._disabled = True
+                return None
+            self._cache[key] = metadata
+            return metadata
+
+    def close(self) -> None:
+        """關閉連接"""
+        self.mapper.close()
@@ -0,0 +1,571 @@
+"""
+階段狀態清單（Stage Manifest）
+以單一 SQLite 檔記錄各階段每個檔案的狀態、內容雜湊、時間與錯誤，取代反覆掃描目錄與自訂進度 JSON
+
+- 清單以 (stage, key) 為主鍵；檔案清冊類的 stage（例如 stage1 輸出）由 scan() 維護，
+  工作類的 stage（例如 stage3 標籤）由 plan() 依來源 stage 的內容雜湊產生待處理項目
+- scan() 記錄每個目錄的 mtime，目錄未變動時不列出其檔案；檔案大小或 mtime 改變才重新計算雜湊，
+  重新掃描的耗時與變動的目錄與檔案數成正比（原地修改檔案內容不會改變目錄 mtime，需 full=True 或由寫入端呼叫 record()）
+- 多個行程可同時以 claim() 領取工作：以 BEGIN IMMEDIATE 交易選取並標記，同一項目不會被兩個工作者領取；
+  領取後超過租期（lease）未完成的項目可被重新領取，失敗項目在 max_attempts 次內可重試
+"""
+
+import os
+import json
+import time
+import socket
+import fnmatch
+import hashlib
+import logging
+import sqlite3
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+# 未設定時清單放在資料目錄下的 stage_manifest.sqlite3
+STAGE_MANIFEST_PATH = os.getenv("STAGE_MANIFEST_PATH", "")
+MANIFEST_FILENAME = "stage_manifest.sqlite3"
+DEFAULT_LEASE_SECONDS = float(os.getenv("STAGE_MANIFEST_LEASE_SECONDS", "600"))
+DEFAULT_MAX_ATTEMPTS = int(os.getenv("STAGE_MANIFEST_MAX_ATTEMPTS", "3"))
+
+# 共用的 stage 名稱
+STAGE1_FILES = "stage1_files"           # stage1 切塊輸出（key 為相對於 stage1 目錄的路徑）
+TAGGING_STAGE = "stage3_tagging"        # stage1 → stage3 標籤工作
+STAGE3_FILES = "stage3_files"           # stage3 標籤輸出（key 為檔名）
+STAGE4_FILES = "stage4_files"           # stage4 輸出（key 為對應的 stage3 檔名）
+STAGE4_VALIDATION = "stage4_validation"  # stage4 檔案結構驗證
+
+STATUS_PENDING = "pending"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+# 單一 SQL 的參數數量上限
+_QUERY_CHUNK = 500
+# plan() 水位線往前保留的秒數（容許多個行程間的時鐘與交易先後差異）
+_PLAN_SLACK_SECONDS = 5.0
+# mtime 距今不到此秒數的目錄不記錄 mtime，下次仍會列出（避免同一時間刻度內新增的檔案被略過）
+_DIRECTORY_SETTLE_SECONDS = 2.0
+_HASH_BLOCK_SIZE = 1 << 20
+# chunk store 資料集目錄內的描述檔（資料集每次寫入都會整個換名，描述檔內容隨之改變）
+_CHUNK_STORE_MANIFEST = "manifest.json"
+
+
+def _content_path(path: Union[str, Path]) -> Path:
+    """檔案本身；chunk store 資料集目錄則為其描述檔"""
+    path = Path(path)
+    manifest = path / _CHUNK_STORE_MANIFEST
+    return manifest if manifest.is_file() else path
+
+
+def file_hash(path: Union[str, Path]) -> str:
+    """計算檔案內容的 SHA-256（chunk store 資料集以描述檔計算）"""
+    digest = hashlib.sha256()
+    with open(_content_path(path), 'rb') as f:
+        for block in iter(lambda: f.read(_HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def default_worker_id() -> str:
+    """以主機名稱、行程與執行緒識別工作者"""
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+
+
+@dataclass
+class ManifestEntry:
+    """清單項目"""
+    stage: str
+    key: str
+    path: Optional[str]
+    status: str
+    content_hash: Optional[str]
+    source_path: Optional[str]
+    source_hash: Optional[str]
+    attempts: int
+    error: Optional[str]
+    worker: Optional[str]
+    updated_at: Optional[float]
+
+
+_ENTRY_COLUMNS = ("stage, key, path, status, content_hash, source_path, source_hash, "
+                  "attempts, error, worker, updated_at")
+
+
+class StageManifest:
+    """階段狀態清單（SQLite）"""
+
+    def __init__(self, path: Union[str, Path]):
+        """
+        開啟（或建立）清單
+
+        Args:
+            path: SQLite 檔案路徑
+        """
+        path = str(path)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.RLock()
+        # 交易自行控制（isolation_level=None），領取工作時以 BEGIN IMMEDIATE 取得寫入鎖
+        self._conn = sqlite3.connect(path, timeout=30.0, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._transaction():
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS files ("
+                "stage TEXT NOT NULL, key TEXT NOT NULL, path TEXT, directory TEXT, "
+                "status TEXT NOT NULL, content_hash TEXT, size INTEGER, mtime_ns INTEGER, "
+                "source_path TEXT, source_hash TEXT, attempts INTEGER NOT NULL DEFAULT 0, error TEXT, "
+                "worker TEXT, lease_until REAL, created_at REAL, updated_at REAL, "
+                "PRIMARY KEY (stage, key))"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_files_status ON files (stage, status, key)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_files_directory ON files (stage, directory)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_files_updated ON files (stage, updated_at)")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS directories ("
+                "stage TEXT NOT NULL, path TEXT NOT NULL, mtime_ns INTEGER, subdirs TEXT NOT NULL DEFAULT '[]', "
+                "PRIMARY KEY (stage, path))"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS plans ("
+                "source_stage TEXT NOT NULL, target_stage TEXT NOT NULL, prefix TEXT NOT NULL, planned_at REAL, "
+                "PRIMARY KEY (source_stage, target_stage, prefix))"
+            )
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """寫入交易（BEGIN IMMEDIATE，跨行程互斥）"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def close(self) -> None:
+        """關閉連線"""
+        with self._lock:
+            self._conn.close()
+
+    # ---- 查詢 ----
+
+    def get(self, stage: str, key: str) -> Optional[ManifestEntry]:
+        """查詢單一項目"""
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {_ENTRY_COLUMNS} FROM files WHERE stage = ? AND key = ?", (stage, key)
+            ).fetchone()
+        return ManifestEntry(*row) if row else None
+
+    def get_many(self, stage: str, keys: Sequence[str]) -> Dict[str, ManifestEntry]:
+        """批次查詢項目"""
+        entries: Dict[str, ManifestEntry] = {}
+        with self._lock:
+            for start in range(0, len(keys), _QUERY_CHUNK):
+                part = list(keys[start:start + _QUERY_CHUNK])
+                rows = self._conn.execute(
+                    f"SELECT {_ENTRY_COLUMNS} FROM files "
+                    f"WHERE stage = ? AND key IN ({','.join('?' * len(part))})",
+                    [stage] + part
+                ).fetchall()
+                for row in rows:
+                    entries[row[1]] = ManifestEntry(*row)
+        return entries
+
+    def paths(self, stage: str, prefix: str = "") -> Dict[str, str]:
+        """列出 key 到檔案路徑的對應"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, path FROM files WHERE stage = ? AND path IS NOT NULL AND key >= ? AND key < ?",
+                (stage, prefix, prefix + "\U0010ffff")
+            ).fetchall()
+        return dict(rows)
+
+    def keys(self, stage: str, status: Optional[str] = None, prefix: str = "") -> List[str]:
+        """列出 key（可依狀態與前綴過濾）"""
+        sql = "SELECT key FROM files WHERE stage = ? AND key >= ? AND key < ?"
+        params: List = [stage, prefix, prefix + "\U0010ffff"]
+        if status is not None:
+            sql += " AND status = ?"
+            params.append(status)
+        with self._lock:
+            return [key for (key,) in self._conn.execute(sql + " ORDER BY key", params)]
+
+    def counts(self, stage: str, prefix: str = "") -> Dict[str, int]:
+        """各狀態的項目數"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*) FROM files WHERE stage = ? AND key >= ? AND key < ? GROUP BY status",
+                (stage, prefix, prefix + "\U0010ffff")
+            ).fetchall()
+        return dict(rows)
+
+    def errors(self, stage: str, prefix: str = "") -> List[Tuple[str, str]]:
+        """列出失敗項目：(key, 錯誤訊息)"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT key, error FROM files WHERE stage = ? AND status = ? AND key >= ? AND key < ? ORDER BY key",
+                (stage, STATUS_FAILED, prefix, prefix + "\U0010ffff")
+            ).fetchall()
+
+    def missing_keys(self, source_stage: str, target_stage: str) -> List[str]:
+        """來源 stage 有、目標 stage 沒有的 key"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT s.key FROM files s WHERE s.stage = ? AND NOT EXISTS "
+                "(SELECT 1 FROM files t WHERE t.stage = ? AND t.key = s.key) ORDER BY s.key",
+                (source_stage, target_stage)
+            ).fetchall()
+        return [key for (key,) in rows]
+
+    # ---- 檔案清冊 ----
+
+    def scan(self, stage: str, root: Union[str, Path], pattern: str = "*.json",
+             key_func: Optional[Callable[[str], str]] = None, subdir: Optional[str] = None,
+             recursive: bool = True, full: bool = False) -> Dict[str, int]:
+        """
+        同步目錄中的檔案到清單（檔案清冊類 stage，存在的檔案狀態為 done）
+
+        Args:
+            stage: stage 名稱
+            root: 根目錄，路徑與 key 以相對於此目錄的 POSIX 路徑表示
+            pattern: 以 fnmatch 比對相對路徑；chunk store 資料集目錄視為單一項目，
+                     以其取代的 JSON 檔名（目錄名加 .json）比對並產生 key
+            key_func: 由相對路徑產生 key，預設為相對路徑
+            subdir: 只掃描根目錄下的此子目錄
+            recursive: 是否掃描子目錄
+            full: 忽略目錄 mtime，並檢查每個檔案的大小與 mtime
+
+        Returns:
+            統計：added、modified、removed、unchanged、listed_dirs、skipped_dirs
+        """
+        root = Path(root)
+        stats = dict(added=0, modified=0, removed=0, unchanged=0, listed_dirs=0, skipped_dirs=0)
+        key_func = key_func or (lambda relative: relative)
+
+        def item_key(relative: str) -> str:
+            if (root / relative / _CHUNK_STORE_MANIFEST).is_file():
+                relative = f"{relative}.json"
+            return key_func(relative)
+
+        start_dir = subdir.strip("/") if subdir else ""
+        if not (root / start_dir).is_dir():
+            self._remove_directory(stage, start_dir, stats)
+            return stats
+
+        with self._lock:
+            known_dirs = {path: (mtime_ns, json.loads(subdirs)) for path, mtime_ns, subdirs in self._conn.execute(
+                "SELECT path, mtime_ns, subdirs FROM directories WHERE stage = ? AND (path = ? OR path >= ? AND path < ?)",
+                (stage, start_dir, start_dir + "/" if start_dir else "", (start_dir + "/" if start_dir else "") + "\U0010ffff")
+            )}
+
+        now = time.time()
+        stack = [start_dir]
+        while stack:
+            relative_dir = stack.pop()
+            directory = root / relative_dir if relative_dir else root
+            try:
+                mtime_ns = os.stat(directory).st_mtime_ns
+            except FileNotFoundError:
+                self._remove_directory(stage, relative_dir, stats)
+                continue
+
+            known = known_dirs.get(relative_dir)
+            if not full and known and known[0] == mtime_ns:
+                stats['skipped_dirs'] += 1
+                if recursive:
+                    stack.extend(known[1])
+                continue
+
+            stats['listed_dirs'] += 1
+            files: Dict[str, os.stat_result] = {}
+            subdirs: List[str] = []
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    relative = f"{relative_dir}/{entry.name}" if relative_dir else entry.name
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name.endswith(".tmp"):
+                            continue
+                        manifest = Path(entry.path) / _CHUNK_STORE_MANIFEST
+                        if not manifest.is_file():
+                            subdirs.append(relative)
+                        elif fnmatch.fnmatch(f"{relative}.json", pattern):
+                            files[relative] = manifest.stat()
+                    elif entry.is_file() and fnmatch.fnmatch(relative, pattern):
+                        files[relative] = entry.stat()
+            subdirs.sort()
+
+            self._sync_directory(stage, root, relative_dir, files, item_key, stats)
+            for removed in set(known[1] if known else []) - set(subdirs):
+                self._remove_directory(stage, removed, stats)
+
+            settled = now - mtime_ns / 1e9 >= _DIRECTORY_SETTLE_SECONDS
+            # 非遞迴掃描同樣記錄列出的子目錄，之後的遞迴掃描略過此目錄時仍會進入其子目錄
+            with self._transaction() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO directories (stage, path, mtime_ns, subdirs) VALUES (?, ?, ?, ?)",
+                    (stage, relative_dir, mtime_ns if settled else None, json.dumps(subdirs))
+                )
+            if recursive:
+                stack.extend(subdirs)
+
+        logger.info(f"掃描 {stage}: 新增 {stats['added']}、修改 {stats['modified']}、移除 {stats['removed']}、"
+                    f"列出 {stats['listed_dirs']} 個目錄、略過 {stats['skipped_dirs']} 個未變動目錄")
+        return stats
+
+    def _sync_directory(self, stage: str, root: Path, relative_dir: str, files: Dict[str, os.stat_result],
+                        key_func: Callable[[str], str], stats: Dict[str, int]) -> None:
+        """比對單一目錄的檔案與清單"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, path, content_hash, size, mtime_ns FROM files WHERE stage = ? AND directory = ?",
+                (stage, relative_dir)
+            ).fetchall()
+        known = {path: (key, content_hash, size, mtime_ns) for key, path, content_hash, size, mtime_ns in rows}
+
+        now = time.time()
+        upserts = []
+        touches = []
+        for relative, stat in files.items():
+            previous = known.get(relative)
+            if previous and previous[2] == stat.st_size and previous[3] == stat.st_mtime_ns:
+                stats['unchanged'] += 1
+                continue
+            try:
+                content_hash = file_hash(root / relative)
+            except OSError as e:
+                logger.warning(f"讀取檔案失敗 {relative}: {e}")
+                continue
+            if previous and previous[1] == content_hash:
+                touches.append((stat.st_size, stat.st_mtime_ns, stage, previous[0]))
+                stats['unchanged'] += 1
+                continue
+            stats['modified' if previous else 'added'] += 1
+            upserts.append((stage, key_func(relative), relative, relative_dir, STATUS_DONE, content_hash,
+                            stat.st_size, stat.st_mtime_ns, now, now))
+        removed = [(stage, key) for path, (key, _, _, _) in known.items() if path not in files]
+        stats['removed'] += len(removed)
+
+        if not (upserts or touches or removed):
+            return
+        with self._transaction() as conn:
+            conn.executemany(
+                "INSERT INTO files (stage, key, path, directory, status, content_hash, size, mtime_ns, "
+                "created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (stage, key) DO UPDATE SET path = excluded.path, directory = excluded.directory, "
+                "status = excluded.status, content_hash = excluded.content_hash, size = excluded.size, "
+                "mtime_ns = excluded.mtime_ns, error = NULL, updated_at = excluded.updated_at",
+                upserts
+            )
+            conn.executemany("UPDATE files SET size = ?, mtime_ns = ? WHERE stage = ? AND key = ?", touches)
+            conn.executemany("DELETE FROM files WHERE stage = ? AND key = ?", removed)
+
+    def _remove_directory(self, stage: str, relative_dir: str, stats: Dict[str, int]) -> None:
+        """目錄已不存在：移除其下所有檔案與目錄記錄"""
+        if relative_dir:
+            condition, params = "(directory = ? OR directory >= ? AND directory < ?)", \
+                [relative_dir, relative_dir + "/", relative_dir + "/\U0010ffff"]
+            dir_condition = "(path = ? OR path >= ? AND path < ?)"
+        else:
+            condition, params, dir_condition = "1", [], "1"
+        with self._transaction() as conn:
+            cursor = conn.execute(f"DELETE FROM files WHERE stage = ? AND directory IS NOT NULL AND {condition}",
+                                  [stage] + params)
+            stats['removed'] += cursor.rowcount
+            conn.execute(f"DELETE FROM directories WHERE stage = ? AND {dir_condition}", [stage] + params)
+
+    def record(self, stage: str, key: str, path: Union[str, Path], root: Union[str, Path, None] = None,
+               source_hash: Optional[str] = None) -> None:
+        """
+        寫入端產生檔案後直接記錄（計算雜湊，下次 scan 不需重新讀取）
+
+        Args:
+            stage: stage 名稱
+            key: 項目 key
+            path: 檔案路徑
+            root: 清冊根目錄，提供時路徑以相對路徑記錄（與 scan 一致）
+            source_hash: 產生此檔案的來源內容雜湊
+        """
+        self.mark_done(stage, [(key, path, source_hash)], root)
+
+    # ---- 工作項目 ----
+
+    def plan(self, source_stage: str, target_stage: str, prefix: str = "", full: bool = False) -> int:
+        """
+        依來源 stage 產生目標 stage 的待處理項目：目標沒有此 key，或目標記錄的來源雜湊與來源目前內容不同
+
+        同一組 (來源, 目標, 前綴) 只比對上次 plan 之後有變動的來源項目
+
+        Args:
+            source_stage: 來源 stage（檔案清冊）
+            target_stage: 目標 stage（工作項目）
+            prefix: 只處理此前綴的 key
+            full: 比對全部來源項目
+
+        Returns:
+            新增或重設為待處理的項目數
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT planned_at FROM plans WHERE source_stage = ? AND target_stage = ? AND prefix = ?",
+                (source_stage, target_stage, prefix)
+            ).fetchone()
+            since = row[0] - _PLAN_SLACK_SECONDS if row and not full else None
+            # 有水位線時以 updated_at 索引只讀取之後變動的來源項目
+            source_index, since_condition = ("INDEXED BY idx_files_updated", "AND s.updated_at >= ? ") \
+                if since is not None else ("", "")
+            cursor = conn.execute(
+                "INSERT INTO files (stage, key, status, source_path, source_hash, attempts, created_at, updated_at) "
+                f"SELECT ?, s.key, ?, s.path, s.content_hash, 0, ?, ? FROM files s {source_index} "
+                "LEFT JOIN files t ON t.stage = ? AND t.key = s.key "
+                f"WHERE s.stage = ? AND s.status = ? AND s.key >= ? AND s.key < ? {since_condition}"
+                "AND (t.key IS NULL OR t.source_hash IS NOT s.content_hash) "
+                "ON CONFLICT (stage, key) DO UPDATE SET status = excluded.status, source_path = excluded.source_path, "
+                "source_hash = excluded.source_hash, attempts = 0, error = NULL, worker = NULL, lease_until = NULL, "
+                "updated_at = excluded.updated_at",
+                (target_stage, STATUS_PENDING, now, now, target_stage, source_stage, STATUS_DONE,
+                 prefix, prefix + "\U0010ffff") + ((since,) if since is not None else ())
+            )
+            planned = cursor.rowcount
+            conn.execute(
+                "INSERT OR REPLACE INTO plans (source_stage, target_stage, prefix, planned_at) VALUES (?, ?, ?, ?)",
+                (source_stage, target_stage, prefix, now)
+            )
+        if planned:
+            logger.info(f"{source_stage} → {target_stage}: {planned} 個待處理項目")
+        return planned
+
+    def claim(self, stage: str, limit: int = 1, worker: Optional[str] = None, prefix: str = "",
+              lease_seconds: float = DEFAULT_LEASE_SECONDS, max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+              failed_before: Optional[float] = None) -> List[ManifestEntry]:
+        """
+        領取待處理項目（跨行程安全）：待處理、租期已過的執行中、以及嘗試次數未達上限的失敗項目
+
+        Args:
+            stage: stage 名稱
+            limit: 最多領取數量
+            worker: 工作者識別，預設為主機:行程:執行緒
+            prefix: 只領取此前綴的 key
+            lease_seconds: 租期秒數，逾時未完成的項目可被其他工作者重新領取
+            max_attempts: 最多嘗試次數
+            failed_before: 只重試在此時間之前失敗的項目，預設為現在
+
+        Returns:
+            領取的項目
+        """
+        worker = worker or default_worker_id()
+        now = time.time()
+        with self._transaction() as conn:
+            rows = conn.execute(
+                f"SELECT {_ENTRY_COLUMNS} FROM files WHERE stage = ? AND key >= ? AND key < ? AND ("
+                "status = ? OR (status = ? AND lease_until < ?) OR (status = ? AND attempts < ? AND updated_at < ?)"
+                ") ORDER BY key LIMIT ?",
+                (stage, prefix, prefix + "\U0010ffff", STATUS_PENDING, STATUS_RUNNING, now,
+                 STATUS_FAILED, max_attempts, now if failed_before is None else failed_before, limit)
+            ).fetchall()
+            conn.executemany(
+                "UPDATE files SET status = ?, worker = ?, lease_until = ?, attempts = attempts + 1, updated_at = ? "
+                "WHERE stage = ? AND key = ?",
+                [(STATUS_RUNNING, worker, now + lease_seconds, now, stage, row[1]) for row in rows]
+            )
+        entries = [ManifestEntry(*row) for row in rows]
+        for entry in entries:
+            entry.status = STATUS_RUNNING
+            entry.worker = worker
+            entry.attempts += 1
+        return entries
+
+    def iter_claims(self, stage: str, batch_size: int = 16, worker: Optional[str] = None, prefix: str = "",
+                    lease_seconds: float = DEFAULT_LEASE_SECONDS,
+                    max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> Iterator[ManifestEntry]:
+        """持續領取項目直到沒有可處理的項目（本次迭代中失敗的項目不會再被領取）"""
+        started = time.time()
+        while True:
+            entries = self.claim(stage, batch_size, worker, prefix, lease_seconds, max_attempts, started)
+            if not entries:
+                return
+            yield from entries
+
+    def mark_done(self, stage: str, entries: Iterable[Tuple[str, Union[str, Path, None], Optional[str]]],
+                  root: Union[str, Path, None] = None) -> None:
+        """
+        批次標記完成
+
+        Args:
+            stage: stage 名稱
+            entries: (key, 輸出檔案路徑或 None, 來源雜湊)；來源雜湊應為領取時的值，
+                     處理期間來源再次變動時下次 plan() 會重新排入
+            root: 輸出根目錄，提供時路徑以相對路徑記錄
+        """
+        now = time.time()
+        rows = []
+        for key, path, source_hash in entries:
+            stored_path, directory, content_hash, size, mtime_ns = None, None, None, None, None
+            if path is not None:
+                stat = os.stat(_content_path(path))
+                content_hash = file_hash(path)
+                size, mtime_ns = stat.st_size, stat.st_mtime_ns
+                stored_path = Path(path).relative_to(root).as_posix() if root is not None else str(path)
+                directory = stored_path.rpartition("/")[0] if root is not None else None
+            rows.append((stage, key, stored_path, directory, STATUS_DONE, content_hash, size, mtime_ns,
+                         source_hash, now, now))
+        with self._transaction() as conn:
+            conn.executemany(
+                "INSERT INTO files (stage, key, path, directory, status, content_hash, size, mtime_ns, source_hash, "
+                "created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (stage, key) DO UPDATE SET path = COALESCE(excluded.path, path), "
+                "directory = COALESCE(excluded.directory, directory), status = excluded.status, "
+                "content_hash = COALESCE(excluded.content_hash, content_hash), size = COALESCE(excluded.size, size), "
+                "mtime_ns = COALESCE(excluded.mtime_ns, mtime_ns), source_hash = excluded.source_hash, "
+                "error = NULL, worker = NULL, lease_until = NULL, updated_at = excluded.updated_at",
+                rows
+            )
+
+    def complete(self, entry: ManifestEntry, output_path: Union[str, Path, None] = None,
+                 root: Union[str, Path, None] = None) -> None:
+        """標記領取的項目完成"""
+        self.mark_done(entry.stage, [(entry.key, output_path, entry.source_hash)], root)
+
+    def fail(self, stage: str, key: str, error: str) -> None:
+        """標記項目失敗"""
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO files (stage, key, status, error, attempts, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, 1, ?, ?) "
+                "ON CONFLICT (stage, key) DO UPDATE SET status = excluded.status, error = excluded.error, "
+                "worker = NULL, lease_until = NULL, updated_at = excluded.updated_at",
+                (stage, key, STATUS_FAILED, str(error)[:2000], now, now)
+            )
+
+
+_manifests: Dict[str, StageManifest] = {}
+_manifest_lock = threading.Lock()
+
+
+def get_stage_manifest(path: Union[str, Path, None] = None, data_dir: Union[str, Path] = "data") -> StageManifest:
+    """
+    獲取共用清單（每個檔案一個連線）
+
+    Args:
+        path: SQLite 檔案路徑，None 表示 STAGE_MANIFEST_PATH
+        data_dir: 兩者皆未指定時使用 data_dir/stage_manifest.sqlite3
+    """
+    key = os.path.abspath(str(path or STAGE_MANIFEST_PATH or os.path.join(str(data_dir), MANIFEST_FILENAME)))
+    manifest = _manifests.get(key)
+    if manifest is None:
+        with _manifest_lock:
+            manifest = _manifests.get(key)
+            if manifest is None:
+                manifest = _manifests[key] = StageManifest(key)
+    return manifest
@@ -2,6 +2,9 @@
 """
 Stage 同步管理核心模組
 處理 stage3 到 stage4 的檔案同步，修復錯誤檔案
+
+檔案清單與驗證結果記錄在階段狀態清單（stage_manifest），重新執行時只列出有變動的目錄、
+只驗證內容變動過的 stage4 檔案
 """
 
 import os
@@ -12,6 +15,11 @@ import logging
 from typing import Dict, List, Tuple, Optional, Set
 from datetime import datetime
 
+from .chunk_store import is_chunk_store, read_records
+from .stage_manifest import (
+    StageManifest, get_stage_manifest, STAGE3_FILES, STAGE4_FILES, STAGE4_VALIDATION
+)
+
 logger = logging.getLogger(__name__)
 
 class StageSyncManager:
@@ -20,16 +28,18 @@ class StageSyncManager:
     處理 stage3 到 stage4 的檔案同步與錯誤修復
     """
     
-    def __init__(self, base_dir: Optional[Path] = None):
+    def __init__(self, base_dir: Optional[Path] = None, manifest: Optional[StageManifest] = None):
         """
         初始化 Stage 同步管理器
         
         Args:
             base_dir: 資料目錄路徑，預設為當前目錄的 data 資料夾
+            manifest: 階段狀態清單，預設為 base_dir 下的 stage_manifest.sqlite3
         """
         self.base_dir = base_dir or Path(__file__).parent.parent / "data"
         self.stage3_dir = self.base_dir / "stage3_tagging"
         self.stage4_dir = self.base_dir / "stage4_embedding_prep"
+        self.manifest = manifest or get_stage_manifest(data_dir=self.base_dir)
         
         # 統計資訊
         self.stats = {
@@ -48,13 +58,11 @@ class StageSyncManager:
         Returns:
             檔案名到路徑的映射
         """
-        stage3_files = {}
-        
-        for rss_dir in self.stage3_dir.iterdir():
-            if rss_dir.is_dir() and rss_dir.name.startswith('RSS_'):
-                for json_file in rss_dir.glob('*.json'):
-                    if json_file.name.endswith('.json'):
-                        stage3_files[json_file.name] = json_file
+        self.manifest.scan(STAGE3_FILES, self.stage3_dir, pattern='RSS_*/*.json',
+                           key_func=lambda relative: relative.rpartition('/')[2])
+        stage3_files = {
+            filename: self.stage3_dir / path for filename, path in self.manifest.paths(STAGE3_FILES).items()
+        }
         
         self.stats['stage3_files'] = len(stage3_files)
         logger.info(f"掃描到 {len(stage3_files)} 個 stage3 檔案")
@@ -67,17 +75,49 @@ class StageSyncManager:
         Returns:
             檔案名到路徑的映射（移除 _milvus 後綴）
         """
-        stage4_files = {}
-        
-        for json_file in self.stage4_dir.glob('*_milvus.json'):
-            # 移除 _milvus 後綴以匹配 stage3 檔案名
-            base_filename = json_file.name.replace('_milvus.json', '.json')
-            stage4_files[base_filename] = json_file
+        # 移除 _milvus 後綴以匹配 stage3 檔案名
+        self.manifest.scan(STAGE4_FILES, self.stage4_dir, pattern='*_milvus.json', recursive=False,
+                           key_func=lambda relative: relative.replace('_milvus.json', '.json'))
+        stage4_files = {
+            filename: self.stage4_dir / path for filename, path in self.manifest.paths(STAGE4_FILES).items()
+        }
         
         self.stats['stage4_files'] = len(stage4_files)
         logger.info(f"掃描到 {len(stage4_files)} 個 stage4 檔案")
         return stage4_files
     
+    def _copy_to_stage4(self, stage3_path: Path, filename: str, backup: bool = False) -> Path:
+        """
+        將 stage3 的檔案或 chunk store 資料集複製到 stage4（加上 _milvus 後綴）
+        
+        Args:
+            stage3_path: stage3 檔案或資料集目錄
+            filename: 清單中的檔案名（資料集為其取代的 JSON 檔名）
+            backup: stage4 已存在時是否先備份
+            
+        Returns:
+            stage4 路徑
+        """
+        stage4_filename = filename.replace('.json', '_milvus.json')
+        if is_chunk_store(stage3_path):
+            stage4_path = self.stage4_dir / Path(stage4_filename).stem
+            if stage4_path.exists():
+                if backup:
+                    shutil.copytree(stage4_path, stage4_path.with_name(stage4_path.name + '.backup'),
+                                    dirs_exist_ok=True)
+                    logger.info(f"備份原資料集: {stage4_path.name}")
+                shutil.rmtree(stage4_path)
+            shutil.copytree(stage3_path, stage4_path)
+        else:
+            stage4_path = self.stage4_dir / stage4_filename
+            if backup and stage4_path.exists():
+                backup_path = stage4_path.with_suffix('.milvus.json.backup')
+                shutil.copy2(stage4_path, backup_path)
+                logger.info(f"備份原檔案: {stage4_filename}")
+            shutil.copy2(stage3_path, stage4_path)
+        self.manifest.record(STAGE4_FILES, filename, stage4_path, root=self.stage4_dir)
+        return stage4_path
+    
     def find_missing_files(self) -> List[str]:
         """
         找出 stage3 中有但 stage4 中缺少的檔案
@@ -85,13 +125,10 @@ class StageSyncManager:
         Returns:
             缺少的檔案名列表
         """
-        stage3_files = self.scan_stage3_files()
-        stage4_files = self.scan_stage4_files()
+        self.scan_stage3_files()
+        self.scan_stage4_files()
         
-        missing_files = []
-        for filename in stage3_files.keys():
-            if filename not in stage4_files:
-                missing_files.append(filename)
+        missing_files = self.manifest.missing_keys(STAGE3_FILES, STAGE4_FILES)
         
         self.stats['missing_files'] = len(missing_files)
         logger.info(f"發現 {len(missing_files)} 個缺少的檔案")
@@ -115,16 +152,9 @@ class StageSyncManager:
         
         for filename in missing_files:
             try:
-                stage3_path = stage3_files[filename]
-                
-                # 建立 stage4 檔案名（加上 _milvus 後綴）
-                stage4_filename = filename.replace('.json', '_milvus.json')
-                stage4_path = self.stage4_dir / stage4_filename
+                stage4_path = self._copy_to_stage4(stage3_files[filename], filename)
                 
-                # 複製檔案
-                shutil.copy2(stage3_path, stage4_path)
-                
-                logger.info(f"同步檔案: {filename} -> {stage4_filename}")
+                logger.info(f"同步檔案: {filename} -> {stage4_path.name}")
                 success_count += 1
                 
             except Exception as e:
@@ -159,27 +189,15 @@ class StageSyncManager:
         
         logger.info(f"開始修復 {len(error_files_list)} 個錯誤檔案")
         
+        # 嘗試從 stage3 重新同步
+        stage3_files = self.scan_stage3_files()
+        
         success_count = 0
         for filename in error_files_list:
             try:
-                # 嘗試從 stage3 重新同步
-                stage3_files = self.scan_stage3_files()
-                
                 if filename in stage3_files:
-                    stage3_path = stage3_files[filename]
-                    
-                    # 建立 stage4 檔案名
-                    stage4_filename = filename.replace('.json', '_milvus.json')
-                    stage4_path = self.stage4_dir / stage4_filename
-                    
                     # 如果 stage4 檔案已存在，先備份
-                    if stage4_path.exists():
-                        backup_path = stage4_path.with_suffix('.milvus.json.backup')
-                        shutil.copy2(stage4_path, backup_path)
-                        logger.info(f"備份原檔案: {stage4_filename}")
-                    
-                    # 複製檔案
-                    shutil.copy2(stage3_path, stage4_path)
+                    self._copy_to_stage4(stage3_files[filename], filename, backup=True)
                     
                     logger.info(f"修復檔案: {filename}")
                     success_count += 1
@@ -207,39 +225,42 @@ class StageSyncManager:
         Returns:
             驗證結果，包含錯誤檔案列表
         """
-        stage3_files = self.scan_stage3_files()
+        self.scan_stage3_files()
         stage4_files = self.scan_stage4_files()
         
         validation_results = {
-            'missing_files': [],
+            'missing_files': self.manifest.missing_keys(STAGE3_FILES, STAGE4_FILES),
             'corrupted_files': [],
-            'extra_files': []
+            'extra_files': self.manifest.missing_keys(STAGE4_FILES, STAGE3_FILES)
         }
         
-        # 檢查缺少的檔案
-        for filename in stage3_files.keys():
-            if filename not in stage4_files:
-                validation_results['missing_files'].append(filename)
-        
-        # 檢查多餘的檔案
-        for filename in stage4_files.keys():
-            if filename not in stage3_files:
-                validation_results['extra_files'].append(filename)
-        
-        # 檢查檔案完整性
-        for filename, stage4_path in stage4_files.items():
+        # 檢查檔案完整性（只驗證新增或內容變動過的檔案，結果記錄在清單中）
+        self.manifest.plan(STAGE4_FILES, STAGE4_VALIDATION)
+        for entry in self.manifest.iter_claims(STAGE4_VALIDATION, batch_size=64, max_attempts=1):
             try:
-                with open(stage4_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
+                stage4_path = self.stage4_dir / entry.source_path
+                if is_chunk_store(stage4_path):
+                    # chunk store 的結構固定，只需確認描述檔與分片可讀取
+                    read_records(stage4_path, columns=['chunk_text'])
+                    valid = True
+                else:
+                    with open(stage4_path, 'r', encoding='utf-8') as f:
+                        data = json.load(f)
+                    valid = isinstance(data, dict) and 'chunks' in data
                 
                 # 檢查基本結構
-                if not isinstance(data, dict) or 'chunks' not in data:
-                    validation_results['corrupted_files'].append(filename)
+                if not valid:
+                    self.manifest.fail(STAGE4_VALIDATION, entry.key, '缺少 chunks 欄位')
+                else:
+                    self.manifest.complete(entry)
                     
             except Exception as e:
-                logger.error(f"驗證檔案失敗 {filename}: {e}")
-                validation_results['corrupted_files'].append(filename)
+                logger.error(f"驗證檔案失敗 {entry.key}: {e}")
+                self.manifest.fail(STAGE4_VALIDATION, entry.key, str(e))
         
+        validation_results['corrupted_files'] = [
+            filename for filename, _ in self.manifest.errors(STAGE4_VALIDATION) if filename in stage4_files
+        ]
         return validation_results
     
     def generate_sync_report(self) -> str:
@@ -0,0 +1,297 @@
+"""
+串流管線執行器
+以有界佇列串接各階段，文件從來源逐筆流經切塊、標籤、嵌入到寫入 Milvus，
+不需要在階段之間把整個語料庫載入記憶體或寫成中間檔案
+
+- 每個階段由一或多個工作執行緒處理，輸入佇列有上限，下游變慢時上游自動等待（背壓）
+- 階段可設定批次大小（例如嵌入與寫入），在 max_wait 內湊不滿批次時直接處理
+- 單筆或單批處理失敗只記錄錯誤並繼續
+- 每個階段記錄輸入/輸出數量、錯誤、忙碌時間、佇列深度與等待下游的時間，並定期輸出
+"""
+
+import os
+import time
+import queue
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE_SIZE = int(os.getenv("STREAM_QUEUE_SIZE", "64"))
+DEFAULT_REPORT_INTERVAL = float(os.getenv("STREAM_REPORT_INTERVAL", "10"))
+
+# 結束標記，由來源送出並逐階段往下游傳遞
+_END = object()
+
+
+@dataclass
+class StageMetrics:
+    """階段執行指標"""
+    name: str
+    workers: int
+    queue_size: int
+    items_in: int = 0
+    items_out: int = 0
+    errors: int = 0
+    batches: int = 0
+    busy_seconds: float = 0.0
+    blocked_seconds: float = 0.0  # 等待下游佇列空位的時間（背壓）
+    max_queue_depth: int = 0
+    queue_depth_sum: int = 0
+    queue_depth_samples: int = 0
+
+    def sample_queue(self, depth: int) -> None:
+        self.max_queue_depth = max(self.max_queue_depth, depth)
+        self.queue_depth_sum += depth
+        self.queue_depth_samples += 1
+
+    def snapshot(self, elapsed: float) -> Dict[str, Any]:
+        """輸出指標摘要"""
+        return {
+            "workers": self.workers,
+            "items_in": self.items_in,
+            "items_out": self.items_out,
+            "errors": self.errors,
+            "batches": self.batches,
+            "throughput_per_sec": self.items_in / elapsed if elapsed > 0 else 0.0,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "blocked_seconds": round(self.blocked_seconds, 3),
+            "queue_size": self.queue_size,
+            "max_queue_depth": self.max_queue_depth,
+            "avg_queue_depth": self.queue_depth_sum / self.queue_depth_samples if self.queue_depth_samples else 0.0
+        }
+
+
+class StreamStage:
+    """串流階段"""
+
+    def __init__(self,
+                 name: str,
+                 fn: Callable[[Any], Iterable[Any]],
+                 workers: int = 1,
+                 batch_size: int = 1,
+                 max_wait: float = 0.05,
+                 queue_size: int = DEFAULT_QUEUE_SIZE):
+        """
+        初始化串流階段
+
+        Args:
+            name: 階段名稱
+            fn: 處理函數，回傳零到多筆輸出；batch_size > 1 時輸入為一批項目的列表
+            workers: 工作執行緒數
+            batch_size: 批次大小
+            max_wait: 湊批次的最長等待時間（秒）
+            queue_size: 輸入佇列上限
+        """
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, workers)
+        self.batch_size = max(1, batch_size)
+        self.max_wait = max_wait
+        self.queue_size = max(1, queue_size)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        """重設指標與工作執行緒狀態（每次執行前呼叫）"""
+        self.metrics = StageMetrics(name=self.name, workers=self.workers, queue_size=self.queue_size)
+        self._finished_workers = 0
+
+    def _take_batch(self, inbox: queue.Queue) -> Tuple[List[Any], bool]:
+        """從輸入佇列取出一批項目，回傳 (項目, 是否收到結束標記)"""
+        item = inbox.get()
+        depth = inbox.qsize()
+        if item is _END:
+            return [], True
+        batch = [item]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = inbox.get(timeout=remaining) if remaining > 0 else inbox.get_nowait()
+            except queue.Empty:
+                break
+            if item is _END:
+                with self._lock:
+                    self.metrics.sample_queue(depth)
+                return batch, True
+            batch.append(item)
+        with self._lock:
+            self.metrics.sample_queue(depth)
+        return batch, False
+
+    def _work(self, inbox: queue.Queue, outbox: Optional[queue.Queue]) -> None:
+        """工作執行緒主迴圈"""
+        while True:
+            batch, ended = self._take_batch(inbox)
+            if batch:
+                self._process(batch, outbox)
+            if ended:
+                break
+
+        # 讓同階段其他工作執行緒也看到結束標記；最後一個結束的工作執行緒通知下游
+        inbox.put(_END)
+        with self._lock:
+            self._finished_workers += 1
+            last = self._finished_workers == self.workers
+        if last and outbox is not None:
+            outbox.put(_END)
+
+    def _process(self, batch: List[Any], outbox: Optional[queue.Queue]) -> None:
+        start = time.perf_counter()
+        outputs: List[Any] = []
+        failed = 0
+        try:
+            if self.batch_size > 1:
+                outputs = list(self.fn(batch))
+            else:
+                outputs = list(self.fn(batch[0]))
+        except Exception as e:
+            failed = len(batch)
+            logger.error(f"串流階段 {self.name} 處理失敗（{len(batch)} 筆）: {e}")
+        busy = time.perf_counter() - start
+
+        blocked = 0.0
+        if outbox is not None:
+            for output in outputs:
+                put_start = time.perf_counter()
+                outbox.put(output)
+                blocked += time.perf_counter() - put_start
+
+        with self._lock:
+            self.metrics.items_in += len(batch)
+            self.metrics.items_out += len(outputs)
+            self.metrics.errors += failed
+            self.metrics.batches += 1
+            self.metrics.busy_seconds += busy
+            self.metrics.blocked_seconds += blocked
+
+
+class StreamingPipeline:
+    """串流管線"""
+
+    def __init__(self,
+                 source: Iterable[Any],
+                 stages: List[StreamStage],
+                 report_interval: float = DEFAULT_REPORT_INTERVAL,
+                 name: str = "串流管線"):
+        """
+        初始化串流管線
+
+        Args:
+            source: 來源迭代器（例如 MongoDB cursor 的生成器），逐筆讀取
+            stages: 依序串接的階段，最後一個階段的輸出會被丟棄（通常是寫入端）
+            report_interval: 定期輸出指標的間隔（秒），0 表示不輸出
+            name: 日誌名稱
+        """
+        if not stages:
+            raise ValueError("串流管線至少需要一個階段")
+        self.source = source
+        self.stages = stages
+        self.report_interval = report_interval
+        self.name = name
+        self.source_items = 0
+        self.source_errors = 0
+        self.source_blocked_seconds = 0.0
+        self._stop = threading.Event()
+        self._started_at = 0.0
+        self._finished_at = 0.0
+
+    def stop(self) -> None:
+        """停止讀取來源；已讀入的項目會繼續流完"""
+        self._stop.set()
+
+    def _feed(self, outbox: queue.Queue) -> None:
+        """來源執行緒：逐筆放入第一個階段的佇列"""
+        try:
+            for item in self.source:
+                if self._stop.is_set():
+                    break
+                put_start = time.perf_counter()
+                outbox.put(item)
+                self.source_blocked_seconds += time.perf_counter() - put_start
+                self.source_items += 1
+        except Exception as e:
+            self.source_errors += 1
+            logger.error(f"{self.name} 來源讀取失敗: {e}")
+        finally:
+            outbox.put(_END)
+
+    def run(self) -> Dict[str, Any]:
+        """
+        執行管線直到來源耗盡且所有項目處理完畢
+
+        Returns:
+            Dict[str, Any]: 執行摘要（見 get_metrics）
+        """
+        self._started_at = time.monotonic()
+        self._finished_at = 0.0
+        self.source_items = 0
+        self.source_errors = 0
+        self.source_blocked_seconds = 0.0
+        queues = [queue.Queue(maxsize=stage.queue_size) for stage in self.stages]
+        for stage in self.stages:
+            stage.reset()
+
+        threads = [threading.Thread(target=self._feed, args=(queues[0],), name=f"{self.name}-source", daemon=True)]
+        for index, stage in enumerate(self.stages):
+            outbox = queues[index + 1] if index + 1 < len(queues) else None
+            for worker in range(stage.workers):
+                threads.append(threading.Thread(
+                    target=stage._work, args=(queues[index], outbox),
+                    name=f"{self.name}-{stage.name}-{worker}", daemon=True
+                ))
+
+        done = threading.Event()
+        reporter = None
+        if self.report_interval > 0:
+            reporter = threading.Thread(target=self._report_loop, args=(done, queues), daemon=True)
+            reporter.start()
+
+        logger.info(f"🚀 {self.name} 開始：{' → '.join(stage.name for stage in self.stages)}")
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self._finished_at = time.monotonic()
+        done.set()
+        if reporter is not None:
+            reporter.join()
+
+        summary = self.get_metrics()
+        logger.info(f"🎉 {self.name} 完成：來源 {self.source_items} 筆，耗時 {summary['elapsed_seconds']:.2f}s")
+        self._log_metrics(queues=None)
+        return summary
+
+    def _report_loop(self, done: threading.Event, queues: List[queue.Queue]) -> None:
+        while not done.wait(self.report_interval):
+            self._log_metrics(queues)
+
+    def _log_metrics(self, queues: Optional[List[queue.Queue]]) -> None:
+        elapsed = self._elapsed()
+        for index, stage in enumerate(self.stages):
+            snapshot = stage.metrics.snapshot(elapsed)
+            depth = f"{queues[index].qsize()}/{stage.queue_size}" if queues else f"峰值 {snapshot['max_queue_depth']}"
+            logger.info(
+                f"📊 {stage.name}: 輸入 {snapshot['items_in']} 輸出 {snapshot['items_out']} "
+                f"錯誤 {snapshot['errors']} 速率 {snapshot['throughput_per_sec']:.1f}/s "
+                f"佇列 {depth} 等待下游 {snapshot['blocked_seconds']:.1f}s"
+            )
+
+    def _elapsed(self) -> float:
+        if not self._started_at:
+            return 0.0
+        return (self._finished_at or time.monotonic()) - self._started_at
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """獲取各階段吞吐量與佇列深度指標"""
+        elapsed = self._elapsed()
+        return {
+            "elapsed_seconds": elapsed,
+            "source_items": self.source_items,
+            "source_errors": self.source_errors,
+            "source_blocked_seconds": round(self.source_blocked_seconds, 3),
+            "stages": {stage.name: stage.metrics.snapshot(elapsed) for stage in self.stages}
+        }
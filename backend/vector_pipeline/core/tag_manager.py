@@ -6,12 +6,20 @@
 
 import logging
 import json
+import os
 import re
+import sys
 from typing import List, Dict, Any, Optional, Set
 from pathlib import Path
 from dataclasses import dataclass
 from abc import ABC, abstractmethod
 
+backend_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if backend_root not in sys.path:
+    sys.path.insert(0, backend_root)
+
+from utils.keyword_matcher import KeywordMatcher
+
 # 嘗試導入相關模組
 try:
     from rag_pipeline.utils.tag_processor import TagProcessor
@@ -197,6 +205,9 @@ class FallbackTagExtractor(BaseTagExtractor):
     def __init__(self):
         """初始化備援提取器"""
         self.keyword_patterns = self._load_keyword_patterns()
+        self.matcher = KeywordMatcher(
+            (keyword, category) for category, keywords in self.keyword_patterns.items() for keyword in keywords
+        )
     
     def _load_keyword_patterns(self) -> Dict[str, List[str]]:
         """載入關鍵字模式"""
@@ -218,15 +229,9 @@ class FallbackTagExtractor(BaseTagExtractor):
         try:
             # 合併標題和內容
             full_text = f"{title} {text}" if title else text
-            full_text_lower = full_text.lower()
             
-            # 基於關鍵字匹配
-            matched_tags = []
-            for category, keywords in self.keyword_patterns.items():
-                for keyword in keywords:
-                    if keyword.lower() in full_text_lower:
-                        matched_tags.append(category)
-                        break  # 每個類別只取一個標籤
+            # 基於關鍵字匹配，每個類別只取一個標籤
+            matched_tags = list(dict.fromkeys(self.matcher.find_payloads(full_text)))
             
             # 限制為最多3個標籤
             tags = matched_tags[:3]
@@ -18,6 +18,11 @@ from dataclasses import dataclass
 
 # 添加路徑以便匯入模組
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'rag_pipeline', 'scripts'))
+backend_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if backend_root not in sys.path:
+    sys.path.insert(0, backend_root)
+
+from utils.keyword_matcher import KeywordMatcher
 
 logger = logging.getLogger(__name__)
 
@@ -51,6 +56,7 @@ class MoneyDJWikiExtractor(BaseTagExtractor):
     
     def __init__(self):
         self.wiki_terms = set()
+        self.matcher = KeywordMatcher()
         self._load_moneydj_terms()
     
     def _load_moneydj_terms(self) -> Set[str]:
@@ -274,6 +280,7 @@ class MoneyDJWikiExtractor(BaseTagExtractor):
             
             for term in all_terms:
                 self.wiki_terms.add(term)
+            self.matcher = KeywordMatcher(self.wiki_terms)
             
             logger.info(f"成功載入 {len(self.wiki_terms)} 個 MoneyDJ 百科專業名詞")
             return self.wiki_terms
@@ -289,12 +296,7 @@ class MoneyDJWikiExtractor(BaseTagExtractor):
         if not self.wiki_terms:
             self._load_moneydj_terms()
         
-        extracted_tags = []
-        text_lower = text.lower()
-        
-        for term in self.wiki_terms:
-            if term.lower() in text_lower:
-                extracted_tags.append(term)
+        extracted_tags = self.matcher.find_keywords(text)
         
         processing_time = time.time() - start_time
         
@@ -377,6 +379,9 @@ class FallbackTagExtractor(BaseTagExtractor):
     
     def __init__(self):
         self.keyword_patterns = self._load_keyword_patterns()
+        self.matcher = KeywordMatcher(
+            (keyword, topic) for topic, keywords in self.keyword_patterns.items() for keyword in keywords
+        )
     
     def _load_keyword_patterns(self) -> Dict[str, List[str]]:
         """載入關鍵詞模式"""
@@ -405,14 +410,8 @@ class FallbackTagExtractor(BaseTagExtractor):
             )
         
         text_lower = text.lower()
-        matched_tags = []
-        
-        # 檢查每個主題的關鍵詞
-        for topic, keywords in self.keyword_patterns.items():
-            for keyword in keywords:
-                if keyword in text_lower:
-                    matched_tags.append(topic)
-                    break  # 每個主題只取一個標籤
+        # 每個主題只取一個標籤
+        matched_tags = list(dict.fromkeys(self.matcher.find_payloads(text)))
         
         # 如果沒有匹配到任何標籤，使用通用標籤
         if not matched_tags:
@@ -1,14 +1,49 @@
 """
 文本切分處理器
 負責將長文本切分成適當大小的 chunks
+
+- 以嵌入模型 tokenizer 的 token 數控制大小（CHUNK_MAX_TOKENS，預設 512），
+  同時不超過 max_chunk_size 個字元（Milvus chunk_text 欄位上限 1024）
+- 先依中英文句末標點（。！？；… 與後接的引號括號）與換行切成句子，整份文件的句子一次批次計數 token
+- 依位置區間貪婪打包，每個 chunk 只從原文切一次；重疊以往回退幾個句子實現，不複製已產生的文字，
+  整體耗時與文本長度成線性
+- 超過上限的單一句子依逗號、頓號再切，仍過長時依字元切段
+- tokenizer 與切分器可跨文件共用，split_many() 可一次批次計數多份文件
 """
 
+import os
+import re
+import sys
 import logging
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Optional, Sequence, Tuple
 from dataclasses import dataclass
 
+# 添加後端根目錄到 Python 路徑
+backend_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if backend_root not in sys.path:
+    sys.path.insert(0, backend_root)
+
+from utils.token_counter import TokenCounter, get_token_counter
+
 logger = logging.getLogger(__name__)
 
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "512"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "50"))
+# 切塊使用嵌入模型的 tokenizer（只讀本機檔案，無法載入時以字元規則估算）
+CHUNK_TOKENIZER_PATH = os.getenv("CHUNK_TOKENIZER_PATH", "")
+CHUNK_TOKENIZER_MODEL = os.getenv("CHUNK_TOKENIZER_MODEL", "BAAI/bge-m3")
+
+# 句子：到句末標點（含後接的引號括號）、英文句點後接空白，或換行為止
+_SENTENCE_PATTERN = re.compile(
+    r"[^\n]*?(?:(?:[。！？!?；;…]+|\.(?=\s|$))[」』”’\"'）)]*|\n+|$)"
+)
+# 過長句子再依逗號、頓號、冒號切
+_CLAUSE_PATTERN = re.compile(r"[^，,、：:]*[，,、：:]+|[^，,、：:]+")
+# 段落分隔：空白行
+_PARAGRAPH_SEPARATOR = re.compile(r"\n\s*\n")
+
+Span = Tuple[int, int]
+
 
 @dataclass
 class TextChunk:
@@ -18,207 +53,276 @@ class TextChunk:
     chunk_text: str
     chunk_length: int
     source_document_id: str
+    token_count: int = 0
+    start_offset: int = 0
+    end_offset: int = 0
+
+
+def _strip_span(text: str, start: int, end: int) -> Optional[Span]:
+    """去掉區間頭尾空白，全為空白時回傳 None"""
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return (start, end) if start < end else None
+
+
+def _sentence_spans(text: str, start: int = 0, end: Optional[int] = None) -> List[Span]:
+    """切出句子區間"""
+    spans = []
+    for match in _SENTENCE_PATTERN.finditer(text, start, len(text) if end is None else end):
+        span = _strip_span(text, match.start(), match.end())
+        if span:
+            spans.append(span)
+    return spans
+
+
+def _line_spans(text: str) -> List[Span]:
+    """切出行區間"""
+    spans = []
+    position = 0
+    for line in text.split('\n'):
+        span = _strip_span(text, position, position + len(line))
+        if span:
+            spans.append(span)
+        position += len(line) + 1
+    return spans
+
+
+def _paragraph_spans(text: str) -> List[Span]:
+    """切出段落區間"""
+    spans = []
+    position = 0
+    for separator in _PARAGRAPH_SEPARATOR.finditer(text):
+        span = _strip_span(text, position, separator.start())
+        if span:
+            spans.append(span)
+        position = separator.end()
+    span = _strip_span(text, position, len(text))
+    if span:
+        spans.append(span)
+    return spans
 
 
 class TextChunker:
     """文本切分處理器"""
-    
-    def __init__(self, max_chunk_size: int = 1024, overlap_size: int = 100):
+
+    def __init__(self, max_chunk_size: int = 1024, overlap_size: int = 100,
+                 max_tokens: int = CHUNK_MAX_TOKENS, overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+                 token_counter: Optional[TokenCounter] = None):
         """
         初始化文本切分器
-        
+
         Args:
-            max_chunk_size: 最大分塊大小
-            overlap_size: 重疊大小
+            max_chunk_size: 最大分塊字元數
+            overlap_size: 最大重疊字元數
+            max_tokens: 最大分塊 token 數
+            overlap_tokens: 最大重疊 token 數
+            token_counter: Token 計數器，預設為 CHUNK_TOKENIZER_* 指定 tokenizer 的共用實例
         """
-        self.max_chunk_size = max_chunk_size
-        self.overlap_size = overlap_size
-        
+        self.max_chunk_size = max(1, max_chunk_size)
+        self.overlap_size = max(0, overlap_size)
+        self.max_tokens = max(1, max_tokens)
+        self.overlap_tokens = max(0, min(overlap_tokens, self.max_tokens - 1))
+        self.token_counter = token_counter or get_token_counter(CHUNK_TOKENIZER_PATH, CHUNK_TOKENIZER_MODEL)
+
+    def _fits(self, span: Span, tokens: int) -> bool:
+        return tokens <= self.max_tokens and span[1] - span[0] <= self.max_chunk_size
+
+    def _count_spans(self, texts: Sequence[str], spans: Sequence[Span]) -> List[int]:
+        """批次計算多個區間的 token 數（可跨文件）"""
+        return self.token_counter.count_batch([text[start:end] for text, (start, end) in zip(texts, spans)])
+
+    def _split_oversized(self, text: str, span: Span, tokens: int) -> Tuple[List[Span], List[int]]:
+        """將超過上限的句子切成符合上限的片段"""
+        pieces: List[Span] = []
+        counts: List[int] = []
+        clauses = [clause for clause in (_strip_span(text, match.start(), match.end())
+                                         for match in _CLAUSE_PATTERN.finditer(text, span[0], span[1])) if clause]
+        if len(clauses) > 1:
+            pending = list(zip(clauses, self._count_spans([text] * len(clauses), clauses)))
+        else:
+            pending = [(span, tokens)]
+
+        while pending:
+            piece, piece_tokens = pending.pop(0)
+            if self._fits(piece, piece_tokens):
+                pieces.append(piece)
+                counts.append(piece_tokens)
+                continue
+            # 依目前片段的 token 密度估算字元數，切成等長段後重新計數
+            length = piece[1] - piece[0]
+            window = int(length * self.max_tokens / max(piece_tokens, 1) * 0.9)
+            window = max(1, min(window, self.max_chunk_size, length - 1))
+            windows = [(start, min(start + window, piece[1])) for start in range(piece[0], piece[1], window)]
+            pending = list(zip(windows, self._count_spans([text] * len(windows), windows))) + pending
+        return pieces, counts
+
+    def _units(self, text: str, spans: List[Span], counts: List[int]) -> Tuple[List[Span], List[int]]:
+        """確保每個單位都不超過上限"""
+        if all(self._fits(span, tokens) for span, tokens in zip(spans, counts)):
+            return spans, counts
+        unit_spans: List[Span] = []
+        unit_counts: List[int] = []
+        for span, tokens in zip(spans, counts):
+            if self._fits(span, tokens):
+                unit_spans.append(span)
+                unit_counts.append(tokens)
+            else:
+                pieces, piece_counts = self._split_oversized(text, span, tokens)
+                unit_spans.extend(pieces)
+                unit_counts.extend(piece_counts)
+        return unit_spans, unit_counts
+
+    def _pack(self, text: str, spans: List[Span], counts: List[int], document_id: str) -> List[TextChunk]:
+        """依位置區間貪婪打包成 chunks，重疊以往回退句子實現"""
+        spans, counts = self._units(text, spans, counts)
+        chunks: List[TextChunk] = []
+        start = 0
+        while start < len(spans):
+            end = start
+            tokens = 0
+            while end < len(spans) and (end == start or (
+                    tokens + counts[end] <= self.max_tokens
+                    and spans[end][1] - spans[start][0] <= self.max_chunk_size)):
+                tokens += counts[end]
+                end += 1
+
+            chunk_start, chunk_end = spans[start][0], spans[end - 1][1]
+            chunk_text = text[chunk_start:chunk_end]
+            chunks.append(TextChunk(
+                chunk_id=f"{document_id}_{len(chunks)}",
+                chunk_index=len(chunks),
+                chunk_text=chunk_text,
+                chunk_length=len(chunk_text),
+                source_document_id=document_id,
+                token_count=tokens,
+                start_offset=chunk_start,
+                end_offset=chunk_end
+            ))
+            if end >= len(spans):
+                break
+
+            # 下一個 chunk 從結尾往回數、不超過重疊上限的句子開始（至少前進一個句子）
+            next_start = end
+            overlap = 0
+            while next_start - 1 > start and overlap + counts[next_start - 1] <= self.overlap_tokens \
+                    and chunk_end - spans[next_start - 1][0] <= self.overlap_size:
+                next_start -= 1
+                overlap += counts[next_start]
+            start = next_start
+        return chunks
+
+    def _split(self, text: str, spans: List[Span], document_id: str) -> List[TextChunk]:
+        return self._pack(text, spans, self._count_spans([text] * len(spans), spans), document_id)
+
     def split_text_into_chunks(self, text: str, document_id: str) -> List[TextChunk]:
         """
-        將文本分割成塊 (以空白或換行切分)
-        
+        將文本分割成塊（依句末標點與換行切句後打包）
+
         Args:
             text: 要切分的文本
             document_id: 來源文檔 ID
-            
+
         Returns:
             文本塊列表
         """
         if not text:
             return []
-            
-        # 先按換行符分割
-        lines = text.split('\n')
-        chunks = []
-        current_chunk = ""
-        chunk_index = 0
-        
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-                
-            # 如果當前行加上現有chunk超過最大長度，且當前chunk不為空，則保存當前chunk
-            if len(current_chunk) + len(line) > self.max_chunk_size and current_chunk:
-                # 建立 TextChunk 物件
-                chunk = TextChunk(
-                    chunk_id=f"{document_id}_{chunk_index}",
-                    chunk_index=chunk_index,
-                    chunk_text=current_chunk.strip(),
-                    chunk_length=len(current_chunk.strip()),
-                    source_document_id=document_id
-                )
-                chunks.append(chunk)
-                chunk_index += 1
-                
-                # 開始新的 chunk，保留部分重疊內容
-                if self.overlap_size > 0 and len(current_chunk) > self.overlap_size:
-                    current_chunk = current_chunk[-self.overlap_size:] + " " + line
-                else:
-                    current_chunk = line
-            else:
-                if current_chunk:
-                    current_chunk += " " + line
-                else:
-                    current_chunk = line
-                    
-        # 處理最後一個chunk
-        if current_chunk:
-            chunk = TextChunk(
-                chunk_id=f"{document_id}_{chunk_index}",
-                chunk_index=chunk_index,
-                chunk_text=current_chunk.strip(),
-                chunk_length=len(current_chunk.strip()),
-                source_document_id=document_id
-            )
-            chunks.append(chunk)
-            
-        logger.info(f"文本切斷成 {len(chunks)} 個 chunks")
+        chunks = self._split(text, _sentence_spans(text), document_id)
+        logger.debug(f"文本切斷成 {len(chunks)} 個 chunks")
         return chunks
-    
-    def split_text_by_sentences(self, text: str, document_id: str) -> List[TextChunk]:
+
+    def split_many(self, documents: Sequence[Tuple[str, str]]) -> List[List[TextChunk]]:
         """
-        按句子切分文本
-        
+        批次切分多份文件（所有句子一次計數 token）
+
+        Args:
+            documents: (文本, 來源文檔 ID) 列表
+
+        Returns:
+            每份文件的文本塊列表
+        """
+        document_spans = [_sentence_spans(text) if text else [] for text, _ in documents]
+        texts = [text for (text, _), spans in zip(documents, document_spans) for _ in spans]
+        all_counts = self._count_spans(texts, [span for spans in document_spans for span in spans])
+
+        results = []
+        offset = 0
+        for (text, document_id), spans in zip(documents, document_spans):
+            counts = all_counts[offset:offset + len(spans)]
+            offset += len(spans)
+            results.append(self._pack(text, spans, counts, document_id) if spans else [])
+        return results
+
+    def iter_chunks(self, documents: Sequence[Tuple[str, str]], batch_size: int = 32) -> Iterator[List[TextChunk]]:
+        """每 batch_size 份文件批次切分一次，依序產生每份文件的文本塊列表"""
+        for start in range(0, len(documents), batch_size):
+            yield from self.split_many(documents[start:start + batch_size])
+
+    def split_text_by_lines(self, text: str, document_id: str) -> List[TextChunk]:
+        """
+        按行切分文本（單行過長時再依標點切）
+
         Args:
             text: 要切分的文本
             document_id: 來源文檔 ID
-            
+
         Returns:
             文本塊列表
         """
         if not text:
             return []
-            
-        # 簡單的句子分割（按句號、問號、驚嘆號）
-        import re
-        sentences = re.split(r'[。！？.!?]', text)
-        chunks = []
-        current_chunk = ""
-        chunk_index = 0
-        
-        for sentence in sentences:
-            sentence = sentence.strip()
-            if not sentence:
-                continue
-                
-            # 如果當前句子加上現有chunk超過最大長度，且當前chunk不為空，則保存當前chunk
-            if len(current_chunk) + len(sentence) > self.max_chunk_size and current_chunk:
-                chunk = TextChunk(
-                    chunk_id=f"{document_id}_{chunk_index}",
-                    chunk_index=chunk_index,
-                    chunk_text=current_chunk.strip(),
-                    chunk_length=len(current_chunk.strip()),
-                    source_document_id=document_id
-                )
-                chunks.append(chunk)
-                chunk_index += 1
-                current_chunk = sentence
-            else:
-                if current_chunk:
-                    current_chunk += " " + sentence
-                else:
-                    current_chunk = sentence
-                    
-        # 處理最後一個chunk
-        if current_chunk:
-            chunk = TextChunk(
-                chunk_id=f"{document_id}_{chunk_index}",
-                chunk_index=chunk_index,
-                chunk_text=current_chunk.strip(),
-                chunk_length=len(current_chunk.strip()),
-                source_document_id=document_id
-            )
-            chunks.append(chunk)
-            
-        logger.info(f"文本按句子切斷成 {len(chunks)} 個 chunks")
-        return chunks
-    
+        return self._split(text, _line_spans(text), document_id)
+
+    def split_text_by_sentences(self, text: str, document_id: str) -> List[TextChunk]:
+        """
+        按句子切分文本
+
+        Args:
+            text: 要切分的文本
+            document_id: 來源文檔 ID
+
+        Returns:
+            文本塊列表
+        """
+        return self.split_text_into_chunks(text, document_id)
+
     def split_text_by_paragraphs(self, text: str, document_id: str) -> List[TextChunk]:
         """
-        按段落切分文本
-        
+        按段落切分文本（段落過長時再依句子切）
+
         Args:
             text: 要切分的文本
             document_id: 來源文檔 ID
-            
+
         Returns:
             文本塊列表
         """
         if not text:
             return []
-            
-        # 按雙換行符分割段落
-        paragraphs = text.split('\n\n')
-        chunks = []
-        current_chunk = ""
-        chunk_index = 0
-        
-        for paragraph in paragraphs:
-            paragraph = paragraph.strip()
-            if not paragraph:
-                continue
-                
-            # 如果當前段落加上現有chunk超過最大長度，且當前chunk不為空，則保存當前chunk
-            if len(current_chunk) + len(paragraph) > self.max_chunk_size and current_chunk:
-                chunk = TextChunk(
-                    chunk_id=f"{document_id}_{chunk_index}",
-                    chunk_index=chunk_index,
-                    chunk_text=current_chunk.strip(),
-                    chunk_length=len(current_chunk.strip()),
-                    source_document_id=document_id
-                )
-                chunks.append(chunk)
-                chunk_index += 1
-                current_chunk = paragraph
+        spans: List[Span] = []
+        counts: List[int] = []
+        paragraphs = _paragraph_spans(text)
+        for paragraph, tokens in zip(paragraphs, self._count_spans([text] * len(paragraphs), paragraphs)):
+            if self._fits(paragraph, tokens):
+                spans.append(paragraph)
+                counts.append(tokens)
             else:
-                if current_chunk:
-                    current_chunk += "\n\n" + paragraph
-                else:
-                    current_chunk = paragraph
-                    
-        # 處理最後一個chunk
-        if current_chunk:
-            chunk = TextChunk(
-                chunk_id=f"{document_id}_{chunk_index}",
-                chunk_index=chunk_index,
-                chunk_text=current_chunk.strip(),
-                chunk_length=len(current_chunk.strip()),
-                source_document_id=document_id
-            )
-            chunks.append(chunk)
-            
-        logger.info(f"文本按段落切斷成 {len(chunks)} 個 chunks")
+                sentences = _sentence_spans(text, *paragraph)
+                spans.extend(sentences)
+                counts.extend(self._count_spans([text] * len(sentences), sentences))
+        chunks = self._pack(text, spans, counts, document_id)
+        logger.debug(f"文本按段落切斷成 {len(chunks)} 個 chunks")
         return chunks
-    
+
     def get_chunk_statistics(self, chunks: List[TextChunk]) -> Dict[str, Any]:
         """
         獲取切分統計資訊
-        
+
         Args:
             chunks: 文本塊列表
-            
+
         Returns:
             統計資訊字典
         """
@@ -228,16 +332,21 @@ class TextChunker:
                 'avg_chunk_length': 0,
                 'min_chunk_length': 0,
                 'max_chunk_length': 0,
-                'total_text_length': 0
+                'total_text_length': 0,
+                'avg_token_count': 0,
+                'max_token_count': 0
             }
-            
+
         lengths = [chunk.chunk_length for chunk in chunks]
         total_length = sum(lengths)
-        
+        token_counts = [chunk.token_count for chunk in chunks]
+
         return {
             'total_chunks': len(chunks),
             'avg_chunk_length': total_length / len(chunks),
             'min_chunk_length': min(lengths),
             'max_chunk_length': max(lengths),
-            'total_text_length': total_length
-        } 
\ No newline at end of file
+            'total_text_length': total_length,
+            'avg_token_count': sum(token_counts) / len(chunks),
+            'max_token_count': max(token_counts)
+        }
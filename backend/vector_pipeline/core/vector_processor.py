@@ -3,12 +3,21 @@
 負責生成文本嵌入向量
 """
 
+import os
+import sys
 import logging
 from typing import List, Optional, Dict, Any
 import numpy as np
-from sentence_transformers import SentenceTransformer
 from sklearn.metrics.pairwise import cosine_similarity
 
+# 添加後端根目錄到 Python 路徑以使用共用嵌入模型註冊表
+backend_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if backend_root not in sys.path:
+    sys.path.insert(0, backend_root)
+
+from utils.embedding_registry import get_shared_encoder
+from utils.bulk_embedder import get_bulk_embedder
+
 logger = logging.getLogger(__name__)
 
 
@@ -25,14 +34,16 @@ class VectorProcessor:
         """
         self.embedding_model = embedding_model
         self.device = device
-        self.model: Optional[SentenceTransformer] = None
+        self.model: Optional[Any] = None
         
     def load_model(self) -> None:
         """載入嵌入模型"""
         if self.model is None:
             try:
                 logger.info(f"載入嵌入模型: {self.embedding_model}")
-                self.model = SentenceTransformer(self.embedding_model, device=self.device)
+                self.model = get_shared_encoder(self.embedding_model, self.device).model
+                if self.model is None:
+                    raise RuntimeError(f"共用嵌入模型不可用: {self.embedding_model}")
                 logger.info("嵌入模型載入成功")
             except Exception as e:
                 logger.error(f"載入嵌入模型失敗: {e}")
@@ -141,33 +152,26 @@ class VectorProcessor:
     def batch_generate_embeddings(self, texts: List[str], batch_size: int = 32,
                                  normalize: bool = True) -> np.ndarray:
         """
-        批次生成嵌入向量
+        批次生成嵌入向量（大量灌庫用）
+        
+        由共用大量嵌入執行器處理：依 token 長度分批、CPU 上以多個工作程序平行編碼，
+        回傳順序與輸入相同。工作程序數等參數見 utils/bulk_embedder.py 的 BULK_EMBED_* 環境變數。
+        文本未變動的 chunk 直接由磁碟嵌入快取讀回（utils/embedding_cache.py，EMBEDDING_CACHE_* 環境變數）。
         
         Args:
             texts: 文本列表
-            batch_size: 批次大小
+            batch_size: 每批最多筆數
             normalize: 是否正規化
             
         Returns:
             嵌入向量陣列
         """
-        self.load_model()
-        
-        if self.model is None:
-            raise RuntimeError("模型未正確載入")
-        
-        all_embeddings = []
-        total_batches = (len(texts) + batch_size - 1) // batch_size
-        
-        for i in range(0, len(texts), batch_size):
-            batch_texts = texts[i:i + batch_size]
-            batch_embeddings = self.generate_embeddings(
-                batch_texts, 
-                normalize=normalize, 
-                show_progress_bar=False
-            )
-            all_embeddings.append(batch_embeddings)
-            
-            logger.info(f"處理批次 {len(all_embeddings)}/{total_batches}")
-        
-        return np.vstack(all_embeddings) 
\ No newline at end of file
+        embedder = get_bulk_embedder(self.embedding_model, self.device)
+        embeddings = embedder.encode(texts, normalize=normalize, max_batch_size=batch_size)
+        stats = embedder.get_stats()
+        cache_info = ""
+        if stats['cache'] is not None:
+            cache_info = f"，快取命中率 {stats['cache']['hit_rate']:.0%}（累計編碼 {stats['encoded']}/{stats['items']} 筆）"
+        logger.info(f"生成 {len(embeddings)} 個嵌入向量（{stats['workers']} 個工作程序，"
+                    f"padding 效率 {stats['padding_efficiency']:.0%}，{stats['items_per_sec']:.1f} 筆/秒{cache_info}）")
+        return embeddings
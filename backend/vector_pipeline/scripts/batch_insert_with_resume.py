@@ -8,13 +8,17 @@
 import sys
 import os
 import json
-import glob
 import time
 from typing import List, Dict, Any, Set
 from pymilvus import connections, Collection
 import logging
 from tqdm import tqdm
 
+# 添加 vector_pipeline 目錄到 Python 路徑
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.chunk_store import list_stage_sources, read_records
+
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
@@ -60,16 +64,13 @@ class BatchMilvusInserter:
         logger.info("成功連接並載入 Milvus collection")
 
     def find_json_files(self) -> List[str]:
-        pattern = os.path.join(self.base_path, "**/*.json")
-        files = [f for f in glob.glob(pattern, recursive=True) if not f.endswith('.backup')]
-        logger.info(f"找到 {len(files)} 個 JSON 檔案於 {self.base_path}")
+        files = [str(path) for path in list_stage_sources(self.base_path, recursive=True)]
+        logger.info(f"找到 {len(files)} 個 JSON 檔案 / chunk store 資料集於 {self.base_path}")
         return files
 
     def load_json_file(self, file_path: str) -> List[Dict[str, Any]]:
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            return data if isinstance(data, list) else []
+            return read_records(file_path)
         except Exception as e:
             logger.error(f"載入檔案失敗 {file_path}: {e}")
             return []
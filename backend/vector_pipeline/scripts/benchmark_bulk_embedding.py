@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+大量嵌入基準測試
+
+以長度差異很大的合成 chunk 比較四種編碼方式的吞吐量（chunks/sec）：
+- 逐筆編碼（原 BGE_M3_Embedding.generate_embedding 迴圈）
+- 依輸入順序固定 32 筆一批（原 VectorProcessor.batch_generate_embeddings）
+- utils/bulk_embedder.py 依長度分批、本程序編碼
+- utils/bulk_embedder.py 依長度分批、多個工作程序編碼
+
+並驗證各方式的向量相同且順序與輸入一致。預設使用確定性的 stub 模型（計算量與 padding 長度成正比）；
+安裝 sentence-transformers 後可用 --model BAAI/bge-m3 測真實模型。
+
+用法:
+    python scripts/benchmark_bulk_embedding.py --chunks 2000
+    python scripts/benchmark_bulk_embedding.py --model BAAI/bge-m3 --chunks 1000 --workers 4
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+from typing import List
+
+import numpy as np
+
+# 添加後端根目錄到 Python 路徑
+backend_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if backend_root not in sys.path:
+    sys.path.insert(0, backend_root)
+
+from utils.bulk_embedder import STUB_MODEL, BulkEmbedder, _load_encoder
+
+SENTENCE = "今天我們來聊聊投資理財的基本觀念，以及新手最常犯的錯誤。"
+
+
+def build_texts(count: int, seed: int = 5) -> List[str]:
+    """長度差異很大的 chunk：多數短句，少數接近切塊上限"""
+    rng = random.Random(seed)
+    texts = []
+    for i in range(count):
+        repeat = rng.choice([1, 1, 2, 3, 5, 8, 20, 35])
+        texts.append(f"[{i}] " + SENTENCE * repeat)
+    return texts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="大量嵌入基準測試")
+    parser.add_argument("--model", default=STUB_MODEL)
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=0, help="工作程序數，0 表示依 CPU 核心數自動決定")
+    parser.add_argument("--threads-per-worker", type=int, default=1)
+    parser.add_argument("--skip-single", action="store_true", help="跳過逐筆編碼（真實模型時很慢）")
+    args = parser.parse_args()
+
+    texts = build_texts(args.chunks)
+    encoder = _load_encoder(args.model, "cpu")
+    encoder.encode(texts[:4], normalize_embeddings=True, batch_size=4)  # 預熱
+    results = {}
+
+    if not args.skip_single:
+        start = time.perf_counter()
+        single = np.stack([encoder.encode([text], normalize_embeddings=True, batch_size=1)[0] for text in texts])
+        results["逐筆編碼"] = (time.perf_counter() - start, single)
+
+    start = time.perf_counter()
+    naive = np.vstack([
+        encoder.encode(texts[i:i + args.batch_size], normalize_embeddings=True, batch_size=args.batch_size)
+        for i in range(0, len(texts), args.batch_size)
+    ])
+    results["固定批次"] = (time.perf_counter() - start, naive)
+
+    local = BulkEmbedder(model_path=args.model, device="cpu", workers=1, max_batch_size=args.batch_size,
+                         use_cache=False)
+    start = time.perf_counter()
+    bucketed = local.encode(texts)
+    results["長度分批"] = (time.perf_counter() - start, bucketed)
+
+    with BulkEmbedder(model_path=args.model, device="cpu", workers=args.workers,
+                      threads_per_worker=args.threads_per_worker, max_batch_size=args.batch_size,
+                      use_cache=False) as embedder:
+        embedder.encode(texts[:embedder.workers * 4])  # 啟動工作程序並載入模型
+        start = time.perf_counter()
+        streamed = []
+        for window in embedder.encode_iter(texts):
+            streamed.append(window)
+        results[f"長度分批 ×{embedder.workers} 程序"] = (time.perf_counter() - start, np.vstack(streamed))
+        workers = embedder.workers
+
+    stats = local.get_stats()
+    lengths = local._count_tokens(texts)
+    naive_padded = sum(len(lengths[i:i + args.batch_size]) * max(lengths[i:i + args.batch_size])
+                       for i in range(0, len(lengths), args.batch_size))
+    print(f"模型={args.model}  chunks={len(texts)}  CPU={os.cpu_count()}  工作程序={workers}  "
+          f"padding 效率: 固定批次 {sum(lengths) / naive_padded:.0%} → 長度分批 {stats['padding_efficiency']:.0%}")
+    baseline = results["固定批次"][0]
+    for name, (elapsed, _) in results.items():
+        print(f"  {name:<14s} {elapsed:8.2f}s  {len(texts) / elapsed:9.1f} chunks/s  ({baseline / elapsed:4.1f}x)")
+
+    for name, (_, vectors) in results.items():
+        assert vectors.shape == naive.shape, f"{name} 向量數量不一致"
+        assert np.allclose(vectors, naive, atol=1e-4), f"{name} 向量或順序與輸入不一致"
+    assert results["長度分批"][0] < baseline, "長度分批未比固定批次快"
+    print("✅ 驗證通過")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Chunk store 基準測試
+
+以合成的 stage4 chunk（含 1024 維 embedding）比較 JSON (indent=2) 與 chunk store：
+- 寫入耗時與磁碟大小
+- 完整載入（所有欄位，embedding 轉為 list）耗時
+- 只讀取 embedding 矩陣（mmap）與只讀取 metadata 欄位的耗時
+- 驗證讀回的 metadata 與 embedding（float32）完全相同
+
+用法:
+    python scripts/benchmark_chunk_store.py --chunks 5000 --dim 1024
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+
+# 添加 vector_pipeline 目錄到 Python 路徑
+pipeline_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if pipeline_root not in sys.path:
+    sys.path.insert(0, pipeline_root)
+
+from core.chunk_store import ChunkStore, read_records, write_chunk_store
+
+CATEGORIES = ["商業", "教育"]
+
+
+def build_chunks(count: int, dim: int, seed: int = 11) -> List[Dict[str, Any]]:
+    """合成 stage4 chunk，欄位與 Stage4EmbeddingPrepProcessor / Milvus schema 相同"""
+    rng = random.Random(seed)
+    vectors = np.random.default_rng(seed).standard_normal((count, dim)).astype(np.float32)
+    chunks = []
+    for i in range(count):
+        chunks.append({
+            "chunk_id": f"chunk_{i:08d}",
+            "chunk_index": i % 40,
+            "episode_id": 1000 + i // 40,
+            "podcast_id": 1321 + i % 3,
+            "podcast_name": f"節目 {i % 3}",
+            "author": "主持人",
+            "category": CATEGORIES[i % 2],
+            "episode_title": f"第 {i // 40} 集：投資理財與職涯規劃",
+            "duration": "00:45:00",
+            "published_date": "2024-01-01",
+            "apple_rating": rng.randint(1, 5),
+            "chunk_text": "今天我們來聊聊投資理財的基本觀念，以及新手最常犯的錯誤。" * rng.randint(3, 8),
+            "embedding": vectors[i].tolist(),
+            "language": "zh-TW",
+            "created_at": "2024-01-01T00:00:00",
+            "source_model": "bge-m3",
+            "tags": json.dumps(["投資", "理財"], ensure_ascii=False)
+        })
+    return chunks
+
+
+def dir_size(path: Path) -> int:
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Chunk store 基準測試")
+    parser.add_argument("--chunks", type=int, default=5000)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--file-chunks", type=int, default=40, help="每個 JSON 檔案的 chunk 數（一集一檔）")
+    parser.add_argument("--shard-rows", type=int, default=4096)
+    args = parser.parse_args()
+
+    chunks = build_chunks(args.chunks, args.dim)
+    with tempfile.TemporaryDirectory() as tmp:
+        json_dir = Path(tmp) / "json"
+        store_dir = Path(tmp) / "store"
+        json_dir.mkdir()
+
+        def write_json():
+            for start in range(0, len(chunks), args.file_chunks):
+                with open(json_dir / f"episode_{start:08d}.json", "w", encoding="utf-8") as f:
+                    json.dump(chunks[start:start + args.file_chunks], f, ensure_ascii=False, indent=2)
+
+        json_write, _ = timed(write_json)
+        store_write, _ = timed(lambda: write_chunk_store(store_dir, chunks, shard_rows=args.shard_rows))
+
+        json_load, json_records = timed(lambda: [
+            record for path in sorted(json_dir.glob("*.json")) for record in read_records(path)
+        ])
+        store_load, store_records = timed(lambda: read_records(store_dir))
+
+        def store_embeddings():
+            store = ChunkStore(store_dir)
+            return np.concatenate([store.embeddings(i) for i in range(len(store.shards))])
+
+        json_vectors_time, json_vectors = timed(
+            lambda: np.asarray([record["embedding"] for path in sorted(json_dir.glob("*.json"))
+                                for record in read_records(path)], dtype=np.float32))
+        store_vectors_time, store_vectors = timed(store_embeddings)
+        metadata_time, metadata = timed(lambda: read_records(store_dir, columns=["chunk_id", "chunk_text"]))
+
+        json_bytes = dir_size(json_dir)
+        store_bytes = dir_size(store_dir)
+
+        print(f"chunks={args.chunks}  dim={args.dim}")
+        print(f"{'':12s}{'JSON':>12s}{'chunk store':>14s}")
+        print(f"{'磁碟大小':10s}{json_bytes / 1024 / 1024:10.1f}MB{store_bytes / 1024 / 1024:12.1f}MB")
+        print(f"{'寫入':12s}{json_write:11.2f}s{store_write:13.2f}s")
+        print(f"{'完整載入':10s}{json_load:11.2f}s{store_load:13.2f}s")
+        print(f"{'只讀向量':10s}{json_vectors_time:11.2f}s{store_vectors_time:13.2f}s")
+        print(f"{'只讀 metadata':9s}{'-':>12s}{metadata_time:13.2f}s")
+
+        assert len(store_records) == len(json_records) == args.chunks
+        for expected, actual in zip(json_records, store_records):
+            assert {k: v for k, v in expected.items() if k != "embedding"} == \
+                   {k: v for k, v in actual.items() if k != "embedding"}, "metadata 不一致"
+        assert np.array_equal(json_vectors, store_vectors), "embedding 不一致"
+        assert [record["chunk_id"] for record in metadata] == [record["chunk_id"] for record in json_records]
+        assert store_bytes < json_bytes and store_load < json_load and store_vectors_time < json_vectors_time
+        print("✅ 驗證通過")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+嵌入快取基準測試
+
+以同一批合成 chunk 連續灌庫兩次，比較未使用快取、首次（冷快取）與重新灌庫（熱快取）的耗時與模型前向次數，
+並驗證：
+- 重新灌庫時 100% 命中，模型前向次數為 0，向量與直接編碼完全相同
+- 只改動少數 chunk 時僅重新編碼改動的部分（空白差異不視為改動）
+- 快取項目數不超過上限
+
+預設使用確定性的 stub 模型；快取檔案寫在暫存目錄，不影響共用快取。
+
+用法:
+    python scripts/benchmark_embedding_cache.py --chunks 3000
+    python scripts/benchmark_embedding_cache.py --model BAAI/bge-m3 --chunks 500
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+import numpy as np
+
+# 添加後端根目錄到 Python 路徑
+backend_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if backend_root not in sys.path:
+    sys.path.insert(0, backend_root)
+
+from utils.bulk_embedder import STUB_MODEL, BulkEmbedder
+from utils.embedding_cache import EmbeddingCache
+
+SENTENCE = "今天我們來聊聊投資理財的基本觀念，以及新手最常犯的錯誤。"
+
+
+def build_texts(count: int, seed: int = 7):
+    rng = random.Random(seed)
+    return [f"[{i}] " + SENTENCE * rng.choice([1, 2, 3, 5, 8]) for i in range(count)]
+
+
+def run(model: str, texts, cache=None, use_cache: bool = True):
+    embedder = BulkEmbedder(model_path=model, device="cpu", workers=1, cache=cache, use_cache=use_cache)
+    start = time.perf_counter()
+    vectors = embedder.encode(texts)
+    return time.perf_counter() - start, vectors, embedder.get_stats()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="嵌入快取基準測試")
+    parser.add_argument("--model", default=STUB_MODEL)
+    parser.add_argument("--chunks", type=int, default=3000)
+    parser.add_argument("--changed", type=float, default=0.05, help="第三次灌庫時改動的 chunk 比例")
+    args = parser.parse_args()
+
+    texts = build_texts(args.chunks)
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = EmbeddingCache(os.path.join(tmp, "embeddings.sqlite3"), max_entries=args.chunks * 2)
+
+        baseline_time, baseline, _ = run(args.model, texts, use_cache=False)
+        cold_time, cold, cold_stats = run(args.model, texts, cache)
+        warm_time, warm, warm_stats = run(args.model, texts, cache)
+
+        # 少數 chunk 內容改動，另有一部分只多了空白
+        rng = random.Random(11)
+        edited = list(texts)
+        changed = set(rng.sample(range(len(texts)), int(len(texts) * args.changed)))
+        for i in changed:
+            edited[i] = texts[i] + "（更新）"
+        for i in rng.sample(sorted(set(range(len(texts))) - changed), len(changed)):
+            edited[i] = "  " + texts[i].replace(" ", "   ") + "\n"
+        _, _, partial_stats = run(args.model, edited, cache)
+
+        print(f"模型={args.model}  chunks={len(texts)}")
+        print(f"  未使用快取   {baseline_time:8.2f}s")
+        print(f"  首次灌庫     {cold_time:8.2f}s  編碼 {cold_stats['encoded']} 筆 / {cold_stats['batches']} 次前向")
+        print(f"  重新灌庫     {warm_time:8.2f}s  編碼 {warm_stats['encoded']} 筆 / {warm_stats['batches']} 次前向"
+              f"  ({baseline_time / max(warm_time, 1e-9):.1f}x)")
+        print(f"  改動 {len(changed)} 筆  編碼 {partial_stats['encoded']} 筆 / {partial_stats['batches']} 次前向")
+
+        assert np.array_equal(cold, baseline), "首次灌庫的向量與直接編碼不一致"
+        assert np.array_equal(warm, baseline), "快取讀回的向量與直接編碼不一致"
+        assert warm_stats["encoded"] == 0 and warm_stats["batches"] == 0, "重新灌庫仍有模型前向"
+        assert partial_stats["encoded"] == len(changed), "只應重新編碼內容改動的 chunk"
+
+        # 淘汰：上限設為語料的一半
+        small = EmbeddingCache(os.path.join(tmp, "small.sqlite3"), max_entries=args.chunks // 2)
+        run(args.model, texts, small)
+        small_stats = small.get_stats()
+        print(f"  上限 {small.max_entries} 筆: 剩餘 {small_stats['entries']} 筆，淘汰 {small_stats['evictions']} 筆")
+        assert small_stats["entries"] <= small.max_entries, "快取項目數超過上限"
+
+        stats = cache.get_stats()
+        print(f"  快取命中率 {stats['hit_rate']:.0%}（命中 {stats['hits']}，未命中 {stats['misses']}），"
+              f"檔案 {os.path.getsize(cache.path) / 1e6:.1f}MB")
+        cache.close()
+        small.close()
+    print("✅ 驗證通過")
+
+
+if __name__ == "__main__":
+    main()
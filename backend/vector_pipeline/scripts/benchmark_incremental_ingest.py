@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+增量灌庫基準測試
+
+以記憶體中的合成 MongoDB collection 與本機 Milvus Lite 驗證 IncrementalIngestor：
+1. 首次灌庫（全部文件）
+2. 新增 50 份、修改 20 份、只更新時間戳 10 份後增量灌庫：只嵌入變動文件的 chunk，耗時與變動量成正比
+3. 再修改 20 份並在刪除舊 chunk 時模擬當機，重新執行後結果正確
+4. 刪除 5 份文件後以 full_scan 灌庫，移除其 chunk
+5. 新增 10 份、其中 5 份切塊失敗：水位線仍前進，下次執行只依 _id 重試這 5 份，修正後寫入
+
+每一步都驗證 Milvus 中的 chunk_id 與目前文件內容應產生的 chunk_id 完全相同（沒有殘留或缺漏）。
+切塊與嵌入以合成函數代替（每個 chunk 以 --embed-ms 模擬模型耗時），需安裝 milvus-lite。
+
+用法:
+    python scripts/benchmark_incremental_ingest.py
+    python scripts/benchmark_incremental_ingest.py --docs 5000 --embed-ms 5
+"""
+
+import os
+import sys
+import time
+import random
+import hashlib
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Set
+
+import numpy as np
+
+# 添加 vector_pipeline 目錄到 Python 路徑
+pipeline_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if pipeline_root not in sys.path:
+    sys.path.insert(0, pipeline_root)
+
+from core.incremental_ingest import IncrementalIngestor, IngestStateStore, document_hash, make_chunk_id
+from core.milvus_writer import MilvusWriter
+
+CHUNK_CHARS = 500
+SOURCE_COLLECTION = "RSS_benchmark"
+
+
+class InMemoryCollection:
+    """記憶體中的 collection，只支援增量灌庫用到的查詢（{}、$gt、$in、$or）"""
+
+    def __init__(self):
+        self.docs: Dict[int, Dict[str, Any]] = {}
+
+    def _match(self, doc: Dict[str, Any], query: Dict[str, Any]) -> bool:
+        if '$or' in query:
+            return any(self._match(doc, condition) for condition in query['$or'])
+        for field, condition in query.items():
+            value = doc.get(field)
+            if '$in' in condition:
+                if value not in condition['$in']:
+                    return False
+            elif value is None or not value > condition['$gt']:
+                return False
+        return True
+
+    def find(self, query: Dict[str, Any], projection: Dict[str, int], batch_size: int = 100) -> Iterator[Dict]:
+        for doc_id in sorted(self.docs):
+            doc = self.docs[doc_id]
+            if self._match(doc, query):
+                yield {key: value for key, value in doc.items() if key == '_id' or key in projection}
+
+
+class InMemoryDatabase(dict):
+    def list_collection_names(self) -> List[str]:
+        return list(self)
+
+
+class Workload:
+    """合成文件、切塊與嵌入"""
+
+    def __init__(self, dim: int, embed_ms: float, seed: int = 5):
+        self.dim = dim
+        self.embed_ms = embed_ms
+        self.rng = random.Random(seed)
+        self.clock = datetime(2025, 1, 1)
+        self.next_id = 1
+        self.embedded = 0
+        self.reject: Set[int] = set()
+
+    def now(self) -> datetime:
+        self.clock += timedelta(seconds=1)
+        return self.clock
+
+    def text(self) -> str:
+        return "".join(chr(0x4E00 + self.rng.randrange(3000)) for _ in range(self.rng.randint(2000, 4000)))
+
+    def add_documents(self, collection: InMemoryCollection, count: int) -> None:
+        for _ in range(count):
+            collection.docs[self.next_id] = {'_id': self.next_id, 'text': self.text(),
+                                             'file': f"episode_{self.next_id}.mp3", 'updated_at': self.now()}
+            self.next_id += 1
+
+    def chunk_document(self, doc: Dict[str, Any], source_collection: str) -> List[Dict[str, Any]]:
+        if doc['_id'] in self.reject:
+            raise ValueError("模擬無法寫入的文件")
+        text = doc.get('text', '')
+        return [{'episode_id': doc['_id'], 'chunk_index': index, 'content': text[start:start + CHUNK_CHARS],
+                 'tags': [], 'original_filename': doc.get('file', ''), 'collection_name': source_collection}
+                for index, start in enumerate(range(0, len(text), CHUNK_CHARS))]
+
+    def embed_chunks(self, chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        time.sleep(self.embed_ms * len(chunks) / 1000)
+        self.embedded += len(chunks)
+        records = []
+        for chunk in chunks:
+            seed = int.from_bytes(hashlib.sha256(chunk['content'].encode("utf-8")).digest()[:4], "little")
+            vector = np.random.default_rng(seed).standard_normal(self.dim).astype(np.float32)
+            records.append({'chunk_id': chunk['chunk_id'], 'chunk_index': chunk['chunk_index'],
+                            'episode_id': chunk['episode_id'], 'chunk_text': chunk['content'][:1024],
+                            'embedding': (vector / np.linalg.norm(vector)).tolist(), 'tags': "[]"})
+        return records
+
+
+def expected_chunk_ids(collection: InMemoryCollection, workload: Workload) -> Set[str]:
+    ids = set()
+    for doc in collection.docs.values():
+        if doc['_id'] in workload.reject:
+            continue
+        content_hash = document_hash(doc)
+        for chunk in workload.chunk_document(doc, SOURCE_COLLECTION):
+            ids.add(make_chunk_id(str(doc['_id']), content_hash, chunk['chunk_index']))
+    return ids
+
+
+def milvus_chunk_ids(writer: MilvusWriter, collection_name: str) -> Set[str]:
+    writer.load_collection(collection_name)
+    return {chunk_id for page in writer.iter_chunk_ids(collection_name) for chunk_id in page}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="增量灌庫基準測試")
+    parser.add_argument("--docs", type=int, default=1000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--embed-ms", type=float, default=2.0, help="每個 chunk 模擬的嵌入耗時（毫秒）")
+    parser.add_argument("--group-size", type=int, default=32)
+    args = parser.parse_args()
+
+    workload = Workload(args.dim, args.embed_ms)
+    source = InMemoryCollection()
+    db = InMemoryDatabase({SOURCE_COLLECTION: source})
+    workload.add_documents(source, args.docs)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        writer = MilvusWriter({'uri': os.path.join(tmp, "milvus_incremental.db"),
+                               'index_type': "FLAT", 'metric_type': "COSINE"})
+        writer.connect()
+        collection_name = "benchmark_incremental"
+        writer.create_collection(collection_name, args.dim)
+        state = IngestStateStore(os.path.join(tmp, "incremental_state.sqlite3"))
+
+        def ingest(full_scan: bool = False) -> Dict[str, Any]:
+            ingestor = IncrementalIngestor(db, state, writer, collection_name, workload.chunk_document,
+                                           workload.embed_chunks, group_size=args.group_size)
+            embedded = workload.embedded
+            result = ingestor.run(full_scan=full_scan)
+            result['embedded'] = workload.embedded - embedded
+            return result
+
+        def verify(step: str) -> None:
+            expected = expected_chunk_ids(source, workload)
+            actual = milvus_chunk_ids(writer, collection_name)
+            assert actual == expected, f"{step}: Milvus 殘留 {len(actual - expected)}、缺少 {len(expected - actual)} 個 chunk"
+
+        steps = []
+        result = ingest()
+        verify("首次灌庫")
+        steps.append(("首次灌庫", result))
+
+        doc_ids = list(source.docs)
+        workload.add_documents(source, 50)
+        for doc_id in random.Random(1).sample(doc_ids, 30):
+            source.docs[doc_id]['updated_at'] = workload.now()
+        for doc_id in random.Random(1).sample(doc_ids, 30)[:20]:
+            source.docs[doc_id]['text'] = workload.text()
+        result = ingest()
+        verify("增量灌庫")
+        steps.append(("新增 50 / 修改 20 / 只更新時間戳 10", result))
+
+        for doc_id in random.Random(2).sample(doc_ids, 20):
+            source.docs[doc_id].update(text=workload.text(), updated_at=workload.now())
+        delete_chunk_ids = writer.delete_chunk_ids
+
+        def crash(*_args, **_kwargs):
+            raise RuntimeError("模擬當機")
+
+        writer.delete_chunk_ids = crash
+        crashed = ingest()
+        writer.delete_chunk_ids = delete_chunk_ids
+        assert crashed['errors'] == 1
+        result = ingest()
+        verify("當機後重新執行")
+        steps.append(("修改 20（當機後重新執行）", result))
+
+        for doc_id in random.Random(3).sample(doc_ids, 5):
+            del source.docs[doc_id]
+        result = ingest(full_scan=True)
+        verify("full_scan")
+        steps.append(("刪除 5（full_scan）", result))
+
+        new_ids = range(workload.next_id, workload.next_id + 10)
+        workload.add_documents(source, 10)
+        workload.reject = set(new_ids[:5])
+        result = ingest()
+        assert result['new'] == 5 and result['rejected'] == 5
+        assert state.get_watermark(SOURCE_COLLECTION)[0] == new_ids[-1], "拒絕的文件擋住水位線"
+        verify("拒絕文件")
+        steps.append(("新增 10（拒絕 5）", result))
+        result = ingest()
+        assert result['retried'] == 5 and result['rejected'] == 5 and result['scanned'] == 0
+        steps.append(("重試（仍拒絕）", result))
+        workload.reject = set()
+        result = ingest()
+        assert result['retried'] == 5 and result['new'] == 5 and result['scanned'] == 0
+        assert not state.list_rejected(SOURCE_COLLECTION)
+        verify("重試拒絕文件")
+        steps.append(("重試（修正後寫入）", result))
+
+        state.close()
+        writer.drop_collection(collection_name)
+        writer.close()
+
+    print(f"docs={args.docs}  dim={args.dim}  模擬嵌入 {args.embed_ms:g}ms/chunk")
+    for name, result in steps:
+        print(f"  {name:<28s} {result['elapsed_seconds']:7.2f}s  掃描 {result['scanned']:5d}  "
+              f"新增 {result['new']:4d}  修改 {result['modified']:3d}  刪除 {result['deleted']:2d}  "
+              f"未變動 {result['unchanged']:3d}  嵌入 {result['embedded']:6d}  "
+              f"寫入 {result['chunks_inserted']:6d}  刪除 chunk {result['chunks_deleted']:4d}  "
+              f"回復 {result['recovered']}  拒絕 {result['rejected']}  重試 {result['retried']}")
+    print("✅ 驗證通過")
+
+
+if __name__ == "__main__":
+    main()
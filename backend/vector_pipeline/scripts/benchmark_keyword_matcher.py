@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+多關鍵字比對基準測試
+
+以合成的中文 chunk 與標籤詞庫比較兩種貼標方式的吞吐量（chunks/sec）：
+- 原做法：對每個 chunk 逐一檢查詞庫中每個關鍵字（`keyword.lower() in text.lower()`）
+- 目前做法：詞庫編譯成 KeywordMatcher 自動機，每個 chunk 掃描一次
+
+逐一檢查的成本與詞庫大小成正比，預設只量測前 --naive-sample 個 chunk 再推估全量耗時，
+並驗證兩種做法在這些 chunk 上的比對結果完全相同。
+
+用法:
+    python scripts/benchmark_keyword_matcher.py
+    python scripts/benchmark_keyword_matcher.py --chunks 100000 --terms 50000 --naive-sample 200
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+from typing import List, Tuple
+
+# 添加後端根目錄到 Python 路徑
+backend_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if backend_root not in sys.path:
+    sys.path.insert(0, backend_root)
+
+from utils.keyword_matcher import KeywordMatcher
+
+# 常用漢字區段與少量英數字，模擬中英夾雜的逐字稿
+CJK_CHARS = [chr(code) for code in range(0x4E00, 0x4E00 + 3000)]
+LATIN_WORDS = ["AI", "ETF", "ESG", "GDP", "CEO", "SaaS", "IPO", "API", "5G", "EV"]
+
+
+def build_vocabulary(count: int, seed: int = 7) -> List[Tuple[str, str]]:
+    """合成 (關鍵字, 標籤) 詞庫，每個標籤約有 5 個同義詞"""
+    rng = random.Random(seed)
+    terms = dict.fromkeys(LATIN_WORDS)
+    while len(terms) < count:
+        terms["".join(rng.choice(CJK_CHARS) for _ in range(rng.randint(2, 4)))] = None
+    return [(term, f"標籤{i // 5}") for i, term in enumerate(terms)]
+
+
+def build_chunks(count: int, vocabulary: List[Tuple[str, str]], seed: int = 11) -> List[str]:
+    """合成 chunk：隨機漢字中夾雜數個詞庫關鍵字"""
+    rng = random.Random(seed)
+    chunks = []
+    for _ in range(count):
+        parts = []
+        length = 0
+        target = rng.randint(200, 400)
+        while length < target:
+            if rng.random() < 0.05:
+                part = rng.choice(vocabulary)[0]
+                part = part.lower() if rng.random() < 0.5 else part
+            else:
+                part = "".join(rng.choice(CJK_CHARS) for _ in range(rng.randint(5, 20))) + "，"
+            parts.append(part)
+            length += len(part)
+        chunks.append("".join(parts))
+    return chunks
+
+
+def naive_search(vocabulary: List[Tuple[str, str]], text: str) -> List[Tuple[str, str]]:
+    """原做法：逐一檢查每個關鍵字"""
+    text_lower = text.lower()
+    return [(keyword, tag) for keyword, tag in vocabulary if keyword.lower() in text_lower]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="多關鍵字比對基準測試")
+    parser.add_argument("--chunks", type=int, default=100000)
+    parser.add_argument("--terms", type=int, default=50000)
+    parser.add_argument("--naive-sample", type=int, default=200, help="逐一檢查做法實際量測的 chunk 數")
+    args = parser.parse_args()
+
+    vocabulary = build_vocabulary(args.terms)
+    chunks = build_chunks(args.chunks, vocabulary)
+    sample = chunks[:min(args.naive_sample, len(chunks))]
+    total_chars = sum(len(chunk) for chunk in chunks)
+
+    start = time.perf_counter()
+    naive_results = [naive_search(vocabulary, chunk) for chunk in sample]
+    naive_per_chunk = (time.perf_counter() - start) / len(sample)
+
+    start = time.perf_counter()
+    matcher = KeywordMatcher(vocabulary)
+    matcher.search(chunks[0])
+    compile_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    matched = [matcher.search(chunk) for chunk in chunks]
+    elapsed = time.perf_counter() - start
+    match_count = sum(len(tags) for tags in matched)
+
+    print(f"chunks={args.chunks}  平均 {total_chars / len(chunks):.0f} 字  詞庫={len(vocabulary)} 個關鍵字")
+    naive_total = naive_per_chunk * len(chunks)
+    print(f"  {'逐一檢查':<20s} {naive_per_chunk * 1000:9.3f} ms/chunk  {1 / naive_per_chunk:10.1f} chunks/s  "
+          f"（以 {len(sample)} 個 chunk 推估全量 {naive_total:.0f}s）")
+    print(f"  {'自動機':<20s} {elapsed / len(chunks) * 1000:9.3f} ms/chunk  {len(chunks) / elapsed:10.1f} chunks/s  "
+          f"全量 {elapsed:.1f}s（{naive_total / elapsed:.0f}x）  編譯 {compile_time:.2f}s  命中 {match_count} 次")
+
+    assert matched[:len(sample)] == naive_results, "自動機比對結果與逐一檢查不同"
+    print("✅ 驗證通過")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Milvus 寫入基準測試
+
+以合成的 stage4 chunk（含 1024 維 embedding）比較 MilvusWriter 的兩種寫入方式（rows/sec）：
+- 原做法：逐列組出 19 個欄位、每批 100 筆同步 insert
+- 目前做法：整欄準備與轉型、每批 MILVUS_INSERT_BATCH_SIZE 筆、多個 insert 同時在途，最後 flush 一次
+
+另外單獨量測批次準備的耗時，並以主鍵查詢驗證所有資料皆已寫入。
+預設連到本機 Milvus Lite 檔案（需安裝 milvus-lite）；--uri 可改為 Milvus 服務位址。
+Milvus Lite 與測試程式在同一台機器上，沒有網路往返；--rtt-ms 可在每次 insert 加上模擬的往返延遲，
+對照連到遠端 Milvus 叢集時的情況。
+
+用法:
+    python scripts/benchmark_milvus_insert.py --chunks 20000
+    python scripts/benchmark_milvus_insert.py --chunks 20000 --rtt-ms 20
+    python scripts/benchmark_milvus_insert.py --uri http://192.168.32.86:19530 --chunks 50000
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+from typing import Any, Dict, List
+
+import numpy as np
+
+# 添加 vector_pipeline 目錄到 Python 路徑
+pipeline_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if pipeline_root not in sys.path:
+    sys.path.insert(0, pipeline_root)
+
+from core.milvus_writer import FIELD_ORDER, INSERT_BATCH_SIZE, INSERT_MAX_IN_FLIGHT, MilvusWriter
+
+
+def build_records(count: int, dim: int, prefix: str, seed: int = 13) -> List[Dict[str, Any]]:
+    """合成 Milvus 記錄（欄位與 Stage4MilvusInserter._prepare_data_for_insert 相同）"""
+    rng = random.Random(seed)
+    vectors = np.random.default_rng(seed).standard_normal((count, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return [{
+        'chunk_id': f"{prefix}_{i}",
+        'chunk_index': i % 50,
+        'episode_id': i // 50,
+        'podcast_id': rng.randint(1, 300),
+        'podcast_name': f"節目 {i % 300}",
+        'author': "主持人",
+        'category': rng.choice(["商業", "教育"]),
+        'episode_title': f"第 {i // 50} 集",
+        'duration': "00:42:10",
+        'published_date': "2025-01-01",
+        'apple_rating': 4.5,
+        'sentiment_rating': 0.0,
+        'total_rating': 0.0,
+        'chunk_text': "今天我們來聊聊投資理財的基本觀念。" * rng.randint(1, 10),
+        'embedding': vectors[i].tolist(),
+        'language': "zh-TW",
+        'created_at': "2025-01-01T00:00:00",
+        'source_model': "bge-m3",
+        'tags': '["投資", "理財"]'
+    } for i in range(count)]
+
+
+def prepare_rowwise(data_list: List[Dict[str, Any]]) -> Dict[str, List]:
+    """原 MilvusWriter._prepare_batch_data：逐列逐欄組出 dict-of-lists"""
+    batch_data = {key: [] for key in FIELD_ORDER}
+    for data in data_list:
+        for key in batch_data:
+            if key in data:
+                value = data[key]
+                if key == "chunk_id":
+                    if isinstance(value, list):
+                        value = value[0] if value else ""
+                    value = str(value)
+                batch_data[key].append(value)
+            elif key == "embedding":
+                batch_data[key].append([])
+            elif key == "tags":
+                batch_data[key].append("[]")
+            else:
+                batch_data[key].append("")
+    return batch_data
+
+
+def insert_legacy(writer: MilvusWriter, collection_name: str, records: List[Dict[str, Any]]) -> int:
+    """原 MilvusWriter.batch_insert：每批 100 筆同步 insert"""
+    total = 0
+    for i in range(0, len(records), 100):
+        total += writer.insert_data(collection_name, prepare_rowwise(records[i:i + 100]))
+    return total
+
+
+def count_existing(writer: MilvusWriter, collection_name: str, records: List[Dict[str, Any]]) -> int:
+    return len(writer.filter_existing_chunk_ids(collection_name, [record['chunk_id'] for record in records]))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Milvus 寫入基準測試")
+    parser.add_argument("--uri", default=None, help="Milvus 位址，預設為暫存目錄中的 Milvus Lite 檔案")
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--batch-size", type=int, default=INSERT_BATCH_SIZE)
+    parser.add_argument("--max-in-flight", type=int, default=INSERT_MAX_IN_FLIGHT)
+    parser.add_argument("--rtt-ms", type=float, default=0.0, help="每次 insert 模擬的網路往返延遲（毫秒）")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        uri = args.uri or os.path.join(tmp, "milvus_benchmark.db")
+        writer = MilvusWriter({'uri': uri, 'index_type': "FLAT", 'metric_type': "COSINE"})
+        writer.connect()
+        if args.rtt_ms > 0:
+            insert_data = writer.insert_data
+
+            def delayed_insert(collection_name: str, data: Dict[str, List]) -> int:
+                time.sleep(args.rtt_ms / 1000)
+                return insert_data(collection_name, data)
+
+            writer.insert_data = delayed_insert
+
+        legacy_records = build_records(args.chunks, args.dim, "legacy")
+        records = build_records(args.chunks, args.dim, "pipelined")
+
+        start = time.perf_counter()
+        for i in range(0, len(records), 100):
+            prepare_rowwise(records[i:i + 100])
+        rowwise_prepare = time.perf_counter() - start
+        start = time.perf_counter()
+        for i in range(0, len(records), args.batch_size):
+            writer._prepare_batch_data(records[i:i + args.batch_size])
+        columnar_prepare = time.perf_counter() - start
+
+        results = {}
+        for name, insert, data in (
+            ("逐列準備 + 同步 100 筆", insert_legacy, legacy_records),
+            (f"整欄準備 + {args.batch_size} 筆 ×{args.max_in_flight} 在途",
+             lambda w, c, r: w.batch_insert(c, r, batch_size=args.batch_size,
+                                            max_in_flight=args.max_in_flight, flush=True), records),
+        ):
+            collection_name = "benchmark_legacy" if data is legacy_records else "benchmark_pipelined"
+            writer.drop_collection(collection_name)
+            writer.create_collection(collection_name, args.dim)
+            start = time.perf_counter()
+            inserted = insert(writer, collection_name, data)
+            if data is legacy_records:
+                writer.flush(collection_name)
+            elapsed = time.perf_counter() - start
+            writer.load_collection(collection_name)
+            results[name] = (elapsed, inserted, count_existing(writer, collection_name, data))
+            writer.drop_collection(collection_name)
+        writer.close()
+
+    print(f"chunks={args.chunks}  dim={args.dim}  uri={args.uri or 'Milvus Lite'}  模擬往返={args.rtt_ms:g}ms")
+    print(f"  批次準備: 逐列 {rowwise_prepare:.2f}s → 整欄 {columnar_prepare:.2f}s")
+    baseline = next(iter(results.values()))[0]
+    for name, (elapsed, inserted, existing) in results.items():
+        print(f"  {name:<28s} {elapsed:8.2f}s  {inserted / elapsed:9.1f} rows/s  ({baseline / elapsed:4.1f}x)  "
+              f"查得 {existing} 筆")
+
+    for name, (_, inserted, existing) in results.items():
+        assert inserted == args.chunks and existing == args.chunks, f"{name} 寫入筆數不符"
+    print("✅ 驗證通過")
+
+
+if __name__ == "__main__":
+    main()
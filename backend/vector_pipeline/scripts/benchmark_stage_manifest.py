@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+階段狀態清單基準測試
+
+在暫存目錄建立 RSS_*/*.json 形式的 stage1 輸出，比較：
+- 舊版：每次啟動 rglob 全部檔案並比對進度 JSON；驗證時開啟全部檔案
+- 清單：首次掃描（計算全部雜湊）、無變動時重新掃描、少量檔案變動後重新掃描、plan 產生待處理項目
+
+並以多個行程同時 claim() 領取工作，驗證每個項目恰好被處理一次、失敗項目記錄錯誤。
+
+用法:
+    python scripts/benchmark_stage_manifest.py
+    python scripts/benchmark_stage_manifest.py --dirs 500 --files-per-dir 200 --workers 8
+"""
+
+import os
+import json
+import time
+import random
+import sqlite3
+import argparse
+import tempfile
+import importlib.util
+import multiprocessing
+from pathlib import Path
+from typing import List
+
+# 直接載入模組檔案，避免 core/__init__ 匯入 MongoDB 等依賴
+pipeline_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_spec = importlib.util.spec_from_file_location(
+    "stage_manifest", os.path.join(pipeline_root, "core", "stage_manifest.py"))
+stage_manifest = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(stage_manifest)
+StageManifest = stage_manifest.StageManifest
+STAGE1_FILES = stage_manifest.STAGE1_FILES
+TAGGING_STAGE = stage_manifest.TAGGING_STAGE
+
+
+def write_document(path: Path, rng: random.Random) -> None:
+    chunks = [{'chunk_text': "".join(chr(0x4E00 + rng.randrange(3000)) for _ in range(50)), 'chunk_index': i}
+              for i in range(rng.randint(3, 8))]
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'chunks': chunks}, f, ensure_ascii=False)
+
+
+def settle(directories, seconds: float = 10.0) -> None:
+    """將目錄 mtime 往前調，模擬一段時間前寫入的資料"""
+    past = time.time() - seconds
+    for directory in directories:
+        os.utime(directory, (past, past))
+
+
+def legacy_resume(stage1: Path, progress_file: Path) -> int:
+    """舊版：載入進度 JSON 後 rglob 全部檔案找出未處理的檔案"""
+    with open(progress_file, 'r', encoding='utf-8') as f:
+        processed = set(json.load(f)['processed_files'])
+    return sum(1 for path in stage1.rglob("*.json") if str(path.relative_to(stage1)) not in processed)
+
+
+def legacy_validate(stage1: Path) -> int:
+    """舊版：開啟全部檔案檢查結構"""
+    corrupted = 0
+    for path in stage1.rglob("*.json"):
+        with open(path, 'r', encoding='utf-8') as f:
+            corrupted += 'chunks' not in json.load(f)
+    return corrupted
+
+
+def worker(manifest_path: str, stage1: str, fail_keys: List[str], results: "multiprocessing.Queue") -> None:
+    manifest = StageManifest(manifest_path)
+    processed = []
+    for entry in manifest.iter_claims(TAGGING_STAGE, batch_size=8):
+        if entry.key in fail_keys:
+            manifest.fail(TAGGING_STAGE, entry.key, "模擬失敗")
+            continue
+        with open(Path(stage1) / entry.source_path, 'r', encoding='utf-8') as f:
+            json.load(f)
+        manifest.complete(entry)
+        processed.append(entry.key)
+    manifest.close()
+    results.put(processed)
+
+
+def timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="階段狀態清單基準測試")
+    parser.add_argument("--dirs", type=int, default=200)
+    parser.add_argument("--files-per-dir", type=int, default=100)
+    parser.add_argument("--changed", type=int, default=50, help="第二輪新增或修改的檔案數")
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    rng = random.Random(11)
+    with tempfile.TemporaryDirectory() as tmp:
+        stage1 = Path(tmp) / "stage1_chunking"
+        for d in range(args.dirs):
+            directory = stage1 / f"RSS_{d:06d}"
+            directory.mkdir(parents=True)
+            for i in range(args.files_per_dir):
+                write_document(directory / f"episode_{i:05d}.json", rng)
+        total = args.dirs * args.files_per_dir
+        progress_file = Path(tmp) / "tagging_progress.json"
+        with open(progress_file, 'w', encoding='utf-8') as f:
+            json.dump({'processed_files': [str(p.relative_to(stage1)) for p in stage1.rglob("*.json")]}, f)
+        settle(directory for directory, _, _ in os.walk(stage1))
+
+        print(f"stage1: {args.dirs} 個目錄 × {args.files_per_dir} = {total} 個檔案")
+        _, seconds = timed(legacy_resume, stage1, progress_file)
+        print(f"  舊版 啟動比對（rglob + 進度 JSON）      {seconds:7.3f}s")
+        _, seconds = timed(legacy_validate, stage1)
+        print(f"  舊版 驗證（開啟全部檔案）              {seconds:7.3f}s")
+
+        manifest_path = os.path.join(tmp, "stage_manifest.sqlite3")
+        manifest = StageManifest(manifest_path)
+        stats, seconds = timed(manifest.scan, STAGE1_FILES, stage1)
+        assert stats['added'] == total
+        print(f"  清單 首次掃描（計算全部雜湊）          {seconds:7.3f}s  {stats}")
+        planned, seconds = timed(manifest.plan, STAGE1_FILES, TAGGING_STAGE)
+        assert planned == total
+        print(f"  清單 plan {planned} 個待處理項目            {seconds:7.3f}s")
+
+        manifest.mark_done(TAGGING_STAGE, [(entry.key, None, entry.source_hash)
+                                           for entry in manifest.claim(TAGGING_STAGE, limit=total)])
+        # 模擬首次掃描在上次 plan 的一小時前完成（plan 只比對水位線之後變動的項目）
+        with sqlite3.connect(manifest_path) as conn:
+            conn.execute("UPDATE files SET updated_at = updated_at - 3600")
+        with sqlite3.connect(manifest_path) as conn:
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        stats, seconds = timed(manifest.scan, STAGE1_FILES, stage1)
+        assert stats['listed_dirs'] == 0 and stats['added'] == stats['modified'] == 0
+        print(f"  清單 無變動重新掃描                    {seconds:7.3f}s  {stats}")
+
+        # 少量變動：新增、修改、刪除
+        changed_dirs = rng.sample(range(args.dirs), max(1, args.changed // 10))
+        changed = set()
+        for n in range(args.changed):
+            directory = stage1 / f"RSS_{changed_dirs[n % len(changed_dirs)]:06d}"
+            name = f"episode_{rng.randrange(args.files_per_dir + 20):05d}.json"
+            write_document(directory / name, rng)
+            changed.add(f"{directory.name}/{name}")
+        removed = stage1 / f"RSS_{changed_dirs[0]:06d}" / "episode_00000.json"
+        if removed.exists() and f"{removed.parent.name}/{removed.name}" not in changed:
+            removed.unlink()
+        settle(stage1 / f"RSS_{d:06d}" for d in changed_dirs)
+        stats, seconds = timed(manifest.scan, STAGE1_FILES, stage1)
+        print(f"  清單 變動 {len(changed)} 個檔案後重新掃描         {seconds:7.3f}s  {stats}")
+        planned, seconds = timed(manifest.plan, STAGE1_FILES, TAGGING_STAGE)
+        assert planned == len(changed), (planned, len(changed))
+        print(f"  清單 plan {planned} 個待處理項目               {seconds:7.3f}s")
+
+        # 多個行程同時領取
+        manifest.plan(STAGE1_FILES, TAGGING_STAGE)
+        fail_keys = sorted(changed)[:3]
+        results = multiprocessing.Queue()
+        processes = [multiprocessing.Process(target=worker, args=(manifest_path, str(stage1), fail_keys, results))
+                     for _ in range(args.workers)]
+        start = time.perf_counter()
+        for process in processes:
+            process.start()
+        processed = [key for _ in processes for key in results.get()]
+        for process in processes:
+            process.join()
+        seconds = time.perf_counter() - start
+        assert len(processed) == len(set(processed)) == len(changed) - len(fail_keys)
+        assert set(processed) | set(fail_keys) == changed
+        assert [key for key, _ in manifest.errors(TAGGING_STAGE)] == fail_keys
+        assert manifest.plan(STAGE1_FILES, TAGGING_STAGE) == 0
+        print(f"  {args.workers} 個行程同時領取 {len(changed)} 個項目          {seconds:7.3f}s  "
+              f"每個項目處理一次，失敗 {len(fail_keys)} 個已記錄")
+        manifest.close()
+    print("✅ 驗證通過")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+串流管線基準測試
+
+以合成語料比較兩種執行方式（嵌入與寫入以固定延遲模擬，不需要模型與 Milvus）：
+- 分批執行：每個階段處理完整個語料庫，結果寫成 indent=2 的 JSON 後由下一階段重新讀取（舊流程）
+- 串流執行：core/streaming_pipeline.py，以有界佇列串接各階段
+
+比較總耗時與 Python 記憶體峰值（tracemalloc），並輸出串流模式各階段的吞吐量與佇列深度。
+
+用法:
+    python scripts/benchmark_streaming_pipeline.py --docs 100 --doc-chars 20000
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import tracemalloc
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Tuple
+
+# 添加 vector_pipeline 目錄到 Python 路徑
+pipeline_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if pipeline_root not in sys.path:
+    sys.path.insert(0, pipeline_root)
+
+from core.streaming_pipeline import StreamingPipeline, StreamStage
+from core.text_chunker import TextChunker
+
+SENTENCES = [
+    "今天我們來聊聊投資理財的基本觀念。",
+    "主持人分享了最近閱讀的一本商業書籍。",
+    "來賓談到創業初期最常遇到的三個問題。",
+    "這一集也回答了聽眾關於職涯轉換的提問。",
+]
+
+
+class FakeWorkload:
+    """模擬嵌入與寫入的延遲"""
+
+    def __init__(self, dim: int, embed_delay: float, insert_delay: float):
+        self.dim = dim
+        self.embed_delay = embed_delay
+        self.insert_delay = insert_delay
+        self.chunker = TextChunker(max_chunk_size=512, overlap_size=50)
+        self.inserted = 0
+
+    def chunk(self, doc: Dict[str, Any]) -> List[Dict[str, Any]]:
+        return [
+            {"chunk_id": chunk.chunk_id, "episode_id": doc["_id"], "content": chunk.chunk_text}
+            for chunk in self.chunker.split_text_into_chunks(doc["text"], doc["_id"])
+        ]
+
+    @staticmethod
+    def clean(chunk: Dict[str, Any]) -> Dict[str, Any]:
+        return {**chunk, "cleaned_content": " ".join(chunk["content"].split())}
+
+    @staticmethod
+    def tag(chunk: Dict[str, Any]) -> Dict[str, Any]:
+        return {**chunk, "tags": [word for word in ("投資", "創業", "職涯") if word in chunk["cleaned_content"]]}
+
+    def embed(self, batch: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        time.sleep(self.embed_delay)
+        return [{**chunk, "embedding": [0.001 * (i % 97) for i in range(self.dim)]} for chunk in batch]
+
+    def insert(self, batch: List[Dict[str, Any]]) -> List[int]:
+        time.sleep(self.insert_delay)
+        self.inserted += len(batch)
+        return [len(batch)]
+
+
+def documents(count: int, chars: int, seed: int = 7) -> Iterator[Dict[str, Any]]:
+    """逐筆產生合成文件（模擬 MongoDB cursor）"""
+    rng = random.Random(seed)
+    for index in range(count):
+        lines, length = [], 0
+        while length < chars:
+            line = "".join(rng.choice(SENTENCES) for _ in range(4))
+            lines.append(line)
+            length += len(line)
+        yield {"_id": f"doc_{index}", "text": "\n".join(lines)}
+
+
+def run_batch(args, workload: FakeWorkload, tmp: Path) -> None:
+    """舊流程：逐階段處理整個語料庫並寫出 JSON"""
+    def save_and_reload(name: str, data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        path = tmp / f"{name}.json"
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        del data
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    chunks = [chunk for doc in documents(args.docs, args.doc_chars) for chunk in workload.chunk(doc)]
+    chunks = save_and_reload("stage1", chunks)
+    chunks = save_and_reload("stage2", [workload.clean(chunk) for chunk in chunks])
+    chunks = save_and_reload("stage3", [workload.tag(chunk) for chunk in chunks])
+    embedded = []
+    for i in range(0, len(chunks), args.embed_batch):
+        embedded.extend(workload.embed(chunks[i:i + args.embed_batch]))
+    embedded = save_and_reload("stage4", embedded)
+    for i in range(0, len(embedded), args.insert_batch):
+        workload.insert(embedded[i:i + args.insert_batch])
+
+
+def run_streaming(args, workload: FakeWorkload) -> Dict[str, Any]:
+    """串流流程"""
+    pipeline = StreamingPipeline(
+        source=documents(args.docs, args.doc_chars),
+        stages=[
+            StreamStage("切塊", workload.chunk, queue_size=8),
+            StreamStage("清理", lambda chunk: [workload.clean(chunk)], queue_size=args.queue_size),
+            StreamStage("標籤", lambda chunk: [workload.tag(chunk)], queue_size=args.queue_size),
+            StreamStage("嵌入", workload.embed, batch_size=args.embed_batch, queue_size=args.queue_size),
+            StreamStage("寫入", workload.insert, batch_size=args.insert_batch, queue_size=args.queue_size),
+        ],
+        report_interval=0
+    )
+    return pipeline.run()
+
+
+def measure(fn) -> Tuple[float, float, Any]:
+    """回傳 (秒, 記憶體峰值 MB, 結果)"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 1024 / 1024, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="串流管線基準測試")
+    parser.add_argument("--docs", type=int, default=100)
+    parser.add_argument("--doc-chars", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--embed-batch", type=int, default=32)
+    parser.add_argument("--insert-batch", type=int, default=100)
+    parser.add_argument("--embed-delay", type=float, default=0.02, help="每批嵌入的模擬延遲（秒）")
+    parser.add_argument("--insert-delay", type=float, default=0.01, help="每批寫入的模擬延遲（秒）")
+    parser.add_argument("--queue-size", type=int, default=64)
+    args = parser.parse_args()
+
+    batch_workload = FakeWorkload(args.dim, args.embed_delay, args.insert_delay)
+    with tempfile.TemporaryDirectory() as tmp:
+        batch_time, batch_peak, _ = measure(lambda: run_batch(args, batch_workload, Path(tmp)))
+    print(f"分批執行  耗時={batch_time:7.2f}s  記憶體峰值={batch_peak:8.1f}MB  寫入={batch_workload.inserted}")
+
+    stream_workload = FakeWorkload(args.dim, args.embed_delay, args.insert_delay)
+    stream_time, stream_peak, summary = measure(lambda: run_streaming(args, stream_workload))
+    print(f"串流執行  耗時={stream_time:7.2f}s  記憶體峰值={stream_peak:8.1f}MB  寫入={stream_workload.inserted}")
+
+    for name, stage in summary["stages"].items():
+        print(f"  {name:<4} 輸入={stage['items_in']:6d} 輸出={stage['items_out']:6d} "
+              f"速率={stage['throughput_per_sec']:8.1f}/s 佇列峰值={stage['max_queue_depth']:3d}/{stage['queue_size']} "
+              f"平均={stage['avg_queue_depth']:5.1f} 等待下游={stage['blocked_seconds']:.2f}s")
+
+    assert stream_workload.inserted == batch_workload.inserted, "串流與分批寫入筆數不一致"
+    assert all(stage["errors"] == 0 for stage in summary["stages"].values())
+    assert all(stage["max_queue_depth"] <= stage["queue_size"] for stage in summary["stages"].values())
+    assert stream_peak < batch_peak, "串流模式記憶體峰值未下降"
+    print("✅ 驗證通過")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+文本切分基準測試
+
+以合成的多小時中文逐字稿（句末標點、換行與無標點長句混合）比較：
+- 舊版：逐行字串串接、以字元數控制大小，單行過長時整行成為一個 chunk
+- 新版 TextChunker：句子區間批次計數 token 後線性打包
+
+並驗證新版輸出：
+- 每個 chunk 重新計數的 token 數不超過 max_tokens、字元數不超過 max_chunk_size
+- chunk_text 等於原文 [start_offset, end_offset) 區間，所有非空白字元都被涵蓋
+- 相鄰 chunk 的重疊不超過 overlap_tokens / overlap_size
+- split_many() 批次結果與逐份切分相同
+
+用法:
+    python scripts/benchmark_text_chunker.py
+    python scripts/benchmark_text_chunker.py --hours 1 3 6 --max-tokens 256
+"""
+
+import os
+import time
+import random
+import argparse
+import importlib.util
+from typing import List
+
+# 直接載入模組檔案，避免 core/__init__ 匯入 MongoDB 等依賴
+pipeline_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_spec = importlib.util.spec_from_file_location(
+    "text_chunker", os.path.join(pipeline_root, "core", "text_chunker.py"))
+text_chunker = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(text_chunker)
+TextChunker = text_chunker.TextChunker
+
+CHARS_PER_MINUTE = 280
+_ENDINGS = ["。", "！", "？", "；", "…", "。」", "？）"]
+
+
+def synthetic_transcript(hours: float, seed: int = 7) -> str:
+    """產生多小時逐字稿：多數句子有標點，部分段落為無標點長句"""
+    rng = random.Random(seed)
+    target = int(hours * 60 * CHARS_PER_MINUTE)
+    parts: List[str] = []
+    size = 0
+    while size < target:
+        words = "".join(chr(0x4E00 + rng.randrange(6000)) for _ in range(rng.randint(8, 40)))
+        if rng.random() < 0.15:
+            words += f" AI {rng.randint(1, 2025)} ETF"
+        if rng.random() < 0.01:
+            # 語音辨識未斷句的長段落
+            words = "".join(chr(0x4E00 + rng.randrange(6000)) for _ in range(rng.randint(800, 3000)))
+        elif rng.random() < 0.3:
+            words += "，" + "".join(chr(0x4E00 + rng.randrange(6000)) for _ in range(rng.randint(5, 20)))
+        sentence = words + rng.choice(_ENDINGS)
+        parts.append(sentence)
+        parts.append("\n" if rng.random() < 0.2 else "")
+        size += len(sentence)
+    return "".join(parts)
+
+
+def legacy_chunks(text: str, max_chunk_size: int, overlap_size: int) -> List[str]:
+    """舊版切分邏輯"""
+    chunks = []
+    current_chunk = ""
+    for line in text.split('\n'):
+        line = line.strip()
+        if not line:
+            continue
+        if len(current_chunk) + len(line) > max_chunk_size and current_chunk:
+            chunks.append(current_chunk.strip())
+            if overlap_size > 0 and len(current_chunk) > overlap_size:
+                current_chunk = current_chunk[-overlap_size:] + " " + line
+            else:
+                current_chunk = line
+        else:
+            current_chunk = current_chunk + " " + line if current_chunk else line
+    if current_chunk:
+        chunks.append(current_chunk.strip())
+    return chunks
+
+
+def verify(chunker: TextChunker, text: str, chunks) -> None:
+    counts = chunker.token_counter.count_batch([chunk.chunk_text for chunk in chunks])
+    covered_until = 0
+    previous = None
+    for chunk, tokens in zip(chunks, counts):
+        assert chunk.chunk_text == text[chunk.start_offset:chunk.end_offset]
+        assert chunk.chunk_length <= chunker.max_chunk_size, f"chunk {chunk.chunk_index} 超過字元上限"
+        assert tokens <= chunker.max_tokens, f"chunk {chunk.chunk_index} 有 {tokens} tokens"
+        assert text[covered_until:chunk.start_offset].strip() == "", f"chunk {chunk.chunk_index} 之前有遺漏"
+        if previous is not None:
+            assert chunk.start_offset > previous.start_offset
+            overlap = text[chunk.start_offset:previous.end_offset]
+            assert len(overlap) <= chunker.overlap_size
+            assert chunker.token_counter.count(overlap) <= chunker.overlap_tokens + 2
+        covered_until = max(covered_until, chunk.end_offset)
+        previous = chunk
+    assert text[covered_until:].strip() == ""
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="文本切分基準測試")
+    parser.add_argument("--hours", type=float, nargs="+", default=[1, 3, 6])
+    parser.add_argument("--max-chunk-size", type=int, default=1024)
+    parser.add_argument("--overlap-size", type=int, default=100)
+    parser.add_argument("--max-tokens", type=int, default=text_chunker.CHUNK_MAX_TOKENS)
+    parser.add_argument("--overlap-tokens", type=int, default=text_chunker.CHUNK_OVERLAP_TOKENS)
+    args = parser.parse_args()
+
+    chunker = TextChunker(args.max_chunk_size, args.overlap_size, args.max_tokens, args.overlap_tokens)
+    print(f"tokenizer={chunker.token_counter.backend}  max_tokens={chunker.max_tokens}  "
+          f"overlap_tokens={chunker.overlap_tokens}  max_chunk_size={chunker.max_chunk_size}")
+
+    documents = []
+    for hours in args.hours:
+        text = synthetic_transcript(hours)
+        documents.append((text, f"episode_{hours:g}h"))
+
+        start = time.perf_counter()
+        old = legacy_chunks(text, args.max_chunk_size, args.overlap_size)
+        old_seconds = time.perf_counter() - start
+        old_tokens = chunker.token_counter.count_batch(old)
+
+        start = time.perf_counter()
+        new = chunker.split_text_into_chunks(text, f"episode_{hours:g}h")
+        new_seconds = time.perf_counter() - start
+        verify(chunker, text, new)
+
+        print(f"  {hours:4g}h {len(text):8d} 字元  舊版 {old_seconds * 1000:8.1f}ms {len(old):5d} chunks "
+              f"(最大 {max(map(len, old)):5d} 字元 / {max(old_tokens):5d} tokens, "
+              f"超過 token 上限 {sum(tokens > chunker.max_tokens for tokens in old_tokens)})  "
+              f"新版 {new_seconds * 1000:8.1f}ms {len(new):5d} chunks "
+              f"({len(text) / new_seconds / 1e6:.2f}M 字元/s, 最大 {max(c.token_count for c in new)} tokens)")
+
+    start = time.perf_counter()
+    batched = chunker.split_many(documents)
+    batch_seconds = time.perf_counter() - start
+    for (text, document_id), chunks in zip(documents, batched):
+        single = chunker.split_text_into_chunks(text, document_id)
+        assert [(c.start_offset, c.end_offset) for c in chunks] == [(c.start_offset, c.end_offset) for c in single]
+    print(f"  split_many {len(documents)} 份文件 {batch_seconds * 1000:.1f}ms，結果與逐份切分相同")
+    print("✅ 驗證通過")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+從 Stage4 Embedding Prep 資料建置 BM25 稀疏索引
+
+功能：
+1. 讀取 stage4_embedding_prep 下每個 RSS 資料夾的 JSON 檔案或 chunk store 資料集
+2. 以 chunk_text 建置 jieba 分詞的 BM25 索引（依 chunk_id 去重）
+3. 寫出可 mmap 的索引目錄，供 RAG Pipeline 的 Level2HybridSearch 使用
+
+用法:
+    python scripts/build_bm25_index.py --output ../rag_pipeline/data/bm25_index
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+from pathlib import Path
+from typing import Any, Dict, Iterator, Set
+
+# 添加後端根目錄到 Python 路徑
+backend_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if backend_root not in sys.path:
+    sys.path.insert(0, backend_root)
+pipeline_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if pipeline_root not in sys.path:
+    sys.path.insert(0, pipeline_root)
+
+from utils.bm25_index import DOC_FIELDS, BM25IndexBuilder
+from core.chunk_store import list_stage_sources, read_records
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+DEFAULT_INPUT = Path(__file__).parent.parent / "data" / "stage4_embedding_prep"
+
+
+def iter_chunks(input_dir: Path) -> Iterator[Dict[str, Any]]:
+    """逐檔讀取 chunk（chunk store 只讀取索引需要的欄位，不載入 embedding）"""
+    seen: Set[str] = set()
+    for file_path in list_stage_sources(input_dir, recursive=True):
+        try:
+            data = read_records(file_path, columns=list(DOC_FIELDS))
+        except Exception as e:
+            logger.error(f"載入檔案 {file_path} 失敗: {e}")
+            continue
+
+        for item in data:
+            chunk_id = str(item.get('chunk_id', ''))
+            if not chunk_id or chunk_id in seen or not item.get('chunk_text'):
+                continue
+            seen.add(chunk_id)
+            yield item
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="建置 BM25 稀疏索引")
+    parser.add_argument("--input", default=str(DEFAULT_INPUT), help="stage4_embedding_prep 目錄")
+    parser.add_argument("--output", required=True, help="索引輸出目錄")
+    parser.add_argument("--k1", type=float, default=1.2)
+    parser.add_argument("--b", type=float, default=0.75)
+    args = parser.parse_args()
+
+    input_dir = Path(args.input)
+    if not input_dir.exists():
+        raise FileNotFoundError(f"輸入路徑不存在: {input_dir}")
+
+    start_time = time.time()
+    builder = BM25IndexBuilder(k1=args.k1, b=args.b)
+    count = builder.add_all(iter_chunks(input_dir))
+    logger.info(f"已分詞 {count} 個 chunk，耗時 {time.time() - start_time:.1f}s")
+
+    meta = builder.save(args.output)
+    logger.info(f"索引建置完成: {meta['num_docs']} 文件, {meta['num_terms']} 詞彙, "
+                f"{meta['num_postings']} postings，總耗時 {time.time() - start_time:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
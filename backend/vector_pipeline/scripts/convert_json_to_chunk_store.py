@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+將既有的 JSON 階段輸出轉換為 chunk store 列式格式
+
+功能：
+1. 遞迴讀取輸入目錄下的 JSON 檔案（chunk 列表或含 chunks 欄位的文件）
+2. 每個目錄（例如 RSS 資料夾）轉成一個分片資料集，保留相對路徑
+3. embedding 轉為 float32 矩陣，其餘欄位依型別分欄儲存
+4. 轉換後逐一核對 chunk 數
+
+用法:
+    python scripts/convert_json_to_chunk_store.py \
+        --input data/stage4_embedding_prep --output data/stage4_embedding_prep_columnar
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+from pathlib import Path
+
+# 添加 vector_pipeline 目錄到 Python 路徑
+pipeline_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if pipeline_root not in sys.path:
+    sys.path.insert(0, pipeline_root)
+
+from core.chunk_store import DEFAULT_SHARD_ROWS, ChunkStore, convert_json_to_chunk_store, list_stage_sources
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="JSON 階段輸出轉換為 chunk store")
+    parser.add_argument("--input", required=True, help="JSON 輸出目錄（例如 data/stage4_embedding_prep）")
+    parser.add_argument("--output", required=True, help="chunk store 輸出目錄")
+    parser.add_argument("--shard-rows", type=int, default=DEFAULT_SHARD_ROWS, help="每個分片的列數")
+    args = parser.parse_args()
+
+    input_dir = Path(args.input)
+    output_dir = Path(args.output)
+    if not input_dir.exists():
+        raise FileNotFoundError(f"輸入路徑不存在: {input_dir}")
+    if output_dir.resolve() == input_dir.resolve():
+        raise ValueError("輸出目錄不可與輸入目錄相同")
+
+    start_time = time.time()
+    stats = convert_json_to_chunk_store(input_dir, output_dir, shard_rows=args.shard_rows)
+
+    stored_rows = sum(len(ChunkStore(path)) for path in list_stage_sources(output_dir, recursive=True))
+    if stored_rows != stats["chunks"]:
+        raise RuntimeError(f"轉換後 chunk 數不一致: 讀取 {stats['chunks']}，寫入 {stored_rows}")
+
+    logger.info(f"轉換完成: {stats['datasets']} 個資料集, {stats['files']} 個檔案, {stats['chunks']} 個 chunk，"
+                f"耗時 {time.time() - start_time:.1f}s")
+    logger.info(f"大小: JSON {stats['json_bytes'] / 1024 / 1024:.1f}MB → "
+                f"chunk store {stats['store_bytes'] / 1024 / 1024:.1f}MB")
+    if stats["failed_files"]:
+        logger.warning(f"{len(stats['failed_files'])} 個檔案載入失敗: {stats['failed_files'][:10]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,26 +3,33 @@
 Stage4 Embedding Prep 資料插入 Milvus 腳本
 
 功能：
-1. 將 stage4_embedding_prep 的 JSON 檔案資料插入到 Milvus 向量資料庫
-2. 防止重複插入（檢查 chunk_id）
+1. 將 stage4_embedding_prep 的 JSON 檔案或 chunk store 資料集插入到 Milvus 向量資料庫
+2. 防止重複插入（逐檔以主鍵查詢 chunk_id 是否已存在，不預先載入全部 id，集合大小不受限）
 3. 記錄執行時間
 4. 以每個 RSS 資料夾為一個批次單位
 5. 錯誤處理和日誌記錄
+6. 多個 insert 同時在途，全部完成後 flush 一次；首次灌庫可用 --bulk-import 改以檔案匯入
+
+用法:
+    python scripts/insert_stage4_to_milvus.py
+    python scripts/insert_stage4_to_milvus.py --bulk-import
 """
 
 import os
 import json
 import logging
+import argparse
 import time
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Any, Set
+from typing import Dict, List, Any
 import sys
 
 # 添加專案根目錄到 Python 路徑
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from core.milvus_writer import MilvusWriter
+from core.chunk_store import list_stage_sources, read_records
 from config.config import config
 from pymilvus import connections, Collection, utility
 
@@ -30,8 +37,14 @@ from pymilvus import connections, Collection, utility
 class Stage4MilvusInserter:
     """Stage4 資料插入 Milvus 的處理器"""
     
-    def __init__(self):
-        """初始化插入器"""
+    def __init__(self, bulk_import: bool = False):
+        """
+        初始化插入器
+        
+        Args:
+            bulk_import: 是否以檔案匯入（每個 RSS 資料夾一個匯入任務）取代逐批 insert
+        """
+        self.bulk_import = bulk_import
         self.milvus_config = config.get_milvus_config()
         self.milvus_writer = MilvusWriter(self.milvus_config)
         self.collection_name = self.milvus_config['collection_name']
@@ -43,8 +56,8 @@ class Stage4MilvusInserter:
         # 連接到 Milvus
         self._connect_milvus()
         
-        # 快取已存在的 chunk_id
-        self.existing_chunk_ids = self._get_existing_chunk_ids()
+        # 載入集合以供 chunk_id 查詢
+        self._load_collection()
         
     def _setup_logging(self):
         """設定日誌"""
@@ -72,37 +85,24 @@ class Stage4MilvusInserter:
             self.logger.error(f"Milvus 連接失敗: {e}")
             raise
             
-    def _get_existing_chunk_ids(self) -> Set[str]:
-        """獲取已存在的 chunk_id 集合"""
+    def _load_collection(self):
+        """載入集合（集合不存在時由第一次插入建立）"""
         try:
             if not utility.has_collection(self.collection_name):
                 self.logger.info(f"集合 {self.collection_name} 不存在，將創建新集合")
-                return set()
+                return
                 
             collection = Collection(self.collection_name)
             collection.load()
-            
-            # 查詢所有 chunk_id
-            results = collection.query(
-                expr="chunk_id != ''",
-                output_fields=["chunk_id"],
-                limit=16384  # Milvus 最大查詢限制
-            )
-            
-            existing_ids = {result['chunk_id'] for result in results}
-            self.logger.info(f"發現 {len(existing_ids)} 個已存在的 chunk_id")
-            return existing_ids
+            self.logger.info(f"集合 {self.collection_name} 現有 {collection.num_entities} 筆資料")
             
         except Exception as e:
-            self.logger.warning(f"獲取已存在 chunk_id 失敗: {e}")
-            return set()
+            self.logger.warning(f"載入集合失敗: {e}")
             
     def _load_json_file(self, file_path: Path) -> List[Dict[str, Any]]:
-        """載入 JSON 檔案"""
+        """載入 JSON 檔案或 chunk store 資料集"""
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            return data if isinstance(data, list) else [data]
+            return read_records(file_path)
         except Exception as e:
             self.logger.error(f"載入檔案 {file_path} 失敗: {e}")
             return []
@@ -166,11 +166,13 @@ class Stage4MilvusInserter:
         skipped_chunks = 0
         error_chunks = 0
         
-        # 獲取所有 JSON 檔案
-        json_files = list(rss_folder.glob("*.json"))
-        self.logger.info(f"發現 {len(json_files)} 個 JSON 檔案")
+        # 獲取所有 JSON 檔案與 chunk store 資料集
+        json_files = list_stage_sources(rss_folder)
+        self.logger.info(f"發現 {len(json_files)} 個檔案/資料集")
         
-        all_data_to_insert = []
+        # 檔案匯入模式下整個資料夾匯入一次，尚未匯入的 chunk_id 也需排除
+        pending_import: List[Dict[str, Any]] = []
+        pending_ids = set()
         
         for json_file in json_files:
             file_start_time = time.time()
@@ -180,54 +182,65 @@ class Stage4MilvusInserter:
             file_data = self._load_json_file(json_file)
             total_files += 1
             
+            valid_chunks = []
             for chunk_data in file_data:
                 total_chunks += 1
                 
+                # 驗證資料格式
+                if not self._validate_data_format(chunk_data):
+                    error_chunks += 1
+                    continue
+                valid_chunks.append(chunk_data)
+                
+            # 以主鍵查詢本檔案的 chunk_id 是否已存在（含本次執行先前檔案插入的資料）
+            try:
+                existing_ids = self.milvus_writer.filter_existing_chunk_ids(
+                    self.collection_name,
+                    [str(chunk_data.get('chunk_id', '')) for chunk_data in valid_chunks]
+                )
+            except Exception as e:
+                self.logger.error(f"查詢已存在 chunk_id 失敗，跳過檔案 {json_file.name}: {e}")
+                error_chunks += len(valid_chunks)
+                continue
+            existing_ids |= pending_ids
+                
+            data_to_insert = []
+            for chunk_data in valid_chunks:
+                chunk_id = str(chunk_data.get('chunk_id', ''))
+                
+                # 檢查是否已存在（同一檔案內重複的 chunk_id 也只插入一次）
+                if chunk_id in existing_ids:
+                    skipped_chunks += 1
+                    continue
+                existing_ids.add(chunk_id)
+                
                 try:
-                    # 驗證資料格式
-                    if not self._validate_data_format(chunk_data):
-                        error_chunks += 1
-                        continue
-                        
-                    chunk_id = str(chunk_data.get('chunk_id', ''))
-                    
-                    # 檢查是否已存在
-                    if chunk_id in self.existing_chunk_ids:
-                        skipped_chunks += 1
-                        continue
-                        
                     # 準備資料格式
-                    prepared_data = self._prepare_data_for_insert(chunk_data)
-                    all_data_to_insert.append(prepared_data)
-                    
+                    data_to_insert.append(self._prepare_data_for_insert(chunk_data))
                 except Exception as e:
                     self.logger.error(f"處理 chunk 失敗: {e}")
                     error_chunks += 1
                     
+            if self.bulk_import:
+                pending_import.extend(data_to_insert)
+                pending_ids.update(data['chunk_id'] for data in data_to_insert)
+            # 逐檔插入，記憶體只保留單一檔案的資料
+            elif data_to_insert:
+                try:
+                    inserted_chunks += self.milvus_writer.batch_insert(self.collection_name, data_to_insert)
+                except Exception as e:
+                    self.logger.error(f"批次插入失敗: {e}")
+                    error_chunks += len(data_to_insert)
+                    
             file_time = time.time() - file_start_time
-            self.logger.info(f"檔案 {json_file.name} 處理完成，耗時: {file_time:.2f}秒")
+            self.logger.info(f"檔案 {json_file.name} 處理完成，待插入 {len(data_to_insert)} 筆，耗時: {file_time:.2f}秒")
             
-        # 批次插入資料
-        if all_data_to_insert:
+        if pending_import:
             try:
-                insert_start_time = time.time()
-                inserted_count = self.milvus_writer.batch_insert(
-                    self.collection_name, 
-                    all_data_to_insert, 
-                    batch_size=100
-                )
-                inserted_chunks = inserted_count
-                insert_time = time.time() - insert_start_time
-                
-                # 更新已存在的 chunk_id 快取
-                for data in all_data_to_insert:
-                    self.existing_chunk_ids.add(data['chunk_id'])
-                    
-                self.logger.info(f"批次插入完成，插入 {inserted_count} 筆資料，耗時: {insert_time:.2f}秒")
-                
+                inserted_chunks += self.milvus_writer.bulk_import(self.collection_name, pending_import)
             except Exception as e:
-                self.logger.error(f"批次插入失敗: {e}")
-                error_chunks += len(all_data_to_insert)
+                self.logger.error(f"檔案匯入失敗: {e}")
+                error_chunks += len(pending_import)
                 
         total_time = time.time() - start_time
         
@@ -277,10 +290,15 @@ class Stage4MilvusInserter:
                     'total_time': 0
                 })
                 
-        overall_time = time.time() - overall_start_time
-        
         # 統計總結果
         total_inserted = sum(r.get('inserted_chunks', 0) for r in total_results)
+        
+        # 全部插入完成後 flush 一次（檔案匯入不需要）
+        if total_inserted and not self.bulk_import:
+            self.milvus_writer.flush(self.collection_name)
+            
+        overall_time = time.time() - overall_start_time
+        
         total_skipped = sum(r.get('skipped_chunks', 0) for r in total_results)
         total_errors = sum(r.get('error_chunks', 0) for r in total_results)
         
@@ -315,12 +333,16 @@ class Stage4MilvusInserter:
 
 def main():
     """主函數"""
+    parser = argparse.ArgumentParser(description="Stage4 Embedding Prep 資料插入 Milvus")
+    parser.add_argument("--bulk-import", action="store_true", help="以檔案匯入取代逐批 insert（首次大量灌庫用）")
+    args = parser.parse_args()
+    
     print("Stage4 Embedding Prep 資料插入 Milvus 腳本")
     print("=" * 50)
     
     inserter = None
     try:
-        inserter = Stage4MilvusInserter()
+        inserter = Stage4MilvusInserter(bulk_import=args.bulk_import)
         summary = inserter.process_all_stage4_data()
         
         # 輸出摘要到檔案
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+增量灌庫腳本
+
+只把上次執行後 MongoDB 新增或修改的逐字稿切塊、標籤、嵌入並寫入 Milvus，
+修改過的文件會刪除舊 chunk；可排程定期執行，中斷後直接重新執行即可。
+
+用法:
+    python scripts/run_incremental_ingest.py
+    python scripts/run_incremental_ingest.py --collections RSS_1500839292 RSS_1531106786
+    python scripts/run_incremental_ingest.py --full-scan   # 比對全部文件內容並刪除已移除文件的 chunk
+"""
+
+import os
+import sys
+import json
+import logging
+import argparse
+
+# 添加專案根目錄到 Python 路徑
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.pipeline_stages import PipelineOrchestrator
+from core.incremental_ingest import DEFAULT_GROUP_SIZE, DEFAULT_TIMESTAMP_FIELD
+from config.config import config
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="MongoDB → Milvus 增量灌庫")
+    parser.add_argument("--collections", nargs="*", default=None, help="MongoDB collection，預設全部")
+    parser.add_argument("--tag-csv", default="../utils/TAG_info.csv")
+    parser.add_argument("--embedding-model", default="BAAI/bge-m3")
+    parser.add_argument("--state-path", default=None, help="狀態檔路徑，預設為 data/incremental_state.sqlite3")
+    parser.add_argument("--timestamp-field", default=DEFAULT_TIMESTAMP_FIELD,
+                        help="文件修改時間欄位，空字串表示只偵測新文件")
+    parser.add_argument("--group-size", type=int, default=DEFAULT_GROUP_SIZE)
+    parser.add_argument("--full-scan", action="store_true", help="掃描全部文件比對內容雜湊並處理已刪除的文件")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    milvus_config = config.get_milvus_config()
+    embedding_config = config.get_embedding_config()
+    summary = PipelineOrchestrator().run_incremental(
+        mongodb_config={'collections': args.collections},
+        tag_csv_path=args.tag_csv,
+        milvus_config=milvus_config,
+        collection_name=milvus_config['collection_name'],
+        embedding_model=args.embedding_model,
+        embedding_dim=embedding_config['dimension'],
+        state_path=args.state_path,
+        timestamp_field=args.timestamp_field or None,
+        group_size=args.group_size,
+        full_scan=args.full_scan,
+        postgres_config=config.get_postgres_config()
+    )
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
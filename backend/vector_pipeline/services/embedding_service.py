@@ -12,8 +12,10 @@ from datetime import datetime
 import numpy as np
 
 from pymilvus import connections, Collection, utility
+from ..core.chunk_store import list_stage_sources, read_documents
 from ..core.vector_processor import VectorProcessor
 from ..config.settings import config
+from utils.milvus_client_manager import get_milvus_manager
 
 logger = logging.getLogger(__name__)
 
@@ -147,27 +149,25 @@ class EmbeddingService:
                 
             logger.info(f"處理資料夾: {subfolder.name}")
             
-            # 處理該資料夾下的所有 JSON 檔案
-            json_files = list(subfolder.glob("*.json"))
-            
-            for json_file in json_files:
-                total_files += 1
-                
+            # 先讀取該資料夾下所有文件（JSON 檔案或 chunk store 資料集）的有效 chunks，整個資料夾一次批次嵌入
+            loaded_files: List[Tuple[Path, Dict[str, Any], List[Dict]]] = []
+            for source in list_stage_sources(subfolder, recursive=True):
                 try:
-                    # 讀取檔案
-                    with open(json_file, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                    
-                    # 處理 chunks
-                    chunks = data.get('chunks', [])
-                    if not chunks:
-                        failed_files += 1
-                        failed_files_list.append(str(json_file))
-                        continue
+                    documents = read_documents(source)
+                except Exception as e:
+                    logger.error(f"處理檔案失敗 {source}: {e}")
+                    total_files += 1
+                    failed_files += 1
+                    failed_files_list.append(str(source))
+                    continue
+                
+                for name, data in documents:
+                    total_files += 1
+                    json_file = source if source.is_file() else source / name
                     
                     # 過濾有效的 chunks
                     valid_chunks = []
-                    for chunk in chunks:
+                    for chunk in data.get('chunks', []):
                         chunk_text = chunk.get('chunk_text', '')
                         if chunk_text and chunk_text.strip() != '' and chunk_text.strip() != '!':
                             valid_chunks.append(chunk)
@@ -177,12 +177,29 @@ class EmbeddingService:
                         failed_files_list.append(str(json_file))
                         continue
                     
-                    # 生成嵌入向量
-                    texts = [chunk['chunk_text'] for chunk in valid_chunks]
-                    embeddings = self.vector_processor.generate_embeddings(texts)
-                    
+                    loaded_files.append((json_file, data, valid_chunks))
+            
+            if not loaded_files:
+                continue
+            
+            # 生成嵌入向量（依長度分批、多程序編碼，順序與輸入相同）
+            texts = [chunk['chunk_text'] for _, _, chunks in loaded_files for chunk in chunks]
+            try:
+                embeddings = self.vector_processor.batch_generate_embeddings(texts)
+            except Exception as e:
+                logger.error(f"資料夾 {subfolder.name} 生成嵌入向量失敗: {e}")
+                failed_files += len(loaded_files)
+                failed_files_list.extend(str(json_file) for json_file, _, _ in loaded_files)
+                continue
+            
+            offset = 0
+            for json_file, data, valid_chunks in loaded_files:
+                file_embeddings = embeddings[offset:offset + len(valid_chunks)]
+                offset += len(valid_chunks)
+                
+                try:
                     # 準備插入資料
-                    insert_data = self._prepare_insert_data(data, valid_chunks, embeddings)
+                    insert_data = self._prepare_insert_data(data, valid_chunks, file_embeddings)
                     
                     # 插入到 Milvus
                     collection.insert(insert_data)
@@ -190,7 +207,7 @@ class EmbeddingService:
                     successful_files += 1
                     total_chunks += len(valid_chunks)
                     
-                    if total_files % 100 == 0:
+                    if successful_files % 100 == 0:
                         logger.info(f"已處理 {total_files} 個檔案，成功 {successful_files} 個")
                     
                 except Exception as e:
@@ -266,28 +283,22 @@ class EmbeddingService:
             相似 chunks 列表
         """
         try:
-            if not self.connect_milvus():
-                return []
-            
-            # 載入集合
-            collection = Collection(self.collection_name)
-            collection.load()
+            # 連線與已載入的集合由共用管理器重用，不再每次查詢都 connect/load/release
+            manager = get_milvus_manager()
             
             # 生成查詢向量
             query_embedding = self.vector_processor.generate_single_embedding(query_text)
             
             # 執行搜尋
-            search_params = {
-                "metric_type": "COSINE",
-                "params": {"nprobe": 10}
-            }
-            
-            results = collection.search(
-                data=[query_embedding],
+            results = manager.search(
+                self.collection_name,
+                [query_embedding],
                 anns_field="embedding",
-                param=search_params,
+                param={"metric_type": "COSINE", "params": {"nprobe": 10}},
                 limit=top_k,
-                output_fields=["chunk_id", "chunk_text", "episode_title", "podcast_name", "tag"]
+                output_fields=["chunk_id", "chunk_text", "episode_title", "podcast_name", "tag"],
+                host=self.milvus_config['host'],
+                port=int(self.milvus_config['port'])
             )
             
             # 處理結果
@@ -304,11 +315,8 @@ class EmbeddingService:
                         "tags": json.loads(hit.entity.get('tag', '[]'))
                     })
             
-            collection.release()
             return search_results
             
         except Exception as e:
             logger.error(f"搜尋失敗: {e}")
-            return []
-        finally:
-            self.disconnect_milvus() 
\ No newline at end of file
+            return [] 
\ No newline at end of file
@@ -14,7 +14,9 @@ from datetime import datetime
 # 添加路徑以便匯入模組
 sys.path.append(str(Path(__file__).parent.parent))
 
+from ..core.chunk_store import is_chunk_store, list_stage_sources, read_records, write_chunk_store
 from ..core.tag_processor import UnifiedTagProcessor
+from ..core.stage_manifest import StageManifest, get_stage_manifest, STAGE1_FILES, TAGGING_STAGE
 from ..config.settings import config
 
 logger = logging.getLogger(__name__)
@@ -23,15 +25,17 @@ logger = logging.getLogger(__name__)
 class TaggingService:
     """標籤服務 - 整合所有標籤處理功能"""
     
-    def __init__(self, tag_csv_path: Optional[str] = None):
+    def __init__(self, tag_csv_path: Optional[str] = None, manifest: Optional[StageManifest] = None):
         """
         初始化標籤服務
         
         Args:
             tag_csv_path: TAG_info.csv 檔案路徑
+            manifest: 階段狀態清單，預設為 stage1 目錄所在資料目錄下的 stage_manifest.sqlite3
         """
         self.tag_csv_path = tag_csv_path or config.tag_csv_path
         self.tag_processor = UnifiedTagProcessor(self.tag_csv_path)
+        self.manifest = manifest
         
         logger.info(f"標籤服務初始化完成，使用標籤檔案: {self.tag_csv_path}")
     
@@ -47,9 +51,13 @@ class TaggingService:
             處理是否成功
         """
         try:
-            # 讀取輸入檔案
-            with open(input_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            # 讀取輸入檔案（JSON 檔案或 chunk store 資料集）
+            columnar = is_chunk_store(input_file)
+            if columnar:
+                data = {'chunks': read_records(input_file)}
+            else:
+                with open(input_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
             
             # 處理 chunks
             chunks = data.get('chunks', [])
@@ -65,10 +73,13 @@ class TaggingService:
                     enhanced_tags = self.tag_processor.process_chunk(chunk_text)
                     chunk['enhanced_tags'] = enhanced_tags
             
-            # 保存結果
+            # 保存結果（與輸入相同格式）
             output_file.parent.mkdir(parents=True, exist_ok=True)
-            with open(output_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            if columnar:
+                write_chunk_store(output_file, chunks)
+            else:
+                with open(output_file, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, ensure_ascii=False, indent=2)
             
             logger.info(f"檔案處理完成: {input_file} -> {output_file}")
             return True
@@ -77,14 +88,16 @@ class TaggingService:
             logger.error(f"處理檔案失敗 {input_file}: {e}")
             return False
     
-    def process_rss_folder(self, rss_folder: str, stage1_dir: str, stage3_dir: str) -> Dict[str, Any]:
+    def process_rss_folder(self, rss_folder: str, stage1_dir: str, stage3_dir: str,
+                           worker: Optional[str] = None) -> Dict[str, Any]:
         """
-        處理單一 RSS 資料夾
+        處理單一 RSS 資料夾（只處理新增或內容變動的檔案，多個行程可同時處理同一資料夾）
         
         Args:
             rss_folder: RSS 資料夾名稱
             stage1_dir: stage1 目錄路徑
             stage3_dir: stage3 目錄路徑
+            worker: 工作者識別，預設為主機:行程:執行緒
             
         Returns:
             處理結果統計
@@ -104,44 +117,48 @@ class TaggingService:
         # 創建輸出目錄
         rss_output_path.mkdir(parents=True, exist_ok=True)
         
-        # 處理所有 JSON 檔案
-        json_files = list(rss_input_path.glob("*.json"))
+        # 以清單比對 JSON 檔案，只列出有變動的目錄
+        manifest = self.manifest or get_stage_manifest(data_dir=stage1_path.parent)
+        prefix = f"{rss_folder}/"
+        manifest.scan(STAGE1_FILES, stage1_path, subdir=rss_folder, recursive=False)
+        total_files = sum(manifest.counts(STAGE1_FILES, prefix=prefix).values())
         
-        if not json_files:
+        if not total_files:
             return {
                 "rss_folder": rss_folder,
                 "error": f"沒有找到 JSON 檔案: {rss_input_path}"
             }
         
-        total_files = len(json_files)
         successful_files = 0
         failed_files = 0
         total_chunks = 0
         total_tags = 0
         failed_files_list = []
         
+        manifest.plan(STAGE1_FILES, TAGGING_STAGE, prefix=prefix)
         logger.info(f"開始處理 RSS 資料夾: {rss_folder} ({total_files} 個檔案)")
         
-        for json_file in json_files:
-            output_file = rss_output_path / json_file.name
+        for entry in manifest.iter_claims(TAGGING_STAGE, worker=worker, prefix=prefix):
+            json_file = stage1_path / entry.source_path
+            output_file = stage3_path / entry.source_path
             
             if self.process_single_file(json_file, output_file):
+                manifest.complete(entry, output_file)
                 successful_files += 1
                 
                 # 統計 chunks 和 tags
                 try:
-                    with open(output_file, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                    chunks = data.get('chunks', [])
+                    chunks = read_records(output_file, columns=['enhanced_tags'])
                     total_chunks += len(chunks)
                     
                     for chunk in chunks:
-                        tags = chunk.get('enhanced_tags', [])
+                        tags = chunk.get('enhanced_tags') or []
                         total_tags += len(tags)
                         
                 except Exception as e:
                     logger.warning(f"統計檔案失敗 {output_file}: {e}")
             else:
+                manifest.fail(TAGGING_STAGE, entry.key, "處理檔案失敗")
                 failed_files += 1
                 failed_files_list.append(str(json_file))
         
@@ -153,6 +170,7 @@ class TaggingService:
             "total_files": total_files,
             "successful_files": successful_files,
             "failed_files": failed_files,
+            "skipped_files": total_files - successful_files - failed_files,
             "total_chunks": total_chunks,
             "total_tags": total_tags,
             "failed_files_list": failed_files_list,
@@ -231,18 +249,15 @@ class TaggingService:
         total_chunks = 0
         total_files = 0
         
-        # 遍歷所有檔案
-        for json_file in stage3_path.rglob("*.json"):
+        # 遍歷所有檔案（JSON 檔案與 chunk store 資料集）
+        for json_file in list_stage_sources(stage3_path, recursive=True):
             total_files += 1
             
             try:
-                with open(json_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                
-                chunks = data.get('chunks', [])
+                chunks = read_records(json_file, columns=['enhanced_tags'])
                 for chunk in chunks:
                     total_chunks += 1
-                    tags = chunk.get('enhanced_tags', [])
+                    tags = chunk.get('enhanced_tags') or []
                     
                     for tag in tags:
                         tag_counts[tag] = tag_counts.get(tag, 0) + 1
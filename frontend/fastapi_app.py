@@ -2,10 +2,11 @@ from fastapi import FastAPI, Request
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse, JSONResponse, Response
+from fastapi.responses import HTMLResponse, JSONResponse, Response, StreamingResponse
 import uvicorn
 from pathlib import Path
 import httpx
+import json
 import logging
 import asyncio
 from datetime import datetime
@@ -173,6 +174,57 @@ async def rag_query(request: Request):
         logger.error(f"RAG Pipeline 查詢失敗: {e}")
         return {"error": str(e)}
 
+def format_sse(event: str, data: Dict[str, Any]) -> bytes:
+    """格式化 Server-Sent Events 事件"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8")
+
+@app.post("/api/rag/query/stream")
+async def rag_query_stream(request: Request):
+    """RAG Pipeline 串流查詢 - 後端的 SSE 事件收到即轉送，不等待完整回答"""
+    body = await request.json()
+    query = body.get("query", "")
+    user_id = body.get("user_id", "Podwise0001")
+    
+    backend_request = {
+        "query": query,
+        "user_id": user_id,
+        "session_id": body.get("session_id", f"session_{user_id}_{int(datetime.now().timestamp())}"),
+        "enable_tts": False,
+        "voice": body.get("voice", "podrina"),
+        "speed": body.get("speed", 1.0),
+        "metadata": body.get("metadata", {})
+    }
+    
+    async def relay():
+        forwarded = False
+        try:
+            # 逾時套用於每次讀取，即兩段輸出之間的等待時間
+            async with httpx.AsyncClient(timeout=30.0) as client:
+                async with client.stream("POST", f"{RAG_API_URL}/api/v1/query/stream", json=backend_request) as response:
+                    if response.status_code == 200:
+                        async for chunk in response.aiter_raw():
+                            forwarded = True
+                            yield chunk
+                        return
+                    logger.warning(f"後端串流服務回應錯誤: {response.status_code}")
+        except Exception as backend_error:
+            logger.warning(f"後端串流連接失敗: {backend_error}")
+            if forwarded:
+                yield format_sse("error", {"detail": str(backend_error)})
+                return
+        
+        # 後端不可用時以本地回應作為單一片段
+        response_text = generate_smart_response(query)
+        yield format_sse("metadata", {"category": "其他", "source": "local_smart_response"})
+        yield format_sse("token", {"text": response_text})
+        yield format_sse("done", {"confidence": 0.0, "level_used": "local_smart_response"})
+    
+    return StreamingResponse(
+        relay(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 async def generate_local_response(body: dict) -> dict:
     """生成本地回應 - 現在會嘗試調用後端 RAG Pipeline"""
     query = body.get("query", "")